@@ -0,0 +1,121 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Tuple
+
+# HDR-style latency histogram. Values are recorded as integers in `unit` (microseconds by default)
+# and bucketed by power of two, each power split into 2**(sub_bits-1) linear sub-buckets, so every
+# recorded value is reproduced within a relative error of 2**-(sub_bits-1) (~1.6% at the default
+# sub_bits=7) from a few hundred sparse counters, whatever the range (1 us .. hours).
+DEFAULT_SUB_BITS = 7
+
+
+class LogHistogram:
+    """Log-bucketed histogram with constant relative precision; mergeable and JSON-serialisable."""
+
+    def __init__(self, unit_s: float = 1e-6, sub_bits: int = DEFAULT_SUB_BITS):
+        self.unit_s = unit_s
+        self.sub_bits = sub_bits
+        self._half = 1 << (sub_bits - 1)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: int | None = None
+        self.max: int | None = None
+
+    # -- bucketing --
+
+    def _index(self, v: int) -> int:
+        if v < (self._half << 1):
+            return v
+        shift = v.bit_length() - self.sub_bits
+        return shift * self._half + (v >> shift)
+
+    def _bounds(self, idx: int) -> Tuple[int, int]:
+        """[lowest, highest] value that lands in bucket idx."""
+        if idx < (self._half << 1):
+            return idx, idx
+        shift = idx // self._half - 1
+        top = idx - shift * self._half
+        return top << shift, ((top + 1) << shift) - 1
+
+    # -- recording --
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        v = max(0, int(round(seconds / self.unit_s)))
+        idx = self._index(v)
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        self.count += count
+        self.total += v * count
+        self.min = v if self.min is None else min(self.min, v)
+        self.max = v if self.max is None else max(self.max, v)
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        if (other.unit_s, other.sub_bits) != (self.unit_s, self.sub_bits):
+            raise ValueError("cannot merge histograms with different unit or precision")
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        for v in (other.min, other.max):
+            if v is not None:
+                self.min = v if self.min is None else min(self.min, v)
+                self.max = v if self.max is None else max(self.max, v)
+        return self
+
+    # -- reading (results in seconds) --
+
+    def percentile(self, q: float) -> float:
+        """Value at percentile q (0..100); the midpoint of its bucket, clamped to the recorded min/max."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(q / 100.0 * self.count)))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                lo, hi = self._bounds(idx)
+                v = min(max((lo + hi) / 2.0, self.min), self.max)
+                return v * self.unit_s
+        return float(self.max) * self.unit_s
+
+    def mean(self) -> float:
+        return (self.total / self.count) * self.unit_s if self.count else 0.0
+
+    def cumulative(self, bounds_s: Iterable[float]) -> List[Tuple[float, int]]:
+        """(upper bound, count of values <= bound) pairs, e.g. for Prometheus `le` buckets."""
+        ordered = sorted(self.counts.items())
+        out: List[Tuple[float, int]] = []
+        for b in bounds_s:
+            limit = b / self.unit_s
+            out.append((b, sum(n for idx, n in ordered if self._bounds(idx)[1] <= limit)))
+        return out
+
+    def summary(self, scale: float = 1e3, digits: int = 3) -> Dict[str, float]:
+        """p50/p95/p99/mean/max, by default in milliseconds."""
+        return {
+            "p50": round(self.percentile(50) * scale, digits),
+            "p95": round(self.percentile(95) * scale, digits),
+            "p99": round(self.percentile(99) * scale, digits),
+            "mean": round(self.mean() * scale, digits),
+            "max": round((self.max or 0) * self.unit_s * scale, digits),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "unit_s": self.unit_s,
+            "sub_bits": self.sub_bits,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "buckets": [[idx, n] for idx, n in sorted(self.counts.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogHistogram":
+        h = cls(unit_s=float(data.get("unit_s", 1e-6)), sub_bits=int(data.get("sub_bits", DEFAULT_SUB_BITS)))
+        h.counts = {int(idx): int(n) for idx, n in data.get("buckets", [])}
+        h.count = int(data.get("count", sum(h.counts.values())))
+        h.total = int(data.get("total", 0))
+        h.min = data.get("min")
+        h.max = data.get("max")
+        return h
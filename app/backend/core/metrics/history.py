@@ -0,0 +1,396 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from datetime import datetime, timezone
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from ..utils.io import ARTIFACTS_CACHE, ARTIFACTS_DIR, ARTIFACTS_METRICS, file_lock, load_json, now_iso
+
+# Append-only metrics history. Every recorded payload is appended as one JSON line to a monthly
+# segment, metrics_history/<capability>/<YYYY-MM>.jsonl; segments are never rewritten, so history
+# survives re-evaluations and exports with the rest of the artifacts. A SQLite index in the cache
+# (disposable, rebuilt from the segments like the registry index) maps (capability, model_id, ts)
+# to samples and keeps per-hour/per-day rollups (count, min, max, mean, p50, p95) of every numeric
+# field. Segments are ingested incrementally from the byte offset reached last time.
+HISTORY_DIR: Path = ARTIFACTS_DIR / "metrics_history"
+HISTORY_INDEX_PATH: Path = ARTIFACTS_CACHE / "metrics_history.sqlite"
+ROLLUP_PERIODS: Dict[str, int] = {"hour": 3600, "day": 86400}
+# top-level fields that identify a run or machine rather than measure it
+NON_METRIC_FIELDS = ("seed", "model_train_seed", "env")
+MAX_LIMIT = 1000
+_RESCAN_INTERVAL_S = 1.0
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    path TEXT PRIMARY KEY,
+    ino INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    capability TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (segment, offset)
+);
+CREATE TABLE IF NOT EXISTS points (
+    capability TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL,
+    segment TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    capability TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket REAL NOT NULL,
+    count INTEGER NOT NULL,
+    min REAL, max REAL, mean REAL, p50 REAL, p95 REAL,
+    PRIMARY KEY (capability, model_id, metric, period, bucket)
+);
+CREATE INDEX IF NOT EXISTS ix_samples_model_ts ON samples(capability, model_id, ts);
+CREATE INDEX IF NOT EXISTS ix_samples_ts ON samples(capability, ts);
+CREATE INDEX IF NOT EXISTS ix_points_metric_ts ON points(capability, model_id, metric, ts);
+CREATE INDEX IF NOT EXISTS ix_points_segment ON points(segment);
+"""
+
+
+def parse_ts(value: Any) -> float | None:
+    """Epoch seconds for an ISO-8601 string (naive means local time) or a number; None if unparsable."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt.timestamp()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def metric_values(payload: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a metrics payload with dotted names, e.g. {"latency_ms.p50": 1.2}."""
+    out: Dict[str, float] = {}
+    for k, v in payload.items():
+        name = f"{prefix}{k}"
+        if (not prefix and k in NON_METRIC_FIELDS) or str(k).endswith("histogram"):
+            continue
+        if isinstance(v, dict):
+            out.update(metric_values(v, f"{name}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v):
+            out[name] = float(v)
+    return out
+
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    # nearest rank, same convention as the chat latency benchmark
+    k = int(round((q / 100.0) * (len(sorted_vals) - 1)))
+    return sorted_vals[k]
+
+
+def _segment_name(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m") + ".jsonl"
+
+
+class MetricsHistory:
+    """Append-only metrics history with an incremental SQLite index over its segments."""
+
+    def __init__(self, history_dir: Path = HISTORY_DIR, index_path: Path | str = HISTORY_INDEX_PATH):
+        self.history_dir = Path(history_dir)
+        self._lock = threading.RLock()
+        self._scanned_at = float("-inf")
+        self.conn = self._connect(index_path)
+
+    def _connect(self, path: Path | str) -> sqlite3.Connection:
+        conn = None
+        if path != ":memory:":
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(path), check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    conn.executescript(
+                        "DROP TABLE IF EXISTS segments; DROP TABLE IF EXISTS samples;"
+                        " DROP TABLE IF EXISTS points; DROP TABLE IF EXISTS rollups;"
+                    )
+            except sqlite3.Error:
+                # unwritable or corrupt index file: fall back to a private in-memory index
+                conn = None
+        if conn is None:
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        conn.commit()
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    # -- writes --
+
+    def append(self, capability: str, payload: Dict[str, Any]) -> Path:
+        """Append one sample (payload must carry model_id and timestamp) and index it right away."""
+        ts = parse_ts(payload.get("timestamp"))
+        if ts is None:
+            ts = time.time()
+        seg = self.history_dir / capability / _segment_name(ts)
+        seg.parent.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with file_lock(seg):
+            # one write() on an O_APPEND descriptor: concurrent appenders never interleave lines
+            fd = os.open(seg, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        with self._lock:
+            dirty: Set[Tuple[str, str, str, str, float]] = set()
+            self._sync_segment(seg, dirty)
+            self._rollup(dirty)
+            self.conn.commit()
+        return seg
+
+    # -- sync --
+
+    def _segments(self) -> List[Path]:
+        if not self.history_dir.is_dir():
+            return []
+        return sorted(self.history_dir.glob("*/*.jsonl"))
+
+    def _rel(self, seg: Path) -> str:
+        return seg.relative_to(self.history_dir).as_posix()
+
+    def _forget(self, rel: str, dirty: Set[Tuple[str, str, str, str, float]]) -> None:
+        for cap, model, metric, ts in self.conn.execute(
+                "SELECT capability, model_id, metric, ts FROM points WHERE segment=?", (rel,)):
+            for period, width in ROLLUP_PERIODS.items():
+                dirty.add((cap, model, metric, period, ts - ts % width))
+        self.conn.execute("DELETE FROM samples WHERE segment=?", (rel,))
+        self.conn.execute("DELETE FROM points WHERE segment=?", (rel,))
+        self.conn.execute("DELETE FROM segments WHERE path=?", (rel,))
+
+    def _sync_segment(self, seg: Path, dirty: Set[Tuple[str, str, str, str, float]]) -> None:
+        rel = self._rel(seg)
+        try:
+            st = seg.stat()
+        except OSError:
+            self._forget(rel, dirty)
+            return
+        row = self.conn.execute("SELECT ino, offset FROM segments WHERE path=?", (rel,)).fetchone()
+        offset = 0
+        if row is not None:
+            if row[0] == st.st_ino and row[1] <= st.st_size:
+                offset = row[1]
+            else:
+                # replaced or truncated (e.g. restored from a bundle): re-read it from the start
+                self._forget(rel, dirty)
+        if row is not None and offset == st.st_size:
+            return
+        capability = seg.parent.name
+        with seg.open("rb") as f:
+            f.seek(offset)
+            data = f.read(st.st_size - offset)
+        end = data.rfind(b"\n") + 1  # a line still being written is picked up next time
+        pos = offset
+        for raw in data[:end].splitlines(keepends=True):
+            line_offset, pos = pos, pos + len(raw)
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(payload, dict):
+                continue
+            ts = parse_ts(payload.get("timestamp"))
+            if ts is None:
+                continue
+            model_id = str(payload.get("model_id") or "")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO samples (capability, model_id, ts, segment, offset, body) VALUES (?,?,?,?,?,?)",
+                (capability, model_id, ts, rel, line_offset, raw.decode("utf-8").rstrip("\n")),
+            )
+            values = metric_values(payload)
+            self.conn.executemany(
+                "INSERT INTO points (capability, model_id, metric, ts, value, segment) VALUES (?,?,?,?,?,?)",
+                [(capability, model_id, m, ts, v, rel) for m, v in values.items()],
+            )
+            for m in values:
+                for period, width in ROLLUP_PERIODS.items():
+                    dirty.add((capability, model_id, m, period, ts - ts % width))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO segments (path, ino, offset) VALUES (?,?,?)", (rel, st.st_ino, offset + end)
+        )
+
+    def _rollup(self, dirty: Iterable[Tuple[str, str, str, str, float]]) -> None:
+        """Recompute the buckets new samples landed in; all other buckets are left as they are."""
+        for cap, model, metric, period, bucket in sorted(dirty):
+            vals = [r[0] for r in self.conn.execute(
+                "SELECT value FROM points WHERE capability=? AND model_id=? AND metric=? AND ts>=? AND ts<?"
+                " ORDER BY value",
+                (cap, model, metric, bucket, bucket + ROLLUP_PERIODS[period]),
+            )]
+            if not vals:
+                self.conn.execute(
+                    "DELETE FROM rollups WHERE capability=? AND model_id=? AND metric=? AND period=? AND bucket=?",
+                    (cap, model, metric, period, bucket),
+                )
+                continue
+            self.conn.execute(
+                "INSERT OR REPLACE INTO rollups (capability, model_id, metric, period, bucket, count, min, max, mean,"
+                " p50, p95) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                (cap, model, metric, period, bucket, len(vals), vals[0], vals[-1], sum(vals) / len(vals),
+                 _percentile(vals, 50), _percentile(vals, 95)),
+            )
+
+    def sync(self, force: bool = False) -> None:
+        """Ingest lines appended by other processes; segments are re-stat'ed at most every
+        _RESCAN_INTERVAL_S (appends made through this instance are indexed immediately)."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._scanned_at < _RESCAN_INTERVAL_S:
+                return
+            self._scanned_at = now
+            dirty: Set[Tuple[str, str, str, str, float]] = set()
+            on_disk = {self._rel(s): s for s in self._segments()}
+            for (rel,) in self.conn.execute("SELECT path FROM segments").fetchall():
+                if rel not in on_disk:
+                    self._forget(rel, dirty)
+            for seg in on_disk.values():
+                self._sync_segment(seg, dirty)
+            self._rollup(dirty)
+            self.conn.commit()
+
+    # -- queries --
+
+    def latest(self, capability: str, model_id: str | None = None) -> Dict[str, Any]:
+        """Newest sample for a capability (optionally one model); an index seek, not a scan."""
+        self.sync()
+        sql = "SELECT body FROM samples WHERE capability=?"
+        args: List[Any] = [capability]
+        if model_id:
+            sql += " AND model_id=?"
+            args.append(model_id)
+        with self._lock:
+            row = self.conn.execute(sql + " ORDER BY ts DESC LIMIT 1", args).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def query(
+        self,
+        capability: str,
+        model_id: str | None = None,
+        since: Any = None,
+        until: Any = None,
+        limit: int | None = 100,
+        order: str = "desc",
+    ) -> List[Dict[str, Any]]:
+        """Samples with since <= timestamp < until (ISO strings or epoch seconds), newest first by default."""
+        order = str(order).lower()
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        where, args = self._where(capability, model_id, since, until)
+        sql = f"SELECT body FROM samples WHERE {' AND '.join(where)} ORDER BY ts {order.upper()}, offset {order.upper()}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(max(1, min(int(limit), MAX_LIMIT)))
+        self.sync()
+        with self._lock:
+            return [json.loads(r[0]) for r in self.conn.execute(sql, args)]
+
+    def rollups(
+        self,
+        capability: str,
+        metric: str,
+        model_id: str | None = None,
+        period: str = "hour",
+        since: Any = None,
+        until: Any = None,
+    ) -> List[Dict[str, Any]]:
+        """Pre-aggregated buckets of one metric (e.g. "latency_ms.p50"), oldest first."""
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"period must be one of {', '.join(ROLLUP_PERIODS)}")
+        where, args = self._where(capability, model_id, since, until, ts_col="bucket")
+        where += ["metric=?", "period=?"]
+        args += [metric, period]
+        self.sync()
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT model_id, bucket, count, min, max, mean, p50, p95 FROM rollups WHERE {' AND '.join(where)}"
+                " ORDER BY bucket, model_id",
+                args,
+            ).fetchall()
+        return [
+            {"model_id": r[0], "bucket": _iso(r[1]), "count": r[2], "min": r[3], "max": r[4], "mean": r[5],
+             "p50": r[6], "p95": r[7]}
+            for r in rows
+        ]
+
+    @staticmethod
+    def _where(capability: str, model_id: str | None, since: Any, until: Any,
+               ts_col: str = "ts") -> Tuple[List[str], List[Any]]:
+        where = ["capability=?"]
+        args: List[Any] = [capability]
+        if model_id:
+            where.append("model_id=?")
+            args.append(model_id)
+        for bound, op in ((since, ">="), (until, "<")):
+            if bound is None or bound == "":
+                continue
+            ts = parse_ts(bound)
+            if ts is None:
+                raise ValueError(f"invalid timestamp: {bound}")
+            where.append(f"{ts_col} {op} ?")
+            args.append(ts)
+        return where, args
+
+
+def backfill(history: "MetricsHistory", metrics_dir: Path = ARTIFACTS_METRICS) -> int:
+    """Seed an empty history from the per-model latest files written before history existed."""
+    n = 0
+    for f in sorted(metrics_dir.glob("*/*.json")):
+        try:
+            data = load_json(f)
+        except Exception:
+            continue
+        if isinstance(data, dict) and data.get("timestamp"):
+            history.append(f.parent.name, dict(data, model_id=data.get("model_id") or f.stem))
+            n += 1
+    return n
+
+
+_HISTORY: MetricsHistory | None = None
+_HISTORY_LOCK = threading.Lock()
+
+
+def get_history() -> MetricsHistory:
+    global _HISTORY
+    if _HISTORY is None:
+        with _HISTORY_LOCK:
+            if _HISTORY is None:
+                _HISTORY = MetricsHistory()
+                try:
+                    # whoever creates the directory (one worker, once) backfills it
+                    HISTORY_DIR.parent.mkdir(parents=True, exist_ok=True)
+                    HISTORY_DIR.mkdir()
+                except FileExistsError:
+                    pass
+                else:
+                    backfill(_HISTORY)
+    return _HISTORY
+
+
+def append_metrics(capability: str, payload: Dict[str, Any]) -> Path:
+    data = dict(payload)
+    data.setdefault("timestamp", now_iso())
+    return get_history().append(capability, data)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from ..utils.io import ARTIFACTS_TRACES, load_json, now_iso, write_json
+
+# On-demand profiling of live traffic. arm() selects a target: the next N runtime_post requests, or
+# one job (by id or by type). Matching calls run under cProfile; with memory=True, tracemalloc runs
+# from arming until the session completes (it is process-wide, so the allocation top-list is the
+# growth over that window). The merged pstats, a text report, the allocation top-list and a JSON
+# summary of the hottest functions land in artifacts/traces/profiles/<profile_id>.*.
+# A session whose target never comes (tracemalloc slows every allocation in the process) ends by
+# itself after timeout_s, with whatever it captured.
+# While nothing is armed, profiled() costs one global read.
+PROFILES_DIR: Path = ARTIFACTS_TRACES / "profiles"
+MAX_REQUESTS = 1000
+DEFAULT_TOP = 25
+DEFAULT_TIMEOUT_S = 600.0
+MAX_TIMEOUT_S = 6 * 3600.0
+
+
+class ProfileBusy(RuntimeError):
+    """A profiling session is already armed."""
+
+
+class _Session:
+    def __init__(self, requests: int, job_id: str | None, job_type: str | None, memory: bool, top: int,
+                 timeout_s: float):
+        self.profile_id = f"prof_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.requests = requests
+        self.job_id = job_id
+        self.job_type = job_type
+        self.memory = memory
+        self.top = top
+        self.remaining = requests if not (job_id or job_type) else 1
+        self.running = 0
+        self.captured = 0
+        self.stats: pstats.Stats | None = None
+        self.wall_s = 0.0
+        self.armed_at = now_iso()
+        self.expires_at = (datetime.now().astimezone() + timedelta(seconds=timeout_s)).isoformat()
+        self.timer: threading.Timer | None = None
+        self.expired = False
+        self.started_tracemalloc = False
+        self.baseline: tracemalloc.Snapshot | None = None
+
+    def target(self) -> Dict[str, Any]:
+        if self.job_id or self.job_type:
+            return {"kind": "job", "job_id": self.job_id, "job_type": self.job_type}
+        return {"kind": "runtime_post", "requests": self.requests}
+
+    def matches(self, kind: str, job_id: str | None, job_type: str | None) -> bool:
+        if self.remaining <= 0:
+            return False
+        if kind == "job":
+            if self.job_id:
+                return job_id == self.job_id
+            return bool(self.job_type) and job_type == self.job_type
+        return kind == "runtime_post" and not (self.job_id or self.job_type)
+
+
+_LOCK = threading.Lock()
+_SESSION: _Session | None = None
+
+
+def arm(requests: int = 10, job_id: str | None = None, job_type: str | None = None,
+        memory: bool = True, top: int = DEFAULT_TOP, timeout_s: float = DEFAULT_TIMEOUT_S) -> Dict[str, Any]:
+    """Arm a session for the next `requests` runtime_post calls, or for one job (job_id or job_type).
+    To profile one queued job, arm its id and then submit it with that job_id. The session ends
+    after timeout_s even if its target never runs."""
+    global _SESSION
+    requests = max(1, min(int(requests), MAX_REQUESTS))
+    timeout_s = float(timeout_s)
+    if not 0 < timeout_s <= MAX_TIMEOUT_S:
+        raise ValueError(f"timeout_s must be in (0, {MAX_TIMEOUT_S:g}]")
+    with _LOCK:
+        if _SESSION is not None:
+            raise ProfileBusy(f"profile {_SESSION.profile_id} is still armed")
+        s = _Session(requests, job_id or None, job_type or None, bool(memory), max(1, int(top)), timeout_s)
+        if s.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(16)
+                s.started_tracemalloc = True
+            s.baseline = tracemalloc.take_snapshot()
+        s.timer = threading.Timer(timeout_s, _expire, args=(s,))
+        s.timer.daemon = True
+        s.timer.start()
+        _SESSION = s
+    return status()
+
+
+def status() -> Dict[str, Any]:
+    s = _SESSION
+    if s is None:
+        return {"armed": False}
+    return {"armed": True, "profile_id": s.profile_id, "target": s.target(), "armed_at": s.armed_at,
+            "captured": s.captured, "remaining": s.remaining, "memory": s.memory, "expires_at": s.expires_at}
+
+
+def _stop_locked(s: _Session) -> Dict[str, Any]:
+    s.remaining = 0
+    if s.running:
+        return status()  # the last in-flight call finishes the session
+    return _finish_locked(s)
+
+
+def disarm() -> Dict[str, Any] | None:
+    """Stop the armed session now; whatever was captured so far is written out."""
+    with _LOCK:
+        s = _SESSION
+        if s is None:
+            return None
+        return _stop_locked(s)
+
+
+def _expire(s: _Session) -> None:
+    with _LOCK:
+        if _SESSION is s:
+            s.expired = True
+            _stop_locked(s)
+
+
+@contextmanager
+def profiled(kind: str, job_id: str | None = None, job_type: str | None = None) -> Iterator[None]:
+    """Profile the enclosed call if an armed session targets it."""
+    s = _SESSION
+    if s is None:
+        yield
+        return
+    with _LOCK:
+        take = _SESSION is s and s.matches(kind, job_id, job_type)
+        if take:
+            s.remaining -= 1
+            s.running += 1
+    if not take:
+        yield
+        return
+    prof = cProfile.Profile()
+    t0 = time.perf_counter()
+    try:
+        prof.enable()
+    except ValueError:
+        prof = None  # another profiler owns this thread; still count the call
+    try:
+        yield
+    finally:
+        if prof is not None:
+            prof.disable()
+        dt = time.perf_counter() - t0
+        with _LOCK:
+            s.running -= 1
+            s.captured += 1
+            s.wall_s += dt
+            if prof is not None:
+                if s.stats is None:
+                    s.stats = pstats.Stats(prof)
+                else:
+                    s.stats.add(prof)
+            if s.remaining <= 0 and s.running == 0 and _SESSION is s:
+                _finish_locked(s)
+
+
+def _hottest(stats: pstats.Stats, top: int) -> List[Dict[str, Any]]:
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append({
+            "function": func,
+            "file": filename,
+            "line": line,
+            "ncalls": nc,
+            "tottime_ms": round(tt * 1000.0, 3),
+            "cumtime_ms": round(ct * 1000.0, 3),
+        })
+    rows.sort(key=lambda r: r["tottime_ms"], reverse=True)
+    return rows[:top]
+
+
+def _finish_locked(s: _Session) -> Dict[str, Any]:
+    global _SESSION
+    _SESSION = None
+    if s.timer is not None:
+        s.timer.cancel()
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    base = PROFILES_DIR / s.profile_id
+    summary: Dict[str, Any] = {
+        "profile_id": s.profile_id,
+        "target": s.target(),
+        "armed_at": s.armed_at,
+        "finished_at": now_iso(),
+        "captured": s.captured,
+        "expired": s.expired,
+        "wall_ms": round(s.wall_s * 1000.0, 3),
+        "hottest": [],
+        "allocations": [],
+        "files": {},
+    }
+    if s.stats is not None:
+        s.stats.dump_stats(str(base) + ".pstats")
+        buf = io.StringIO()
+        pstats.Stats(str(base) + ".pstats", stream=buf).sort_stats("cumulative").print_stats(s.top)
+        (base.parent / (base.name + ".txt")).write_text(buf.getvalue(), encoding="utf-8")
+        summary["hottest"] = _hottest(s.stats, s.top)
+        summary["files"]["pstats"] = base.name + ".pstats"
+        summary["files"]["report"] = base.name + ".txt"
+    if s.memory and s.baseline is not None:
+        try:
+            snap = tracemalloc.take_snapshot()
+            diff = snap.compare_to(s.baseline, "lineno")[: s.top]
+            summary["allocations"] = [
+                {"where": str(d.traceback[0]) if d.traceback else "?", "size_kb": round(d.size_diff / 1024.0, 1),
+                 "count": d.count_diff}
+                for d in diff
+            ]
+            lines = [f"{a['size_kb']:>10.1f} KiB {a['count']:>8d}  {a['where']}" for a in summary["allocations"]]
+            (base.parent / (base.name + ".alloc.txt")).write_text("\n".join(lines) + "\n", encoding="utf-8")
+            summary["files"]["allocations"] = base.name + ".alloc.txt"
+        finally:
+            if s.started_tracemalloc:
+                tracemalloc.stop()
+    write_json(base.parent / (base.name + ".json"), summary)
+    return summary
+
+
+def load_summary(profile_id: str) -> Dict[str, Any] | None:
+    path = PROFILES_DIR / f"{os.path.basename(profile_id)}.json"
+    if not path.exists():
+        return None
+    return load_json(path)
+
+
+def list_summaries(limit: int = 20) -> List[Dict[str, Any]]:
+    out = []
+    if PROFILES_DIR.is_dir():
+        for p in sorted(PROFILES_DIR.glob("prof_*.json"), reverse=True)[:limit]:
+            try:
+                data = load_json(p)
+            except (OSError, ValueError):
+                continue
+            out.append({k: data.get(k) for k in ("profile_id", "target", "finished_at", "captured", "wall_ms")})
+    return out
@@ -2,6 +2,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Any, Dict, List
 from ..utils.io import ARTIFACTS_METRICS, load_json
+from .history import get_history
 
 
 def list_metrics(capability: str) -> List[Dict[str, Any]]:
@@ -18,11 +19,7 @@ def list_metrics(capability: str) -> List[Dict[str, Any]]:
 
 
 def latest_metric(capability: str, model_id: str | None = None) -> Dict[str, Any]:
-    items = list_metrics(capability)
-    if model_id:
-        items = [x for x in items if x.get("model_id") == model_id]
-    items.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    return items[0] if items else {}
+    return get_history().latest(capability, model_id)
 
 
 def metric_by_filename(filename: str) -> Dict[str, Any] | None:
@@ -2,11 +2,14 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Any, Dict
 from ..utils.io import ARTIFACTS_METRICS, write_json, now_iso
+from .history import append_metrics
 
 
 def record_metrics(capability: str, model_id: str, payload: Dict[str, Any]) -> Path:
     """Write metrics JSON under artifacts\metrics\<capability>\<model_id>.json
-    Adds timestamp if missing.
+    Adds timestamp if missing. The file only holds the latest run; every run is also appended
+    to the metrics history (see history.py), after the file is written, so a failing append
+    never costs the latest metrics.
     """
     cap_dir = ARTIFACTS_METRICS / capability
     cap_dir.mkdir(parents=True, exist_ok=True)
@@ -17,4 +20,5 @@ def record_metrics(capability: str, model_id: str, payload: Dict[str, Any]) -> P
         data["model_id"] = model_id
     out = cap_dir / f"{model_id}.json"
     write_json(out, data)
+    append_metrics(capability, data)
     return out
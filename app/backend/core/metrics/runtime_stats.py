@@ -0,0 +1,248 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import threading
+import time
+import weakref
+from .histogram import LogHistogram
+
+# Live backend counters for /api/metrics/runtime (Prometheus text format).
+# Recording is lock-free on the hot path: every thread owns a shard (counters + histograms) that
+# only it writes; a scrape merges all shards. Copying a dict is atomic under the GIL, so readers
+# never block writers. When a thread exits, its shard is folded into one retired shard, so counters
+# never go backwards and the shard list stays as long as the live thread count. Gauges that are "set" (not accumulated) and callback gauges live in one
+# small locked table, since they change rarely.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Prometheus `le` boundaries (seconds) derived from the log-bucketed histograms at scrape time
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_METRICS: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+_SHARDS: List["_Shard"] = []
+_SHARDS_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_GAUGES: Dict[Key, float] = {}
+_GAUGE_FNS: Dict[str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float] | float]] = {}
+_GAUGES_LOCK = threading.Lock()
+
+
+class _Shard:
+    __slots__ = ("counters", "hists")
+
+    def __init__(self):
+        self.counters: Dict[Key, float] = {}
+        self.hists: Dict[Key, LogHistogram] = {}
+
+
+_RETIRED = _Shard()  # totals of exited threads; written only under _SHARDS_LOCK
+
+
+class _ThreadToken:
+    """Lives only in the owning thread's local storage: collected when the thread exits."""
+    __slots__ = ("__weakref__",)
+
+
+def _retire(s: _Shard) -> None:
+    with _SHARDS_LOCK:
+        try:
+            _SHARDS.remove(s)
+        except ValueError:
+            return
+        for k, v in s.counters.items():
+            _RETIRED.counters[k] = _RETIRED.counters.get(k, 0.0) + v
+        for k, h in s.hists.items():
+            if k in _RETIRED.hists:
+                _RETIRED.hists[k].merge(h)
+            else:
+                _RETIRED.hists[k] = h
+
+
+def _shard() -> _Shard:
+    s = getattr(_LOCAL, "shard", None)
+    if s is None:
+        s = _LOCAL.shard = _Shard()
+        _LOCAL.token = token = _ThreadToken()
+        weakref.finalize(token, _retire, s)
+        with _SHARDS_LOCK:
+            _SHARDS.append(s)
+    return s
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def describe(name: str, kind: str, help_text: str) -> None:
+    """Declare a metric (kind: counter | gauge | histogram) so it is rendered with HELP/TYPE."""
+    _METRICS[name] = (kind, help_text)
+
+
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    c = _shard().counters
+    k = _key(name, labels)
+    c[k] = c.get(k, 0.0) + value
+
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    h = _shard().hists
+    k = _key(name, labels)
+    hist = h.get(k)
+    if hist is None:
+        hist = h[k] = LogHistogram()
+    hist.record(seconds)
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    with _GAUGES_LOCK:
+        _GAUGES[_key(name, labels)] = float(value)
+
+
+def gauge_callback(name: str, fn: Callable[[], Dict[Tuple[Tuple[str, str], ...], float] | float]) -> None:
+    """Gauge computed at scrape time: fn returns a number, or {label tuple: number}."""
+    with _GAUGES_LOCK:
+        _GAUGE_FNS[name] = fn
+
+
+def _merged() -> Tuple[Dict[Key, float], Dict[Key, LogHistogram]]:
+    counters: Dict[Key, float] = {}
+    hists: Dict[Key, LogHistogram] = {}
+    # held while reading so a shard retiring meanwhile is counted once (writers never take it)
+    with _SHARDS_LOCK:
+        for s in _SHARDS + [_RETIRED]:
+            for k, v in dict(s.counters).items():
+                counters[k] = counters.get(k, 0.0) + v
+            for k, h in dict(s.hists).items():
+                # copy the owner's histogram fields without locking it; a sample recorded meanwhile may be
+                # missing from this scrape but lands in the next one
+                snap = LogHistogram(h.unit_s, h.sub_bits)
+                snap.counts = dict(h.counts)
+                snap.count = sum(snap.counts.values())
+                snap.total, snap.min, snap.max = h.total, h.min, h.max
+                hists[k] = hists[k].merge(snap) if k in hists else snap
+    return counters, hists
+
+
+def counter_value(name: str, **labels: Any) -> float:
+    """Sum of a counter over all threads; with labels, only the matching series."""
+    want = set(_key(name, labels)[1])
+    counters, _ = _merged()
+    return sum(v for (n, lbl), v in counters.items() if n == name and want <= set(lbl))
+
+
+def _fmt_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format 0.0.4."""
+    counters, hists = _merged()
+    with _GAUGES_LOCK:
+        gauges = dict(_GAUGES)
+        fns = dict(_GAUGE_FNS)
+    for name, fn in fns.items():
+        try:
+            val = fn()
+        except Exception:
+            continue
+        if isinstance(val, dict):
+            for lbl, v in val.items():
+                gauges[(name, tuple(lbl))] = float(v)
+        elif val is not None:
+            gauges[(name, ())] = float(val)
+
+    series: Dict[str, List[str]] = {}
+    for (name, lbl), v in sorted(counters.items()):
+        series.setdefault(name, []).append(f"{name}{_fmt_labels(lbl)} {_fmt_value(v)}")
+    for (name, lbl), v in sorted(gauges.items()):
+        series.setdefault(name, []).append(f"{name}{_fmt_labels(lbl)} {_fmt_value(v)}")
+    for (name, lbl), h in sorted(hists.items(), key=lambda kv: kv[0]):
+        lines = series.setdefault(name, [])
+        for le, n in h.cumulative(LATENCY_BUCKETS_S):
+            lines.append(f"{name}_bucket{_fmt_labels(lbl, (('le', repr(le)),))} {n}")
+        lines.append(f"{name}_bucket{_fmt_labels(lbl, (('le', '+Inf'),))} {h.count}")
+        lines.append(f"{name}_sum{_fmt_labels(lbl)} {_fmt_value(round(h.total * h.unit_s, 6))}")
+        lines.append(f"{name}_count{_fmt_labels(lbl)} {h.count}")
+
+    out: List[str] = []
+    for name in sorted(set(series) | set(_METRICS)):
+        kind, help_text = _METRICS.get(name, ("untyped", ""))
+        if help_text:
+            out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(series.get(name, []))
+    return "\n".join(out) + "\n"
+
+
+def reset() -> None:
+    """Forget everything recorded so far (tests)."""
+    with _SHARDS_LOCK:
+        for s in _SHARDS + [_RETIRED]:
+            s.counters.clear()
+            s.hists.clear()
+    with _GAUGES_LOCK:
+        _GAUGES.clear()
+
+
+class RuntimeMetricsMiddleware:
+    """ASGI middleware: per-route latency histogram, request/error counters and in-flight gauge.
+    Routes are labelled by their path template (/api/registry/models/{model_id}), never the raw path,
+    so label cardinality stays bounded."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message.get("type") == "http.response.start":
+                status["code"] = int(message.get("status", 500))
+            await send(message)
+
+        shard = _shard()
+        method = scope.get("method", "GET")
+        inflight = ("riai_http_requests_in_flight", ())
+        shard.counters[inflight] = shard.counters.get(inflight, 0.0) + 1
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        except Exception:
+            status["code"] = 500
+            raise
+        finally:
+            dt = time.perf_counter() - t0
+            shard.counters[inflight] = shard.counters.get(inflight, 0.0) - 1
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            code = status["code"]
+            # keys built directly (labels already in sorted order) rather than via inc()/observe()
+            lbl = (("method", method), ("route", route))
+            c = shard.counters
+            k = ("riai_http_requests_total", lbl + (("status", str(code)),))
+            c[k] = c.get(k, 0.0) + 1
+            if code >= 500:
+                k = ("riai_http_request_errors_total", lbl)
+                c[k] = c.get(k, 0.0) + 1
+            k = ("riai_http_request_duration_seconds", lbl)
+            hist = shard.hists.get(k)
+            if hist is None:
+                hist = shard.hists[k] = LogHistogram()
+            hist.record(dt)
+
+
+describe("riai_http_requests_total", "counter", "HTTP requests by route template, method and status.")
+describe("riai_http_request_errors_total", "counter", "HTTP requests that failed with a 5xx status or an exception.")
+describe("riai_http_requests_in_flight", "gauge", "HTTP requests currently being served.")
+describe("riai_http_request_duration_seconds", "histogram", "HTTP request latency by route template and method.")
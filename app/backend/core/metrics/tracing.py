@@ -0,0 +1,238 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+import json
+import os
+import queue
+import random
+import threading
+import time
+from ..utils.io import ARTIFACTS_TRACES, file_lock
+from . import runtime_stats
+
+# Lightweight span tracing. A root trace (one runtime request, one job) is head-sampled when it
+# starts; spans opened below it, in any function and through asyncio/threadpool hand-offs (the
+# current trace lives in a ContextVar), are recorded only if the root was sampled, so unsampled
+# requests pay one ContextVar lookup per span. A finished trace becomes one JSON line in
+# artifacts/traces/<name>-<YYYY-MM-DD>.jsonl, written by a background thread from a bounded queue;
+# when the queue is full the trace is dropped (and counted) rather than slowing the request.
+# Daily files older than RETAIN_DAYS are deleted when the writer starts a new day.
+SAMPLE_RATE = float(os.environ.get("RIAI_TRACE_SAMPLE", "0.1"))
+JOB_SAMPLE_RATE = float(os.environ.get("RIAI_TRACE_JOB_SAMPLE", "1.0"))
+RETAIN_DAYS = int(os.environ.get("RIAI_TRACE_RETAIN_DAYS", "7"))
+BUFFER_TRACES = 1024
+TRACES_DIR: Path = ARTIFACTS_TRACES
+
+_CURRENT: ContextVar[Tuple["_Trace", int] | None] = ContextVar("riai_trace", default=None)
+_RNG = random.Random()  # private: sampling must not consume the seeded global PRNG stream
+
+
+class _Trace:
+    __slots__ = ("trace_id", "name", "attrs", "t0", "started_at", "spans", "_next_id")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = f"{_RNG.getrandbits(64):016x}"
+        self.name = name
+        self.attrs = attrs
+        self.t0 = time.perf_counter()
+        self.started_at = datetime.now().astimezone()
+        self.spans: List[Dict[str, Any]] = []
+        self._next_id = 0
+
+    def new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+
+class Span:
+    """Handle yielded by trace()/span(); set() adds attributes (e.g. a result size) before it ends."""
+    __slots__ = ("attrs",)
+
+    def __init__(self, attrs: Dict[str, Any]):
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Any]:
+    """Time a stage of the current trace; a no-op when there is none or it was not sampled."""
+    cur = _CURRENT.get()
+    if cur is None:
+        yield _NOOP
+        return
+    tr, parent = cur
+    sid = tr.new_id()
+    rec: Dict[str, Any] = {"id": sid, "parent": parent, "name": name}
+    handle = Span(dict(attrs))
+    token = _CURRENT.set((tr, sid))
+    t0 = time.perf_counter()
+    try:
+        yield handle
+    except BaseException as e:
+        handle.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        t1 = time.perf_counter()
+        _CURRENT.reset(token)
+        rec["start_ms"] = round((t0 - tr.t0) * 1000.0, 3)
+        rec["duration_ms"] = round((t1 - t0) * 1000.0, 3)
+        if handle.attrs:
+            rec["attrs"] = handle.attrs
+        tr.spans.append(rec)
+
+
+@contextmanager
+def trace(name: str, rate: float | None = None, **attrs: Any) -> Iterator[Any]:
+    """Start a root trace, sampled with probability rate (default RIAI_TRACE_SAMPLE). Inside an
+    active trace this is just a span."""
+    if _CURRENT.get() is not None:
+        with span(name, **attrs) as s:
+            yield s
+        return
+    p = SAMPLE_RATE if rate is None else rate
+    if p <= 0 or (p < 1 and _RNG.random() >= p):
+        yield _NOOP
+        return
+    tr = _Trace(name, dict(attrs))
+    handle = Span(tr.attrs)
+    token = _CURRENT.set((tr, 0))
+    try:
+        yield handle
+    except BaseException as e:
+        tr.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - tr.t0
+        _CURRENT.reset(token)
+        _WRITER.submit({
+            "trace_id": tr.trace_id,
+            "name": tr.name,
+            "started_at": tr.started_at.isoformat(),
+            "duration_ms": round(duration * 1000.0, 3),
+            "attrs": tr.attrs,
+            "spans": sorted(tr.spans, key=lambda s: s["start_ms"]),
+        })
+
+
+def current_trace_id() -> str | None:
+    cur = _CURRENT.get()
+    return cur[0].trace_id if cur is not None else None
+
+
+class _TraceWriter:
+    """Background JSONL writer: submit() never blocks; the thread starts on first use."""
+
+    def __init__(self, maxsize: int = BUFFER_TRACES):
+        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=maxsize)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._pruned_day: str | None = None
+
+    def submit(self, rec: Dict[str, Any]) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._q.put_nowait(rec)
+        except queue.Full:
+            runtime_stats.inc("riai_traces_dropped_total")
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                t = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                t.start()
+                self._thread = t
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._q.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                runtime_stats.inc("riai_traces_dropped_total", len(batch))
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        by_file: Dict[Path, List[str]] = {}
+        for rec in batch:
+            day = rec["started_at"][:10]
+            path = TRACES_DIR / f"{rec['name'].split('.', 1)[0]}-{day}.jsonl"
+            by_file.setdefault(path, []).append(json.dumps(rec, ensure_ascii=False, separators=(",", ":"), default=str))
+        for path, lines in by_file.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            with file_lock(path):
+                # one write() on an O_APPEND descriptor: other worker processes never interleave lines
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+        runtime_stats.inc("riai_traces_written_total", len(batch))
+        today = date.today().isoformat()
+        if self._pruned_day != today:
+            self._pruned_day = today
+            prune()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every submitted trace is on disk (tests, shutdown). False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._q.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+
+def prune(retain_days: int | None = None, today: date | None = None) -> List[Path]:
+    """Delete daily trace files older than retain_days (default RETAIN_DAYS; <= 0 keeps all)."""
+    retain_days = RETAIN_DAYS if retain_days is None else retain_days
+    if retain_days <= 0 or not TRACES_DIR.is_dir():
+        return []
+    cutoff = (today or date.today()) - timedelta(days=retain_days)
+    removed = []
+    for path in TRACES_DIR.glob("*-????-??-??.jsonl"):
+        try:
+            day = date.fromisoformat(path.stem[-10:])
+        except ValueError:
+            continue
+        if day < cutoff:
+            try:
+                path.unlink()
+                removed.append(path)
+            except OSError:
+                continue
+    return removed
+
+
+_WRITER = _TraceWriter()
+
+
+def flush(timeout: float = 5.0) -> bool:
+    return _WRITER.flush(timeout)
+
+
+runtime_stats.describe("riai_traces_written_total", "counter", "Sampled traces written to artifacts/traces.")
+runtime_stats.describe("riai_traces_dropped_total", "counter", "Sampled traces dropped because the writer fell behind.")
@@ -0,0 +1,536 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import posixpath
+import queue
+import shutil
+import sys
+import tarfile
+import threading
+import uuid
+import zlib
+from ..utils.io import ARTIFACTS_DIR, FSYNC_MODE, REGISTRY_DIR, atomic_open, file_lock, now_iso
+from ..utils.hash_cache import iter_sha256, stat_signature
+from ..utils import fs_events
+
+# Export/import bundles (docs/specs/registry_spec.md, "Export/Import"): a tar stream of registry/* and
+# artifacts/* that starts with VERSION and ends with hashes.json. A bundle can be incremental: files
+# whose hash matches a previous bundle's hashes.json are listed under "omitted" instead of archived,
+# and import takes them from the local tree (after verifying their hashes).
+BUNDLE_FORMAT = 1
+DEFAULT_ROOTS: Dict[str, Path] = {"registry": REGISTRY_DIR, "artifacts": ARTIFACTS_DIR}
+# Machine-local state (locks, hash cache, sqlite index) is neither exported nor replaced on import.
+# The blob store is local too: its files are exported once, under their legacy paths.
+LOCAL_ONLY = ("artifacts/cache", "artifacts/blobs")
+COMPRESSIONS = ("none", "gz", "xz")
+CHUNK_BYTES = 1 << 20
+MAX_META_BYTES = 256 * 1024 * 1024
+
+_REMEDIATION = {
+    "corrupt_bundle": "The bundle is damaged or truncated; copy it from the source machine again and retry.",
+    "checksum_mismatch": "The bundle is damaged or truncated; copy it from the source machine again and retry.",
+    "missing_member": "The bundle is damaged or truncated; copy it from the source machine again and retry.",
+    "missing_manifest": "The bundle is damaged or truncated; copy it from the source machine again and retry.",
+    "invalid_manifest": "The bundle is damaged or truncated; copy it from the source machine again and retry.",
+    "missing_version": "The file is not an export bundle; create one with the export endpoint or CLI.",
+    "unsupported_version": "The bundle was written by a newer version; upgrade this installation first.",
+    "unsafe_path": "The bundle has entries outside registry/ and artifacts/; it was not produced by the exporter.",
+    "unexpected_member": "The bundle has entries outside registry/ and artifacts/; it was not produced by the exporter.",
+    "unsupported_member": "The bundle has links or special files; it was not produced by the exporter.",
+    "base_missing": "This is an incremental bundle; import its base bundle first, or export a full bundle.",
+    "base_mismatch": "This is an incremental bundle; import its base bundle first, or export a full bundle.",
+}
+
+
+def _is_local_only(arc: str) -> bool:
+    return any(arc == p or arc.startswith(p + "/") for p in LOCAL_ONLY)
+
+
+def _safe_name(name: str) -> str | None:
+    n = name.replace("\\", "/")
+    if n.startswith("/") or (len(n) > 1 and n[1] == ":"):
+        return None
+    n = posixpath.normpath(n)
+    if n in (".", "..") or n.startswith("../"):
+        return None
+    return n
+
+
+def list_files(roots: Dict[str, Path] | None = None) -> List[Tuple[str, Path]]:
+    """(archive name, path) for every regular file under the roots, in a stable order.
+    Skips machine-local dirs, in-flight atomic-write temp files and symlinks."""
+    out: List[Tuple[str, Path]] = []
+    for top, root in sorted((roots or DEFAULT_ROOTS).items()):
+        if not root.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel = Path(dirpath).relative_to(root).as_posix()
+            base = top if rel == "." else f"{top}/{rel}"
+            dirnames[:] = sorted(d for d in dirnames if not _is_local_only(f"{base}/{d}"))
+            for name in sorted(filenames):
+                path = Path(dirpath) / name
+                if (name.startswith(".") and name.endswith(".tmp")) or path.is_symlink():
+                    continue
+                out.append((f"{base}/{name}", path))
+    return out
+
+
+def _manifest_files(manifest: Dict[str, Any] | None) -> Dict[str, Dict[str, Any]]:
+    files = (manifest or {}).get("files")
+    return files if isinstance(files, dict) else {}
+
+
+class _HashingReader:
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.h = hashlib.sha256()
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.f.read(n)
+        self.h.update(data)
+        return data
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    ti = tarfile.TarInfo(name)
+    ti.size = len(data)
+    ti.mode = 0o644
+    tar.addfile(ti, io.BytesIO(data))
+
+
+def export_bundle(out: BinaryIO, roots: Dict[str, Path] | None = None, compression: str = "gz", level: int = 6,
+                  base_manifest: Dict[str, Any] | None = None, workers: int | None = None) -> Dict[str, Any]:
+    """Write a bundle to out, which only needs write() (nothing is staged on disk), and return its
+    hashes.json. Files are hashed on a thread pool ahead of the archiver (through the persistent hash
+    cache, so unchanged files are not re-read for hashing); with base_manifest, files whose hash
+    matches are omitted from the archive."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+    roots = roots or DEFAULT_ROOTS
+    base_files = _manifest_files(base_manifest)
+    files = list_files(roots)
+    arc_of = {path: arc for arc, path in files}
+    manifest: Dict[str, Any] = {
+        "format": BUNDLE_FORMAT,
+        "bundle_id": uuid.uuid4().hex,
+        "base": (base_manifest or {}).get("bundle_id"),
+        "created_at": now_iso(),
+        "files": {},
+        "omitted": [],
+    }
+    comp: Any = None
+    if compression == "gz":
+        comp = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=level, mtime=0)
+    elif compression == "xz":
+        comp = lzma.LZMAFile(out, "wb", preset=level)
+    try:
+        with tarfile.open(fileobj=comp or out, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            _add_bytes(tar, "VERSION", f"{BUNDLE_FORMAT}\n".encode("ascii"))
+            for path, sig, sha in iter_sha256([p for _, p in files], workers=workers):
+                if sha is None:
+                    continue  # removed since the listing
+                arc = arc_of[path]
+                prev = base_files.get(arc)
+                if isinstance(prev, dict) and prev.get("sha256") == sha and prev.get("size") == sig["size"]:
+                    manifest["files"][arc] = {"sha256": sha, "size": sig["size"]}
+                    manifest["omitted"].append(arc)
+                    continue
+                try:
+                    f = path.open("rb")
+                except OSError:
+                    continue
+                with f:
+                    st = os.fstat(f.fileno())
+                    ti = tarfile.TarInfo(arc)
+                    ti.size = st.st_size
+                    ti.mtime = int(st.st_mtime)
+                    ti.mode = 0o644
+                    if stat_signature(st) == sig:
+                        tar.addfile(ti, f)
+                    else:
+                        # replaced after it was hashed: record the digest of the bytes archived
+                        reader = _HashingReader(f)
+                        tar.addfile(ti, reader)
+                        sha = reader.h.hexdigest()
+                manifest["files"][arc] = {"sha256": sha, "size": st.st_size}
+            _add_bytes(tar, "hashes.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    finally:
+        if comp is not None:
+            comp.close()
+    return manifest
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """write() side of stream_export: buffers into chunks and hands them to a bounded queue."""
+
+    def __init__(self, q: queue.Queue, chunk_size: int):
+        self.q = q
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+        self.cancelled = threading.Event()
+
+    def _put(self, item: Any) -> None:
+        while True:
+            if self.cancelled.is_set():
+                raise _Cancelled()
+            try:
+                self.q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data: bytes) -> int:
+        self.buf += data
+        if len(self.buf) >= self.chunk_size:
+            self._put(bytes(self.buf))
+            self.buf.clear()
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> None:
+        if self.buf:
+            self._put(bytes(self.buf))
+            self.buf.clear()
+
+
+_DONE = object()
+
+
+def stream_export(roots: Dict[str, Path] | None = None, compression: str = "gz", level: int = 6,
+                  base_manifest: Dict[str, Any] | None = None, workers: int | None = None,
+                  chunk_size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Bundle bytes as an iterator of chunks (e.g. for a streaming HTTP response). The archive is
+    written on a background thread into a small bounded queue, so memory stays at a few chunks
+    whatever the bundle size; closing the iterator early aborts the export."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+    q: queue.Queue = queue.Queue(maxsize=8)
+    sink = _QueueWriter(q, chunk_size)
+
+    def _run() -> None:
+        try:
+            export_bundle(sink, roots=roots, compression=compression, level=level,
+                          base_manifest=base_manifest, workers=workers)
+            sink.drain()
+            sink._put(_DONE)
+        except _Cancelled:
+            pass
+        except BaseException as e:
+            try:
+                sink._put(e)
+            except _Cancelled:
+                pass
+
+    def _chunks() -> Iterator[bytes]:
+        t = threading.Thread(target=_run, name="bundle-export", daemon=True)
+        t.start()
+        try:
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            sink.cancelled.set()
+            t.join()
+
+    return _chunks()
+
+
+class QueueReader:
+    """read() side of a streaming import: another thread (e.g. the request handler) feeds chunks
+    and calls finish() when the body ends or the client goes away."""
+
+    def __init__(self, maxsize: int = 8):
+        self.q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.buf = b""
+        self.eof = False
+        self.finished = threading.Event()
+        self.abandoned = threading.Event()
+
+    def feed(self, chunk: bytes) -> bool:
+        """Queue a chunk. Returns False once the reader has stopped reading."""
+        while not self.abandoned.is_set():
+            try:
+                self.q.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def finish(self) -> None:
+        self.finished.set()
+
+    def abandon(self) -> None:
+        self.abandoned.set()
+
+    def read(self, n: int = -1) -> bytes:
+        while not self.eof and (n is None or n < 0 or len(self.buf) < n):
+            try:
+                self.buf += self.q.get(timeout=0.1)
+            except queue.Empty:
+                # feed() and finish() come from one thread in order, so an empty queue after
+                # finish() really is the end of the stream
+                if self.finished.is_set() and self.q.empty():
+                    self.eof = True
+        if n is None or n < 0:
+            out, self.buf = self.buf, b""
+        else:
+            out, self.buf = self.buf[:n], self.buf[n:]
+        return out
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _sync_all() -> None:
+    if FSYNC_MODE != "off" and hasattr(os, "sync"):
+        os.sync()
+
+
+def _activate(roots: Dict[str, Path], stage: Dict[str, Path], token: str) -> None:
+    """Swap each staged tree in with two renames, carrying machine-local dirs over. Any failure
+    rolls back the renames done so far."""
+    swapped: List[Tuple[str, Path | None]] = []
+    moved: List[Tuple[Path, Path]] = []
+    try:
+        for top, root in sorted(roots.items()):
+            new = stage[top]
+            for arc in LOCAL_ONLY:
+                head, _, rest = arc.partition("/")
+                if head == top and (root / rest).exists():
+                    (new / rest).parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(root / rest, new / rest)
+                    moved.append((root / rest, new / rest))
+            old = None
+            if root.exists():
+                old = root.parent / f".{root.name}.old-{token}"
+                os.replace(root, old)
+            try:
+                os.replace(new, root)
+            except BaseException:
+                if old is not None:
+                    os.replace(old, root)
+                raise
+            swapped.append((top, old))
+    except BaseException:
+        for top, old in reversed(swapped):
+            os.replace(roots[top], stage[top])
+            if old is not None:
+                os.replace(old, roots[top])
+        for src, dst in reversed(moved):
+            os.replace(dst, src)
+        raise
+    for _, old in swapped:
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    for root in roots.values():
+        fs_events.notify(root)
+
+
+def import_bundle(src: BinaryIO, roots: Dict[str, Path] | None = None, activate: bool = True,
+                  workers: int | None = None) -> Dict[str, Any]:
+    """Stream a bundle from src (anything with read(); plain, gzip or xz), verify every file against
+    hashes.json and, if all is well and activate=True, replace the roots with the bundle's contents.
+    The new trees are assembled next to the live ones and swapped in by rename, so readers see the old
+    state or the new one. Returns a report; status is "imported", "verified" (activate=False) or
+    "rejected" with errors and remediation, in which case nothing on disk changed."""
+    roots = roots or DEFAULT_ROOTS
+    token = uuid.uuid4().hex[:12]
+    stage = {top: root.parent / f".{root.name}.import-{token}" for top, root in roots.items()}
+    errors: List[Dict[str, Any]] = []
+    received: Dict[str, Dict[str, Any]] = {}
+    manifest: Dict[str, Any] | None = None
+    version: str | None = None
+    try:
+        for d in stage.values():
+            d.mkdir(parents=True)
+        try:
+            with tarfile.open(fileobj=src, mode="r|*") as tar:
+                for m in tar:
+                    name = _safe_name(m.name)
+                    if name is None:
+                        errors.append({"error_code": "unsafe_path", "path": m.name})
+                        continue
+                    if name in ("VERSION", "hashes.json"):
+                        if not m.isfile() or m.size > MAX_META_BYTES:
+                            errors.append({"error_code": "unsupported_member", "path": name})
+                            continue
+                        data = tar.extractfile(m).read()
+                        if name == "VERSION":
+                            version = data.decode("utf-8", errors="replace").strip()
+                        else:
+                            try:
+                                manifest = json.loads(data.decode("utf-8"))
+                            except ValueError as e:
+                                errors.append({"error_code": "invalid_manifest", "human_message": str(e)})
+                        continue
+                    if m.isdir():
+                        continue
+                    top, _, rest = name.partition("/")
+                    if top not in roots or not rest or _is_local_only(name):
+                        errors.append({"error_code": "unexpected_member", "path": name})
+                        continue
+                    if not m.isfile():
+                        errors.append({"error_code": "unsupported_member", "path": name})
+                        continue
+                    dst = stage[top] / rest
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    h = hashlib.sha256()
+                    with tar.extractfile(m) as rf, dst.open("wb") as wf:
+                        while True:
+                            chunk = rf.read(CHUNK_BYTES)
+                            if not chunk:
+                                break
+                            h.update(chunk)
+                            wf.write(chunk)
+                    received[name] = {"sha256": h.hexdigest(), "size": m.size}
+        except (tarfile.TarError, EOFError, OSError, zlib.error, lzma.LZMAError) as e:
+            errors.append({"error_code": "corrupt_bundle", "human_message": str(e)})
+
+        files: Dict[str, Dict[str, Any]] = {}
+        reuse: List[Tuple[str, Path]] = []
+        if version is None:
+            errors.append({"error_code": "missing_version"})
+        elif not version.isdigit() or int(version) > BUNDLE_FORMAT:
+            errors.append({"error_code": "unsupported_version", "version": version})
+        if manifest is None or not isinstance(manifest.get("files"), dict):
+            if not any(e["error_code"] == "invalid_manifest" for e in errors):
+                errors.append({"error_code": "missing_manifest"})
+        else:
+            files = manifest["files"]
+            omitted = set(manifest.get("omitted") or [])
+            for arc, got in received.items():
+                exp = files.get(arc)
+                if not isinstance(exp, dict):
+                    errors.append({"error_code": "unexpected_member", "path": arc})
+                elif exp.get("sha256") != got["sha256"] or exp.get("size") != got["size"]:
+                    errors.append({"error_code": "checksum_mismatch", "path": arc,
+                                   "expected": exp.get("sha256"), "actual": got["sha256"]})
+            for arc in sorted(files):
+                if arc in received:
+                    continue
+                top, _, rest = arc.partition("/")
+                if _safe_name(arc) != arc or top not in roots or not rest or _is_local_only(arc):
+                    errors.append({"error_code": "unsafe_path", "path": arc})
+                elif arc not in omitted:
+                    errors.append({"error_code": "missing_member", "path": arc})
+                else:
+                    reuse.append((arc, roots[top] / rest))
+            if reuse:
+                for (arc, _), (_, _, sha) in zip(reuse, iter_sha256([p for _, p in reuse], workers=workers)):
+                    if sha is None:
+                        errors.append({"error_code": "base_missing", "path": arc})
+                    elif sha != files[arc].get("sha256"):
+                        errors.append({"error_code": "base_mismatch", "path": arc,
+                                       "expected": files[arc].get("sha256"), "actual": sha})
+
+        report: Dict[str, Any] = {
+            "status": "rejected" if errors else ("imported" if activate else "verified"),
+            "bundle_id": (manifest or {}).get("bundle_id"),
+            "base": (manifest or {}).get("base"),
+            "files": len(files),
+            "received": len(received),
+            "reused": len(reuse),
+            "bytes": sum(r["size"] for r in received.values()),
+        }
+        if errors:
+            report["errors"] = errors
+            report["remediation"] = sorted({_REMEDIATION[e["error_code"]] for e in errors})
+            return report
+        if not activate:
+            return report
+        for arc, path in reuse:
+            top, _, rest = arc.partition("/")
+            _link_or_copy(path, stage[top] / rest)
+        _sync_all()
+        # one import at a time; the lock file moves along with artifacts/cache during the swap
+        with file_lock(Path(REGISTRY_DIR.parent) / ".bundle_import"):
+            _activate(roots, stage, token)
+        _sync_all()
+        return report
+    finally:
+        for d in stage.values():
+            shutil.rmtree(d, ignore_errors=True)
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    """hashes.json from a saved manifest (.json) or from a bundle file (base for incremental exports)."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    with tarfile.open(path, mode="r|*") as tar:
+        for m in tar:
+            if m.name == "hashes.json" and m.isfile():
+                return json.loads(tar.extractfile(m).read().decode("utf-8"))
+    raise ValueError(f"{path} has no hashes.json")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.backend.core.registry.bundle",
+                                     description="Export or import app/registry + app/artifacts bundles.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="write a bundle")
+    ex.add_argument("-o", "--output", required=True, help="bundle path, or - for stdout")
+    ex.add_argument("--compression", choices=COMPRESSIONS, default="gz")
+    ex.add_argument("--level", type=int, default=6, help="gzip level / xz preset")
+    ex.add_argument("--base", help="previous bundle or its hashes.json; unchanged files are omitted")
+    ex.add_argument("--manifest", help="also save this bundle's hashes.json here")
+    ex.add_argument("--workers", type=int, default=None, help="hashing threads")
+    im = sub.add_parser("import", help="verify and activate a bundle")
+    im.add_argument("bundle", help="bundle path, or - for stdin")
+    im.add_argument("--dry-run", action="store_true", help="verify only")
+    im.add_argument("--workers", type=int, default=None)
+    mf = sub.add_parser("manifest", help="print a bundle's hashes.json")
+    mf.add_argument("bundle")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export":
+        base = read_manifest(Path(args.base)) if args.base else None
+        kwargs = dict(compression=args.compression, level=args.level, base_manifest=base, workers=args.workers)
+        if args.output == "-":
+            manifest = export_bundle(sys.stdout.buffer, **kwargs)
+        else:
+            with atomic_open(Path(args.output), "wb") as f:
+                manifest = export_bundle(f, **kwargs)
+        if args.manifest:
+            with atomic_open(Path(args.manifest)) as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+        print(f"exported {len(manifest['files']) - len(manifest['omitted'])} files "
+              f"({len(manifest['omitted'])} unchanged, omitted)", file=sys.stderr)
+        return 0
+    if args.cmd == "import":
+        if args.bundle == "-":
+            report = import_bundle(sys.stdin.buffer, activate=not args.dry_run, workers=args.workers)
+        else:
+            with open(args.bundle, "rb") as f:
+                report = import_bundle(f, activate=not args.dry_run, workers=args.workers)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if report["status"] != "rejected" else 1
+    print(json.dumps(read_manifest(Path(args.bundle)), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
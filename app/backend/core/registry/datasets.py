@@ -1,17 +1,13 @@
 from __future__ import annotations
 from typing import Dict, Any, List
 from pathlib import Path
-from ..utils.io import REGISTRY_DATASETS_DIR, write_json, load_json, compute_sha256, ROOT
+from ..utils.io import REGISTRY_DATASETS_DIR, write_json, compute_sha256, ROOT
 
 
-def list_datasets() -> List[Dict[str, Any]]:
-    items: List[Dict[str, Any]] = []
-    for p in REGISTRY_DATASETS_DIR.glob("*.json"):
-        try:
-            items.append(load_json(p))
-        except Exception:
-            continue
-    return items
+def list_datasets(**filters: Any) -> List[Dict[str, Any]]:
+    """All dataset entries (sorted by id), optionally filtered (see index.FILTER_FIELDS)."""
+    from .index import query_registry
+    return query_registry("datasets", filters=filters, with_total=False)["items"]
 
 
 def _to_rel(p: Path) -> str:
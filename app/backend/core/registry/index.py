@@ -0,0 +1,326 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from ..utils.io import ARTIFACTS_DIR, REGISTRY_DATASETS_DIR, REGISTRY_MODELS_DIR, REGISTRY_NN_DIR
+from ..utils import fs_events
+
+# SQLite index over registry/<kind>/*.json. The JSON files stay the source of truth (export, diffs);
+# the index is a disposable cache that is rebuilt from them whenever it is missing or out of date.
+INDEX_PATH: Path = ARTIFACTS_DIR / "cache" / "registry_index.sqlite"
+KIND_DIRS: Dict[str, Path] = {
+    "models": REGISTRY_MODELS_DIR,
+    "neural_nets": REGISTRY_NN_DIR,
+    "datasets": REGISTRY_DATASETS_DIR,
+}
+SORT_FIELDS = ("id", "name", "created_at", "capability", "task")
+FILTER_FIELDS = ("capability", "task", "nn_id", "family", "dataset_id")
+MAX_LIMIT = 1000
+# Files added/removed change the directory mtime and trigger a scan at once; in-place edits made
+# outside write_json are caught by a full re-scan at most this often.
+_RESCAN_INTERVAL_S = float(os.environ.get("RIAI_REGISTRY_RESCAN_S", "10.0"))
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    capability TEXT NOT NULL DEFAULT '',
+    task TEXT NOT NULL DEFAULT '',
+    nn_id TEXT NOT NULL DEFAULT '',
+    family TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    body TEXT,
+    PRIMARY KEY (kind, id)
+);
+CREATE TABLE IF NOT EXISTS entry_datasets (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    PRIMARY KEY (kind, id, dataset_id)
+);
+CREATE INDEX IF NOT EXISTS ix_entries_capability ON entries(kind, capability, id);
+CREATE INDEX IF NOT EXISTS ix_entries_task ON entries(kind, task, id);
+CREATE INDEX IF NOT EXISTS ix_entries_nn_id ON entries(kind, nn_id);
+CREATE INDEX IF NOT EXISTS ix_entries_family ON entries(kind, family);
+CREATE INDEX IF NOT EXISTS ix_entries_created_at ON entries(kind, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_entries_name ON entries(kind, name, id);
+CREATE INDEX IF NOT EXISTS ix_entry_datasets_dataset_id ON entry_datasets(dataset_id, kind);
+"""
+
+
+def _text(v: Any) -> str:
+    # missing values index as '' (NOT NULL), so sorting on the bare column can use the indexes
+    if v is None or isinstance(v, (dict, list)):
+        return ""
+    return str(v)
+
+
+def _dataset_ids(kind: str, file_id: str, body: Dict[str, Any]) -> List[str]:
+    if kind == "datasets":
+        return [str(body.get("id") or file_id)]
+    out: List[str] = []
+    ids = body.get("dataset_ids")
+    if isinstance(ids, list):
+        out.extend(str(x) for x in ids if x)
+    if body.get("dataset_id"):
+        out.append(str(body["dataset_id"]))
+    return sorted(set(out))
+
+
+def encode_cursor(sort_value: Any, entry_id: str) -> str:
+    raw = json.dumps([sort_value, entry_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, entry_id = json.loads(raw.decode("utf-8"))
+        return str(value), str(entry_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+class RegistryIndex:
+    """Registry entries mirrored into SQLite for filtered, sorted, keyset-paginated listing.
+
+    Sync is incremental: a scan compares (mtime_ns, size) per file and re-parses only changed files;
+    files written in-process via write_json are upserted as soon as they are announced.
+    """
+
+    def __init__(self, path: Path | str = INDEX_PATH, kind_dirs: Dict[str, Path] | None = None):
+        self.kind_dirs = dict(kind_dirs or KIND_DIRS)
+        self._lock = threading.RLock()
+        self._pending: set = set()          # paths announced by fs_events, upserted on next query
+        self._scanned_at: Dict[str, float] = {}
+        self._dir_mtime: Dict[str, int | None] = {}
+        self.conn = self._connect(Path(path) if path != ":memory:" else path)
+        fs_events.subscribe(self._on_write)
+
+    def _connect(self, path: Path | str) -> sqlite3.Connection:
+        conn = None
+        if path != ":memory:":
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(path), check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    conn.executescript("DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS entry_datasets;")
+            except sqlite3.Error:
+                # unwritable or corrupt index file: fall back to a private in-memory index
+                conn = None
+        if conn is None:
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        conn.commit()
+        return conn
+
+    def close(self) -> None:
+        fs_events.unsubscribe(self._on_write)
+        with self._lock:
+            self.conn.close()
+
+    # -- sync --
+
+    def _kind_of(self, path: Path) -> str | None:
+        parent = os.path.abspath(path.parent)
+        for kind, d in self.kind_dirs.items():
+            if os.path.abspath(d) == parent:
+                return kind
+        return None
+
+    def _on_write(self, path: Path) -> None:
+        if path.suffix == ".json" and self._kind_of(path) is not None:
+            with self._lock:
+                self._pending.add(str(path))
+
+    def _upsert(self, kind: str, path: Path, st: os.stat_result) -> None:
+        file_id = path.stem
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                body = json.load(f)
+            if not isinstance(body, dict):
+                raise ValueError("registry entry is not an object")
+        except Exception:
+            # unreadable entry: remember the stat so it is not re-parsed until it changes, list nothing
+            body = None
+        b = body or {}
+        self.conn.execute("DELETE FROM entry_datasets WHERE kind=? AND id=?", (kind, file_id))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (kind, id, file, mtime_ns, size, name, capability, task, nn_id, family,"
+            " created_at, body) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+            (
+                kind, file_id, path.name, st.st_mtime_ns, st.st_size,
+                _text(b.get("name")), _text(b.get("capability")), _text(b.get("task")), _text(b.get("nn_id")),
+                _text(b.get("family")), _text(b.get("created_at")),
+                json.dumps(body, ensure_ascii=False) if body is not None else None,
+            ),
+        )
+        if body is not None:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO entry_datasets (kind, id, dataset_id) VALUES (?,?,?)",
+                [(kind, file_id, ds) for ds in _dataset_ids(kind, file_id, body)],
+            )
+
+    def _delete(self, kind: str, file_id: str) -> None:
+        self.conn.execute("DELETE FROM entries WHERE kind=? AND id=?", (kind, file_id))
+        self.conn.execute("DELETE FROM entry_datasets WHERE kind=? AND id=?", (kind, file_id))
+
+    def _sync_file(self, path: Path, force: bool = False) -> None:
+        kind = self._kind_of(path)
+        if kind is None:
+            return
+        try:
+            st = path.stat()
+        except OSError:
+            self._delete(kind, path.stem)
+            return
+        row = self.conn.execute("SELECT mtime_ns, size FROM entries WHERE kind=? AND id=?", (kind, path.stem)).fetchone()
+        if force or row is None or row != (st.st_mtime_ns, st.st_size):
+            self._upsert(kind, path, st)
+
+    def _scan(self, kind: str) -> None:
+        d = self.kind_dirs[kind]
+        on_disk: Dict[str, Tuple[Path, os.stat_result]] = {}
+        try:
+            with os.scandir(d) as it:
+                for de in it:
+                    if de.name.endswith(".json") and de.is_file():
+                        try:
+                            on_disk[de.name[:-5]] = (Path(de.path), de.stat())
+                        except OSError:
+                            continue
+        except OSError:
+            pass
+        known = {r[0]: (r[1], r[2]) for r in self.conn.execute(
+            "SELECT id, mtime_ns, size FROM entries WHERE kind=?", (kind,))}
+        for file_id in known.keys() - on_disk.keys():
+            self._delete(kind, file_id)
+        for file_id, (path, st) in on_disk.items():
+            if known.get(file_id) != (st.st_mtime_ns, st.st_size):
+                self._upsert(kind, path, st)
+
+    def sync(self, kind: str | None = None, force: bool = False) -> None:
+        """Bring the index up to date: announced writes always; a scan when the directory listing
+        changed (mtime) or _RESCAN_INTERVAL_S has passed."""
+        kinds = [kind] if kind else list(self.kind_dirs)
+        with self._lock:
+            now = time.monotonic()
+            pending, self._pending = self._pending, set()
+            for p in sorted(pending):
+                # announced writes are re-read even if a coarse mtime did not move
+                self._sync_file(Path(p), force=True)
+            for k in kinds:
+                try:
+                    dir_mtime = os.stat(self.kind_dirs[k]).st_mtime_ns
+                except OSError:
+                    dir_mtime = None
+                if (
+                    force
+                    or dir_mtime != self._dir_mtime.get(k, -1)
+                    or now - self._scanned_at.get(k, float("-inf")) >= _RESCAN_INTERVAL_S
+                ):
+                    self._scan(k)
+                    self._scanned_at[k] = now
+                    self._dir_mtime[k] = dir_mtime
+            self.conn.commit()
+
+    # -- queries --
+
+    def query(
+        self,
+        kind: str,
+        filters: Dict[str, Any] | None = None,
+        sort: str = "id",
+        order: str = "asc",
+        limit: int | None = None,
+        cursor: str | None = None,
+        with_total: bool | None = None,
+    ) -> Dict[str, Any]:
+        """List entries of one kind.
+        filters: any of FILTER_FIELDS (exact match; dataset_id matches models referencing the dataset)
+        sort: one of SORT_FIELDS, ties broken by id; order: asc|desc
+        limit/cursor: keyset pagination, pass next_cursor from the previous page
+        with_total: count all matches of the filters (a full scan of them); default only on the
+        first page (no cursor)
+        Returns {items, next_cursor, total}; total is None when not counted.
+        """
+        if kind not in self.kind_dirs:
+            raise ValueError(f"unknown registry kind: {kind}")
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+        order = str(order).lower()
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        if limit is not None:
+            limit = max(1, min(int(limit), MAX_LIMIT))
+        self.sync(kind)
+
+        where = ["e.kind = ?", "e.body IS NOT NULL"]
+        args: List[Any] = [kind]
+        for field, value in (filters or {}).items():
+            if value is None or value == "":
+                continue
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"unknown filter: {field}")
+            if field == "dataset_id":
+                where.append("EXISTS (SELECT 1 FROM entry_datasets d WHERE d.dataset_id = ? AND d.kind = e.kind AND d.id = e.id)")
+            else:
+                where.append(f"e.{field} = ?")
+            args.append(str(value))
+        col = f"e.{sort}"
+        if with_total is None:
+            with_total = not cursor
+        with self._lock:
+            total = None
+            if with_total:
+                total = self.conn.execute(f"SELECT COUNT(*) FROM entries e WHERE {' AND '.join(where)}", args).fetchone()[0]
+            if cursor:
+                value, last_id = decode_cursor(cursor)
+                op = ">" if order == "asc" else "<"
+                where.append(f"({col} {op} ? OR ({col} = ? AND e.id {op} ?))")
+                args.extend([value, value, last_id])
+            sql = (
+                f"SELECT e.id, {col}, e.body FROM entries e WHERE {' AND '.join(where)}"
+                f" ORDER BY {col} {order.upper()}, e.id {order.upper()}"
+            )
+            if limit is not None:
+                sql += " LIMIT ?"
+                args.append(limit + 1)
+            rows = self.conn.execute(sql, args).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return {"items": [json.loads(r[2]) for r in rows], "next_cursor": next_cursor, "total": total}
+
+    def list_all(self, kind: str) -> List[Dict[str, Any]]:
+        return self.query(kind, with_total=False)["items"]
+
+
+_INDEX: RegistryIndex | None = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index() -> RegistryIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = RegistryIndex()
+    return _INDEX
+
+
+def query_registry(kind: str, **kwargs: Any) -> Dict[str, Any]:
+    return get_index().query(kind, **kwargs)
@@ -1,16 +1,12 @@
 from __future__ import annotations
 from typing import Dict, Any, List
-from ..utils.io import REGISTRY_MODELS_DIR, write_json, load_json, now_iso
+from ..utils.io import REGISTRY_MODELS_DIR, write_json, now_iso
 
 
-def list_models() -> List[Dict[str, Any]]:
-    items: List[Dict[str, Any]] = []
-    for p in REGISTRY_MODELS_DIR.glob("*.json"):
-        try:
-            items.append(load_json(p))
-        except Exception:
-            continue
-    return items
+def list_models(**filters: Any) -> List[Dict[str, Any]]:
+    """All model entries (sorted by id), optionally filtered (see index.FILTER_FIELDS)."""
+    from .index import query_registry
+    return query_registry("models", filters=filters, with_total=False)["items"]
 
 
 def create_model(model_id: str, capability: str, task: str, name: str | None = None, extra: Dict[str, Any] | None = None) -> Dict[str, Any]:
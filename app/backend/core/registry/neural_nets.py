@@ -1,17 +1,13 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Any, List
-from ..utils.io import REGISTRY_NN_DIR, write_json, load_json
+from ..utils.io import REGISTRY_NN_DIR, write_json
 
 
-def list_neural_nets() -> List[Dict[str, Any]]:
-    items: List[Dict[str, Any]] = []
-    for p in REGISTRY_NN_DIR.glob("*.json"):
-        try:
-            items.append(load_json(p))
-        except Exception:
-            continue
-    return items
+def list_neural_nets(**filters: Any) -> List[Dict[str, Any]]:
+    """All neural net entries (sorted by id), optionally filtered (see index.FILTER_FIELDS)."""
+    from .index import query_registry
+    return query_registry("neural_nets", filters=filters, with_total=False)["items"]
 
 
 def create_neural_net(nn_id: str, name: str | None = None, family: str | None = None, extra: Dict[str, Any] | None = None) -> Dict[str, Any]:
@@ -0,0 +1,182 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import re
+import threading
+import time
+from ..utils.io import REGISTRY_DIR, REGISTRY_NN_DIR, ROOT, file_lock, load_json, now_iso, update_json, write_json
+
+# neural_networks.yaml is compiled once (and again only when its mtime/size change) into lookup
+# tables; the registry is seeded from it by a recorded, one-time migration instead of on every GET.
+CATALOG_PATH: Path = ROOT / "neural_networks.yaml"
+MIGRATIONS_PATH: Path = REGISTRY_DIR / "migrations.json"
+_MIGRATION = "nn_catalog_seed"
+_STAT_INTERVAL_S = 1.0
+
+
+def alias_key(name: str) -> str:
+    """Lookup key for names/aliases: case-insensitive, ignoring spaces, dashes, dots and underscores."""
+    return re.sub(r"[\s\-_.]+", "", str(name)).casefold()
+
+
+def _scalar(v: str) -> str:
+    v = v.strip()
+    if len(v) >= 2 and v[0] == v[-1] and v[0] in "\"'":
+        return v[1:-1]
+    return v
+
+
+def _flow_list(v: str) -> List[str]:
+    v = v.strip()
+    if not (v.startswith("[") and v.endswith("]")):
+        return [_scalar(v)] if v else []
+    return [_scalar(x) for x in v[1:-1].split(",") if _scalar(x)]
+
+
+def parse_catalog(text: str) -> List[Dict[str, Any]]:
+    """Minimal parser for the architectures list: `- id:` blocks with name, family and aliases
+    (flow list or block list). Unknown keys are ignored."""
+    out: List[Dict[str, Any]] = []
+    current: Dict[str, Any] | None = None
+    last_key = None
+    for raw in text.splitlines():
+        line = raw.split(" #", 1)[0].rstrip()
+        s = line.strip()
+        if not s or s.startswith("#"):
+            continue
+        if s.startswith("- id:"):
+            current = {"id": _scalar(s.split(":", 1)[1]), "aliases": []}
+            out.append(current)
+            last_key = "id"
+            continue
+        if current is None:
+            continue
+        if s.startswith("- ") and last_key == "aliases":
+            current["aliases"].append(_scalar(s[2:]))
+            continue
+        parts = s.split(":", 1)
+        if len(parts) != 2:
+            continue
+        k, v = parts[0].strip(), parts[1]
+        last_key = k
+        if k in ("name", "family") and _scalar(v):
+            current[k] = _scalar(v)
+        elif k == "aliases":
+            current["aliases"] = _flow_list(v)
+    entries: List[Dict[str, Any]] = []
+    seen = set()
+    for e in out:
+        if not e.get("id") or e["id"] in seen:
+            continue
+        seen.add(e["id"])
+        entries.append({
+            "id": str(e["id"]),
+            "name": str(e.get("name", e["id"])),
+            "family": e.get("family"),
+            "aliases": [str(a) for a in e.get("aliases", [])],
+        })
+    return entries
+
+
+class NNCatalog:
+    """Compiled neural_networks.yaml: entries in file order plus id, alias and family indexes.
+    The alias index also covers each entry's id and display name."""
+
+    def __init__(self, entries: List[Dict[str, Any]], signature: Tuple[int, int] | None):
+        self.entries = entries
+        self.signature = signature
+        self.by_id: Dict[str, Dict[str, Any]] = {e["id"]: e for e in entries}
+        self.by_alias: Dict[str, str] = {}
+        self.by_family: Dict[str, List[str]] = {}
+        for e in entries:
+            for name in [e["id"], e["name"], *e["aliases"]]:
+                self.by_alias.setdefault(alias_key(name), e["id"])
+            if e.get("family"):
+                self.by_family.setdefault(e["family"], []).append(e["id"])
+
+    def resolve(self, name: str) -> str | None:
+        """Catalog id for an id, display name or alias (e.g. "ResNet-50" -> "resnet")."""
+        if name in self.by_id:
+            return name
+        return self.by_alias.get(alias_key(name))
+
+    def family(self, family: str) -> List[Dict[str, Any]]:
+        return [self.by_id[i] for i in self.by_family.get(family, [])]
+
+
+_LOCK = threading.Lock()
+_CATALOG: NNCatalog | None = None
+_CHECKED_AT = 0.0
+_SEEDED_SIG: Tuple[int, int] | None = None
+
+
+def _signature() -> Tuple[int, int] | None:
+    try:
+        st = CATALOG_PATH.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def get_nn_catalog(refresh: bool = False) -> NNCatalog:
+    """Return the compiled catalog; the file is re-stat'ed at most every _STAT_INTERVAL_S
+    (unless refresh=True) and re-parsed only when its (mtime, size) changed."""
+    global _CATALOG, _CHECKED_AT
+    now = time.monotonic()
+    cat = _CATALOG
+    if cat is not None and not refresh and now - _CHECKED_AT < _STAT_INTERVAL_S:
+        return cat
+    with _LOCK:
+        sig = _signature()
+        if _CATALOG is None or _CATALOG.signature != sig:
+            entries: List[Dict[str, Any]] = []
+            if sig is not None:
+                try:
+                    entries = parse_catalog(CATALOG_PATH.read_text(encoding="utf-8", errors="ignore"))
+                except OSError:
+                    entries = []
+            _CATALOG = NNCatalog(entries, sig)
+        _CHECKED_AT = now
+        return _CATALOG
+
+
+def seed_registry(refresh: bool = False) -> List[str]:
+    """One-time migration: write a registry entry for each catalog architecture that has never been
+    seeded before. Seeded ids are recorded in registry/migrations.json, so entries a user deletes
+    stay deleted and architectures added to the catalog later are seeded once. Returns new ids."""
+    global _SEEDED_SIG
+    cat = get_nn_catalog(refresh=refresh)
+    if _SEEDED_SIG is not None and _SEEDED_SIG == cat.signature:
+        return []
+    created: List[str] = []
+
+    def _migrate(data: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(data, dict):
+            data = {}
+        rec = data.get(_MIGRATION) or {}
+        done = set(rec.get("seeded_ids") or [])
+        for e in cat.entries:
+            if e["id"] in done:
+                continue
+            path = REGISTRY_NN_DIR / f"{e['id']}.json"
+            with file_lock(path):
+                if not path.exists():
+                    write_json(path, {"id": e["id"], "name": e["name"], "family": e["family"]})
+                    created.append(e["id"])
+            done.add(e["id"])
+        if done != set(rec.get("seeded_ids") or []) or not rec:
+            data[_MIGRATION] = {"seeded_ids": sorted(done), "applied_at": now_iso()}
+        return data
+
+    with _LOCK:
+        if _SEEDED_SIG is not None and _SEEDED_SIG == cat.signature:
+            return []
+        if cat.entries:
+            try:
+                rec = load_json(MIGRATIONS_PATH).get(_MIGRATION) or {}
+            except Exception:
+                rec = {}
+            if set(cat.by_id) - set(rec.get("seeded_ids") or []):
+                update_json(MIGRATIONS_PATH, _migrate, default={})
+        _SEEDED_SIG = cat.signature
+    return created
@@ -1,28 +1,59 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import json
 import ast
-import string
-from ..utils.io import ARTIFACTS_DIR, ARTIFACTS_INDICES, ARTIFACTS_DATASETS, write_json, load_json
-from ..utils.seeds import set_global_seed
+import os
 import random
+import string
+import threading
+import time
+from bisect import bisect_left
+from ..utils.io import ARTIFACTS_DIR, ARTIFACTS_INDICES, write_json, load_json
+from ..utils.seeds import make_rng
+from ..utils.dataset_reader import DatasetReader, dialog_text, DIALOG_FIELDS
+from ..utils import memory
 
 BUBBLE_DIR: Path = ARTIFACTS_DIR / "bubble"
 BUBBLE_MODEL_PATH: Path = BUBBLE_DIR / "model.json"
 
+# Normalization charset; everything else collapses to a space
+_ALLOWED_CHARS = frozenset(string.ascii_lowercase + " .,!?:;\n")
+# Seconds between stat() checks of model.json for out-of-process rebuilds
+_STAT_INTERVAL_S = 1.0
+
+
+class _NormalizeTable(dict):
+    """str.translate table: lower-case allowed chars, map the rest to a space.
+    Entries are filled lazily so arbitrary Unicode input needs no precomputed table.
+    """
+
+    def __missing__(self, key: int) -> str:
+        lo = chr(key).lower()
+        val = lo if lo in _ALLOWED_CHARS else " "
+        self[key] = val
+        return val
+
+
+_NORMALIZE_TABLE = _NormalizeTable()
+
+
+def normalize_text(text: str) -> str:
+    return text.translate(_NORMALIZE_TABLE)
+
 
 def _safe_parse_index_line(line: str) -> Dict[str, Any] | None:
     line = line.strip()
     if not line:
         return None
+    # JSON lines (current index format) first; Python dict reprs from older builds as a fallback
     try:
-        rec = ast.literal_eval(line)
+        rec = json.loads(line)
         if isinstance(rec, dict) and rec.get("lemma"):
             return rec
     except Exception:
         try:
-            rec = json.loads(line)
+            rec = ast.literal_eval(line)
             if isinstance(rec, dict) and rec.get("lemma"):
                 return rec
         except Exception:
@@ -31,40 +62,9 @@ def _safe_parse_index_line(line: str) -> Dict[str, Any] | None:
 
 
 def _collect_corpus() -> str:
-    corpus = ""
-    # 1) Synthetic dialogs (JSONL)
-    synths = sorted(ARTIFACTS_DATASETS.glob("wordnet_synth_*.jsonl"), key=lambda p: p.name)
-    for ds in synths:
-        try:
-            with ds.open("r", encoding="utf-8") as f:
-                for k, line in enumerate(f):
-                    if k >= 2000:
-                        break
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        obj = {"text": line.strip()}
-                    txt = str(obj.get("response", "")) + "\n" + str(obj.get("prompt", obj.get("text", ""))) + "\n"
-                    corpus += txt
-        except Exception:
-            continue
-    # 2) Uploads (JSONL)
-    uploads_dir = ARTIFACTS_DATASETS / "uploads"
-    if uploads_dir.exists():
-        for ds in sorted(uploads_dir.glob("*.jsonl"), key=lambda p: p.name):
-            try:
-                with ds.open("r", encoding="utf-8") as f:
-                    for k, line in enumerate(f):
-                        if k >= 2000:
-                            break
-                        try:
-                            obj = json.loads(line)
-                        except Exception:
-                            obj = {"text": line.strip()}
-                        txt = str(obj.get("response", "")) + "\n" + str(obj.get("prompt", obj.get("text", ""))) + "\n"
-                        corpus += txt
-            except Exception:
-                continue
+    # 1) Synthetic dialogs, then 2) uploads (JSONL), via the shared dataset reader
+    reader = DatasetReader(("synth", "uploads"), fields=DIALOG_FIELDS, limit_per_file=2000)
+    corpus = "".join(dialog_text(rec) for rec in reader)
     # 3) WordNet index lemmas as last resort
     if not corpus:
         idx_path = ARTIFACTS_INDICES / "wordnet-lexicon.jsonl"
@@ -86,7 +86,6 @@ def build_bubble_model(seed: int = 1337, order: int = 2) -> Path:
     """Build a minimal character-level bubble model (unigram+bigram) usable across modules.
     Deterministic and offline. Persist to artifacts\\bubble\\model.json
     """
-    set_global_seed(seed)
     BUBBLE_DIR.mkdir(parents=True, exist_ok=True)
     corpus = _collect_corpus()
     # If still empty, seed with alphabet and space/punctuation to allow babbling
@@ -97,8 +96,7 @@ def build_bubble_model(seed: int = 1337, order: int = 2) -> Path:
     uni: Dict[str, int] = {}
     bi: Dict[str, Dict[str, int]] = {}
     # Normalize to lower-case small charset to stabilize determinism footprint
-    allowed = set(string.ascii_lowercase + " .,!?:;\n")
-    text = "".join([c.lower() if c.lower() in allowed else " " for c in corpus])
+    text = normalize_text(corpus)
     for ch in text:
         uni[ch] = uni.get(ch, 0) + 1
     for i in range(len(text) - 1):
@@ -113,6 +111,8 @@ def build_bubble_model(seed: int = 1337, order: int = 2) -> Path:
         "built_from": "auto"
     }
     write_json(BUBBLE_MODEL_PATH, model)
+    # Swap the freshly built model in directly so the next babble skips the disk
+    _install_compiled(_compile_model(model), _model_generation())
     return BUBBLE_MODEL_PATH
 
 
@@ -123,30 +123,128 @@ def load_bubble_model() -> Dict[str, Any]:
         return {}
 
 
-def _sample_from_bucket(bucket: Dict[str, int]) -> str:
+# ---- Compiled in-memory model ----
+
+_Dist = Tuple[Tuple[str, ...], Tuple[int, ...]]
+
+
+class CompiledBubbleModel:
+    """Transition matrix (prev char -> cumulative distribution) plus unigram fallback.
+    Rows keep the (count, char) ordering of the persisted model so sampling is unchanged.
+    """
+
+    __slots__ = ("transitions", "unigram")
+
+    def __init__(self, transitions: Dict[str, _Dist | None], unigram: _Dist | None):
+        self.transitions = transitions
+        self.unigram = unigram
+
+    def sample(self, dist: _Dist, rng: random.Random) -> str:
+        chars, cum = dist
+        r = rng.randint(1, cum[-1])
+        return chars[bisect_left(cum, r)]
+
+    def next_char(self, prev: str, rng: random.Random) -> str:
+        if prev in self.transitions:
+            dist = self.transitions[prev]
+        else:
+            dist = self.unigram
+        if dist is None:
+            # zero-mass row (or no unigram at all)
+            return " "
+        return self.sample(dist, rng)
+
+
+def _cumulative(bucket: Dict[str, int]) -> _Dist | None:
     items = sorted(bucket.items(), key=lambda kv: (kv[1], kv[0]))
-    total = sum(v for _, v in items)
-    if total <= 0:
-        return " "
-    r = random.randint(1, total)
+    chars: List[str] = []
+    cum: List[int] = []
     acc = 0
     for ch, v in items:
         acc += v
-        if r <= acc:
-            return ch
-    return items[-1][0]
+        chars.append(ch)
+        cum.append(acc)
+    if acc <= 0:
+        return None
+    return tuple(chars), tuple(cum)
+
+
+def _compile_model(model: Dict[str, Any]) -> CompiledBubbleModel:
+    uni = model.get("unigram", {}) if isinstance(model, dict) else {}
+    bi = model.get("bigram", {}) if isinstance(model, dict) else {}
+    transitions: Dict[str, _Dist | None] = {}
+    if isinstance(bi, dict):
+        for prev, bucket in bi.items():
+            if isinstance(bucket, dict) and bucket:
+                transitions[prev] = _cumulative(bucket)
+    unigram = _cumulative(uni) if isinstance(uni, dict) and uni else None
+    return CompiledBubbleModel(transitions, unigram)
+
+
+def _model_generation() -> Tuple[int, int] | None:
+    try:
+        st = os.stat(BUBBLE_MODEL_PATH)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
 
-def generate_babble(seed_text: str = "", n_chars: int = 48, seed: int = 1337) -> str:
-    set_global_seed(seed)
-    model = load_bubble_model()
-    uni: Dict[str, int] = model.get("unigram", {}) if isinstance(model, dict) else {}
-    bi: Dict[str, Dict[str, int]] = model.get("bigram", {}) if isinstance(model, dict) else {}
+_COMPILED: CompiledBubbleModel | None = None
+_COMPILED_GEN: Tuple[int, int] | None = None
+_COMPILED_CHECKED_AT: float = 0.0
+_COMPILED_BYTES = 0
+_COMPILED_LOCK = threading.Lock()
+
+
+def _install_compiled(compiled: CompiledBubbleModel, generation: Tuple[int, int] | None) -> None:
+    """Keep the compiled model unless it exceeds the bubble_model budget."""
+    global _COMPILED, _COMPILED_GEN, _COMPILED_CHECKED_AT, _COMPILED_BYTES
+    nbytes = memory.approx_size(compiled)
+    if not memory.admit("bubble_model", nbytes):
+        return
+    with _COMPILED_LOCK:
+        _COMPILED = compiled
+        _COMPILED_GEN = generation
+        _COMPILED_CHECKED_AT = time.monotonic()
+        _COMPILED_BYTES = nbytes
+
+
+def _evict_compiled() -> None:
+    global _COMPILED, _COMPILED_GEN, _COMPILED_BYTES
+    with _COMPILED_LOCK:
+        _COMPILED, _COMPILED_GEN, _COMPILED_BYTES = None, None, 0
+
+
+def get_compiled_model() -> CompiledBubbleModel:
+    """Return the in-memory compiled model, reloading only when model.json's generation changes.
+    The generation (mtime_ns, size) is re-checked at most every _STAT_INTERVAL_S seconds.
+    """
+    global _COMPILED_CHECKED_AT
+    compiled = _COMPILED
+    if compiled is not None and time.monotonic() - _COMPILED_CHECKED_AT < _STAT_INTERVAL_S:
+        return compiled
+    gen = _model_generation()
+    if compiled is not None and gen == _COMPILED_GEN:
+        _COMPILED_CHECKED_AT = time.monotonic()
+        return compiled
+    compiled = _compile_model(load_bubble_model())
+    _install_compiled(compiled, gen)
+    return compiled
+
+
+def generate_babble(seed_text: str = "", n_chars: int = 48, seed: int = 1337, rng: random.Random | None = None) -> str:
+    """Babble n_chars after seed_text. Uses rng when given, else a private PRNG seeded with seed."""
+    if rng is None:
+        rng = make_rng(seed)
+    model = get_compiled_model()
     out = list(seed_text)
     prev = out[-1] if out else " "
     for _ in range(max(0, n_chars)):
-        bucket = bi.get(prev) if prev in bi else None
-        ch = _sample_from_bucket(bucket) if bucket else _sample_from_bucket(uni) if isinstance(uni, dict) and uni else " "
+        ch = model.next_char(prev, rng)
         out.append(ch)
         prev = ch
     return "".join(out)
+
+
+memory.register("bubble_model", lambda: (_COMPILED_BYTES, len(_COMPILED.transitions) if _COMPILED else 0), 64 * memory.MIB,
+                _evict_compiled, "Compiled bubble babble model (transition rows)")
@@ -1,32 +1,46 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
+import atexit
 import json
 import ast
+import os
 import re
 import random
-from ..utils.io import ARTIFACTS_INDICES, ARTIFACTS_DIR, ARTIFACTS_DATASETS, WORDNET_ROOT, write_json, load_json
-from ..utils.seeds import set_global_seed
+import sys
+import threading
+import time
+from collections import OrderedDict
+from ..utils.io import ARTIFACTS_INDICES, ARTIFACTS_DIR, WORDNET_ROOT, write_json, load_json, update_json
+from ..utils.seeds import make_rng
+from ..utils.dataset_reader import DatasetReader, dialog_text, DIALOG_FIELDS
+from ..utils import memory
 from .bubble import generate_babble
+from ..metrics import runtime_stats
+from ..metrics.tracing import span
 
 _INDEX_CACHE: List[Dict[str, Any]] | None = None
 _LEMMA_SET: set[str] | None = None
+_INDEX_BYTES = 0
+_INDEX_REFUSED = False  # the last load was over budget: said so once, until the index fits again
 _COUNTS_PATH: Path = ARTIFACTS_DIR / "chat" / "lm_counts.json"
 _LM_PATH: Path = ARTIFACTS_DIR / "chat" / "lm_ngram.json"
 _LM_CACHE: Dict[str, Any] | None = None
+_LM_BYTES = 0
 
 
 def _safe_parse_line(line: str) -> Dict[str, Any] | None:
     line = line.strip()
     if not line:
         return None
+    # JSON lines (current index format) first; Python dict reprs from older builds as a fallback
     try:
-        rec = ast.literal_eval(line)
+        rec = json.loads(line)
         if isinstance(rec, dict) and rec.get("lemma"):
             return rec
     except Exception:
         try:
-            rec = json.loads(line)
+            rec = ast.literal_eval(line)
             if isinstance(rec, dict) and rec.get("lemma"):
                 return rec
         except Exception:
@@ -35,9 +49,12 @@ def _safe_parse_line(line: str) -> Dict[str, Any] | None:
 
 
 def load_index() -> List[Dict[str, Any]]:
-    global _INDEX_CACHE, _LEMMA_SET
+    """Index records, cached in-process unless they exceed the wordnet_index budget (then every
+    call re-reads the file, counted in riai_index_uncached_loads_total and reported once on stderr)."""
+    global _INDEX_CACHE, _LEMMA_SET, _INDEX_BYTES, _INDEX_REFUSED
     if _INDEX_CACHE is not None:
         return _INDEX_CACHE
+    t0 = time.perf_counter()
     idx_path = ARTIFACTS_INDICES / "wordnet-lexicon.jsonl"
     recs: List[Dict[str, Any]] = []
     if idx_path.exists():
@@ -47,30 +64,134 @@ def load_index() -> List[Dict[str, Any]]:
                 if rec:
                     recs.append(rec)
     # build lemma set for quick membership
-    _INDEX_CACHE = recs
-    _LEMMA_SET = {str(r.get("lemma")).lower() for r in recs}
+    lemma_set = {str(r.get("lemma")).lower() for r in recs}
+    nbytes = memory.approx_size(recs) + memory.approx_size(lemma_set)
+    if memory.admit("wordnet_index", nbytes):
+        _INDEX_CACHE, _LEMMA_SET, _INDEX_BYTES = recs, lemma_set, nbytes
+        _INDEX_REFUSED = False
+    else:
+        runtime_stats.inc("riai_index_uncached_loads_total")
+        if not _INDEX_REFUSED:
+            _INDEX_REFUSED = True
+            print(f"riai: WordNet index ({nbytes} bytes) exceeds the wordnet_index budget "
+                  f"({memory.budget('wordnet_index')} bytes); every lookup re-reads {idx_path.name}. "
+                  "Raise it in RIAI_CACHE_BUDGETS (MiB) to cache the index.", file=sys.stderr)
+    runtime_stats.set_gauge("riai_index_load_seconds", time.perf_counter() - t0)
+    runtime_stats.set_gauge("riai_index_records", len(recs))
     return recs
 
 
-def _get_counts() -> Dict[str, int]:
+def _evict_index() -> None:
+    global _INDEX_CACHE, _LEMMA_SET, _INDEX_BYTES
+    _INDEX_CACHE, _LEMMA_SET, _INDEX_BYTES = None, None, 0
+
+
+# Lemma counts are bumped on every grounded answer. Bumps collect in memory and a background thread
+# adds them to lm_counts.json every COUNTS_FLUSH_S (and at exit), so a request never waits on the
+# file lock or an fsync; each process adds only its own deltas, so workers do not lose increments.
+COUNTS_FLUSH_S = float(os.environ.get("RIAI_COUNTS_FLUSH_S", "2.0"))
+_COUNTS_LOCK = threading.Lock()
+_PENDING: Dict[str, int] = {}
+_COUNTS_BASE: Dict[str, int] | None = None  # lm_counts.json as of this process's last flush
+_FLUSHER: threading.Thread | None = None
+
+
+def _load_counts_file() -> Dict[str, int]:
     try:
-        return load_json(_COUNTS_PATH)
+        data = load_json(_COUNTS_PATH)
+        return data if isinstance(data, dict) else {}
     except Exception:
         return {}
 
 
-def _save_counts(counts: Dict[str, int]) -> None:
-    _COUNTS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    write_json(_COUNTS_PATH, counts)
+def _get_counts() -> Dict[str, int]:
+    """Persisted counts plus this process's unflushed bumps."""
+    global _COUNTS_BASE
+    with _COUNTS_LOCK:
+        if _COUNTS_BASE is None:
+            _COUNTS_BASE = _load_counts_file()
+        if not _PENDING:
+            return dict(_COUNTS_BASE)
+        counts = dict(_COUNTS_BASE)
+        for lemma, n in _PENDING.items():
+            counts[lemma] = int(counts.get(lemma, 0)) + n
+        return counts
+
+
+def flush_counts() -> Dict[str, int]:
+    """Add the pending bumps to lm_counts.json (locked read-modify-write) and return the result."""
+    global _COUNTS_BASE
+    with _COUNTS_LOCK:
+        pending = dict(_PENDING)
+        _PENDING.clear()
+    if not pending:
+        return _get_counts()
+
+    def _bump(counts: Dict[str, int]) -> Dict[str, int]:
+        if not isinstance(counts, dict):
+            counts = {}
+        for lemma, n in pending.items():
+            counts[lemma] = int(counts.get(lemma, 0)) + n
+        return counts
+    try:
+        counts = update_json(_COUNTS_PATH, _bump, default={})
+    except BaseException:
+        with _COUNTS_LOCK:  # keep the bumps for the next flush
+            for lemma, n in pending.items():
+                _PENDING[lemma] = _PENDING.get(lemma, 0) + n
+        raise
+    with _COUNTS_LOCK:
+        _COUNTS_BASE = dict(counts)
+    return _get_counts()
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(COUNTS_FLUSH_S)
+        try:
+            flush_counts()
+        except Exception:
+            pass  # retried next round
 
 
 def update_counts(lemma: str) -> Dict[str, int]:
+    """Bump lemma's count; returns {lemma: count} including bumps not yet flushed."""
+    global _COUNTS_BASE, _FLUSHER
     if not lemma:
+        return {}
+    with _COUNTS_LOCK:
+        if _COUNTS_BASE is None:
+            _COUNTS_BASE = _load_counts_file()
+        _PENDING[lemma] = _PENDING.get(lemma, 0) + 1
+        n = int(_COUNTS_BASE.get(lemma, 0)) + _PENDING[lemma]
+        if _FLUSHER is None:
+            _FLUSHER = threading.Thread(target=_flush_loop, name="lm-counts-flush", daemon=True)
+            _FLUSHER.start()
+            atexit.register(flush_counts)
+    return {lemma: n}
+
+
+def discount_counts(increments: Dict[str, int]) -> Dict[str, int]:
+    """Take back count bumps made by synthetic traffic (benchmarks), leaving concurrent real ones."""
+    global _COUNTS_BASE
+    if not increments:
         return _get_counts()
-    counts = _get_counts()
-    counts[lemma] = int(counts.get(lemma, 0)) + 1
-    _save_counts(counts)
-    return counts
+    flush_counts()
+
+    def _drop(counts: Dict[str, int]) -> Dict[str, int]:
+        if not isinstance(counts, dict):
+            return {}
+        for lemma, n in increments.items():
+            left = int(counts.get(lemma, 0)) - int(n)
+            if left > 0:
+                counts[lemma] = left
+            else:
+                counts.pop(lemma, None)
+        return counts
+    counts = update_json(_COUNTS_PATH, _drop, default={})
+    with _COUNTS_LOCK:
+        _COUNTS_BASE = dict(counts)
+    return _get_counts()
 
 
 def most_seen_lemma() -> str | None:
@@ -88,13 +209,13 @@ def extract_lemma(text: str) -> str | None:
     if m:
         return m.group(1).strip().lower()
     # Else, choose the first token present in index lemma set
-    load_index()
-    global _LEMMA_SET
-    if not _LEMMA_SET:
+    recs = load_index()
+    lemma_set = _LEMMA_SET if _LEMMA_SET is not None else {str(r.get("lemma")).lower() for r in recs}
+    if not lemma_set:
         return None
     tokens = [t.lower() for t in re.findall(r"[A-Za-z]+", text)]
     for tok in tokens:
-        if tok in _LEMMA_SET:
+        if tok in lemma_set:
             return tok
     # Fallback to most seen lemma (learning bias)
     return most_seen_lemma()
@@ -112,12 +233,25 @@ def _find_record_for_lemma(lemma: str) -> Dict[str, Any] | None:
 
 # ---------------- Small offline LM (character-level n-gram) ----------------
 
+def _keep_lm(model: Dict[str, Any]) -> Dict[str, Any]:
+    """Cache the LM unless it exceeds the chat_lm budget."""
+    global _LM_CACHE, _LM_BYTES
+    nbytes = memory.approx_size(model.get("counts"))
+    if memory.admit("chat_lm", nbytes):
+        _LM_CACHE, _LM_BYTES = model, nbytes
+    return model
+
+
+def _evict_lm() -> None:
+    global _LM_CACHE, _LM_BYTES
+    _LM_CACHE, _LM_BYTES = None, 0
+
+
 def _load_or_build_lm(order: int = 3) -> Dict[str, Any]:
     """Builds or loads a tiny char-level n-gram from local datasets.
     Preference order: prebuilt artifacts\chat\lm_ngram.json → synth datasets → index lemmas.
-    Deterministic given the same dataset and seed. Cached and persisted to _LM_PATH.
+    Deterministic given the same dataset and seed. Cached (within the chat_lm budget) and persisted to _LM_PATH.
     """
-    global _LM_CACHE
     if _LM_CACHE is not None:
         return _LM_CACHE
 
@@ -126,8 +260,7 @@ def _load_or_build_lm(order: int = 3) -> Dict[str, Any]:
         if _LM_PATH.exists():
             obj = load_json(_LM_PATH)
             if isinstance(obj, dict) and obj.get("counts"):
-                _LM_CACHE = {"order": int(obj.get("order", order)), "counts": obj.get("counts", {}), "seed": int(obj.get("seed", 1337)), "built_from": obj.get("built_from", "prebuilt")}
-                return _LM_CACHE
+                return _keep_lm({"order": int(obj.get("order", order)), "counts": obj.get("counts", {}), "seed": int(obj.get("seed", 1337)), "built_from": obj.get("built_from", "prebuilt")})
     except Exception:
         pass
 
@@ -141,41 +274,26 @@ def _load_or_build_lm(order: int = 3) -> Dict[str, Any]:
                 latest = ckpts[-1]
                 obj = load_json(latest)
                 if isinstance(obj, dict) and isinstance(obj.get("counts"), dict):
-                    _LM_CACHE = {"order": int(obj.get("order", 3)), "counts": obj.get("counts", {}), "seed": int(obj.get("seed", 1337)), "built_from": f"sft:{latest.name}"}
+                    sft_model = {"order": int(obj.get("order", 3)), "counts": obj.get("counts", {}), "seed": int(obj.get("seed", 1337)), "built_from": f"sft:{latest.name}"}
                     # Persist a small aggregated lm_ngram.json for reuse in future runs
                     try:
                         _LM_PATH.parent.mkdir(parents=True, exist_ok=True)
-                        write_json(_LM_PATH, {"order": _LM_CACHE["order"], "counts": _LM_CACHE["counts"], "seed": _LM_CACHE["seed"], "built_from": _LM_CACHE["built_from"]})
+                        write_json(_LM_PATH, dict(sft_model))
                     except Exception:
                         pass
-                    return _LM_CACHE
+                    return _keep_lm(sft_model)
     except Exception:
         pass
 
     model: Dict[str, Any] = {"order": order, "counts": {}, "seed": 1337, "built_from": None}
 
     # Aggregate corpus from synth and uploads
+    reader = DatasetReader(("synth", "uploads"), fields=DIALOG_FIELDS, limit_per_file=2000, on_error="skip")
+    srcs = reader.sources()
     corpus = ""
-    synths = sorted(ARTIFACTS_DATASETS.glob("wordnet_synth_*.jsonl"), key=lambda p: p.name)
-    uploads_dir = ARTIFACTS_DATASETS / "uploads"
-    uploads = sorted(uploads_dir.glob("*.jsonl"), key=lambda p: p.name) if uploads_dir.exists() else []
-    srcs = synths + uploads
     if srcs:
         model["built_from"] = ",".join([p.name for p in srcs[:3]]) + ("+" if len(srcs) > 3 else "")
-        for ds_file in srcs:
-            try:
-                with ds_file.open("r", encoding="utf-8") as f:
-                    for k, line in enumerate(f):
-                        if k >= 2000:
-                            break
-                        try:
-                            obj = json.loads(line)
-                            txt = str(obj.get("response", "")) + "\n" + str(obj.get("prompt", obj.get("text", ""))) + "\n"
-                            corpus += txt
-                        except Exception:
-                            continue
-            except Exception:
-                continue
+        corpus = "".join(dialog_text(rec) for rec in reader)
 
     if not corpus:
         # Fallback to lemmas from index to form a minimal corpus
@@ -199,17 +317,16 @@ def _load_or_build_lm(order: int = 3) -> Dict[str, Any]:
     except Exception:
         pass
 
-    _LM_CACHE = model
-    return model
+    return _keep_lm(model)
 
 
-def _sample_from_counts(d: Dict[str, int]) -> str:
-    # Deterministic tie-breaking via sorted items and a fixed PRNG seeded each call upstream
+def _sample_from_counts(d: Dict[str, int], rng: random.Random) -> str:
+    # Deterministic tie-breaking via sorted items and a per-request PRNG passed in by the caller
     items = sorted(d.items(), key=lambda kv: (kv[1], kv[0]))  # sort by count then char
     total = sum(v for _, v in items)
     if total <= 0:
         return " "
-    r = random.randint(1, total)
+    r = rng.randint(1, total)
     acc = 0
     for ch, v in items:
         acc += v
@@ -218,15 +335,16 @@ def _sample_from_counts(d: Dict[str, int]) -> str:
     return items[-1][0]
 
 
-def _lm_generate(seed_text: str, n_tokens: int = 40, order: int = 3, seed: int = 1337) -> str:
-    set_global_seed(seed)
+def _lm_generate(seed_text: str, n_tokens: int = 40, order: int = 3, seed: int = 1337, rng: random.Random | None = None) -> str:
+    if rng is None:
+        rng = make_rng(seed)
     model = _load_or_build_lm(order=order)
     counts = model.get("counts", {})
     order = int(model.get("order", order))
     if not counts:
         # Fallback to shared Bubble Learner for early-stage babbling
         try:
-            return generate_babble(seed_text, n_tokens, seed)
+            return generate_babble(seed_text, n_tokens, seed, rng=rng)
         except Exception:
             # Never echo back the input; provide a minimal offline stub instead
             return "offline continuation"
@@ -244,14 +362,18 @@ def _lm_generate(seed_text: str, n_tokens: int = 40, order: int = 3, seed: int =
             bucket = counts.get(ctx, None)
             if not bucket:
                 break
-        ch = _sample_from_counts(bucket)
+        ch = _sample_from_counts(bucket, rng)
         out.append(ch)
         ctx = (ctx + ch)[-order:]
     return "".join(out)
 
 
 # ---- WordNet gloss lookup helpers ----
-_GLOSS_CACHE: Dict[Tuple[str, int], Tuple[str, List[str]]] = {}
+# LRU of parsed synsets, kept within the wordnet_glosses budget
+_GLOSS_CACHE: "OrderedDict[Tuple[str, int], Tuple[str, List[str]]]" = OrderedDict()
+_GLOSS_BYTES = 0
+_GLOSS_LOCK = threading.Lock()
+_GLOSS_ENTRY_OVERHEAD = 150  # key tuple + OrderedDict slot
 
 _DEF_DATA_FILES = {
     "noun": "data.noun",
@@ -278,10 +400,41 @@ def _pos_to_data_path(pos: str) -> Path | None:
     return WORDNET_ROOT / "dict" / fname
 
 
+def _gloss_put(key: Tuple[str, int], value: Tuple[str, List[str]]) -> None:
+    global _GLOSS_BYTES
+    size = memory.approx_size(value) + _GLOSS_ENTRY_OVERHEAD
+    cap = memory.budget("wordnet_glosses")
+    dropped = 0
+    with _GLOSS_LOCK:
+        if key in _GLOSS_CACHE or size > cap:
+            return
+        while _GLOSS_CACHE and _GLOSS_BYTES + size > cap:
+            _, old = _GLOSS_CACHE.popitem(last=False)
+            _GLOSS_BYTES -= memory.approx_size(old) + _GLOSS_ENTRY_OVERHEAD
+            dropped += 1
+        _GLOSS_CACHE[key] = value
+        _GLOSS_BYTES += size
+    if dropped:
+        memory.evicted("wordnet_glosses", dropped)
+
+
+def _evict_glosses() -> None:
+    global _GLOSS_BYTES
+    with _GLOSS_LOCK:
+        _GLOSS_CACHE.clear()
+        _GLOSS_BYTES = 0
+
+
 def _read_synset(pos: str, offset: int) -> Tuple[str, List[str]] | None:
     key = (pos, int(offset))
-    if key in _GLOSS_CACHE:
-        return _GLOSS_CACHE[key]
+    with _GLOSS_LOCK:
+        hit = _GLOSS_CACHE.get(key)
+        if hit is not None:
+            _GLOSS_CACHE.move_to_end(key)
+    if hit is not None:
+        runtime_stats.inc("riai_gloss_cache_lookups_total", result="hit")
+        return hit
+    runtime_stats.inc("riai_gloss_cache_lookups_total", result="miss")
     data_path = _pos_to_data_path(pos)
     if not data_path or not data_path.exists():
         return None
@@ -312,13 +465,35 @@ def _read_synset(pos: str, offset: int) -> Tuple[str, List[str]] | None:
                                 break
                             syns.append(toks[i].lower())
                             i += 2  # skip lex_id
-                    _GLOSS_CACHE[key] = (gloss, syns)
-                    return _GLOSS_CACHE[key]
+                    _gloss_put(key, (gloss, syns))
+                    return gloss, syns
     except Exception:
         return None
     return None
 
 
+def _gloss_hit_ratio() -> float | None:
+    hits = runtime_stats.counter_value("riai_gloss_cache_lookups_total", result="hit")
+    total = runtime_stats.counter_value("riai_gloss_cache_lookups_total")
+    return hits / total if total else None
+
+
+runtime_stats.describe("riai_index_load_seconds", "gauge", "Time the last WordNet index load took.")
+runtime_stats.describe("riai_index_records", "gauge", "Records in the loaded WordNet index.")
+runtime_stats.describe("riai_index_uncached_loads_total", "counter",
+                       "WordNet index loads over the wordnet_index budget, so re-read per request.")
+runtime_stats.describe("riai_gloss_cache_lookups_total", "counter", "WordNet gloss lookups by cache result.")
+runtime_stats.describe("riai_gloss_cache_hit_ratio", "gauge", "Share of gloss lookups served from the cache.")
+runtime_stats.gauge_callback("riai_gloss_cache_hit_ratio", _gloss_hit_ratio)
+
+memory.register("wordnet_index", lambda: (_INDEX_BYTES, len(_INDEX_CACHE or ())), 512 * memory.MIB, _evict_index,
+                "WordNet index records and lemma set (chat.load_index)")
+memory.register("wordnet_glosses", lambda: (_GLOSS_BYTES, len(_GLOSS_CACHE)), 16 * memory.MIB, _evict_glosses,
+                "Parsed WordNet synsets by (pos, offset), LRU")
+memory.register("chat_lm", lambda: (_LM_BYTES, len((_LM_CACHE or {}).get("counts") or ())), 256 * memory.MIB, _evict_lm,
+                "Char n-gram LM used for fallback answers (contexts)")
+
+
 def _choose_offset(offsets: List[int]) -> int | None:
     nums = []
     for x in offsets:
@@ -331,22 +506,27 @@ def _choose_offset(offsets: List[int]) -> int | None:
     return sorted(nums)[0]
 
 
-def generate_answer(text: str) -> Tuple[str, Dict[str, Any]]:
+def generate_answer(text: str, rng: random.Random | None = None) -> Tuple[str, Dict[str, Any]]:
     """
     Return (answer_raw, meta): retrieval-first grounded answer from local WordNet; LM used only as last fallback.
-    Deterministic and fully offline.
+    Deterministic and fully offline. rng overrides the per-call PRNG (seed 1337) used by the LM fallback.
     """
-    lemma = extract_lemma(text) or "unknown"
-    rec = _find_record_for_lemma(lemma)
+    with span("extract_lemma"):
+        lemma = extract_lemma(text) or "unknown"
+    with span("index_lookup") as sp:
+        rec = _find_record_for_lemma(lemma)
+        sp.set(found=rec is not None)
     if rec:
         pos = rec.get("pos")
         offsets = rec.get("offsets", [])
         off = _choose_offset(offsets)
         if off is not None:
-            syn = _read_synset(pos, off)
+            with span("read_synset", pos=pos):
+                syn = _read_synset(pos, off)
             if syn:
                 gloss, syns = syn
-                counts = update_counts(lemma)
+                with span("update_counts"):
+                    counts = update_counts(lemma)
                 syns_display = ", ".join(sorted({s.replace("_", " ") for s in syns if s})) or "(none)"
                 answer = (
                     f"{lemma} ({pos}) — Definition: {gloss}. Synonyms: {syns_display}. "
@@ -363,7 +543,8 @@ def generate_answer(text: str) -> Tuple[str, Dict[str, Any]]:
                 return answer, meta
     # Last fallback: tiny LM continuation without stubby phrasing
     seed_text = f"{lemma} — "
-    continuation = _lm_generate(seed_text, n_tokens=48, order=3, seed=1337)
+    with span("lm_generate"):
+        continuation = _lm_generate(seed_text, n_tokens=48, order=3, seed=1337, rng=rng)
     answer = f"No exact WordNet gloss was found for '{lemma}'. Local continuation: {continuation.strip()}"
     meta = {"lemma": lemma, "pos": rec.get("pos") if rec else None, "offsets": rec.get("offsets", []) if rec else [], "lm": {"used": True, "order": 3, "seed": 1337}}
     return answer, meta
@@ -1,39 +1,363 @@
 from __future__ import annotations
+import hashlib
+import json
 import re
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Tuple
+
+try:  # Python 3.11+
+    from re import _parser as _sre_parse
+except ImportError:  # pragma: no cover - Python 3.10
+    import sre_parse as _sre_parse  # type: ignore
+
+
+DEFAULT_GUARDRAILS: Dict[str, Any] = {
+    "max_tokens": 256,
+    "pii_regex": ["\\b\\d{3}-\\d{2}-\\d{4}\\b"],
+    "content_filters": ["hate", "violence"],
+    "allowed_file_types": [".txt", ".csv", ".json"]
+}
+
+
+def default_guardrails() -> Dict[str, Any]:
+    return json.loads(json.dumps(DEFAULT_GUARDRAILS))
+
+
+def config_hash(cfg: Dict[str, Any]) -> str:
+    """Stable hash of a guardrails config (key order independent)."""
+    blob = json.dumps(cfg, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def pii_patterns(cfg: Dict[str, Any]) -> List[str]:
+    """The config's pii_regex entries that can be patterns; null, numeric and other non-string
+    entries of a hand-edited config.json are skipped rather than turned into regexes."""
+    entries = cfg.get("pii_regex") or []
+    if not isinstance(entries, (list, tuple)):
+        return []
+    return [p for p in entries if isinstance(p, str)]
+
+
+class CompiledGuardrails:
+    """Guardrails config compiled once: PII patterns precompiled, content filters fused into one
+    alternation, and truncation that stops scanning after max_tokens.
+    apply() returns the same structure as apply_guardrails().
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        self.cfg = cfg
+        self.hash = config_hash(cfg)
+        try:
+            self.max_tokens = int(cfg.get("max_tokens", DEFAULT_GUARDRAILS["max_tokens"]))
+        except (TypeError, ValueError):
+            # a hand-edited non-integer: keep serving with the default, readiness flags the config
+            self.max_tokens = DEFAULT_GUARDRAILS["max_tokens"]
+        self.pii: List[Tuple[str, re.Pattern]] = []
+        for pattern in pii_patterns(cfg):
+            try:
+                self.pii.append((pattern, re.compile(pattern)))
+            except re.error:
+                # ignore invalid regex
+                continue
+        self.filters: List[Tuple[str, re.Pattern]] = []
+        for cat in cfg.get("content_filters", []) or []:
+            # ignore non-string and blank categories (hand-edited config.json) like invalid regex
+            if not isinstance(cat, str) or not cat.strip():
+                continue
+            self.filters.append((cat, re.compile(rf"\b{re.escape(cat)}\b", re.IGNORECASE)))
+        # One pass over the text answers "any category present?"; the per-category patterns only
+        # run on the rare hit, so overlapping categories (e.g. "hate" / "hate speech") are all flagged.
+        self.any_filter: re.Pattern | None = None
+        if self.filters:
+            alts = sorted({re.escape(cat) for cat, _ in self.filters}, key=len, reverse=True)
+            self.any_filter = re.compile(rf"\b(?:{'|'.join(alts)})\b", re.IGNORECASE)
+
+    def truncate(self, text: str) -> Tuple[str, bool]:
+        n = self.max_tokens
+        if n < 0:
+            tokens = text.split()
+            if len(tokens) > n:
+                return " ".join(tokens[:n]), True
+            return text, False
+        # keep the text, whitespace and all, up to the end of token n; scanning stops at token n+1
+        end = 0
+        for i, m in enumerate(_TOKEN_RE.finditer(text)):
+            if i == n:
+                return text[:end], True
+            end = m.end()
+        return text, False
+
+    def apply(self, text: str) -> Dict[str, Any]:
+        actions: List[Dict[str, Any]] = []
+        result, truncated = self.truncate(text)
+        if truncated:
+            actions.append({"type": "truncate", "max_tokens": self.max_tokens})
+
+        for pattern, regex in self.pii:
+            result, n = regex.subn("[PII]", result)
+            if n:
+                actions.append({"type": "pii_mask", "pattern": pattern})
+
+        if self.any_filter is not None and self.any_filter.search(result):
+            flags = [cat for cat, regex in self.filters if regex.search(result)]
+            if flags:
+                actions.append({"type": "content_flag", "categories": flags})
+
+        return {"original": text, "result": result, "actions": actions}
+
+    def stream(self) -> "StreamingGuardrails":
+        return StreamingGuardrails(self)
+
+
+# ---- Incremental (chunked) guardrails ----
+
+# Widths above this are treated as unbounded: the stage then buffers until finish()
+_MAX_WINDOW = 1 << 16
+_RUN_RE = re.compile(r"\s+|\S+")
+_TOKEN_RE = re.compile(r"\S+")
+_ASSERT_OPS = tuple(getattr(_sre_parse, n) for n in ("ASSERT", "ASSERT_NOT"))
+_REPEAT_OPS = tuple(getattr(_sre_parse, n) for n in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") if hasattr(_sre_parse, n))
+_ATOMIC_GROUP = getattr(_sre_parse, "ATOMIC_GROUP", None)
+
+
+def _assert_reach(sub: Any) -> int:
+    """Upper bound on how far lookarounds anywhere in sub can peek beyond the match span."""
+    total = 0
+    for op, av in sub.data:
+        if op in _ASSERT_OPS:
+            total += av[1].getwidth()[1] + _assert_reach(av[1])
+        elif op is _sre_parse.BRANCH:
+            total += sum(_assert_reach(b) for b in av[1])
+        elif op is _sre_parse.SUBPATTERN:
+            total += _assert_reach(av[-1])
+        elif op in _REPEAT_OPS:
+            total += _assert_reach(av[2])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            total += _assert_reach(av)
+        elif op is _sre_parse.GROUPREF_EXISTS:
+            total += _assert_reach(av[1]) + (_assert_reach(av[2]) if av[2] is not None else 0)
+    return total
+
+
+def pattern_window(regex: re.Pattern) -> Tuple[int | None, int]:
+    """Return (look-ahead, look-behind) in chars needed to decide a match at a position.
+    Look-ahead is None when the pattern can match unboundedly long text.
+    One extra char each way covers \\b, ^ and $ context.
+    """
+    parsed = _sre_parse.parse(regex.pattern, regex.flags)
+    width = parsed.getwidth()[1]
+    reach = _assert_reach(parsed)
+    if width + reach >= _MAX_WINDOW:
+        return None, 0
+    return width + reach + 2, reach + 1
+
+
+class _TokenBudget:
+    """Streaming max_tokens: emits text that is identical to the batch truncation.
+    Tokens up to max_tokens and the whitespace between them pass straight through; only whitespace
+    after token max_tokens is held, until token max_tokens+1 appears (drop) or the stream ends (keep).
+    """
+
+    def __init__(self, max_tokens: int):
+        self.n = max_tokens
+        self.count = 0
+        self.in_token = False
+        self.ws = ""
+        self.truncated = False
+        self.done = False
+        self._raw: List[str] = []  # only used for negative max_tokens (batch-only semantics)
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        if self.n < 0:
+            self._raw.append(chunk)
+            return ""
+        out: List[str] = []
+        for m in _RUN_RE.finditer(chunk):
+            seg = m.group()
+            if seg[0].isspace():
+                self.in_token = False
+                if self.count < self.n:
+                    out.append(seg)
+                else:
+                    self.ws += seg
+                continue
+            if not self.in_token:
+                self.count += 1
+                if self.count > self.n:
+                    self.truncated = self.done = True
+                    self.ws = ""
+                    return "".join(out)
+                self.in_token = True
+            out.append(seg)
+        return "".join(out)
+
+    def finish(self) -> str:
+        if self.done:
+            return ""
+        self.done = True
+        if self.n < 0:
+            text = "".join(self._raw)
+            tokens = text.split()
+            if len(tokens) > self.n:
+                self.truncated = True
+                return " ".join(tokens[:self.n])
+            return text
+        tail, self.ws = self.ws, ""
+        return tail
+
+
+class _StreamingSub:
+    """Streaming regex.sub("[PII]", ...): commits text once no match starting there can change,
+    keeping a look-behind window of already committed input for lookbehinds and \\b.
+    """
+
+    def __init__(self, regex: re.Pattern):
+        self.regex = regex
+        self.ahead, behind = pattern_window(regex)
+        self.keep = max(1, behind)
+        self.hist = ""
+        self.buf = ""
+        self.count = 0
+
+    def feed(self, chunk: str, final: bool = False) -> str:
+        self.buf += chunk
+        # the final pass always runs, even on an empty buffer: empty matches can sit at end of text
+        if not final and (not self.buf or self.ahead is None):
+            return ""
+        text = self.hist + self.buf
+        start = len(self.hist)
+        limit = len(text) + 1 if final else len(text) - self.ahead
+        if limit <= start:
+            return ""
+        out: List[str] = []
+        pos = start
+        for m in self.regex.finditer(text, start):
+            if m.start() >= limit:
+                break
+            out.append(text[pos:m.start()])
+            out.append("[PII]")
+            self.count += 1
+            pos = m.end()
+        cut = max(pos, min(limit, len(text)))
+        out.append(text[pos:cut])
+        self.buf = text[cut:]
+        self.hist = text[max(0, cut - self.keep):cut]
+        return "".join(out)
+
+
+class _FlagScanner:
+    """Tracks which content filter categories occur in the emitted text, with a bounded tail."""
+
+    def __init__(self, engine: CompiledGuardrails):
+        self.engine = engine
+        self.keep = max((len(cat) for cat, _ in engine.filters), default=0) + 1
+        self.tail = ""
+        # 1 once tail[0] is only look-behind context for \\b (its matches were decided earlier)
+        self.ctx = 0
+        self.found: set[str] = set()
+
+    def scan(self, text: str, final: bool = False) -> None:
+        if self.engine.any_filter is None:
+            return
+        self.tail += text
+        if not self.tail:
+            return
+        # a match touching the end of tail is undecided until the next char (\\b) is known
+        end = len(self.tail) if final else len(self.tail) - 1
+        if self.engine.any_filter.search(self.tail, self.ctx):
+            for cat, regex in self.engine.filters:
+                if cat in self.found:
+                    continue
+                for m in regex.finditer(self.tail, self.ctx):
+                    if m.end() <= end:
+                        self.found.add(cat)
+                        break
+        if len(self.tail) > self.keep:
+            self.tail = self.tail[-self.keep:]
+            self.ctx = 1
+
+    def categories(self) -> List[str]:
+        return [cat for cat, _ in self.engine.filters if cat in self.found]
+
+
+class StreamingGuardrails:
+    """Incremental guardrails over text chunks.
+
+    feed(chunk) returns the part of the guarded output that is final; finish() flushes the rest.
+    The concatenated output and `actions` equal apply_guardrails() on the concatenated input.
+    `done` turns True once max_tokens is exceeded; later chunks are ignored.
+    """
+
+    def __init__(self, engine: CompiledGuardrails):
+        self.engine = engine
+        self._budget = _TokenBudget(engine.max_tokens)
+        self._subs = [(pattern, _StreamingSub(regex)) for pattern, regex in engine.pii]
+        self._flags = _FlagScanner(engine)
+        self._finished = False
+
+    @property
+    def done(self) -> bool:
+        return self._budget.done
+
+    def _pipe(self, text: str, final: bool) -> str:
+        for _, sub in self._subs:
+            text = sub.feed(text, final=final)
+        self._flags.scan(text, final=final)
+        return text
+
+    def feed(self, chunk: str) -> str:
+        if self._finished or self._budget.done:
+            return ""
+        text = self._budget.feed(chunk)
+        if self._budget.done:
+            # max_tokens reached: nothing else can arrive, flush every stage
+            self._finished = True
+            return self._pipe(text, final=True)
+        return self._pipe(text, final=False)
+
+    def finish(self) -> str:
+        if self._finished:
+            return ""
+        self._finished = True
+        return self._pipe(self._budget.finish(), final=True)
+
+    @property
+    def actions(self) -> List[Dict[str, Any]]:
+        actions: List[Dict[str, Any]] = []
+        if self._budget.truncated:
+            actions.append({"type": "truncate", "max_tokens": self.engine.max_tokens})
+        for pattern, sub in self._subs:
+            if sub.count:
+                actions.append({"type": "pii_mask", "pattern": pattern})
+        flags = self._flags.categories()
+        if flags:
+            actions.append({"type": "content_flag", "categories": flags})
+        return actions
+
+
+_COMPILED_CACHE: Dict[str, CompiledGuardrails] = {}
+_COMPILED_CACHE_MAX = 16
+_CACHE_LOCK = threading.Lock()
+
+
+def compile_guardrails(cfg: Dict[str, Any]) -> CompiledGuardrails:
+    """Return the CompiledGuardrails for cfg, building it only once per config hash."""
+    key = config_hash(cfg)
+    engine = _COMPILED_CACHE.get(key)
+    if engine is not None:
+        return engine
+    engine = CompiledGuardrails(cfg)
+    with _CACHE_LOCK:
+        if len(_COMPILED_CACHE) >= _COMPILED_CACHE_MAX:
+            _COMPILED_CACHE.pop(next(iter(_COMPILED_CACHE)))
+        _COMPILED_CACHE.setdefault(key, engine)
+    return engine
 
 
 def apply_guardrails(text: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
     """Apply simple guardrails: max_tokens (by words), PII masking via regex, and content filtering flags.
     Returns a dict with original, result, actions.
     """
-    actions = []
-    result = text
-
-    # Max tokens by splitting on whitespace
-    max_tokens = int(cfg.get("max_tokens", 256))
-    tokens = result.split()
-    if len(tokens) > max_tokens:
-        result = " ".join(tokens[:max_tokens])
-        actions.append({"type": "truncate", "max_tokens": max_tokens})
-
-    # PII regex mask
-    for pattern in cfg.get("pii_regex", []) or []:
-        try:
-            regex = re.compile(pattern)
-            if regex.search(result):
-                result = regex.sub("[PII]", result)
-                actions.append({"type": "pii_mask", "pattern": pattern})
-        except re.error:
-            # ignore invalid regex
-            continue
-
-    # Content filters (just flag if words appear)
-    flags = []
-    for cat in cfg.get("content_filters", []) or []:
-        if re.search(rf"\b{re.escape(cat)}\b", result, re.IGNORECASE):
-            flags.append(cat)
-    if flags:
-        actions.append({"type": "content_flag", "categories": flags})
-
-    return {"original": text, "result": result, "actions": actions}
+    return compile_guardrails(cfg).apply(text)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+import threading
+import time
 from ..utils.io import MODULES_DIR, SCHEMA_PATH, load_json
 
 
@@ -11,17 +13,99 @@ REQUIRED_FIELDS = [
     "resources", "guardrails", "autotrain", "schema_version"
 ]
 
+# How often the catalog re-stats modules/*/manifest.json; lookups in between are pure dict reads.
+_STAT_INTERVAL_S = 1.0
 
-def discover_modules() -> List[Dict[str, Any]]:
-    modules: List[Dict[str, Any]] = []
-    for manifest in MODULES_DIR.glob("*/manifest.json"):
+
+def _parse_manifest(manifest: Path) -> Dict[str, Any]:
+    try:
+        data = load_json(manifest)
+        for k in REQUIRED_FIELDS:
+            if k not in data:
+                raise ValueError(f"manifest missing field: {k}")
+        data["_manifest_path"] = str(manifest)
+        return data
+    except Exception as e:
+        return {"id": manifest.parent.name, "error": str(e)}
+
+
+class ModuleCatalog:
+    """Parsed + validated module manifests with lookup tables.
+    Entries with "error" are invalid manifests (kept so readiness can report them).
+    generation increases whenever a manifest is added, removed or changed.
+    """
+
+    def __init__(self, modules: List[Dict[str, Any]], generation: int):
+        self.modules = modules
+        self.generation = generation
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_capability: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_task: Dict[str, List[Dict[str, Any]]] = {}
+        for m in modules:
+            if m.get("error"):
+                continue
+            self.by_id.setdefault(m.get("id"), m)
+            for cap in m.get("capabilities") or []:
+                self.by_capability.setdefault(cap, []).append(m)
+            if m.get("task"):
+                self.by_task.setdefault(m["task"], []).append(m)
+
+    def get(self, module_id: str) -> Dict[str, Any] | None:
+        return self.by_id.get(module_id)
+
+    def with_capability(self, capability: str) -> List[Dict[str, Any]]:
+        return list(self.by_capability.get(capability, []))
+
+    def with_task(self, task: str) -> List[Dict[str, Any]]:
+        return list(self.by_task.get(task, []))
+
+
+_LOCK = threading.Lock()
+_CATALOG: ModuleCatalog | None = None
+_PARSED: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}  # manifest path -> ((mtime_ns, size), entry)
+_CHECKED_AT = 0.0
+
+
+def _scan() -> List[Tuple[Path, Tuple[int, int]]]:
+    out: List[Tuple[Path, Tuple[int, int]]] = []
+    for manifest in sorted(MODULES_DIR.glob("*/manifest.json")):
         try:
-            data = load_json(manifest)
-            for k in REQUIRED_FIELDS:
-                if k not in data:
-                    raise ValueError(f"manifest missing field: {k}")
-            data["_manifest_path"] = str(manifest)
-            modules.append(data)
-        except Exception as e:
-            modules.append({"id": manifest.parent.name, "error": str(e)})
-    return modules
+            st = manifest.stat()
+        except OSError:
+            continue
+        out.append((manifest, (st.st_mtime_ns, st.st_size)))
+    return out
+
+
+def get_catalog(refresh: bool = False) -> ModuleCatalog:
+    """Return the module catalog, re-parsing only manifests whose (mtime, size) changed.
+    The manifest directory is re-stat'ed at most every _STAT_INTERVAL_S unless refresh=True."""
+    global _CATALOG, _CHECKED_AT
+    now = time.monotonic()
+    cat = _CATALOG
+    if cat is not None and not refresh and now - _CHECKED_AT < _STAT_INTERVAL_S:
+        return cat
+    with _LOCK:
+        scanned = _scan()
+        changed = _CATALOG is None or len(scanned) != len(_PARSED)
+        parsed: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        for manifest, sig in scanned:
+            key = str(manifest)
+            hit = _PARSED.get(key)
+            if hit is not None and hit[0] == sig:
+                parsed[key] = hit
+            else:
+                parsed[key] = (sig, _parse_manifest(manifest))
+                changed = True
+        _PARSED.clear()
+        _PARSED.update(parsed)
+        if changed:
+            gen = (_CATALOG.generation + 1) if _CATALOG is not None else 1
+            _CATALOG = ModuleCatalog([entry for _, entry in parsed.values()], gen)
+        _CHECKED_AT = now
+        return _CATALOG
+
+
+def discover_modules() -> List[Dict[str, Any]]:
+    # Shallow copies so callers cannot edit the cached manifests
+    return [dict(m) for m in get_catalog().modules]
@@ -0,0 +1,238 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+import os
+import threading
+import time
+from ..utils import fs_events
+
+# A check reads some files, returns {"errors": [...], ...}. While it runs it records every path it
+# consulted (stat taken *before* reading), so the state knows exactly which checks a change affects.
+CheckFn = Callable[["Deps"], Dict[str, Any]]
+Fingerprint = Tuple[int, ...] | None
+
+POLL_INTERVAL_S = 1.0
+CHECK_TIMEOUT_S = 30.0
+
+
+def _fingerprint(path: str, kind: str) -> Fingerprint:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if kind == "meta":
+        # ownership/permissions only; content churn (e.g. new traces) does not matter
+        return (st.st_ino, st.st_mode, st.st_uid)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class Deps:
+    """Paths a check depends on. file(): content/existence; dir(): entries added or removed
+    (directory mtime); meta(): permissions/ownership. Each returns the path for inline use."""
+
+    def __init__(self):
+        self.paths: Dict[str, Tuple[str, Fingerprint]] = {}
+
+    def _add(self, path: Path | str, kind: str) -> Path:
+        key = os.path.abspath(path)
+        if key not in self.paths:
+            self.paths[key] = (kind, _fingerprint(key, kind))
+        return Path(path)
+
+    def file(self, path: Path | str) -> Path:
+        return self._add(path, "file")
+
+    def dir(self, path: Path | str) -> Path:
+        return self._add(path, "dir")
+
+    def meta(self, path: Path | str) -> Path:
+        return self._add(path, "meta")
+
+
+class ReadinessState:
+    """Readiness verdict kept in memory and recomputed per check.
+
+    Checks are marked dirty by in-process writes (fs_events) and by a polling watcher that stats only
+    the paths the checks recorded. snapshot() returns the cached verdict when nothing is dirty, so
+    queries cost a dict copy; otherwise only the dirty checks run again, concurrently on a thread pool.
+    A check that exceeds its timeout is reported through on_error(name, TimeoutError) and keeps running;
+    its real result replaces the timeout once it finishes. The verdict carries per-check timings under
+    "checks", so the slowest unit is visible.
+    - checks: (name, fn) or (name, fn, timeout_s) in report order
+    - assemble: builds the response from {name: result} (ordered like checks)
+    - on_error: result for a check that raised or timed out, from (name, exception)
+    """
+
+    def __init__(
+        self,
+        checks: Sequence[Tuple[Any, ...]],
+        assemble: Callable[[Dict[str, Dict[str, Any]]], Dict[str, Any]],
+        on_error: Callable[[str, BaseException], Dict[str, Any]],
+        poll_interval: float = POLL_INTERVAL_S,
+        timeout: float = CHECK_TIMEOUT_S,
+    ):
+        self.checks: Dict[str, CheckFn] = {c[0]: c[1] for c in checks}
+        self.timeouts: Dict[str, float] = {c[0]: float(c[2]) if len(c) > 2 else timeout for c in checks}
+        self.assemble = assemble
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()          # serializes recomputes
+        self._state_lock = threading.Lock()    # guards dirty/deps bookkeeping
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._timings: Dict[str, Dict[str, Any]] = {}
+        self._deps: Dict[str, Dict[str, Tuple[str, Fingerprint]]] = {}
+        self._by_path: Dict[str, Set[str]] = {}
+        self._dirty: Set[str] = set(self.checks)
+        self._inflight: Dict[str, Future] = {}
+        self._stale = False                    # a late (post-timeout) result arrived
+        self._pool: ThreadPoolExecutor | None = None
+        self._verdict: Dict[str, Any] | None = None
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+        fs_events.subscribe(self.notify)
+
+    # -- invalidation --
+
+    def _mark(self, names: Set[str]) -> None:
+        if names:
+            with self._state_lock:
+                self._dirty |= names
+
+    def invalidate(self, names: Sequence[str] | None = None) -> None:
+        self._mark(set(self.checks) if names is None else set(names) & set(self.checks))
+
+    def notify(self, path: Path) -> None:
+        """A file was written in-process: dirty the checks that read it or list its directory."""
+        key = os.path.abspath(path)
+        with self._state_lock:
+            self._dirty |= self._by_path.get(key, set())
+            self._dirty |= self._by_path.get(os.path.dirname(key), set())
+
+    def poll(self) -> None:
+        """Stat every recorded dependency once and dirty the checks whose inputs changed."""
+        with self._state_lock:
+            deps = list(self._deps.items())
+        changed: Set[str] = set()
+        for name, paths in deps:
+            for path, (kind, fp) in paths.items():
+                if _fingerprint(path, kind) != fp:
+                    changed.add(name)
+                    break
+        self._mark(changed)
+
+    # -- evaluation --
+
+    def _run(self, name: str) -> Tuple[Dict[str, Any], Deps, float, str]:
+        deps = Deps()
+        t0 = time.perf_counter()
+        try:
+            result, status = self.checks[name](deps), "ok"
+        except Exception as e:
+            result, status = self.on_error(name, e), "error"
+        return result, deps, (time.perf_counter() - t0) * 1000.0, status
+
+    def _record(self, name: str, result: Dict[str, Any], deps: Deps | None, timing: Dict[str, Any]) -> None:
+        with self._state_lock:
+            if deps is not None:
+                for path in self._deps.get(name, {}):
+                    users = self._by_path.get(path)
+                    if users is not None:
+                        users.discard(name)
+                        if not users:
+                            del self._by_path[path]
+                self._deps[name] = deps.paths
+                for path in deps.paths:
+                    self._by_path.setdefault(path, set()).add(name)
+            self._results[name] = result
+            self._timings[name] = timing
+
+    def _late(self, name: str, fut: Future) -> None:
+        """A check that timed out finished after all: publish its real result."""
+        with self._state_lock:
+            if self._inflight.get(name) is fut:
+                del self._inflight[name]
+        try:
+            result, deps, ms, status = fut.result()
+        except Exception as e:  # pragma: no cover - _run does not raise
+            result, deps, ms, status = self.on_error(name, e), None, 0.0, "error"
+        self._record(name, result, deps, {"duration_ms": round(ms, 3), "status": status, "late": True})
+        self._stale = True
+
+    def _submit(self, name: str) -> Future:
+        with self._state_lock:
+            fut = self._inflight.get(name)
+            if fut is None:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.checks)), thread_name_prefix="readiness")
+                fut = self._pool.submit(self._run, name)
+                self._inflight[name] = fut
+            return fut
+
+    def _recompute(self, names: List[str]) -> None:
+        """Run the given checks concurrently; each waits at most its own timeout from submission."""
+        start = time.perf_counter()
+        futures = [(name, self._submit(name)) for name in names]
+        for name, fut in futures:
+            limit = self.timeouts.get(name, CHECK_TIMEOUT_S)
+            try:
+                result, deps, ms, status = fut.result(timeout=max(0.0, start + limit - time.perf_counter()))
+            except FutureTimeout:
+                err = TimeoutError(f"timed out after {limit:g}s")
+                self._record(name, self.on_error(name, err), None, {
+                    "duration_ms": round((time.perf_counter() - start) * 1000.0, 3), "status": "timeout"})
+                fut.add_done_callback(lambda f, n=name: self._late(n, f))
+                continue
+            with self._state_lock:
+                if self._inflight.get(name) is fut:
+                    del self._inflight[name]
+            self._record(name, result, deps, {"duration_ms": round(ms, 3), "status": status})
+
+    def snapshot(self, refresh: bool = False) -> Dict[str, Any]:
+        """Current verdict. refresh=True polls the dependencies first (for gates that must not
+        act on a verdict up to one poll interval old)."""
+        self._ensure_watcher()
+        if refresh:
+            self.poll()
+        verdict = self._verdict
+        if verdict is not None and not self._dirty and not self._stale:
+            return dict(verdict)
+        with self._lock:
+            with self._state_lock:
+                names = [n for n in self.checks if n in self._dirty]
+                self._dirty.difference_update(names)
+            if names or self._stale or self._verdict is None:
+                self._stale = False
+                self._recompute(names)
+                with self._state_lock:
+                    results = {n: self._results[n] for n in self.checks}
+                    timings = {n: dict(self._timings[n], cached=n not in names) for n in self.checks}
+                verdict = self.assemble(results)
+                verdict["checks"] = timings
+                self._verdict = verdict
+            return dict(self._verdict)
+
+    # -- watcher --
+
+    def _ensure_watcher(self) -> None:
+        if self._watcher is not None or self.poll_interval <= 0:
+            return
+        with self._state_lock:
+            if self._watcher is not None:
+                return
+            t = threading.Thread(target=self._watch, name="readiness-watcher", daemon=True)
+            self._watcher = t
+        t.start()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                pass
+
+    def stop(self) -> None:
+        self._stop.set()
+        fs_events.unsubscribe(self.notify)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
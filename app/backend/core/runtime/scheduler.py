@@ -1,51 +1,321 @@
 from __future__ import annotations
-from typing import Any, Dict
+from typing import Any, Dict, List
 from pathlib import Path
+import os
+import re
+import threading
+import time
 import uuid
-from ..utils.io import ARTIFACTS_JOBS, now_iso, write_json, ensure_dirs
-from ..utils.seeds import set_global_seed
+from ..utils.io import ARTIFACTS_JOBS, now_iso, load_json, update_json, file_lock, ensure_dirs
+from ..metrics import runtime_stats
+from ..metrics.profiling import profiled
+from ..metrics.tracing import JOB_SAMPLE_RATE, span, trace
 
 
-def run_job(job_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+# Persistent job queue. An accepted job is its record artifacts\jobs\<job_id>.json (payload included,
+# status "queued") plus a marker artifacts\jobs\queue\<seq>_<job_id>. A worker claims a job by
+# renaming its marker into jobs\running while holding a lock on it, so several uvicorn workers can
+# serve one queue without running a job twice; queued jobs survive restarts, and a running marker
+# whose lock is free at startup belongs to a dead worker (the job is marked failed).
+# Statuses: queued -> running -> finished | failed | cancelled.
+QUEUE_DIR: Path = ARTIFACTS_JOBS / "queue"
+RUNNING_DIR: Path = ARTIFACTS_JOBS / "running"
+TERMINAL = ("finished", "failed", "cancelled")
+# client-chosen job ids (e.g. one armed for profiling before submitting)
+_JOB_ID_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+# worker threads per process; 0 runs jobs inline in the submitting request (no queue)
+WORKERS = int(os.environ.get("RIAI_JOB_WORKERS", "2"))
+# how often idle workers look for jobs queued by other processes
+POLL_S = float(os.environ.get("RIAI_JOB_POLL_S", "1.0"))
+
+
+class JobCancelled(Exception):
+    """Raised by check_cancelled() inside a job whose cancellation was requested."""
+
+
+class JobExists(RuntimeError):
+    """submit() was given a job_id that is already taken."""
+
+
+class InvalidJobId(ValueError):
+    """submit() was given a job_id that is not a safe file name."""
+
+
+_COND = threading.Condition()
+_WORKERS: List[threading.Thread] = []
+_STOP = threading.Event()
+_CANCEL: set[str] = set()
+_CURRENT = threading.local()
+
+
+def _record_path(job_id: str) -> Path:
+    return ARTIFACTS_JOBS / f"{job_id}.json"
+
+
+def _save(job_id: str, /, **changes: Any) -> Dict[str, Any]:
+    """Merge changes into the job record (locked, so a cancel request is never overwritten)."""
+    def merge(rec: Dict[str, Any]) -> Dict[str, Any]:
+        rec = rec if isinstance(rec, dict) else {}
+        rec.update(changes)
+        return rec
+    rec = update_json(_record_path(job_id), merge, default={})
+    with _COND:
+        _COND.notify_all()
+    return rec
+
+
+def get_job(job_id: str) -> Dict[str, Any] | None:
+    if not job_id or "/" in job_id or "\\" in job_id or job_id.startswith("."):
+        return None
+    try:
+        return load_json(_record_path(job_id))
+    except (OSError, ValueError):
+        return None
+
+
+def submit(job_type: str, payload: Dict[str, Any], job_id: str | None = None) -> Dict[str, Any]:
+    """Queue a job and return its record right away (status "queued"); with WORKERS == 0 the job
+    runs before returning. job_id lets the caller choose the id (so a profiling session can be
+    armed on it first); it must be unused, else JobExists."""
+    ensure_dirs()
+    if job_id is None:
+        job_id = f"{job_type}_{uuid.uuid4().hex[:10]}"
+    elif not isinstance(job_id, str) or not _JOB_ID_RE.fullmatch(job_id):
+        raise InvalidJobId("job_id must be 1-64 letters, digits, '_', '.' or '-'")
+    record = {"job_id": job_id, "type": job_type, "module_id": payload.get("module_id"),
+              "seed": int(payload.get("seed", 1337)), "created_at": now_iso(), "status": "queued",
+              "payload": payload}
+
+    def create(rec: Any) -> Dict[str, Any]:
+        if rec:
+            raise JobExists(f"job {job_id} already exists")
+        return record
+    update_json(_record_path(job_id), create, default=None)
+    if WORKERS <= 0:
+        return run_job(job_type, payload, job_id=job_id)
+    QUEUE_DIR.mkdir(parents=True, exist_ok=True)
+    (QUEUE_DIR / f"{time.time_ns():020d}_{job_id}").touch()
+    if not _STOP.is_set():
+        start_workers()  # no-op once running; a pool stopped on purpose stays stopped
+    with _COND:
+        _COND.notify_all()
+    return record
+
+
+def wait(job_id: str, timeout: float | None = None) -> Dict[str, Any] | None:
+    """Block until the job reaches a terminal status (or timeout); returns its latest record."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        rec = get_job(job_id)
+        if rec is None or rec.get("status") in TERMINAL:
+            return rec
+        left = None if deadline is None else deadline - time.monotonic()
+        if left is not None and left <= 0:
+            return rec
+        with _COND:
+            _COND.wait(0.25 if left is None else min(0.25, left))
+
+
+def cancel(job_id: str) -> Dict[str, Any] | None:
+    """Cancel a job. A queued job is dropped from the queue; a running job is asked to stop and ends
+    "cancelled" at its next check_cancelled() (a job that finishes first stays finished). Returns
+    the record, or None if the job does not exist."""
+    rec = get_job(job_id)
+    if rec is None or rec.get("status") in TERMINAL:
+        return rec
+    for marker in QUEUE_DIR.glob(f"*_{job_id}"):
+        try:
+            marker.unlink()
+        except FileNotFoundError:
+            break  # a worker claimed it just now: cancel it as running
+        return _save(job_id, status="cancelled", finished_at=now_iso())
+    with _COND:
+        _CANCEL.add(job_id)
+    return _save(job_id, cancel_requested=True)
+
+
+def check_cancelled() -> None:
+    """Cancellation point for long-running tasks: raises JobCancelled when the job running on this
+    thread was cancelled. Outside run_job it does nothing. Every task calls it between its stages
+    (and inside its long loops), so any running job can be cancelled."""
+    job_id = getattr(_CURRENT, "job_id", None)
+    if job_id is None:
+        return
+    if job_id not in _CANCEL:
+        # requested through another worker process: the record says so (read at most once a second)
+        now = time.monotonic()
+        if now - getattr(_CURRENT, "checked_at", 0.0) < 1.0:
+            return
+        _CURRENT.checked_at = now
+        if not (get_job(job_id) or {}).get("cancel_requested"):
+            return
+    raise JobCancelled(f"job {job_id} was cancelled")
+
+
+def current_job_id() -> str | None:
+    """Id of the job running on this thread (None outside run_job)."""
+    return getattr(_CURRENT, "job_id", None)
+
+
+def _execute(job_id: str) -> None:
+    rec = get_job(job_id) or {}
+    if rec.get("status") in TERMINAL:
+        return
+    run_job(rec.get("type", ""), rec.get("payload") or {}, job_id=job_id)
+
+
+def _run_next() -> bool:
+    """Claim and run the oldest queued job (FIFO); False when the queue is empty."""
+    try:
+        markers = sorted(os.listdir(QUEUE_DIR))
+    except FileNotFoundError:
+        return False
+    RUNNING_DIR.mkdir(parents=True, exist_ok=True)
+    for name in markers:
+        job_id = name.partition("_")[2]
+        running = RUNNING_DIR / job_id
+        with file_lock(running):
+            try:
+                os.replace(QUEUE_DIR / name, running)
+            except FileNotFoundError:
+                continue  # cancelled, or claimed by another worker
+            try:
+                _execute(job_id)
+            finally:
+                running.unlink(missing_ok=True)
+        return True
+    return False
+
+
+def _worker() -> None:
+    while not _STOP.is_set():
+        try:
+            busy = _run_next()
+        except Exception:
+            busy = False  # never let one bad record stop the worker
+        if not busy:
+            with _COND:
+                _COND.wait(POLL_S)
+
+
+def _recover() -> None:
+    """Fail jobs whose worker process died mid-run (their running marker is not locked)."""
+    try:
+        names = os.listdir(RUNNING_DIR)
+    except FileNotFoundError:
+        return
+    for job_id in names:
+        try:
+            with file_lock(RUNNING_DIR / job_id, timeout=0):
+                if not (RUNNING_DIR / job_id).exists():
+                    continue
+                rec = get_job(job_id) or {}
+                if rec.get("status") not in TERMINAL:
+                    _save(job_id, status="failed", finished_at=now_iso(), error="interrupted: worker exited before the job finished")
+                (RUNNING_DIR / job_id).unlink()
+        except TimeoutError:
+            continue  # still running in a live worker
+
+
+def start_workers(n: int | None = None) -> int:
+    """Start the worker pool (idempotent); returns the number of live workers."""
+    n = WORKERS if n is None else n
+    with _COND:
+        alive = [t for t in _WORKERS if t.is_alive()]
+        if alive or n <= 0:
+            return len(alive)
+        _STOP.clear()
+        _recover()
+        _WORKERS[:] = [threading.Thread(target=_worker, name=f"riai-job-worker-{i}", daemon=True) for i in range(n)]
+    for t in _WORKERS:
+        t.start()
+    return n
+
+
+def stop_workers(timeout: float | None = None) -> None:
+    """Stop the pool after running jobs finish; queued jobs stay queued."""
+    _STOP.set()
+    with _COND:
+        _COND.notify_all()
+        workers = list(_WORKERS)
+    for t in workers:
+        t.join(timeout)
+
+
+def run_job(job_type: str, payload: Dict[str, Any], job_id: str | None = None) -> Dict[str, Any]:
     """Run a job synchronously and persist job record to artifacts\jobs.
     job_type: "train" | "evaluate"
     payload must include module_id and may include seed and other params.
+    job_id: use a pre-assigned id (e.g. one armed for profiling) instead of a fresh one.
     """
     ensure_dirs()
-    job_id = f"{job_type}_{uuid.uuid4().hex[:10]}"
-    record = {
+    job_id = job_id or f"{job_type}_{uuid.uuid4().hex[:10]}"
+    # queued or inline, the job can be cancelled through POST /api/jobs/{job_id}/cancel
+    _CURRENT.job_id, _CURRENT.checked_at = job_id, 0.0
+    try:
+        with trace("job", rate=JOB_SAMPLE_RATE, job_id=job_id, type=job_type, module_id=payload.get("module_id")) as tr, \
+                profiled("job", job_id=job_id, job_type=job_type):
+            record = _run_job(job_id, job_type, payload)
+            tr.set(status=record["status"])
+    finally:
+        _CURRENT.job_id = None
+        with _COND:
+            _CANCEL.discard(job_id)
+    # the final status is published after the trace and profile are written, so whoever polls for it
+    # finds them complete
+    return _save(job_id, **{k: v for k, v in record.items() if k != "cancel_requested"})
+
+
+def _run_job(job_id: str, job_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    record = get_job(job_id) or {
         "job_id": job_id,
         "type": job_type,
         "module_id": payload.get("module_id"),
         "seed": int(payload.get("seed", 1337)),
         "created_at": now_iso(),
-        "status": "running"
     }
-    write_json(ARTIFACTS_JOBS / f"{job_id}.json", record)
+    record.update(status="running", started_at=now_iso())
+    with span("job.record"):
+        record = _save(job_id, **record)
+    runtime_stats.inc("riai_jobs_started_total", type=job_type)
 
-    set_global_seed(record["seed"])  # determinism
+    # No global seeding here: tasks derive private PRNGs from payload["seed"] (see utils.seeds.make_rng)
+    # so jobs can run concurrently without clobbering each other's random state.
 
     try:
         import importlib
-        if job_type == "train":
-            mod = importlib.import_module("app.backend.tasks.train")
-            out = mod.run(payload)
-        elif job_type == "evaluate":
-            mod = importlib.import_module("app.backend.tasks.evaluate")
-            out = mod.run(payload)
-        else:
-            # Dynamic task import for specialized jobs (e.g., train_sft, train_dpo, train_cnn, train_tsconv, train_rl,
-            # make_bubbles, self_eval). The module must expose run(payload) -> dict.
+        with span("job.import"):
+            if job_type == "train":
+                mod = importlib.import_module("app.backend.tasks.train")
+            elif job_type == "evaluate":
+                mod = importlib.import_module("app.backend.tasks.evaluate")
+            else:
+                # Dynamic task import for specialized jobs (e.g., train_sft, train_dpo, train_cnn, train_tsconv, train_rl,
+                # make_bubbles, self_eval). The module must expose run(payload) -> dict.
+                try:
+                    mod = importlib.import_module(f"app.backend.tasks.{job_type}")
+                except Exception as _e:
+                    raise ValueError(f"Unknown job type or import failed: {job_type} ({_e})")
+        with span("job.run"):
+            check_cancelled()
             try:
-                mod = importlib.import_module(f"app.backend.tasks.{job_type}")
                 out = mod.run(payload)
+            except JobCancelled:
+                raise
             except Exception as _e:
+                if job_type in ("train", "evaluate"):
+                    raise
                 raise ValueError(f"Unknown job type or import failed: {job_type} ({_e})")
         record.update({
             "status": "finished",
             "finished_at": now_iso(),
             "result": out
         })
+    except JobCancelled:
+        record.update({
+            "status": "cancelled",
+            "finished_at": now_iso()
+        })
     except Exception as e:
         record.update({
             "status": "failed",
@@ -53,6 +323,21 @@ def run_job(job_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
             "error": str(e)
         })
     finally:
-        write_json(ARTIFACTS_JOBS / f"{job_id}.json", record)
+        runtime_stats.inc("riai_jobs_finished_total", type=job_type, status=record["status"])
 
     return record
+
+
+def _jobs_in_progress():
+    started = runtime_stats.counter_value("riai_jobs_started_total")
+    try:
+        queued = len(os.listdir(QUEUE_DIR))
+    except FileNotFoundError:
+        queued = 0
+    return started - runtime_stats.counter_value("riai_jobs_finished_total") + queued
+
+
+runtime_stats.describe("riai_jobs_started_total", "counter", "Jobs started by type.")
+runtime_stats.describe("riai_jobs_finished_total", "counter", "Jobs finished by type and final status.")
+runtime_stats.describe("riai_job_queue_depth", "gauge", "Jobs accepted and not finished yet.")
+runtime_stats.gauge_callback("riai_job_queue_depth", _jobs_in_progress)
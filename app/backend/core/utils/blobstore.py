@@ -0,0 +1,386 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from .io import ARTIFACTS_DIR, REGISTRY_MODELS_DIR, ROOT, atomic_write_bytes, encode_artifact, file_lock, load_json, write_json
+from .hash_cache import cached_sha256, iter_sha256
+from . import fs_events
+
+# Content-addressed store for artifact files: blobs/sha256/<ab>/<digest>. Every checkpoint, index or
+# dataset written through put_* is kept by content, so run records can pin the exact bytes they
+# produced ("blobs" in run.json, "checkpoint_blob" in registry entries) even after the legacy path is
+# overwritten by a later run. Legacy paths are reflinks of the blob where the filesystem supports
+# them (shared extents, copy-on-write), else hardlinks, so identical content is stored once either
+# way; plain copies only where neither works (e.g. the path is on another device). A hardlinked path
+# is the blob: artifacts are only ever written through atomic_open (write_json, put_*), which
+# renames a new file over the path, so a rewrite detaches the path and never reaches the blob.
+# Re-putting content a path already holds costs no I/O.
+#
+# References (legacy path -> blob) live in refs.json, a snapshot compacted by gc(), plus refs.log, a
+# journal every put appends one line to, so a put never rewrites the whole table. gc() keeps blobs
+# referenced by a live path or by a run record / registry entry, and blobs younger than
+# GC_GRACE_S (a put touches the blob it reuses before linking it, so gc never races a put). The
+# journal's "shared" flag marks paths that cost no extra space (reflinks and hardlinks).
+BLOBS_DIR: Path = ARTIFACTS_DIR / "blobs"
+REFS_PATH: Path = BLOBS_DIR / "refs.json"
+REFS_LOG: Path = BLOBS_DIR / "refs.log"
+# run records whose "blobs" pin checkpoints: app/artifacts/<capability>/<run>/run.json
+RUN_RECORDS_GLOB = "*/*/run.json"
+GC_GRACE_S = 3600.0
+# adopt() leaves files below this size alone: a link saves less than the ref bookkeeping costs
+ADOPT_MIN_BYTES = 4096
+_FICLONE = 0x40049409  # linux ioctl: share extents with another file (btrfs/xfs reflink)
+
+
+def blob_path(sha: str) -> Path:
+    return BLOBS_DIR / "sha256" / sha[:2] / sha
+
+
+def _rel(path: Path) -> str:
+    p = Path(os.path.abspath(path))
+    try:
+        return p.relative_to(ROOT).as_posix()
+    except ValueError:
+        return p.as_posix()
+
+
+def _abs(rel: str) -> Path:
+    p = Path(rel)
+    return p if p.is_absolute() else ROOT / p
+
+
+def _load_refs() -> Tuple[Dict[str, str], set[str]]:
+    """(path -> sha, paths sharing the blob's storage): the snapshot with the journal replayed on
+    top. Older snapshots and journal lines call the flag "reflinked" / "reflink"."""
+    paths: Dict[str, str] = {}
+    shared: set[str] = set()
+    try:
+        data = load_json(REFS_PATH)
+        if isinstance(data, dict) and isinstance(data.get("paths"), dict):
+            paths.update(data["paths"])
+            shared.update(data.get("shared", data.get("reflinked")) or ())
+    except (OSError, ValueError):
+        pass
+    try:
+        with REFS_LOG.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ent = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crashed writer
+                rel = ent.get("path")
+                if ent.get("sha"):
+                    paths[rel] = ent["sha"]
+                else:
+                    paths.pop(rel, None)
+                flag = ent.get("shared", ent.get("reflink"))
+                if flag is not None:  # None: content re-confirmed, link kind unchanged
+                    (shared.add if flag else shared.discard)(rel)
+    except OSError:
+        pass
+    return paths, shared & set(paths)
+
+
+def _log_ref(rel: str, sha: str | None, shared: bool | None = False) -> None:
+    line = json.dumps({"path": rel, "sha": sha, "shared": shared}, separators=(",", ":")) + "\n"
+    with file_lock(REFS_PATH):
+        REFS_LOG.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(REFS_LOG), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """Create dst sharing src's extents; False (and no dst) where the filesystem can't."""
+    if os.name == "nt":
+        return False
+    try:
+        import fcntl
+        with open(src, "rb") as rf, open(dst, "wb") as wf:
+            fcntl.ioctl(wf.fileno(), _FICLONE, rf.fileno())
+        return True
+    except (OSError, ImportError):
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _clone(src: Path, dst: Path) -> str:
+    """Give dst src's content as an independent file: reflink, else copy. Returns the method used."""
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def _link(blob: Path, dst: Path) -> str:
+    """Give dst the blob's content without storing it again: reflink, else hardlink, else copy
+    (dst on another device). Returns the method used."""
+    if _reflink(blob, dst):
+        return "reflink"
+    try:
+        os.link(blob, dst)
+        return "hardlink"
+    except OSError:
+        shutil.copyfile(blob, dst)
+        return "copy"
+
+
+def _touch(blob: Path) -> None:
+    """Restart blob's gc grace period. On POSIX a same-mode chmod bumps only the ctime, so paths
+    hardlinked to the blob keep their mtime and caches keyed on it don't reload."""
+    if os.name == "nt":
+        os.utime(blob)
+    else:
+        os.chmod(blob, os.stat(blob).st_mode)
+
+
+def _age_stamp(st: os.stat_result) -> float:
+    return st.st_mtime if os.name == "nt" else max(st.st_mtime, st.st_ctime)
+
+
+def _tmp_for(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _same_content(path: Path, sha: str) -> bool:
+    try:
+        return cached_sha256(path) == sha
+    except OSError:
+        return False
+
+
+def _commit_blob(sha: str, tmp: Path | None) -> None:
+    """Move a prepared blob file into place, or, when the blob already exists, touch it (so gc's
+    grace period covers the link that follows) and drop tmp. Under the refs lock: gc checks blob
+    ages under the same lock."""
+    dst = blob_path(sha)
+    with file_lock(REFS_PATH):
+        if dst.exists():
+            _touch(dst)
+            if tmp is not None:
+                os.unlink(tmp)
+        elif tmp is not None:
+            os.replace(tmp, dst)
+        else:
+            raise FileNotFoundError(f"blob {sha} is not in the store")
+
+
+def _materialise(sha: str, dest: Path) -> None:
+    """Make dest hold the blob's content (no I/O when it already does) and record the reference."""
+    dest = Path(dest)
+    blob = blob_path(sha)
+    try:
+        linked = os.path.samefile(dest, blob)
+    except OSError:
+        linked = False
+    if linked or (dest.exists() and _same_content(dest, sha)):
+        _log_ref(_rel(dest), sha, None)
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_for(dest)
+    try:
+        method = _link(blob, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _log_ref(_rel(dest), sha, method != "copy")
+    fs_events.notify(dest)
+
+
+def put_bytes(data: bytes, dest: Path | None = None) -> str:
+    """Store data (written only if no blob has this content yet), materialise it at dest, return the sha256."""
+    sha = hashlib.sha256(data).hexdigest()
+    blob = blob_path(sha)
+    tmp = None
+    if not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_for(blob)
+        atomic_write_bytes(tmp, data)
+    _commit_blob(sha, tmp)
+    if dest is not None:
+        _materialise(sha, dest)
+    return sha
+
+
+def put_json(dest: Path, data: Any, codec: str | None = None) -> str:
+    """write_json through the store (same bytes and codec choice as io.write_json)."""
+    return put_bytes(encode_artifact(dest, data, codec), dest)
+
+
+def put_file(src: Path, dest: Path | None = None, move: bool = False) -> str:
+    """Store an existing file (e.g. one a job just streamed to a temp path). With move=True src is
+    consumed: renamed into the store when its content is new, deleted when it is a duplicate."""
+    src = Path(src)
+    h = hashlib.sha256()
+    with src.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    sha = h.hexdigest()
+    blob = blob_path(sha)
+    tmp = None
+    if move:
+        tmp = src
+    elif not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_for(blob)
+        _clone(src, tmp)
+    _commit_blob(sha, tmp)
+    if dest is not None:
+        _materialise(sha, dest)
+    return sha
+
+
+def release(dest: Path) -> None:
+    """Forget dest's reference (the file itself is left alone); its blob goes at the next gc()."""
+    _log_ref(_rel(dest), None)
+
+
+def _blob_files() -> List[Path]:
+    root = BLOBS_DIR / "sha256"
+    if not root.is_dir():
+        return []
+    return sorted(p for p in root.glob("*/*") if p.is_file() and not p.name.startswith("."))
+
+
+def _roots() -> set[str]:
+    """Blobs pinned by records rather than by a live path: run.json "blobs" and registry
+    "checkpoint_blob"."""
+    shas: set[str] = set()
+    for path in ARTIFACTS_DIR.glob(RUN_RECORDS_GLOB):
+        try:
+            blobs = (load_json(path) or {}).get("blobs") or {}
+            shas.update(v for v in blobs.values() if isinstance(v, str))
+        except (OSError, ValueError, AttributeError):
+            continue
+    for path in REGISTRY_MODELS_DIR.glob("*.json"):
+        try:
+            sha = (load_json(path) or {}).get("checkpoint_blob")
+            if isinstance(sha, str):
+                shas.add(sha)
+        except (OSError, ValueError, AttributeError):
+            continue
+    return shas
+
+
+def gc(dry_run: bool = False, grace_s: float = GC_GRACE_S) -> Dict[str, Any]:
+    """Drop references whose path is gone or now holds other content, compact the journal, then
+    delete blobs no live path, run record or registry entry references (and older than grace_s)."""
+    roots = _roots()
+    with file_lock(REFS_PATH):
+        refs, shared = _load_refs()
+        live = {rel: sha for rel, sha in refs.items() if _same_content(_abs(rel), sha)}
+        keep = set(live.values()) | roots
+        cutoff = time.time() - grace_s
+        removed: List[str] = []
+        freed = 0
+        for blob in _blob_files():
+            try:
+                st = blob.stat()
+            except OSError:
+                continue
+            if blob.name in keep or _age_stamp(st) > cutoff:
+                continue
+            removed.append(blob.name)
+            freed += st.st_size
+            if not dry_run:
+                try:
+                    blob.unlink()
+                except OSError:
+                    continue
+        if not dry_run:
+            write_json(REFS_PATH, {"version": 2, "paths": dict(sorted(live.items())),
+                                   "shared": sorted(shared & set(live))})
+            try:
+                os.unlink(REFS_LOG)
+            except FileNotFoundError:
+                pass
+    return {"dry_run": dry_run, "stale_refs": len(refs) - len(live), "removed": len(removed),
+            "freed_bytes": freed, "blobs": removed}
+
+
+def reflink_supported() -> bool:
+    """Can the store's filesystem share extents between files?"""
+    BLOBS_DIR.mkdir(parents=True, exist_ok=True)
+    a, b = _tmp_for(BLOBS_DIR / "probe-a"), _tmp_for(BLOBS_DIR / "probe-b")
+    try:
+        a.write_bytes(b"probe")
+        return _reflink(a, b)
+    finally:
+        for p in (a, b):
+            try:
+                os.unlink(p)
+            except OSError:
+                pass
+
+
+def adopt(paths: Iterable[Path], min_bytes: int = ADOPT_MIN_BYTES) -> Dict[str, Any]:
+    """Move existing files into the store and reflink them back, so duplicates share one copy.
+    Only where reflinks work: these files were not written through the store, so nothing promises
+    they are only ever replaced, never written in place, as a hardlink would need.
+    Files are hashed in parallel through the hash cache."""
+    if not reflink_supported():
+        return {"adopted": 0, "saved_bytes": 0, "reflink": False}
+    candidates: List[Path] = []
+    for p in paths:
+        p = Path(p)
+        try:
+            if p.is_file() and not p.is_symlink() and p.stat().st_size >= min_bytes:
+                candidates.append(p)
+        except OSError:
+            continue
+    adopted = 0
+    saved = 0
+    for path, sig, sha in iter_sha256(candidates):
+        if sha is None:
+            continue
+        blob = blob_path(sha)
+        tmp = None
+        if blob.exists():
+            saved += sig["size"]
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = _tmp_for(blob)
+            _clone(path, tmp)
+        _commit_blob(sha, tmp)
+        # re-clone even though the content matches: the point is to share the blob's extents
+        tmp = _tmp_for(path)
+        _clone(blob, tmp)
+        os.replace(tmp, path)
+        _log_ref(_rel(path), sha, True)
+        adopted += 1
+    return {"adopted": adopted, "saved_bytes": saved, "reflink": True}
+
+
+def stats() -> Dict[str, Any]:
+    refs, shared = _load_refs()
+    sizes: Dict[str, int] = {}
+    for blob in _blob_files():
+        try:
+            sizes[blob.name] = blob.stat().st_size
+        except OSError:
+            continue
+    logical = sum(sizes.get(sha, 0) for sha in refs.values())
+    # a reflinked or hardlinked path shares the blob's storage; a copied one costs its full size again
+    saved = sum(sizes.get(refs[rel], 0) for rel in shared)
+    return {
+        "blobs": len(sizes),
+        "refs": len(refs),
+        "shared_refs": len(shared),
+        "stored_bytes": sum(sizes.values()),
+        "referenced_bytes": logical,
+        "saved_bytes": saved,
+    }
@@ -0,0 +1,273 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from collections import OrderedDict
+import hashlib
+import io
+import itertools
+import json
+import os
+import threading
+from .io import ARTIFACTS_DATASETS
+from . import memory
+
+UPLOADS_DIR: Path = ARTIFACTS_DATASETS / "uploads"
+# PII-scrubbed copies of uploads (tasks/scrub_datasets.py), same file names as the sources
+SCRUBBED_DIR: Path = ARTIFACTS_DATASETS / "scrubbed"
+
+# Files up to this size are parsed once and kept in the shared record cache (readers that stop
+# early parse them as they go and cache them only if they reach the end); larger files are
+# streamed line by line on every pass (constant memory).
+CACHE_MAX_FILE_BYTES = 32 * 1024 * 1024
+# default budget of the parsed-record cache (approximate in-memory size, "dataset_records")
+CACHE_MAX_TOTAL_BYTES = 256 * 1024 * 1024
+
+# Fields read by the chat/bubble corpus builders
+DIALOG_FIELDS = ("prompt", "response", "text")
+
+# Parsed line: a dict for valid JSON objects, the stripped raw line otherwise
+_Entry = Any
+
+_LOCK = threading.Lock()
+_RECORDS: "OrderedDict[str, Tuple[int, List[_Entry]]]" = OrderedDict()  # sha256 -> (approx bytes, entries)
+_RECORDS_BYTES = 0
+# (path, size, mtime, inode) -> sha256 of a cached file; keys are dropped with their _RECORDS entry
+_SHA_BY_STAT: Dict[Tuple[str, int, int, int], str] = {}
+_STATS_BY_SHA: Dict[str, set] = {}
+
+
+def _scrubbed_copy(path: Path) -> Path:
+    """The scrubbed copy of an upload if one exists and is not older than the upload, else the upload."""
+    cand = SCRUBBED_DIR / path.name
+    try:
+        if cand.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return cand
+    except OSError:
+        pass
+    return path
+
+
+def dataset_sources(groups: Sequence[str] = ("synth", "uploads"), prefer_scrubbed: bool = True) -> List[Path]:
+    """Resolve dataset groups to JSONL files in a deterministic order.
+    "synth" = artifacts/datasets/wordnet_synth_*.jsonl, "uploads" = artifacts/datasets/uploads/*.jsonl.
+    Each group is sorted by file name; groups keep the order given.
+    With prefer_scrubbed, uploads are replaced by their up-to-date copy under artifacts/datasets/scrubbed.
+    """
+    out: List[Path] = []
+    for g in groups:
+        if g == "synth":
+            out.extend(sorted(ARTIFACTS_DATASETS.glob("wordnet_synth_*.jsonl"), key=lambda p: p.name))
+        elif g == "uploads":
+            if UPLOADS_DIR.exists():
+                uploads = sorted(UPLOADS_DIR.glob("*.jsonl"), key=lambda p: p.name)
+                if prefer_scrubbed:
+                    uploads = [_scrubbed_copy(p) for p in uploads]
+                out.extend(uploads)
+        else:
+            raise ValueError(f"unknown dataset group: {g}")
+    return out
+
+
+def _parse_line(line: str) -> _Entry:
+    try:
+        obj = json.loads(line)
+    except Exception:
+        return line.strip()
+    if isinstance(obj, dict):
+        return obj
+    return line.strip()
+
+
+def _stat_key(path: Path) -> Tuple[str, int, int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return str(path), st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _link_stat_locked(key: Tuple[str, int, int, int], sha: str) -> None:
+    _SHA_BY_STAT[key] = sha
+    _STATS_BY_SHA.setdefault(sha, set()).add(key)
+
+
+def _drop_locked(sha: str) -> int:
+    global _RECORDS_BYTES
+    size, _ = _RECORDS.pop(sha)
+    _RECORDS_BYTES -= size
+    for key in _STATS_BY_SHA.pop(sha, ()):
+        _SHA_BY_STAT.pop(key, None)
+    return size
+
+
+def _cache_put(sha: str, entries: List[_Entry], key: Tuple[str, int, int, int]) -> None:
+    global _RECORDS_BYTES
+    size = memory.approx_size(entries)
+    if not memory.admit("dataset_records", size):
+        return
+    cap = memory.budget("dataset_records")
+    dropped = 0
+    with _LOCK:
+        if sha in _RECORDS:
+            _RECORDS.move_to_end(sha)
+            _link_stat_locked(key, sha)
+            return
+        while _RECORDS and _RECORDS_BYTES + size > cap:
+            _drop_locked(next(iter(_RECORDS)))
+            dropped += 1
+        _RECORDS[sha] = (size, entries)
+        _RECORDS_BYTES += size
+        _link_stat_locked(key, sha)
+    if dropped:
+        memory.evicted("dataset_records", dropped)
+
+
+def _cache_lookup(key: Tuple[str, int, int, int] | None) -> List[_Entry] | None:
+    if key is None:
+        return None
+    with _LOCK:
+        sha = _SHA_BY_STAT.get(key)
+        if sha is None or sha not in _RECORDS:
+            return None
+        _RECORDS.move_to_end(sha)
+        return _RECORDS[sha][1]
+
+
+def _cached_entries(path: Path) -> List[_Entry] | None:
+    """Return parsed entries for a small file, parsing it at most once per content hash."""
+    key = _stat_key(path)
+    if key is None or key[1] > CACHE_MAX_FILE_BYTES:
+        return None
+    entries = _cache_lookup(key)
+    if entries is not None:
+        return entries
+    data = path.read_bytes()
+    sha = hashlib.sha256(data).hexdigest()
+    with _LOCK:
+        hit = _RECORDS.get(sha)
+        if hit is not None:
+            _RECORDS.move_to_end(sha)
+            _link_stat_locked(key, sha)
+            return hit[1]
+    text = data.decode("utf-8", errors="ignore")
+    entries = [_parse_line(line) for line in io.StringIO(text, newline=None)]
+    _cache_put(sha, entries, key)
+    return entries
+
+
+def _stream_entries(path: Path, key: Tuple[str, int, int, int] | None) -> Iterator[_Entry]:
+    """Parse path line by line. With a cache key, the entries are kept and, once the file has been
+    read to the end, cached exactly as _cached_entries would; a consumer that stops early leaves
+    the cache alone."""
+    h = hashlib.sha256()
+    entries: List[_Entry] = []
+    with path.open("rb") as f:
+        for raw in f:
+            text = raw.decode("utf-8", errors="ignore")
+            # universal newlines, as the cached parse splits them (a lone \r ends a line too)
+            for line in io.StringIO(text, newline=None) if "\r" in text else (text,):
+                entry = _parse_line(line)
+                if key is not None:
+                    entries.append(entry)
+                yield entry
+            if key is not None:
+                h.update(raw)
+    if key is not None:
+        _cache_put(h.hexdigest(), entries, key)
+
+
+def _iter_entries(path: Path, max_lines: int | None = None, lazy: bool = False) -> Iterator[_Entry]:
+    """Parsed lines of path, at most max_lines of them. Files up to CACHE_MAX_FILE_BYTES come from
+    the record cache, parsed whole on a miss; lazy (the reader may stop early) parses a missed file
+    only as far as it is consumed. Larger files are always streamed."""
+    key = _stat_key(path)
+    small = key is not None and key[1] <= CACHE_MAX_FILE_BYTES
+    entries = _cache_lookup(key)
+    if entries is None and small and not lazy:
+        entries = _cached_entries(path)
+    it = _stream_entries(path, key if small else None) if entries is None else iter(entries)
+    yield from it if max_lines is None else itertools.islice(it, max_lines)
+
+
+def clear_cache() -> None:
+    global _RECORDS_BYTES
+    with _LOCK:
+        _RECORDS.clear()
+        _SHA_BY_STAT.clear()
+        _STATS_BY_SHA.clear()
+        _RECORDS_BYTES = 0
+
+
+memory.register("dataset_records", lambda: (_RECORDS_BYTES, len(_RECORDS)), CACHE_MAX_TOTAL_BYTES, clear_cache,
+                "Parsed JSONL dataset files up to CACHE_MAX_FILE_BYTES, LRU by content hash")
+
+
+class DatasetReader:
+    """Generator-based reader over local JSONL datasets.
+
+    - groups/paths: which files to read (paths wins when given), in deterministic order
+    - fields: project each record to these keys (None = shallow copy of the full record)
+    - limit_per_file: cap on raw lines read per file (blank/invalid lines count, as in the legacy loops)
+    - limit: cap on records yielded overall, counted after `where`
+    - on_error: "text" wraps unparseable lines as {"text": line}; "skip" drops them
+    Small files are parsed once per process and shared across readers via a cache keyed by sha256;
+    with limit, files not already cached are parsed only as far as the reader gets.
+    """
+
+    def __init__(
+        self,
+        groups: Sequence[str] = ("synth", "uploads"),
+        paths: Iterable[Path] | None = None,
+        fields: Sequence[str] | None = None,
+        limit_per_file: int | None = None,
+        limit: int | None = None,
+        where: Callable[[Dict[str, Any]], bool] | None = None,
+        on_error: str = "text",
+    ):
+        if on_error not in ("text", "skip"):
+            raise ValueError(f"on_error must be 'text' or 'skip', got {on_error!r}")
+        self.groups = tuple(groups)
+        self.paths = [Path(p) for p in paths] if paths is not None else None
+        self.fields = tuple(fields) if fields is not None else None
+        self.limit_per_file = limit_per_file
+        self.limit = limit
+        self.where = where
+        self.on_error = on_error
+
+    def sources(self) -> List[Path]:
+        return list(self.paths) if self.paths is not None else dataset_sources(self.groups)
+
+    def _project(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return dict(obj)
+        return {k: obj[k] for k in self.fields if k in obj}
+
+    def iter_file(self, path: Path) -> Iterator[Dict[str, Any]]:
+        max_lines = None if self.limit_per_file is None else max(0, int(self.limit_per_file))
+        for entry in _iter_entries(path, max_lines, lazy=self.limit is not None):
+            if isinstance(entry, dict):
+                yield self._project(entry)
+            elif self.on_error == "text":
+                yield self._project({"text": entry})
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.limit is not None and self.limit <= 0:
+            return
+        count = 0
+        for path in self.sources():
+            try:
+                for rec in self.iter_file(path):
+                    if self.where is not None and not self.where(rec):
+                        continue
+                    yield rec
+                    count += 1
+                    if self.limit is not None and count >= self.limit:
+                        return
+            except OSError:
+                # unreadable file: skip it like the legacy loaders did
+                continue
+
+
+def dialog_text(rec: Dict[str, Any]) -> str:
+    """Legacy corpus line used by the char-level LMs: response, then prompt (or text)."""
+    return str(rec.get("response", "")) + "\n" + str(rec.get("prompt", rec.get("text", ""))) + "\n"
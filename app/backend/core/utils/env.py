@@ -0,0 +1,52 @@
+from __future__ import annotations
+from typing import Any, Dict
+import hashlib
+import json
+import os
+import platform
+import sys
+
+_FINGERPRINT: Dict[str, Any] | None = None
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.lower().startswith(("model name", "hardware", "cpu model")):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _ram_mb() -> int | None:
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024))
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def env_fingerprint() -> Dict[str, Any]:
+    """Machine/runtime description stored with benchmark results (evaluation policy: env in reports),
+    plus a short id so results from different machines are never compared by accident."""
+    global _FINGERPRINT
+    if _FINGERPRINT is None:
+        env: Dict[str, Any] = {
+            "cpu": _cpu_model(),
+            "cpu_count": os.cpu_count(),
+            "gpu": None,
+            "ram_mb": _ram_mb(),
+            "vram_mb": None,
+            "platform": platform.platform(),
+            "python": f"{platform.python_implementation()} {platform.python_version()}",
+            "fsync": os.environ.get("RIAI_FSYNC", "group").lower(),
+        }
+        env["id"] = hashlib.sha1(json.dumps(env, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        _FINGERPRINT = env
+    return dict(_FINGERPRINT)
+
+
+if __name__ == "__main__":
+    json.dump(env_fingerprint(), sys.stdout, indent=2)
+    print()
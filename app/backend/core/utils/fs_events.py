@@ -0,0 +1,31 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, List
+import threading
+
+# In-process change notifications. write_json (core/utils/io.py and main.py) announces every path it
+# writes so caches derived from files can invalidate immediately instead of waiting for a poll.
+
+_LOCK = threading.Lock()
+_SUBSCRIBERS: List[Callable[[Path], None]] = []
+
+
+def subscribe(callback: Callable[[Path], None]) -> None:
+    with _LOCK:
+        if callback not in _SUBSCRIBERS:
+            _SUBSCRIBERS.append(callback)
+
+
+def unsubscribe(callback: Callable[[Path], None]) -> None:
+    with _LOCK:
+        if callback in _SUBSCRIBERS:
+            _SUBSCRIBERS.remove(callback)
+
+
+def notify(path: Path) -> None:
+    """Tell subscribers that path was created, rewritten or removed. Never raises."""
+    for cb in list(_SUBSCRIBERS):
+        try:
+            cb(Path(path))
+        except Exception:
+            pass
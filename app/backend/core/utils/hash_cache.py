@@ -0,0 +1,176 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from .io import ARTIFACTS_DIR, atomic_write_bytes, file_lock
+
+# Persistent sha256 cache for files on disk. An entry is trusted only while the file's
+# (size, mtime_ns, inode, ctime_ns) still match, so unchanged files are never re-read and any
+# rewrite, truncation, or replacement (new inode) forces a fresh hash.
+HASH_CACHE_PATH: Path = ARTIFACTS_DIR / "cache" / "file_hashes.json"
+HASH_CACHE_MAX_ENTRIES = 8192
+_VERSION = 1
+
+_LOCK = threading.Lock()
+_ENTRIES: Dict[str, Dict[str, Any]] = {}
+_LOADED_GEN: Tuple[int, int] | None = None
+_LOADED = False
+
+
+def stat_signature(st: os.stat_result) -> Dict[str, int]:
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "ino": st.st_ino, "ctime_ns": st.st_ctime_ns}
+
+
+def _cache_gen() -> Tuple[int, int] | None:
+    try:
+        st = HASH_CACHE_PATH.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _load_locked() -> None:
+    """(Re)load the on-disk cache when another process has rewritten it."""
+    global _ENTRIES, _LOADED_GEN, _LOADED
+    gen = _cache_gen()
+    if _LOADED and gen == _LOADED_GEN:
+        return
+    entries: Dict[str, Dict[str, Any]] = {}
+    if gen is not None:
+        try:
+            with HASH_CACHE_PATH.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == _VERSION and isinstance(data.get("files"), dict):
+                entries = {
+                    k: v for k, v in data["files"].items()
+                    if isinstance(v, dict) and isinstance(v.get("sha256"), str) and len(v["sha256"]) == 64
+                }
+        except Exception:
+            # corrupt or partial cache: start over, it only costs re-hashing
+            entries = {}
+    # keep hashes computed in this process that the file does not know about yet
+    for k, v in _ENTRIES.items():
+        entries.setdefault(k, v)
+    _ENTRIES = entries
+    _LOADED_GEN = gen
+    _LOADED = True
+
+
+def _save_locked() -> None:
+    global _LOADED_GEN
+    while len(_ENTRIES) > HASH_CACHE_MAX_ENTRIES:
+        _ENTRIES.pop(next(iter(_ENTRIES)))
+    try:
+        blob = json.dumps({"version": _VERSION, "files": _ENTRIES}, ensure_ascii=False, separators=(",", ":"))
+        atomic_write_bytes(HASH_CACHE_PATH, blob.encode("utf-8"))
+        _LOADED_GEN = _cache_gen()
+    except OSError:
+        # read-only artifacts dir: the in-memory cache still works for this process
+        pass
+
+
+@contextlib.contextmanager
+def _store_lock() -> Iterator[None]:
+    """Serialise cache merges across workers; a lock that cannot be taken (read-only dir,
+    stuck peer) only risks dropping a cache entry, so carry on without it."""
+    with contextlib.ExitStack() as stack:
+        try:
+            stack.enter_context(file_lock(HASH_CACHE_PATH, timeout=5.0))
+        except OSError:  # TimeoutError is an OSError
+            pass
+        yield
+
+
+def _hash_file(path: Path, chunk_size: int) -> str:
+    with path.open("rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def _lookup(key: str, sig: Dict[str, int]) -> str | None:
+    with _LOCK:
+        hit = _ENTRIES.get(key)
+        if hit is None or {k: hit.get(k) for k in sig} != sig:
+            _load_locked()
+            hit = _ENTRIES.get(key)
+        if hit is not None and {k: hit.get(k) for k in sig} == sig:
+            return hit["sha256"]
+    return None
+
+
+def _remember(items: List[Tuple[str, Dict[str, int], str]]) -> None:
+    # merge with entries other workers saved meanwhile (re-load under the cross-process lock)
+    with _LOCK, _store_lock():
+        _load_locked()
+        for key, sig, sha in items:
+            _ENTRIES.pop(key, None)
+            _ENTRIES[key] = dict(sig, sha256=sha)
+        _save_locked()
+
+
+def cached_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read from disk only if the file changed since it was last hashed."""
+    path = Path(path)
+    key = os.path.abspath(path)
+    sig = stat_signature(os.stat(key))
+    sha = _lookup(key, sig)
+    if sha is not None:
+        return sha
+    sha = _hash_file(path, chunk_size)
+    # Only remember the digest if the file did not change while it was being read
+    if stat_signature(os.stat(key)) == sig:
+        _remember([(key, sig, sha)])
+    return sha
+
+
+def iter_sha256(paths: Iterable[Path], workers: int | None = None,
+                chunk_size: int = 1 << 20) -> Iterator[Tuple[Path, Dict[str, int] | None, str | None]]:
+    """Yield (path, stat signature, sha256) in input order while cache misses are hashed ahead on a
+    thread pool (hashlib releases the GIL). New digests are saved once at the end rather than per
+    file. A file that cannot be read yields (path, None, None)."""
+    def _one(path: Path) -> Tuple[Path, Dict[str, int] | None, str | None, bool]:
+        key = os.path.abspath(path)
+        try:
+            sig = stat_signature(os.stat(key))
+            sha = _lookup(key, sig)
+            if sha is not None:
+                return path, sig, sha, False
+            sha = _hash_file(Path(path), chunk_size)
+            return path, sig, sha, stat_signature(os.stat(key)) == sig
+        except OSError:
+            return path, None, None, False
+
+    fresh: List[Tuple[str, Dict[str, int], str]] = []
+    pool = ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1), thread_name_prefix="sha256")
+    try:
+        for path, sig, sha, is_new in pool.map(_one, paths):
+            if is_new:
+                fresh.append((os.path.abspath(path), sig, sha))
+            yield path, sig, sha
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if fresh:
+            _remember(fresh)
+
+
+def invalidate(path: Path | None = None) -> None:
+    """Drop one path (or everything) from the cache."""
+    global _LOADED
+    with _LOCK, _store_lock():
+        if path is None:
+            _ENTRIES.clear()
+            _LOADED = True
+        else:
+            _load_locked()
+            if _ENTRIES.pop(os.path.abspath(path), None) is None:
+                return
+        _save_locked()
@@ -1,8 +1,19 @@
 from __future__ import annotations
 from pathlib import Path
-import json
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+import ast
+import fnmatch
 import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
 from datetime import datetime
+from . import fs_events
 
 # Paths (Windows-friendly; use backslashes when writing literals elsewhere)
 ROOT: Path = Path(__file__).resolve().parents[4]
@@ -21,6 +32,8 @@ ARTIFACTS_LOGS: Path = ARTIFACTS_DIR / "logs"
 ARTIFACTS_JOBS: Path = ARTIFACTS_DIR / "jobs"
 ARTIFACTS_TRACES: Path = ARTIFACTS_DIR / "traces"
 ARTIFACTS_DATASETS: Path = ARTIFACTS_DIR / "datasets"
+ARTIFACTS_CACHE: Path = ARTIFACTS_DIR / "cache"
+LOCKS_DIR: Path = ARTIFACTS_CACHE / "locks"
 SCHEMA_PATH: Path = ROOT / "docs" / "specs" / "module_manifest_schema.json"
 WORDNET_ROOT: Path = ROOT / "WordNet-3.0"
 
@@ -35,27 +48,467 @@ def ensure_dirs():
         d.mkdir(parents=True, exist_ok=True)
 
 
-def load_json(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+# ---- Durable writes -------------------------------------------------------------------------
+# Every write goes to a temp file in the target directory and is renamed over the target, so readers
+# (other threads or uvicorn workers) see either the old or the new file, never a partial one.
+# RIAI_FSYNC selects durability: "group" (default) batches concurrent fsyncs, "always" syncs each
+# write on its own, "off" skips fsync (tests, scratch data).
+FSYNC_MODE = os.environ.get("RIAI_FSYNC", "group").lower()
+_GROUP_WINDOW_S = 0.002
+
+
+class _GroupSync:
+    """Group commit for fsync: the first writer to arrive becomes leader, waits a short window for
+    others, then syncs the whole batch (directories once each) while followers wait on the batch."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batch: Dict[str, Any] | None = None
+        self.writers = 0  # atomic writes in progress; a lone writer does not wait for company
+
+    def enter(self) -> None:
+        with self._lock:
+            self.writers += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self.writers -= 1
+
+    def sync(self, fd: int | None = None, directory: str | None = None) -> None:
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = {"fds": [], "dirs": set(), "done": threading.Event(), "error": None}
+            if fd is not None:
+                batch["fds"].append(fd)
+            if directory is not None:
+                batch["dirs"].add(directory)
+        if not leader:
+            batch["done"].wait()
+            if batch["error"] is not None:
+                raise batch["error"]
+            return
+        if self.writers > 1:
+            time.sleep(_GROUP_WINDOW_S)
+        with self._lock:
+            self._batch = None
+        try:
+            for f in batch["fds"]:
+                os.fsync(f)
+            for d in sorted(batch["dirs"]):
+                _fsync_dir_now(d)
+        except OSError as e:
+            batch["error"] = e
+        finally:
+            batch["done"].set()
+        if batch["error"] is not None:
+            raise batch["error"]
+
 
+_GROUP = _GroupSync()
 
-def write_json(path: Path, data):
+
+def _fsync_dir_now(directory: str) -> None:
+    if os.name == "nt":
+        return  # directories cannot be opened for fsync on Windows; rename is durable with the file
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync(fd: int | None = None, directory: str | None = None) -> None:
+    if FSYNC_MODE == "off":
+        return
+    if FSYNC_MODE == "always":
+        if fd is not None:
+            os.fsync(fd)
+        if directory is not None:
+            _fsync_dir_now(directory)
+        return
+    _GROUP.sync(fd=fd, directory=directory)
+
+
+def _replace(src: str, dst: str) -> None:
+    # Windows refuses to replace a file another process has open; readers hold files only briefly
+    for attempt in range(50):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if os.name != "nt" or attempt == 49:
+                raise
+            time.sleep(0.01)
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w", encoding: str | None = "utf-8", newline: str | None = None) -> Iterator[Any]:
+    """Open a temp file next to path for writing; on success it is fsync'ed and renamed onto path.
+    On error the temp file is removed and path is left untouched."""
+    if mode not in ("w", "wb"):
+        raise ValueError("atomic_open supports 'w' and 'wb' only")
+    path = Path(path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    kwargs = {} if mode == "wb" else {"encoding": encoding, "newline": newline}
+    _GROUP.enter()
+    try:
+        try:
+            with open(tmp, mode, **kwargs) as f:
+                yield f
+                f.flush()
+                _fsync(fd=f.fileno())
+            _replace(str(tmp), str(path))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        _fsync(directory=str(path.parent))
+    finally:
+        _GROUP.leave()
+    fs_events.notify(path)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    with atomic_open(path, "wb") as f:
+        f.write(data)
+
+
+# ---- Serialization ---------------------------------------------------------------------------
+# write_json picks a codec per artifact (CODEC_RULES, first match on the path relative to app/):
+#   json-pretty  indented JSON; registry entries and module files stay hand-editable and diff-friendly
+#   json         compact JSON for records (jobs, metrics, run info)
+#   packed       length-prefixed frames for documents holding a big table (n-gram counts, ...):
+#                a JSON header, then zlib-compressed JSON chunks of the table, so the table can be
+#                streamed with iter_table() without materialising the whole document
+#   auto         packed when the document holds a table of TABLE_MIN_ITEMS+ entries, else json
+# load_json sniffs the format, so readers never care which codec wrote a file. RIAI_ARTIFACT_CODEC
+# overrides the choice everywhere (e.g. json-pretty while debugging); `python -m
+# app.backend.core.utils.io show <file>` pretty-prints any artifact.
+TABLE_MIN_ITEMS = 1024
+PACK_CHUNK_ITEMS = 4096
+PACKED_MAGIC = b"RIAIPK\x01\n"
+_FRAME = struct.Struct("<BI")  # frame kind (| _F_ZLIB), payload length
+_F_HEADER, _F_CHUNK, _F_END, _F_ZLIB = 0, 1, 2, 0x80
+CODEC_RULES: List[Tuple[str, str]] = [
+    ("registry/*", "json-pretty"),
+    ("modules/*", "json-pretty"),
+    ("*", "auto"),
+]
+CODEC_OVERRIDE = os.environ.get("RIAI_ARTIFACT_CODEC") or None
+
+
+def _compact(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _table_key(data: Any, min_items: int = 1) -> str | None:
+    """Key of the largest table in data ("" when data itself is the table), or None if no table
+    has min_items entries."""
+    if isinstance(data, list):
+        return "" if len(data) >= min_items else None
+    if not isinstance(data, dict):
+        return None
+    best, size = None, min_items - 1
+    for k, v in data.items():
+        if isinstance(v, (dict, list)) and len(v) > size:
+            best, size = k, len(v)
+    return best
+
+
+def _frame(kind: int, payload: bytes) -> bytes:
+    return _FRAME.pack(kind, len(payload)) + payload
+
+
+class Codec:
+    name = "json"
+
+    def encode(self, data: Any) -> bytes:
+        return _compact(data)
+
+
+class PrettyJsonCodec(Codec):
+    name = "json-pretty"
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+class PackedCodec(Codec):
+    name = "packed"
+    min_items = 1
+
+    def encode(self, data: Any) -> bytes:
+        key = _table_key(data, self.min_items)
+        if key is None:
+            return _compact(data)
+        table = data if key == "" else data[key]
+        header = {
+            "table": key,
+            "type": "dict" if isinstance(table, dict) else "list",
+            "count": len(table),
+            "keys": None if key == "" else list(data),
+            "doc": None if key == "" else {k: v for k, v in data.items() if k != key},
+        }
+        items = list(table.items()) if isinstance(table, dict) else table
+        parts = [PACKED_MAGIC, _frame(_F_HEADER, _compact(header))]
+        for i in range(0, len(items), PACK_CHUNK_ITEMS):
+            parts.append(_frame(_F_CHUNK | _F_ZLIB, zlib.compress(_compact(items[i:i + PACK_CHUNK_ITEMS]), 1)))
+        parts.append(_frame(_F_END, b""))
+        return b"".join(parts)
+
+
+class AutoCodec(PackedCodec):
+    name = "auto"
+    min_items = TABLE_MIN_ITEMS
+
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    CODECS[codec.name] = codec
+
+
+for _c in (Codec(), PrettyJsonCodec(), PackedCodec(), AutoCodec()):
+    register_codec(_c)
+
+
+def codec_for(path: Path) -> Codec:
+    if CODEC_OVERRIDE:
+        # checked per call, not at import: codecs may be registered after this module loads
+        if CODEC_OVERRIDE not in CODECS:
+            raise ValueError(f"RIAI_ARTIFACT_CODEC={CODEC_OVERRIDE!r} is not a known codec ({', '.join(sorted(CODECS))})")
+        return CODECS[CODEC_OVERRIDE]
+    p = Path(os.path.abspath(path))
+    try:
+        rel = p.relative_to(APP_DIR).as_posix()
+    except ValueError:
+        rel = p.name
+    for pattern, name in CODEC_RULES:
+        if fnmatch.fnmatchcase(rel, pattern):
+            return CODECS[name]
+    return CODECS["auto"]
+
+
+def encode_artifact(path: Path, data: Any, codec: str | None = None) -> bytes:
+    """The bytes write_json(path, data, codec) would write."""
+    return (CODECS[codec] if codec else codec_for(path)).encode(data)
+
+
+def write_json(path: Path, data, codec: str | None = None):
+    atomic_write_bytes(path, encode_artifact(path, data, codec))
+
+
+def _read_frames(f: BinaryIO) -> Iterator[Tuple[int, bytes]]:
+    if f.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+        raise ValueError("not a packed artifact")
+    while True:
+        head = f.read(_FRAME.size)
+        if len(head) < _FRAME.size:
+            raise ValueError("truncated packed artifact")
+        kind, n = _FRAME.unpack(head)
+        payload = f.read(n)
+        if len(payload) < n:
+            raise ValueError("truncated packed artifact")
+        if kind & _F_ZLIB:
+            payload = zlib.decompress(payload)
+        kind &= ~_F_ZLIB
+        if kind == _F_END:
+            return
+        yield kind, payload
+
+
+def _packed_parts(f: BinaryIO) -> Tuple[Dict[str, Any], Iterator[Any]]:
+    frames = _read_frames(f)
+    kind, payload = next(frames)
+    if kind != _F_HEADER:
+        raise ValueError("packed artifact without header")
+    header = json.loads(payload)
+
+    def _items() -> Iterator[Any]:
+        for kind, payload in frames:
+            if kind == _F_CHUNK:
+                yield from json.loads(payload)
+    return header, _items()
+
+
+def load_json(path: Path):
+    """Load an artifact written by any codec (plain JSON files included)."""
+    with open(path, "rb") as f:
+        if f.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+            f.seek(0)
+            return json.loads(f.read())
+        f.seek(0)
+        header, items = _packed_parts(f)
+        table: Any = dict(items) if header["type"] == "dict" else list(items)
+    if header["table"] == "":
+        return table
+    doc = header["doc"]
+    doc[header["table"]] = table
+    return {k: doc[k] for k in header["keys"]} if header.get("keys") else doc
+
+
+def iter_table(path: Path, key: str | None = None) -> Iterator[Any]:
+    """Stream a document's big table: (key, value) pairs for a dict table, items for a list.
+    Packed files are decoded one chunk at a time; JSON files are loaded and their table iterated.
+    key picks the table in a JSON document (default: the largest dict/list value)."""
+    with open(path, "rb") as f:
+        if f.read(len(PACKED_MAGIC)) == PACKED_MAGIC:
+            f.seek(0)
+            header, items = _packed_parts(f)
+            if key is None or key == header["table"]:
+                for item in items:
+                    yield tuple(item) if header["type"] == "dict" else item
+                return
+    data = load_json(path)
+    if key is None:
+        key = _table_key(data)
+    table = data if key == "" else (data.get(key) if isinstance(data, dict) and key is not None else None)
+    if isinstance(table, dict):
+        yield from table.items()
+    elif isinstance(table, list):
+        yield from table
+
+
+def write_ndjson(path: Path, rows: Iterable[Any]) -> int:
+    """Atomically write one compact JSON document per line; returns the row count."""
+    n = 0
+    with atomic_open(path, "w", newline="\n") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            n += 1
+    return n
+
+
+def iter_ndjson(path: Path) -> Iterator[Any]:
+    """Stream records from a JSON-lines file. Blank and unparsable lines are skipped; lines written as
+    Python dict reprs by older versions are still accepted."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                try:
+                    rec = ast.literal_eval(line)
+                except (ValueError, SyntaxError):
+                    continue
+            yield rec
+
+
+# ---- Advisory locks -------------------------------------------------------------------------
+# Cross-process locks for read-modify-write sequences. Lock files live under artifacts/cache/locks
+# (named by a hash of the target path) so data directories stay free of lock litter. Locks are
+# re-entrant within a thread.
+
+_HELD = threading.local()
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_file(fd: int, blocking: bool) -> bool:
+    try:
+        if os.name == "nt":
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except OSError:
+        if blocking and os.name != "nt":
+            raise
+        return False
+
+
+def _unlock_file(fd: int) -> None:
+    if os.name == "nt":
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float | None = None) -> Iterator[None]:
+    """Exclusive advisory lock on path shared by threads and processes. timeout=None waits forever;
+    otherwise TimeoutError is raised when the lock is not obtained in time."""
+    key = os.path.abspath(path)
+    held: Dict[str, int] = getattr(_HELD, "locks", None) or {}
+    _HELD.locks = held
+    if key in held:
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+    with _THREAD_LOCKS_GUARD:
+        tlock = _THREAD_LOCKS.setdefault(key, threading.Lock())
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if not tlock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+        raise TimeoutError(f"timed out waiting for lock on {path}")
+    fd = -1
+    try:
+        LOCKS_DIR.mkdir(parents=True, exist_ok=True)
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock"
+        fd = os.open(str(LOCKS_DIR / name), os.O_RDWR | os.O_CREAT, 0o644)
+        while not _lock_file(fd, blocking=deadline is None and os.name != "nt"):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"timed out waiting for lock on {path}")
+            time.sleep(0.005)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            del held[key]
+            _unlock_file(fd)
+    finally:
+        if fd >= 0:
+            os.close(fd)
+        tlock.release()
+
+
+def update_json(path: Path, update: Callable[[Any], Any], default: Any = None) -> Any:
+    """Locked read-modify-write of a JSON file. update(data) returns the new data (or None after
+    mutating data in place). A missing or unreadable file starts from a copy of default."""
+    with file_lock(path):
+        try:
+            data = load_json(path)
+        except (OSError, ValueError, zlib.error):
+            data = json.loads(json.dumps(default))
+        new = update(data)
+        if new is None:
+            new = data
+        write_json(path, new)
+        return new
 
 
 def compute_sha256(path: Path, chunk_size: int = 65536) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            h.update(chunk)
-    return h.hexdigest()
+    """SHA-256 of a file; served from the persistent hash cache while the file is unchanged."""
+    from .hash_cache import cached_sha256
+    return cached_sha256(path, chunk_size)
 
 
 def now_iso() -> str:
     return datetime.now().astimezone().isoformat()
+
+
+if __name__ == "__main__":
+    # python -m app.backend.core.utils.io show <file>: pretty-print an artifact whatever its codec
+    if len(sys.argv) == 3 and sys.argv[1] == "show":
+        print(json.dumps(load_json(Path(sys.argv[2])), ensure_ascii=False, indent=2))
+    else:
+        print("usage: python -m app.backend.core.utils.io show <file>", file=sys.stderr)
+        sys.exit(2)
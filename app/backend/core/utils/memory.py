@@ -0,0 +1,177 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import os
+import sys
+import threading
+from ..metrics import runtime_stats
+
+# Registry of in-process caches. Every cache registers a size function (approximate bytes, entries),
+# a byte budget and, where it can shed entries, an evict callback. Caches that hold one big object
+# (the WordNet index, the LM) ask admit() before keeping it and, when it does not fit, serve the
+# call without caching it (slower, but RSS stays bounded); caches that grow entry by entry (glosses)
+# evict their oldest entries to stay within budget. Budgets default per cache and can be overridden
+# with RIAI_CACHE_BUDGETS="wordnet_index=256,wordnet_glosses=8" (MiB).
+MIB = 1024 * 1024
+
+SizeFn = Callable[[], Tuple[int, int]]
+
+
+class _Cache:
+    __slots__ = ("name", "size_fn", "budget", "evict", "description")
+
+    def __init__(self, name: str, size_fn: SizeFn, budget: int, evict: Callable[[], None] | None, description: str):
+        self.name = name
+        self.size_fn = size_fn
+        self.budget = budget
+        self.evict = evict
+        self.description = description
+
+
+_CACHES: Dict[str, _Cache] = {}
+_LOCK = threading.Lock()
+
+
+def _env_budgets() -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for part in os.environ.get("RIAI_CACHE_BUDGETS", "").split(","):
+        name, _, mb = part.partition("=")
+        try:
+            out[name.strip()] = int(float(mb) * MIB)
+        except ValueError:
+            continue
+    return out
+
+
+def register(name: str, size_fn: SizeFn, budget_bytes: int, evict: Callable[[], None] | None = None,
+             description: str = "") -> None:
+    """Declare a cache. size_fn() -> (approx bytes, entries) must be cheap: it runs on every
+    /api/debug/memory call and metrics scrape."""
+    budget = _env_budgets().get(name, int(budget_bytes))
+    with _LOCK:
+        _CACHES[name] = _Cache(name, size_fn, budget, evict, description)
+
+
+def budget(name: str) -> int:
+    c = _CACHES.get(name)
+    return c.budget if c is not None else sys.maxsize
+
+
+def set_budget(name: str, budget_bytes: int) -> None:
+    """Change a budget at runtime; a cache now over it is evicted right away."""
+    c = _CACHES[name]
+    c.budget = int(budget_bytes)
+    if c.evict is not None and _size(c)[0] > c.budget:
+        c.evict()
+        runtime_stats.inc("riai_cache_evictions_total", cache=name)
+
+
+def admit(name: str, nbytes: int) -> bool:
+    """May a cache keep an object of nbytes? Counts a refusal when it may not."""
+    if nbytes <= budget(name):
+        return True
+    runtime_stats.inc("riai_cache_refusals_total", cache=name)
+    return False
+
+
+def evicted(name: str, n: int = 1) -> None:
+    runtime_stats.inc("riai_cache_evictions_total", n, cache=name)
+
+
+def approx_size(obj: Any, sample: int = 200, _depth: int = 0) -> int:
+    """Approximate deep size of JSON-like data (dict/list/tuple/set of str/int/float). Containers
+    longer than `sample` are measured on an evenly spaced sample and extrapolated, so sizing a
+    150k-record index takes milliseconds."""
+    n = sys.getsizeof(obj)
+    if _depth > 8 or isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return n
+    if isinstance(obj, dict):
+        pairs: List[Any] = list(obj.items())
+        picked = pairs if len(pairs) <= sample else pairs[:: len(pairs) // sample][:sample]
+        part = sum(approx_size(k, sample, _depth + 1) + approx_size(v, sample, _depth + 1) for k, v in picked)
+        return n + (part * len(pairs) // max(1, len(picked)))
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        seq = obj if isinstance(obj, (list, tuple)) else list(obj)
+        picked = seq if len(seq) <= sample else seq[:: len(seq) // sample][:sample]
+        part = sum(approx_size(x, sample, _depth + 1) for x in picked)
+        return n + (part * len(seq) // max(1, len(picked)))
+    slots = getattr(type(obj), "__slots__", None)
+    if slots:
+        return n + sum(approx_size(getattr(obj, s, None), sample, _depth + 1) for s in slots)
+    return n
+
+
+def _size(c: _Cache) -> Tuple[int, int]:
+    try:
+        b, e = c.size_fn()
+        return int(b), int(e)
+    except Exception:
+        return 0, 0
+
+
+def _proc_status() -> Dict[str, int]:
+    """VmRSS/VmHWM from /proc (Linux); peak RSS from getrusage elsewhere (no current RSS)."""
+    out: Dict[str, int] = {}
+    try:
+        with open("/proc/self/status", "r", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, val = line.split(":", 1)
+                    out["rss_bytes" if key == "VmRSS" else "peak_rss_bytes"] = int(val.split()[0]) * 1024
+    except OSError:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            out["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+        except (ImportError, OSError):
+            pass
+    return out
+
+
+def snapshot() -> Dict[str, Any]:
+    """Process RSS plus every registered cache's size, entries and budget."""
+    with _LOCK:
+        caches = list(_CACHES.values())
+    rows = []
+    for c in caches:
+        b, e = _size(c)
+        rows.append({
+            "name": c.name,
+            "bytes": b,
+            "entries": e,
+            "budget_bytes": c.budget,
+            "over_budget": b > c.budget,
+            "evictions": int(runtime_stats.counter_value("riai_cache_evictions_total", cache=c.name)),
+            "refusals": int(runtime_stats.counter_value("riai_cache_refusals_total", cache=c.name)),
+            "description": c.description,
+        })
+    rows.sort(key=lambda r: r["bytes"], reverse=True)
+    proc = _proc_status()
+    return {
+        "rss_bytes": proc.get("rss_bytes"),
+        "peak_rss_bytes": proc.get("peak_rss_bytes"),
+        "cache_bytes": sum(r["bytes"] for r in rows),
+        "caches": rows,
+    }
+
+
+def _gauge(field: int) -> Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]:
+    def fn() -> Dict[Tuple[Tuple[str, str], ...], float]:
+        with _LOCK:
+            caches = list(_CACHES.values())
+        return {(("cache", c.name),): float(_size(c)[field]) for c in caches}
+    return fn
+
+
+def _rss() -> float | None:
+    v = _proc_status().get("rss_bytes")
+    return float(v) if v is not None else None
+
+
+runtime_stats.describe("riai_cache_bytes", "gauge", "Approximate size of each runtime cache.")
+runtime_stats.describe("riai_cache_entries", "gauge", "Entries held by each runtime cache.")
+runtime_stats.describe("riai_cache_evictions_total", "counter", "Entries (or whole caches) dropped to stay within budget.")
+runtime_stats.describe("riai_cache_refusals_total", "counter", "Loads not cached because they exceeded the cache budget.")
+runtime_stats.describe("riai_process_rss_bytes", "gauge", "Resident set size of this worker process.")
+runtime_stats.gauge_callback("riai_cache_bytes", _gauge(0))
+runtime_stats.gauge_callback("riai_cache_entries", _gauge(1))
+runtime_stats.gauge_callback("riai_process_rss_bytes", _rss)
@@ -2,16 +2,18 @@ from __future__ import annotations
 import os
 import random
 
-def set_global_seed(seed: int | None) -> int:
-    """Set global seeds for determinism and return the used seed.
-    If seed is None, derive from RIAI_SEED env or default 1337.
-    """
+
+def resolve_seed(seed: int | None) -> int:
+    """Return seed, or derive it from RIAI_SEED env (default 1337) when None."""
     if seed is None:
         seed = int(os.environ.get("RIAI_SEED", "1337"))
-    random.seed(seed)
-    try:
-        import numpy as np  # optional
-        np.random.seed(seed)
-    except Exception:
-        pass
-    return seed
+    return int(seed)
+
+
+def make_rng(seed: int | None) -> random.Random:
+    """Return a private PRNG for one request/job.
+    Draws match the legacy random.seed(seed) stream, but no process-wide state is touched,
+    so concurrent requests and parallel jobs stay reproducible.
+    """
+    return random.Random(resolve_seed(seed))
+
@@ -1,11 +1,15 @@
-from fastapi import FastAPI, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Body, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import json
 from datetime import datetime
 import uuid
+from app.backend.core.metrics import runtime_stats as _runtime_stats
+from app.backend.core.metrics.profiling import profiled as _profiled
+from app.backend.core.metrics.tracing import span as _span, trace as _trace
+from app.backend.core.utils.io import write_json as _io_write_json, load_json as _io_load_json, file_lock as _file_lock, atomic_open as _atomic_open
 
 app = FastAPI(title="Modular Offline AI App", version="0.1.0-alpha1")
 
@@ -22,6 +26,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency/error/in-flight counters, served on /api/metrics/runtime
+app.add_middleware(_runtime_stats.RuntimeMetricsMiddleware)
 
 ROOT = Path(__file__).resolve().parents[2]
 MODULES_DIR = ROOT / "app" / "modules"
@@ -97,6 +103,10 @@ def _ensure_bootstrap_assets():
 # Invoke bootstrap at import time
 _ensure_bootstrap_assets()
 
+# Start the job worker pool; it also picks up jobs left queued by a previous run
+from app.backend.core.runtime.scheduler import start_workers as _start_job_workers
+_start_job_workers()
+
 PENDING_WS_PATH = REGISTRY_WS_DIR / "pending.json"
 GUARDRAILS_CONFIG = GUARDRAILS_DIR / "config.json"
 
@@ -109,26 +119,18 @@ if FRONTEND_DIST.exists():
 
 
 def load_json(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    # sniffs the codec (pretty/compact JSON or packed), see core/utils/io.py
+    return _io_load_json(path)
 
 
 def write_json(path: Path, data: dict):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # atomic temp-file + rename with group-committed fsync (shared with the core modules)
+    _io_write_json(path, data)
 
 
 def compute_sha256(path: Path, chunk_size: int = 65536) -> str:
-    import hashlib
-    h = hashlib.sha256()
-    with path.open("rb") as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            h.update(chunk)
-    return h.hexdigest()
+    from app.backend.core.utils.hash_cache import cached_sha256
+    return cached_sha256(path, chunk_size)
 
 
 # Preload schema and required fields to avoid external jsonschema dependency
@@ -150,14 +152,22 @@ def health():
     return {"status": "ok", "offline": True}
 
 
+# (catalog generation, /api/modules response) so the projection is built once per manifest change
+_MODULES_RESP: tuple | None = None
+
+
 @app.get("/api/modules")
-def list_modules():
+def list_modules(refresh: bool = False):
     # Use centralized discovery to avoid drift with schema/validation rules
+    global _MODULES_RESP
     try:
-        from app.backend.core.runtime.loader import discover_modules
-        discovered = discover_modules()
+        from app.backend.core.runtime.loader import get_catalog
+        catalog = get_catalog(refresh=refresh)
+        cached = _MODULES_RESP
+        if cached is not None and cached[0] == catalog.generation:
+            return {"modules": list(cached[1])}
         modules = []
-        for m in discovered:
+        for m in catalog.modules:
             if isinstance(m, dict) and m.get("error"):
                 modules.append({"id": m.get("id"), "error": m.get("error")})
             else:
@@ -174,7 +184,8 @@ def list_modules():
                     "resources": m.get("resources", {}),
                     "permissions": m.get("permissions", {}),
                 })
-        return {"modules": modules}
+        _MODULES_RESP = (catalog.generation, modules)
+        return {"modules": list(modules)}
     except Exception:
         # Fallback to previous simple scan if loader import fails
         modules = []
@@ -202,49 +213,204 @@ def list_modules():
         return {"modules": modules}
 
 
-@app.get("/api/readiness")
-def readiness():
-    def make_err(code: str, human: str, hint: str, log_name: str, extra: dict | None = None):
-        item = {
-            "error_code": code,
-            "human_message": human,
-            "hint": hint,
-            "where_to_find_logs": str(ARTIFACTS_LOGS / log_name)
-        }
-        if extra:
-            item.update(extra)
-        return item
-
-    modules_resp = list_modules()
-    errors = []
+def _readiness_err(code: str, human: str, hint: str, log_name: str, extra: dict | None = None):
+    item = {
+        "error_code": code,
+        "human_message": human,
+        "hint": hint,
+        "where_to_find_logs": str(ARTIFACTS_LOGS / log_name)
+    }
+    if extra:
+        item.update(extra)
+    return item
+
+
+# Readiness is a set of check units. Each takes a Deps recorder and registers the files it reads
+# (before reading them) so the in-memory verdict is recomputed only for the units a change affects.
+
+def _tracked_modules(deps):
+    deps.dir(MODULES_DIR)
+    try:
+        for child in MODULES_DIR.iterdir():
+            if child.is_dir():
+                deps.file(child / "manifest.json")
+    except OSError:
+        pass
+    # refresh: the catalog must be at least as new as the fingerprints just taken
+    return list_modules(refresh=True)
 
-    # Manifests validation results
-    for m in modules_resp["modules"]:
+
+def _tracked_selected(deps):
+    path = deps.file(PENDING_WS_PATH)
+    try:
+        ws = load_json(path) if path.exists() else {"selected_modules": []}
+    except Exception:
+        ws = {"selected_modules": []}
+    return ws.get("selected_modules", [])
+
+
+def _check_manifests(deps):
+    errors = []
+    for m in _tracked_modules(deps)["modules"]:
         if isinstance(m, dict) and m.get("error"):
-            errors.append(make_err(
+            errors.append(_readiness_err(
                 "manifest_invalid",
                 f"Module manifest {m.get('id')} is invalid.",
                 "Validate fields against docs/specs/module_manifest_schema.json.",
                 "modules.txt",
                 {"details": m.get("error"), "module_id": m.get("id")}
             ))
+    return {"errors": errors}
+
 
+def _check_workspace(deps):
     # Load pending workspace (selected modules)
+    errors = []
+    path = deps.file(PENDING_WS_PATH)
     try:
-        ws = load_json(PENDING_WS_PATH) if PENDING_WS_PATH.exists() else {"selected_modules": []}
+        ws = load_json(path) if path.exists() else {"selected_modules": []}
     except Exception as e:
-        errors.append(make_err(
+        errors.append(_readiness_err(
             "workspace_read_failed",
             f"Failed to read pending workspace: {e}",
             "Re-save your selection on Site 1.",
             "workspace.txt"
         ))
         ws = {"selected_modules": []}
+    return {"errors": errors, "workspace": ws}
+
+
+def _check_model_mapped(deps, errors, mid, model_id, mod_map_full):
+    """Registry, dataset, metrics and runnable-weights checks for one module_map entry."""
+    make_err = _readiness_err
+    model_path = deps.file(REGISTRY_MODELS_DIR / f"{model_id}.json")
+    if not model_path.exists():
+        errors.append(make_err(
+            "registry_missing",
+            f"Missing registry entry {str(model_path)}.",
+            "Create model or import registry entry.",
+            "registry.txt",
+            {"model_id": model_id}
+        ))
+        return
+    try:
+        model_entry = load_json(model_path)
+        # Verify NN entry if referenced
+        nn_id = model_entry.get("nn_id")
+        if nn_id:
+            nn_path = deps.file(REGISTRY_NN_DIR / f"{nn_id}.json")
+            if not nn_path.exists():
+                errors.append(make_err(
+                    "registry_missing",
+                    f"Missing registry entry {str(nn_path)}.",
+                    "Create NN or import registry entry.",
+                    "registry.txt",
+                    {"nn_id": nn_id}
+                ))
+        # Verify datasets if referenced
+        for ds_id in model_entry.get("dataset_ids", []):
+            ds_path = deps.file(REGISTRY_DATASETS_DIR / f"{ds_id}.json")
+            if not ds_path.exists():
+                errors.append(make_err(
+                    "registry_missing",
+                    f"Missing registry entry {str(ds_path)}.",
+                    "Register dataset or import registry entry.",
+                    "registry.txt",
+                    {"dataset_id": ds_id}
+                ))
+                continue
+            try:
+                ds_entry = load_json(ds_path)
+                for fdesc in ds_entry.get("files", []):
+                    fpath = Path(fdesc.get("path"))
+                    if not fpath.is_absolute():
+                        fpath = ROOT / fpath
+                    deps.file(fpath)
+                    if not fpath.exists():
+                        errors.append(make_err(
+                            "dataset_missing",
+                            f"Dataset file missing: {str(fpath)}",
+                            "Re-import dataset or regenerate.",
+                            "datasets.txt",
+                            {"dataset_id": ds_id}
+                        ))
+                    else:
+                        sha = fdesc.get("sha256")
+                        if sha:
+                            calc = compute_sha256(fpath)
+                            if sha.lower() != calc.lower():
+                                errors.append(make_err(
+                                    "dataset_checksum_mismatch",
+                                    f"Dataset checksum mismatch: {str(fpath)}",
+                                    "Regenerate with the same seed or update registry.",
+                                    "datasets.txt",
+                                    {"dataset_id": ds_id, "expected": sha, "actual": calc}
+                                ))
+            except Exception:
+                pass
+        # Verify metrics artifact presence per capability
+        cap = model_entry.get("capability") or (mod_map_full.get(mid) or {}).get("capabilities", [None])[0]
+        if cap:
+            metrics_path = deps.file(ARTIFACTS_METRICS / cap / f"{model_id}.json")
+            if not metrics_path.exists():
+                errors.append(make_err(
+                    "artifact_missing",
+                    f"Missing artifact: {str(metrics_path)}",
+                    "Run evaluation to produce metrics.",
+                    "artifacts.txt",
+                    {"model_id": model_id}
+                ))
+            # Enforce runnable chat model when not in retrieval mode
+            if cap == "chat":
+                mode = str(model_entry.get("mode", "")) if isinstance(model_entry.get("mode"), (str,)) else ""
+                if not mode.startswith("retrieval"):
+                    weights_path = model_entry.get("weights_path")
+                    tokenizer_path = model_entry.get("tokenizer_path")
+                    adapter = model_entry.get("inference_adapter")
+                    missing = []
+                    def _resolve(p):
+                        if not p:
+                            return None
+                        q = Path(p)
+                        if not q.is_absolute():
+                            q = ROOT / q
+                        return deps.file(q)
+                    w_path = _resolve(weights_path)
+                    t_path = _resolve(tokenizer_path)
+                    if not weights_path:
+                        missing.append("weights_path")
+                    if not tokenizer_path:
+                        missing.append("tokenizer_path")
+                    if not adapter:
+                        missing.append("inference_adapter")
+                    fs_missing = []
+                    if w_path and (not w_path.exists() or (w_path.exists() and w_path.is_file() and w_path.stat().st_size <= 0)):
+                        fs_missing.append(str(w_path))
+                    if t_path and (not t_path.exists() or (t_path.exists() and t_path.is_file() and t_path.stat().st_size <= 0)):
+                        fs_missing.append(str(t_path))
+                    if missing or fs_missing:
+                        details = {}
+                        if missing:
+                            details["missing_fields"] = missing
+                        if fs_missing:
+                            details["missing_files"] = fs_missing
+                        errors.append(make_err(
+                            "model_not_runnable",
+                            "Model not runnable (no weights).",
+                            "Train or attach local weights/tokenizer and set an inference_adapter, or switch the model to retrieval mode.",
+                            "runtime.txt",
+                            {"model_id": model_id, **details}
+                        ))
+    except Exception:
+        pass
 
-    selected = ws.get("selected_modules", [])
 
+def _check_mappings(deps):
     # Mapping completeness and registry verification (mappings.json expected from Site 2)
-    mappings_path = REGISTRY_WS_DIR / "mappings.json"
+    make_err = _readiness_err
+    errors = []
+    selected = _tracked_selected(deps)
+    mappings_path = deps.file(REGISTRY_WS_DIR / "mappings.json")
     mappings = None
     if selected and not mappings_path.exists():
         errors.append(make_err(
@@ -266,7 +432,7 @@ def readiness():
             ))
         if isinstance(mappings, dict):
             # Build module map for capability cross-checks
-            mod_resp = list_modules()
+            mod_resp = _tracked_modules(deps)
             mod_map_full = {m.get("id"): m for m in mod_resp.get("modules", []) if isinstance(m, dict) and m.get("id")}
             module_map = mappings.get("module_map") if isinstance(mappings.get("module_map"), dict) else None
             cap_map = mappings.get("capability_map") if isinstance(mappings.get("capability_map"), dict) else None
@@ -282,125 +448,7 @@ def readiness():
                             {"module_id": mid}
                         ))
                         continue
-                    model_path = REGISTRY_MODELS_DIR / f"{model_id}.json"
-                    if not model_path.exists():
-                        errors.append(make_err(
-                            "registry_missing",
-                            f"Missing registry entry {str(model_path)}.",
-                            "Create model or import registry entry.",
-                            "registry.txt",
-                            {"model_id": model_id}
-                        ))
-                    else:
-                        try:
-                            model_entry = load_json(model_path)
-                            # Verify NN entry if referenced
-                            nn_id = model_entry.get("nn_id")
-                            if nn_id:
-                                nn_path = REGISTRY_NN_DIR / f"{nn_id}.json"
-                                if not nn_path.exists():
-                                    errors.append(make_err(
-                                        "registry_missing",
-                                        f"Missing registry entry {str(nn_path)}.",
-                                        "Create NN or import registry entry.",
-                                        "registry.txt",
-                                        {"nn_id": nn_id}
-                                    ))
-                            # Verify datasets if referenced
-                            for ds_id in model_entry.get("dataset_ids", []):
-                                ds_path = REGISTRY_DATASETS_DIR / f"{ds_id}.json"
-                                if not ds_path.exists():
-                                    errors.append(make_err(
-                                        "registry_missing",
-                                        f"Missing registry entry {str(ds_path)}.",
-                                        "Register dataset or import registry entry.",
-                                        "registry.txt",
-                                        {"dataset_id": ds_id}
-                                    ))
-                                else:
-                                    try:
-                                        ds_entry = load_json(ds_path)
-                                        for fdesc in ds_entry.get("files", []):
-                                            fpath = Path(fdesc.get("path"))
-                                            if not fpath.is_absolute():
-                                                fpath = ROOT / fpath
-                                            if not fpath.exists():
-                                                errors.append(make_err(
-                                                    "dataset_missing",
-                                                    f"Dataset file missing: {str(fpath)}",
-                                                    "Re-import dataset or regenerate.",
-                                                    "datasets.txt",
-                                                    {"dataset_id": ds_id}
-                                                ))
-                                            else:
-                                                sha = fdesc.get("sha256")
-                                                if sha:
-                                                    calc = compute_sha256(fpath)
-                                                    if sha.lower() != calc.lower():
-                                                        errors.append(make_err(
-                                                            "dataset_checksum_mismatch",
-                                                            f"Dataset checksum mismatch: {str(fpath)}",
-                                                            "Regenerate with the same seed or update registry.",
-                                                            "datasets.txt",
-                                                            {"dataset_id": ds_id, "expected": sha, "actual": calc}
-                                                        ))
-                                    except Exception:
-                                        pass
-                            # Verify metrics artifact presence per capability
-                            cap = model_entry.get("capability") or (mod_map_full.get(mid) or {}).get("capabilities", [None])[0]
-                            if cap:
-                                metrics_path = ARTIFACTS_METRICS / cap / f"{model_id}.json"
-                                if not metrics_path.exists():
-                                    errors.append(make_err(
-                                        "artifact_missing",
-                                        f"Missing artifact: {str(metrics_path)}",
-                                        "Run evaluation to produce metrics.",
-                                        "artifacts.txt",
-                                        {"model_id": model_id}
-                                    ))
-                                # Enforce runnable chat model when not in retrieval mode
-                                if cap == "chat":
-                                    mode = str(model_entry.get("mode", "")) if isinstance(model_entry.get("mode"), (str,)) else ""
-                                    if not mode.startswith("retrieval"):
-                                        weights_path = model_entry.get("weights_path")
-                                        tokenizer_path = model_entry.get("tokenizer_path")
-                                        adapter = model_entry.get("inference_adapter")
-                                        missing = []
-                                        def _resolve(p):
-                                            if not p:
-                                                return None
-                                            q = Path(p)
-                                            if not q.is_absolute():
-                                                q = ROOT / q
-                                            return q
-                                        w_path = _resolve(weights_path)
-                                        t_path = _resolve(tokenizer_path)
-                                        if not weights_path:
-                                            missing.append("weights_path")
-                                        if not tokenizer_path:
-                                            missing.append("tokenizer_path")
-                                        if not adapter:
-                                            missing.append("inference_adapter")
-                                        fs_missing = []
-                                        if w_path and (not w_path.exists() or (w_path.exists() and w_path.is_file() and w_path.stat().st_size <= 0)):
-                                            fs_missing.append(str(w_path))
-                                        if t_path and (not t_path.exists() or (t_path.exists() and t_path.is_file() and t_path.stat().st_size <= 0)):
-                                            fs_missing.append(str(t_path))
-                                        if missing or fs_missing:
-                                            details = {}
-                                            if missing:
-                                                details["missing_fields"] = missing
-                                            if fs_missing:
-                                                details["missing_files"] = fs_missing
-                                            errors.append(make_err(
-                                                "model_not_runnable",
-                                                "Model not runnable (no weights).",
-                                                "Train or attach local weights/tokenizer and set an inference_adapter, or switch the model to retrieval mode.",
-                                                "runtime.txt",
-                                                {"model_id": model_id, **details}
-                                            ))
-                        except Exception:
-                            pass
+                    _check_model_mapped(deps, errors, mid, model_id, mod_map_full)
             elif cap_map:
                 for mid in selected:
                     m = mod_map_full.get(mid) or {}
@@ -409,7 +457,7 @@ def readiness():
                         model_id = cap_map.get(cap)
                         if model_id:
                             found = True
-                            model_path = REGISTRY_MODELS_DIR / f"{model_id}.json"
+                            model_path = deps.file(REGISTRY_MODELS_DIR / f"{model_id}.json")
                             if not model_path.exists():
                                 errors.append(make_err(
                                     "registry_missing",
@@ -420,7 +468,7 @@ def readiness():
                                 ))
                             else:
                                 cap_dir = ARTIFACTS_METRICS / cap
-                                metrics_path = cap_dir / f"{model_id}.json"
+                                metrics_path = deps.file(cap_dir / f"{model_id}.json")
                                 if not metrics_path.exists():
                                     errors.append(make_err(
                                         "artifact_missing",
@@ -437,108 +485,179 @@ def readiness():
                             "workspace.txt",
                             {"module_id": mid}
                         ))
+    return {"errors": errors}
+
 
+def _check_wordnet_root(deps):
     # WordNet root check
-    wn_root = ROOT / "WordNet-3.0"
+    errors = []
+    wn_root = deps.file(ROOT / "WordNet-3.0")
     if not wn_root.exists():
-        errors.append(make_err(
+        errors.append(_readiness_err(
             "wordnet_root_missing",
             f"WordNet-3.0 folder not found at {str(wn_root)}",
             "Place the WordNet-3.0 folder at the repository root.",
             "wordnet.txt"
         ))
+    return {"errors": errors}
+
 
+def _check_chat_assets(deps):
     # If any selected module has chat capability, require WordNet index artifact and synthetic dialogs
+    errors = []
     try:
-        mod_map = {m.get("id"): m for m in modules_resp["modules"] if isinstance(m, dict) and m.get("id")}
+        selected = _tracked_selected(deps)
+        mod_map = {m.get("id"): m for m in _tracked_modules(deps)["modules"] if isinstance(m, dict) and m.get("id")}
         selected_mods = [mod_map[mid] for mid in selected if mid in mod_map]
         chat_selected = any("chat" in (m.get("capabilities") or []) for m in selected_mods)
         if chat_selected:
-            index_path = ARTIFACTS_INDICES / "wordnet-lexicon.jsonl"
+            index_path = deps.file(ARTIFACTS_INDICES / "wordnet-lexicon.jsonl")
             if not index_path.exists():
-                errors.append(make_err(
+                errors.append(_readiness_err(
                     "wordnet_index_missing",
                     f"WordNet index not found at {str(index_path)}",
                     "Run modules/lexicon-wordnet3/pipelines/build_index.py to build the retrieval index.",
                     "wordnet.txt"
                 ))
-            synths = list(ARTIFACTS_DATASETS.glob("wordnet_synth_*.jsonl"))
+            synths = list(deps.dir(ARTIFACTS_DATASETS).glob("wordnet_synth_*.jsonl"))
             if not synths:
-                errors.append(make_err(
+                errors.append(_readiness_err(
                     "wordnet_synth_missing",
                     f"Synthetic dialog dataset not found under {str(ARTIFACTS_DATASETS)}",
                     "Run modules/lexicon-wordnet3/pipelines/synth_dialogs.py --seed 1337 to generate.",
                     "wordnet.txt"
                 ))
     except Exception as e:
-        errors.append(make_err(
+        errors.append(_readiness_err(
             "readiness_internal",
             f"Error checking chat readiness: {e}",
             "See logs.",
             "wordnet.txt"
         ))
+    return {"errors": errors}
 
+
+def _check_predictor_dataset(deps):
     # Predictor dataset check (sample presence)
-    predictor_manifest = MODULES_DIR / "predictor-finance" / "manifest.json"
+    errors = []
+    predictor_manifest = deps.file(MODULES_DIR / "predictor-finance" / "manifest.json")
     if predictor_manifest.exists():
-        sample_csv = MODULES_DIR / "predictor-finance" / "data" / "samples" / "ohlcv.csv"
+        sample_csv = deps.file(MODULES_DIR / "predictor-finance" / "data" / "samples" / "ohlcv.csv")
         if not sample_csv.exists():
-            errors.append(make_err(
+            errors.append(_readiness_err(
                 "predictor_dataset_missing",
                 f"Predictor sample dataset not found at {str(sample_csv)}",
                 "Place ohlcv.csv under modules/predictor-finance/data/samples or generate synthetic data.",
                 "datasets.txt"
             ))
+    return {"errors": errors}
 
+
+def _check_guardrails(deps):
     # Guardrails validation
+    errors = []
+    deps.file(GUARDRAILS_CONFIG)
+    cfg = None
     try:
-        cfg = load_json(GUARDRAILS_CONFIG) if GUARDRAILS_CONFIG.exists() else default_guardrails()
+        cfg, _ = _active_guardrails()
         if not isinstance(cfg.get("max_tokens", 0), int) or cfg.get("max_tokens", 0) < 1:
-            errors.append(make_err(
+            errors.append(_readiness_err(
                 "guardrails_invalid",
                 "Guardrails max_tokens must be an integer >= 1.",
                 "Open the Guardrails panel and set a valid max_tokens.",
                 "guardrails.txt"
             ))
         if "allowed_file_types" in cfg and isinstance(cfg["allowed_file_types"], list) and len(cfg["allowed_file_types"]) == 0:
-            errors.append(make_err(
+            errors.append(_readiness_err(
                 "guardrails_invalid",
                 "Guardrails allowed_file_types cannot be empty when files are enabled.",
                 "Add at least one file extension or disable file access in modules.",
                 "guardrails.txt"
             ))
     except Exception as e:
-        errors.append(make_err(
+        errors.append(_readiness_err(
             "guardrails_read_failed",
             f"Failed to read guardrails: {e}",
             "Reset guardrails via POST /api/guardrails.",
             "guardrails.txt"
         ))
+    return {"errors": errors, "guardrails": dict(cfg) if isinstance(cfg, dict) else {}}
+
 
-    # Filesystem writability checks for metrics and traces
+def _check_filesystem(deps):
+    # Filesystem writability checks for metrics and traces (re-probed when permissions change)
+    errors = []
     for target_dir, log_name in [(ARTIFACTS_METRICS, "fs.txt"), (ARTIFACTS_TRACES, "fs.txt")]:
+        deps.meta(target_dir)
         try:
             probe = target_dir / f".__writetest_{uuid.uuid4().hex}.tmp"
             with probe.open("w", encoding="utf-8") as f:
                 f.write("ok")
             probe.unlink(missing_ok=True)
         except Exception as e:
-            errors.append(make_err(
+            errors.append(_readiness_err(
                 "filesystem_readonly",
                 f"Artifacts directory not writable: {str(target_dir)} ({e})",
                 "Fix permissions or path.",
                 log_name
             ))
-
-    status = "ready" if not errors else "blocked"
+    return {"errors": errors}
+
+
+def _readiness_check_failed(name, exc):
+    if isinstance(exc, TimeoutError):
+        return {"errors": [_readiness_err(
+            "readiness_timeout",
+            f"Readiness check {name} did not finish: {exc}",
+            "Retry shortly; the check keeps running and its result replaces this error when done.",
+            "readiness.txt",
+            {"check": name}
+        )]}
+    return {"errors": [_readiness_err(
+        "readiness_internal",
+        f"Readiness check {name} failed: {exc}",
+        "See logs.",
+        "readiness.txt"
+    )]}
+
+
+def _assemble_readiness(results):
+    errors = [e for res in results.values() for e in res.get("errors", [])]
     return {
-        "status": status,
+        "status": "ready" if not errors else "blocked",
         "errors": errors,
-        "workspace": ws,
-        "guardrails": (load_json(GUARDRAILS_CONFIG) if GUARDRAILS_CONFIG.exists() else default_guardrails())
+        "workspace": results["workspace"].get("workspace", {"selected_modules": []}),
+        "guardrails": results["guardrails"].get("guardrails", {})
     }
 
 
+from app.backend.core.runtime.readiness import ReadinessState
+
+_READINESS = ReadinessState(
+    [
+        ("manifests", _check_manifests),
+        ("workspace", _check_workspace),
+        # dataset checksums of freshly changed multi-GB files can take a while on first hash
+        ("mappings", _check_mappings, 300.0),
+        ("wordnet_root", _check_wordnet_root),
+        ("chat_assets", _check_chat_assets),
+        ("predictor_dataset", _check_predictor_dataset),
+        ("guardrails", _check_guardrails),
+        ("filesystem", _check_filesystem),
+    ],
+    assemble=_assemble_readiness,
+    on_error=_readiness_check_failed,
+)
+
+
+@app.get("/api/readiness")
+def readiness(refresh: bool = False):
+    """Cached readiness verdict; checks re-run (concurrently, each with its own timeout) only when a
+    file they read changes. refresh=true stats their inputs first instead of relying on the background
+    watcher. "checks" reports each unit's last duration_ms and status."""
+    return _READINESS.snapshot(refresh=refresh)
+
+
 @app.get("/api/workspace")
 def get_workspace():
     if PENDING_WS_PATH.exists():
@@ -575,79 +694,39 @@ def save_workspace(payload: dict = Body(...)):
 
 # -------- Registry Stubs --------
 
-@app.get("/api/registry/neural_nets")
-def list_neural_nets():
-    # Seed registry from neural_networks.yaml if present, then list all
-    def _parse_catalog() -> list[dict]:
-        cat_path = ROOT / "neural_networks.yaml"
-        if not cat_path.exists():
-            return []
-        ids_names: list[dict] = []
-        current: dict | None = None
-        try:
-            for raw in cat_path.read_text(encoding="utf-8", errors="ignore").splitlines():
-                line = raw.rstrip()
-                if not line.strip() or line.strip().startswith("#"):
-                    continue
-                if line.lstrip().startswith("- id:"):
-                    # Start a new block
-                    # Extract id token
-                    try:
-                        tid = line.split(":", 1)[1].strip()
-                    except Exception:
-                        tid = None
-                    tid = tid.strip('"') if isinstance(tid, str) else tid
-                    if current:
-                        ids_names.append(current)
-                    current = {"id": tid}
-                elif current is not None:
-                    # parse simple key: value lines at same indent
-                    parts = line.split(":", 1)
-                    if len(parts) == 2:
-                        k = parts[0].strip()
-                        v = parts[1].strip()
-                        v = v.strip('"')
-                        if k in ("name", "family") and v:
-                            current[k] = v
-            if current:
-                ids_names.append(current)
-        except Exception:
-            return []
-        # normalize
-        out = []
-        for e in ids_names:
-            if isinstance(e, dict) and e.get("id"):
-                out.append({
-                    "id": str(e.get("id")),
-                    "name": str(e.get("name", e.get("id"))),
-                    "family": e.get("family")
-                })
-        return out
+def _registry_listing(kind: str, key: str, filters: dict, sort: str, order: str, limit: int | None, cursor: str | None,
+                      total: bool | None = None):
+    """Filtered/sorted/cursor-paginated listing served from the SQLite registry index. total (a full
+    count of the matches) defaults to the first page only; later pages return "total": null."""
+    from app.backend.core.registry.index import query_registry
+    try:
+        page = query_registry(kind, filters=filters, sort=sort, order=order, limit=limit, cursor=cursor, with_total=total)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error_code": "invalid_query", "human_message": str(e)})
+    return {key: page["items"], "next_cursor": page["next_cursor"], "total": page["total"]}
 
-    # Seed missing entries into registry
+
+@app.get("/api/registry/neural_nets")
+def list_neural_nets(family: str | None = None, task: str | None = None, sort: str = "id", order: str = "asc",
+                     limit: int | None = None, cursor: str | None = None, total: bool | None = None):
+    # Catalog seeding is a recorded one-time migration; after the first call this is a cached no-op
+    from app.backend.core.registry.nn_catalog import seed_registry
     try:
-        catalog = _parse_catalog()
-        existing_ids = {p.stem for p in REGISTRY_NN_DIR.glob("*.json")}
-        for entry in catalog:
-            nn_id = entry.get("id")
-            if not nn_id or nn_id in existing_ids:
-                continue
-            write_json(REGISTRY_NN_DIR / f"{nn_id}.json", {
-                "id": nn_id,
-                "name": entry.get("name", nn_id),
-                "family": entry.get("family")
-            })
-            existing_ids.add(nn_id)
+        seed_registry()
     except Exception:
         pass
+    return _registry_listing("neural_nets", "neural_nets", {"family": family, "task": task}, sort, order, limit, cursor, total)
 
-    items = []
-    for path in REGISTRY_NN_DIR.glob("*.json"):
-        try:
-            items.append(load_json(path))
-        except Exception:
-            pass
-    return {"neural_nets": items}
+
+@app.get("/api/registry/neural_nets/resolve")
+def resolve_neural_net(name: str):
+    """Map an id, display name or alias from neural_networks.yaml (e.g. "ResNet-50") to its catalog id."""
+    from app.backend.core.registry.nn_catalog import get_nn_catalog
+    cat = get_nn_catalog()
+    nn_id = cat.resolve(name)
+    if nn_id is None:
+        return JSONResponse(status_code=404, content={"error_code": "nn_not_found", "human_message": f"No architecture matches '{name}'."})
+    return {"id": nn_id, "entry": cat.by_id[nn_id]}
 
 
 @app.post("/api/registry/neural_nets")
@@ -675,25 +754,27 @@ def create_neural_net(payload: dict = Body(...)):
 
 
 @app.get("/api/registry/models")
-def list_models():
-    items = []
-    for path in REGISTRY_MODELS_DIR.glob("*.json"):
-        try:
-            items.append(load_json(path))
-        except Exception:
-            pass
-    return {"models": items}
+def list_models(capability: str | None = None, task: str | None = None, nn_id: str | None = None,
+                dataset_id: str | None = None, sort: str = "id", order: str = "asc",
+                limit: int | None = None, cursor: str | None = None, total: bool | None = None):
+    filters = {"capability": capability, "task": task, "nn_id": nn_id, "dataset_id": dataset_id}
+    return _registry_listing("models", "models", filters, sort, order, limit, cursor, total)
 
 
 @app.post("/api/registry/models")
 def create_model(payload: dict = Body(...)):
     model_id = payload.get("id") or f"model_{uuid.uuid4().hex[:8]}"
+    nn_id = payload.get("nn_id")
+    if nn_id and not (REGISTRY_NN_DIR / f"{nn_id}.json").exists():
+        # accept catalog aliases ("VGG16" -> "vgg") for architectures not registered under that id
+        from app.backend.core.registry.nn_catalog import get_nn_catalog
+        nn_id = get_nn_catalog().resolve(str(nn_id)) or nn_id
     entry = {
         "id": model_id,
         "name": payload.get("name", model_id),
         "capability": payload.get("capability"),
         "task": payload.get("task"),
-        "nn_id": payload.get("nn_id"),
+        "nn_id": nn_id,
         "train_seed": payload.get("train_seed"),
         "dataset_id": payload.get("dataset_id"),
         "dataset_hash": payload.get("dataset_hash"),
@@ -711,7 +792,7 @@ def create_model(payload: dict = Body(...)):
 @app.post("/api/runtime/start")
 def runtime_start(payload: dict = Body(...)):
     # Enforce workspace gating: block if readiness is not ready
-    rd = readiness()
+    rd = readiness(refresh=True)
     if rd.get("status") != "ready":
         return JSONResponse(status_code=400, content={
             "error_code": "workspace_not_ready",
@@ -726,55 +807,88 @@ def runtime_stop(payload: dict = Body(...)):
     return {"ok": True, "message": "Runtime stop requested", "payload": payload}
 
 
+def _count_guardrail_actions(result, stage: str) -> None:
+    if isinstance(result, dict):
+        for a in result.get("actions") or []:
+            if isinstance(a, dict):
+                _runtime_stats.inc("riai_guardrail_actions_total", type=a.get("type", "unknown"), stage=stage)
+
+
+def _lm_fallback_ratio():
+    total = _runtime_stats.counter_value("riai_chat_answers_total")
+    return _runtime_stats.counter_value("riai_chat_answers_total", source="lm") / total if total else None
+
+
+_runtime_stats.describe("riai_chat_answers_total", "counter", "Runtime chat answers by source (wordnet or lm fallback).")
+_runtime_stats.describe("riai_lm_fallback_ratio", "gauge", "Share of runtime chat answers that fell back to the LM.")
+_runtime_stats.describe("riai_guardrail_actions_total", "counter", "Guardrail actions taken on runtime input/output by type.")
+_runtime_stats.gauge_callback("riai_lm_fallback_ratio", _lm_fallback_ratio)
+
+
 @app.post("/api/runtime/post")
 def runtime_post(payload: dict = Body(...)):
+    # Head-sampled trace of the request stages, written to artifacts/traces (see core/metrics/tracing.py)
+    with _trace("runtime_post") as tr, _profiled("runtime_post"):
+        out = _runtime_post(payload)
+        tr.set(lm_used=bool(((out.get("answer") or {}).get("meta") or {}).get("lm", {}).get("used")))
+        return out
+
+
+def _runtime_post(payload: dict):
     # Apply guardrails to text input; generate retrieval-based answer from WordNet index
-    cfg = load_json(GUARDRAILS_CONFIG) if GUARDRAILS_CONFIG.exists() else default_guardrails()
+    cfg, engine = _active_guardrails()
     text = payload.get("text") if isinstance(payload, dict) else None
     processed = None
     answer = None
     if isinstance(text, str):
-        try:
-            from app.backend.core.runtime.guardrails import apply_guardrails
-            processed = apply_guardrails(text, cfg)
-        except Exception as e:
-            processed = {"original": text, "result": text, "actions": [], "error": str(e)}
+        with _span("guardrails.input"):
+            try:
+                processed = engine.apply(text)
+            except Exception as e:
+                processed = {"original": text, "result": text, "actions": [], "error": str(e)}
+        _count_guardrail_actions(processed, "input")
         # Retrieval-based answer + learning counts
         try:
             from app.backend.core.runtime.chat import generate_answer
-            raw, meta = generate_answer(text)
+            with _span("generate_answer"):
+                raw, meta = generate_answer(text)
             # Anti-echo: if output equals input after normalization, prepend a minimal explanation
             def _norm(s: str) -> str:
                 import re as _re
                 return _re.sub(r"\W+", "", (s or "").lower()).strip()
-            if _norm(raw) == _norm(text):
-                raw = f"Answer: {raw}"
+            with _span("anti_echo"):
+                if _norm(raw) == _norm(text):
+                    raw = f"Answer: {raw}"
             # Guard the generated answer using same guardrails
-            try:
-                from app.backend.core.runtime.guardrails import apply_guardrails as _apply
-                guarded = _apply(raw, cfg)
-            except Exception:
-                guarded = {"original": raw, "result": raw, "actions": []}
+            with _span("guardrails.output"):
+                try:
+                    guarded = engine.apply(raw)
+                except Exception:
+                    guarded = {"original": raw, "result": raw, "actions": []}
             # Re-apply anti-echo on guarded result
-            if isinstance(guarded, dict) and _norm(guarded.get("result", "")) == _norm(text):
-                guarded["result"] = f"Answer: {guarded.get('result')}"
-                if isinstance(guarded.get("actions"), list):
-                    guarded["actions"].append({"type": "anti_echo", "reason": "output matched input"})
+            with _span("anti_echo"):
+                if isinstance(guarded, dict) and _norm(guarded.get("result", "")) == _norm(text):
+                    guarded["result"] = f"Answer: {guarded.get('result')}"
+                    if isinstance(guarded.get("actions"), list):
+                        guarded["actions"].append({"type": "anti_echo", "reason": "output matched input"})
+            _count_guardrail_actions(guarded, "output")
+            _runtime_stats.inc("riai_chat_answers_total", source="lm" if (meta.get("lm") or {}).get("used") else "wordnet")
             answer = {"raw": raw, "guarded": guarded, "meta": meta}
         except Exception as e:
             answer = {"error": str(e)}
-    return {"ok": True, "received": payload, "processed": processed, "answer": answer, "guardrails": cfg}
+    return {"ok": True, "received": payload, "processed": processed, "answer": answer, "guardrails": dict(cfg)}
 
 
 # -------- Datasets (ingestion + list) --------
 
-from app.backend.core.registry.datasets import list_datasets as _list_datasets_reg, register_dataset as _register_dataset
+from app.backend.core.registry.datasets import register_dataset as _register_dataset
 from app.backend.core.utils.io import ARTIFACTS_DATASETS, ROOT
 
 @app.get("/api/datasets")
-def api_list_datasets():
+def api_list_datasets(capability: str | None = None, sort: str = "id", order: str = "asc",
+                      limit: int | None = None, cursor: str | None = None, total: bool | None = None):
     try:
-        return {"datasets": _list_datasets_reg()}
+        return _registry_listing("datasets", "datasets", {"capability": capability}, sort, order, limit, cursor, total)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error_code": "datasets_list_failed", "human_message": str(e)})
 
@@ -784,10 +898,13 @@ def api_ingest_dataset(payload: dict = Body(...)):
     """
     Accepts JSON payload and writes a normalized JSONL under artifacts\\datasets\\uploads.
     Payload shape: {
-      id?: string, name?: string, format: 'jsonl'|'text', content: string, capability: 'chat'|'predictor', tags?: []
+      id?: string, name?: string, format: 'jsonl'|'text', content: string, capability: 'chat'|'predictor', tags?: [],
+      scrub?: bool
     }
     For 'text', we wrap content lines as {id, prompt, response} for chat.
     Deterministic ids if not provided.
+    With scrub=true the upload is also queued for the PII scrub job (see /api/datasets/scrub);
+    "scrub_job" is its record, and "wait" blocks until it ends as for the other job endpoints.
     """
     try:
         fmt = str(payload.get("format", "jsonl")).lower()
@@ -802,7 +919,7 @@ def api_ingest_dataset(payload: dict = Body(...)):
         if fmt == "jsonl":
             # validate it's line-delimited JSON
             lines = [ln for ln in str(content).splitlines() if ln.strip()]
-            with out_path.open("w", encoding="utf-8") as wf:
+            with _atomic_open(out_path) as wf:
                 for ln in lines:
                     # best-effort parse; re-dump to ensure validity
                     try:
@@ -812,7 +929,7 @@ def api_ingest_dataset(payload: dict = Body(...)):
                     wf.write(json.dumps(obj, ensure_ascii=False) + "\n")
         elif fmt == "text":
             # each non-empty line becomes a simple chat item
-            with out_path.open("w", encoding="utf-8") as wf:
+            with _atomic_open(out_path) as wf:
                 for k, ln in enumerate(str(content).splitlines()):
                     ln = ln.strip()
                     if not ln:
@@ -822,7 +939,7 @@ def api_ingest_dataset(payload: dict = Body(...)):
         elif fmt == "csv":
             # parse CSV lines; each row becomes a chat item using first column as both prompt/response
             import csv as _csv
-            with out_path.open("w", encoding="utf-8", newline="") as wf:
+            with _atomic_open(out_path, "w", newline="") as wf:
                 reader = _csv.reader(str(content).splitlines())
                 for k, row in enumerate(reader):
                     if not row:
@@ -838,7 +955,7 @@ def api_ingest_dataset(payload: dict = Body(...)):
                 obj = json.loads(str(content))
             except Exception as e:
                 return JSONResponse(status_code=400, content={"error_code": "json_parse_failed", "human_message": f"Invalid JSON: {e}"})
-            with out_path.open("w", encoding="utf-8") as wf:
+            with _atomic_open(out_path) as wf:
                 if isinstance(obj, list):
                     for i, item in enumerate(obj):
                         if not isinstance(item, dict):
@@ -857,35 +974,230 @@ def api_ingest_dataset(payload: dict = Body(...)):
                     wf.write(json.dumps({"text": str(obj)}, ensure_ascii=False) + "\n")
         else:
             return JSONResponse(status_code=400, content={"error_code": "unsupported_format", "human_message": f"Unsupported format: {fmt}"})
-        # Register dataset
-        entry = _register_dataset(ds_id, name, [out_path])
-        # attach tags/capability for UI if desired
-        if payload.get("tags"):
-            entry["tags"] = payload.get("tags")
-        entry["capability"] = capability
-        write_json(REGISTRY_DATASETS_DIR / f"{ds_id}.json", entry)
+        # Register dataset (locked: register + annotate is a read-modify-write of the entry)
+        with _file_lock(REGISTRY_DATASETS_DIR / f"{ds_id}.json"):
+            entry = _register_dataset(ds_id, name, [out_path])
+            # attach tags/capability for UI if desired
+            if payload.get("tags"):
+                entry["tags"] = payload.get("tags")
+            entry["capability"] = capability
+            write_json(REGISTRY_DATASETS_DIR / f"{ds_id}.json", entry)
+        if payload.get("scrub"):
+            job = _submit_job("scrub_datasets", {"dataset_ids": [ds_id], "workers": 1, "wait": payload.get("wait")},
+                              "scrub_failed")
+            if isinstance(job, JSONResponse):
+                return job
+            return {"ok": job["ok"], "dataset": entry, "scrub_job": job["job"]}
         return {"ok": True, "dataset": entry}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error_code": "ingest_failed", "human_message": str(e)})
 
 
+@app.post("/api/datasets/scrub")
+def api_scrub_datasets(payload: dict = Body(...)):
+    """Mask guardrail PII patterns in uploaded datasets (all uploads unless dataset_id(s) given).
+    Writes artifacts\\datasets\\scrubbed\\<id>.jsonl and registers <id>_scrubbed with per-file counts.
+    Queued like /api/train (see _submit_job); the job's result carries the per-file counts.
+    """
+    return _submit_job("scrub_datasets", payload, "scrub_failed")
+
+
+# -------- Export / Import bundles --------
+
+@app.post("/api/bundle/export")
+def api_export_bundle(payload: dict | None = Body(None)):
+    """Stream a tar bundle of app/registry + app/artifacts (see registry_spec.md, Export/Import).
+    Body (optional): {compression?: "gz"|"xz"|"none", level?: int 0-9 (default 6), base_manifest?: <hashes.json
+    of a previous bundle>} — with a base manifest, unchanged files are omitted (incremental bundle)."""
+    from app.backend.core.registry.bundle import COMPRESSIONS, stream_export
+    payload = payload or {}
+    compression = str(payload.get("compression") or "gz")
+    if compression not in COMPRESSIONS:
+        return JSONResponse(status_code=400, content={"error_code": "invalid_compression", "human_message": f"compression must be one of {', '.join(COMPRESSIONS)}."})
+    level = payload.get("level", 6)
+    try:
+        # checked before streaming starts: a bad level would otherwise fail mid-response
+        if isinstance(level, bool) or int(level) != float(level) or not 0 <= int(level) <= 9:
+            raise ValueError
+        level = int(level)
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=400, content={"error_code": "invalid_level", "human_message": "level must be an integer from 0 to 9."})
+    base = payload.get("base_manifest")
+    if base is not None and not isinstance(base, dict):
+        return JSONResponse(status_code=400, content={"error_code": "invalid_manifest", "human_message": "base_manifest must be the hashes.json object of a previous bundle."})
+    ext = {"none": "tar", "gz": "tar.gz", "xz": "tar.xz"}[compression]
+    media = {"none": "application/x-tar", "gz": "application/gzip", "xz": "application/x-xz"}[compression]
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    chunks = stream_export(compression=compression, level=level, base_manifest=base)
+    return StreamingResponse(chunks, media_type=media, headers={"Content-Disposition": f'attachment; filename="riai_bundle_{stamp}.{ext}"'})
+
+
+@app.post("/api/bundle/import")
+async def api_import_bundle(request: Request, activate: bool = True):
+    """Import a bundle sent as the raw request body (plain, gzip or xz tar). The body is verified while
+    it streams in; nothing changes unless every checksum matches. activate=false only verifies."""
+    import asyncio
+    from app.backend.core.registry.bundle import QueueReader, import_bundle
+    reader = QueueReader()
+
+    def _run():
+        try:
+            return import_bundle(reader, activate=activate)
+        finally:
+            reader.abandon()
+
+    loop = asyncio.get_running_loop()
+    job = loop.run_in_executor(None, _run)
+    try:
+        async for chunk in request.stream():
+            if chunk and not await loop.run_in_executor(None, reader.feed, chunk):
+                break
+    finally:
+        # also on client disconnect: the import sees a truncated stream and rejects it
+        reader.finish()
+    try:
+        report = await job
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error_code": "import_failed", "human_message": str(e)})
+    if report["status"] == "rejected":
+        return JSONResponse(status_code=422, content=dict(report, error_code="bundle_rejected", human_message=" ".join(report["remediation"])))
+    return report
+
+
+# -------- Artifact blob store --------
+
+@app.get("/api/artifacts/blobs")
+def api_blob_stats():
+    from app.backend.core.utils.blobstore import stats
+    return stats()
+
+
+@app.post("/api/artifacts/blobs/gc")
+def api_blob_gc(payload: dict | None = Body(None)):
+    """Collect unreferenced blobs. Body (optional): {dry_run?: bool, adopt?: bool}; adopt first moves
+    existing duplicate files under app/artifacts into the store (only on filesystems with reflinks)."""
+    from app.backend.core.utils import blobstore
+    payload = payload or {}
+    out = {}
+    if payload.get("adopt"):
+        skip = (blobstore.BLOBS_DIR, ARTIFACTS_DIR / "cache")
+        files = [p for p in ARTIFACTS_DIR.rglob("*") if p.is_file() and not any(s in p.parents for s in skip)]
+        out["adopt"] = blobstore.adopt(files)
+    out["gc"] = blobstore.gc(dry_run=bool(payload.get("dry_run", False)))
+    out["stats"] = blobstore.stats()
+    return out
+
+
 # -------- Metrics --------
 
 @app.get("/api/metrics/latest")
 def metrics_latest(capability: str = "chat", model_id: str | None = None):
-    # Minimal stub: return empty if none
-    path = ARTIFACTS_METRICS / capability
-    data = []
-    if path.exists():
-        for f in path.glob("*.json"):
-            try:
-                j = load_json(f)
-                if (not model_id) or (j.get("model_id") == model_id):
-                    data.append(j)
-            except Exception:
-                pass
-    latest = sorted(data, key=lambda x: x.get("timestamp", ""), reverse=True)[:1]
-    return {"metrics": latest[0] if latest else {}}
+    from app.backend.core.metrics.readers import latest_metric
+    return {"metrics": latest_metric(capability, model_id)}
+
+
+@app.get("/api/metrics/runtime")
+def metrics_runtime():
+    # Prometheus scrape target: live counters of this worker process
+    return Response(content=_runtime_stats.render(), media_type=_runtime_stats.CONTENT_TYPE)
+
+
+# -------- Admin: on-demand profiling --------
+
+@app.post("/api/admin/profile")
+def admin_profile_arm(payload: dict = Body(default={})):
+    """
+    Arm cProfile (+ tracemalloc) for the next N runtime requests or for one job.
+    Payload: {requests?: int (default 10), job_id?: str, job_type?: str, memory?: bool (default true), top?: int,
+    timeout_s?: float (default 600; the session ends then even if its target never ran)}
+    To profile one specific job, arm a job_id of your choosing, then submit the job with that "job_id".
+    Poll GET /api/admin/profile/{profile_id} for the summary once the target has run.
+    """
+    from app.backend.core.metrics import profiling
+    payload = payload or {}
+    try:
+        return profiling.arm(
+            requests=int(payload.get("requests", 10)),
+            job_id=payload.get("job_id"),
+            job_type=payload.get("job_type"),
+            memory=bool(payload.get("memory", True)),
+            top=int(payload.get("top", profiling.DEFAULT_TOP)),
+            timeout_s=float(payload.get("timeout_s", profiling.DEFAULT_TIMEOUT_S)),
+        )
+    except profiling.ProfileBusy as e:
+        return JSONResponse(status_code=409, content={"error_code": "profile_busy", "human_message": str(e)})
+    except (TypeError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error_code": "invalid_profile_request", "human_message": str(e)})
+
+
+@app.get("/api/admin/profile")
+def admin_profile_status():
+    from app.backend.core.metrics import profiling
+    return {"current": profiling.status(), "profiles": profiling.list_summaries()}
+
+
+@app.delete("/api/admin/profile")
+def admin_profile_disarm():
+    from app.backend.core.metrics import profiling
+    res = profiling.disarm()
+    if res is None:
+        return JSONResponse(status_code=404, content={"error_code": "profile_not_armed", "human_message": "No profiling session is armed"})
+    return res
+
+
+@app.get("/api/admin/profile/{profile_id}")
+def admin_profile_summary(profile_id: str):
+    from app.backend.core.metrics import profiling
+    summary = profiling.load_summary(profile_id)
+    if summary is None:
+        cur = profiling.status()
+        if cur.get("profile_id") == profile_id:
+            return cur
+        return JSONResponse(status_code=404, content={"error_code": "profile_not_found", "human_message": "Profile not found"})
+    return summary
+
+
+@app.get("/api/debug/memory")
+def debug_memory():
+    """Process RSS and the size/budget of every in-process cache (budgets: RIAI_CACHE_BUDGETS)."""
+    from app.backend.core.utils import memory
+    # import the cache owners so their caches are registered even before first use
+    from app.backend.core.runtime import chat, bubble  # noqa: F401
+    return memory.snapshot()
+
+
+@app.get("/api/metrics/history")
+def metrics_history(
+    capability: str = "chat",
+    model_id: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    limit: int = 100,
+    order: str = "desc",
+):
+    from app.backend.core.metrics.history import get_history
+    try:
+        items = get_history().query(capability, model_id=model_id, since=since, until=until, limit=limit, order=order)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error_code": "invalid_query", "human_message": str(e)})
+    return {"items": items}
+
+
+@app.get("/api/metrics/rollups")
+def metrics_rollups(
+    metric: str,
+    capability: str = "chat",
+    model_id: str | None = None,
+    period: str = "hour",
+    since: str | None = None,
+    until: str | None = None,
+):
+    from app.backend.core.metrics.history import get_history
+    try:
+        buckets = get_history().rollups(capability, metric, model_id=model_id, period=period, since=since, until=until)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error_code": "invalid_query", "human_message": str(e)})
+    return {"metric": metric, "period": period, "buckets": buckets}
 
 
 @app.get("/api/metrics/by_id/{metric_file}")
@@ -900,99 +1212,75 @@ def metrics_by_id(metric_file: str):
     return JSONResponse(status_code=404, content={"error_code": "metrics_not_found", "human_message": "Metrics file not found"})
 
 
-# -------- Jobs Dispatcher Stubs --------
+# -------- Jobs --------
+# Training, evaluation, dataset scrubs and tools go through the persistent queue (core.runtime.scheduler): the endpoints
+# return a queued job record at once; poll GET /api/jobs/{job_id}. {"wait": true | seconds} in the
+# payload blocks until the job ends (or the wait runs out), as these endpoints used to.
 
-@app.post("/api/train")
-def train_job(payload: dict = Body(...)):
-    # Run synchronously via local scheduler to produce real artifacts
+def _submit_job(job_type: str, payload: dict, error_code: str):
     try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("train", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
+        from app.backend.core.runtime import scheduler
+        payload = dict(payload or {})
+        wait = payload.pop("wait", None)
+        job_id = payload.pop("job_id", None)
+        try:
+            record = scheduler.submit(job_type, payload, job_id=job_id)
+        except scheduler.JobExists as e:
+            return JSONResponse(status_code=409, content={"error_code": "job_exists", "human_message": str(e)})
+        except scheduler.InvalidJobId as e:
+            return JSONResponse(status_code=400, content={"error_code": "invalid_job_id", "human_message": str(e)})
+        if wait and record.get("status") not in scheduler.TERMINAL:
+            record = scheduler.wait(record["job_id"], None if wait is True else float(wait)) or record
+        return {"ok": record.get("status") not in ("failed", "cancelled"), "job_id": record["job_id"], "job": record}
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "train_failed", "human_message": str(e)})
+        return JSONResponse(status_code=500, content={"error_code": error_code, "human_message": str(e)})
+
+
+@app.post("/api/train")
+def train_job(payload: dict = Body(...)):
+    return _submit_job("train", payload, "train_failed")
 
 
 @app.post("/api/evaluate")
 def evaluate_job(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("evaluate", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "evaluate_failed", "human_message": str(e)})
+    return _submit_job("evaluate", payload, "evaluate_failed")
 
 
 # Specialized training jobs
 @app.post("/api/train/sft")
 def train_sft_job(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("train_sft", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "train_sft_failed", "human_message": str(e)})
+    return _submit_job("train_sft", payload, "train_sft_failed")
 
 
 @app.post("/api/train/dpo")
 def train_dpo_job(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("train_dpo", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "train_dpo_failed", "human_message": str(e)})
+    return _submit_job("train_dpo", payload, "train_dpo_failed")
 
 
 @app.post("/api/train/cnn")
 def train_cnn_job(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("train_cnn", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "train_cnn_failed", "human_message": str(e)})
+    return _submit_job("train_cnn", payload, "train_cnn_failed")
 
 
 @app.post("/api/train/tsconv")
 def train_tsconv_job(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("train_tsconv", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "train_tsconv_failed", "human_message": str(e)})
+    return _submit_job("train_tsconv", payload, "train_tsconv_failed")
 
 
 @app.post("/api/train/rl")
 def train_rl_job(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("train_rl", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "train_rl_failed", "human_message": str(e)})
+    return _submit_job("train_rl", payload, "train_rl_failed")
 
 
 # Tools
 @app.post("/api/tools/make_bubbles")
 def api_make_bubbles(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("make_bubbles", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "make_bubbles_failed", "human_message": str(e)})
+    return _submit_job("make_bubbles", payload, "make_bubbles_failed")
 
 
 @app.post("/api/tools/self_eval")
 def api_self_eval(payload: dict = Body(...)):
-    try:
-        from app.backend.core.runtime.scheduler import run_job
-        record = run_job("self_eval", payload)
-        return {"ok": record.get("status") == "finished", "job": record}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error_code": "self_eval_failed", "human_message": str(e)})
+    return _submit_job("self_eval", payload, "self_eval_failed")
 
 
 @app.get("/api/jobs")
@@ -1007,27 +1295,80 @@ def list_jobs():
     return {"jobs": items}
 
 
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    from app.backend.core.runtime.scheduler import get_job as _get_job
+    record = _get_job(job_id)
+    if record is None:
+        return JSONResponse(status_code=404, content={"error_code": "job_not_found", "human_message": "Job not found"})
+    return record
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running one to stop at its next cancellation point."""
+    from app.backend.core.runtime import scheduler
+    before = scheduler.get_job(job_id)
+    if before is None:
+        return JSONResponse(status_code=404, content={"error_code": "job_not_found", "human_message": "Job not found"})
+    if before.get("status") in scheduler.TERMINAL:
+        return JSONResponse(status_code=409, content={"error_code": "job_already_ended",
+                                                      "human_message": f"Job already {before.get('status')}"})
+    return scheduler.cancel(job_id)
+
+
 # -------- Guardrails --------
 
 def default_guardrails():
-    return {
-        "max_tokens": 256,
-        "pii_regex": ["\\b\\d{3}-\\d{2}-\\d{4}\\b"],
-        "content_filters": ["hate", "violence"],
-        "allowed_file_types": [".txt", ".csv", ".json"]
-    }
+    from app.backend.core.runtime.guardrails import default_guardrails as _default
+    return _default()
+
+
+# Active (config generation, config, compiled engine); replaced as one tuple so readers never
+# see a config paired with another config's engine.
+_GUARDRAILS_ACTIVE: tuple | None = None
+
+
+def _guardrails_generation():
+    try:
+        st = GUARDRAILS_CONFIG.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _active_guardrails():
+    """Return (cfg, CompiledGuardrails), reloading config.json only when its generation changes."""
+    global _GUARDRAILS_ACTIVE
+    from app.backend.core.runtime.guardrails import compile_guardrails
+    gen = _guardrails_generation()
+    active = _GUARDRAILS_ACTIVE
+    if active is not None and active[0] == gen:
+        return active[1], active[2]
+    cfg = load_json(GUARDRAILS_CONFIG) if gen is not None else default_guardrails()
+    active = (gen, cfg, compile_guardrails(cfg))
+    _GUARDRAILS_ACTIVE = active
+    return active[1], active[2]
 
 
 @app.get("/api/guardrails")
 def get_guardrails():
-    return load_json(GUARDRAILS_CONFIG) if GUARDRAILS_CONFIG.exists() else default_guardrails()
+    cfg, _ = _active_guardrails()
+    return dict(cfg)
 
 
 @app.post("/api/guardrails")
 def set_guardrails(payload: dict = Body(...)):
+    global _GUARDRAILS_ACTIVE
+    from app.backend.core.runtime.guardrails import compile_guardrails
     cfg = default_guardrails()
     cfg.update({k: v for k, v in payload.items() if k in cfg})
+    max_tokens = cfg.get("max_tokens")
+    if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens < 1:
+        return JSONResponse(status_code=400, content={"error_code": "invalid_config", "human_message": "max_tokens must be an integer >= 1."})
+    engine = compile_guardrails(cfg)
     write_json(GUARDRAILS_CONFIG, cfg)
+    _GUARDRAILS_ACTIVE = (_guardrails_generation(), cfg, engine)
     return {"ok": True, "guardrails": cfg}
 
 
@@ -1052,9 +1393,9 @@ def save_mappings(payload: dict = Body(...)):
         ws = load_json(PENDING_WS_PATH) if PENDING_WS_PATH.exists() else {"seed": 1337, "selected_modules": []}
         seed = int(ws.get("seed", 1337))
         selected = ws.get("selected_modules", [])
-        # Build module lookup with capabilities
-        mod_resp = list_modules()
-        mod_map_full = {m.get("id"): m for m in mod_resp.get("modules", []) if isinstance(m, dict) and m.get("id")}
+        # Module lookup with capabilities
+        from app.backend.core.runtime.loader import get_catalog
+        mod_map_full = get_catalog().by_id
 
         def _ensure_metrics(module_id: str, model_id: str):
             if not module_id or not model_id:
@@ -1077,8 +1418,8 @@ def save_mappings(payload: dict = Body(...)):
                 metrics_path = ARTIFACTS_METRICS / cap / f"{model_id}.json"
                 if not metrics_path.exists():
                     try:
-                        # Synchronously evaluate via local scheduler
-                        evaluate_job({"module_id": module_id, "seed": seed, "model_id": model_id})
+                        # Evaluate now (waiting for the queued job) so readiness passes right after saving
+                        evaluate_job({"module_id": module_id, "seed": seed, "model_id": model_id, "wait": True})
                     except Exception:
                         pass
 
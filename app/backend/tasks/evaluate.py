@@ -1,52 +1,38 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 import time
 import json
 import csv
 import math
-import ast
+import threading
 from ..core.utils.io import (
     ARTIFACTS_DATASETS,
     ARTIFACTS_INDICES,
     ARTIFACTS_DIR,
+    GUARDRAILS_DIR,
     MODULES_DIR,
     REGISTRY_MODELS_DIR,
+    iter_ndjson,
+    iter_table,
     load_json,
 )
-from ..core.utils.seeds import set_global_seed
+from ..core.utils.blobstore import put_bytes
 from ..core.metrics.recorder import record_metrics
+from ..core.runtime.scheduler import check_cancelled
+from ..core.utils.env import env_fingerprint
 
 
 # ---------- WordNet synthetic dialogs ----------
 
 def _iter_index_records() -> List[Dict[str, Any]]:
     idx_path = ARTIFACTS_INDICES / "wordnet-lexicon.jsonl"
-    records: List[Dict[str, Any]] = []
-    if idx_path.exists():
-        with idx_path.open("r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    # We stored Python dict-like lines; parse safely
-                    rec = ast.literal_eval(line)
-                    if isinstance(rec, dict) and rec.get("lemma"):
-                        records.append(rec)
-                except Exception:
-                    try:
-                        # fallback if actually JSON
-                        rec = json.loads(line)
-                        if isinstance(rec, dict) and rec.get("lemma"):
-                            records.append(rec)
-                    except Exception:
-                        continue
-    return records
+    if not idx_path.exists():
+        return []
+    return [rec for rec in iter_ndjson(idx_path) if isinstance(rec, dict) and rec.get("lemma")]
 
 
 def synth_wordnet_dialogs(seed: int, limit: int = 200) -> Path:
-    set_global_seed(seed)
     ARTIFACTS_DATASETS.mkdir(parents=True, exist_ok=True)
     out = ARTIFACTS_DATASETS / f"wordnet_synth_{seed}.jsonl"
     if out.exists():
@@ -55,28 +41,98 @@ def synth_wordnet_dialogs(seed: int, limit: int = 200) -> Path:
     if not recs:
         # Minimal fallback when index missing: synth from a few placeholders
         recs = [{"lemma": f"word{n}", "pos": "noun", "offsets": [n]} for n in range(limit)]
-    with out.open("w", encoding="utf-8") as wf:
-        n = min(limit, len(recs))
-        step = max(1, len(recs) // n)
-        for i in range(0, n * step, step):
-            r = recs[i % len(recs)]
-            prompt = f"What does '{r['lemma']}' mean? (POS: {r.get('pos','?')})"
-            answer = f"'{r['lemma']}' relates to offsets {r.get('offsets', [])} in WordNet."
-            item = {
-                "id": f"wn_{seed}_{i//step}",
-                "prompt": prompt,
-                "response": answer,
-                "seed": seed,
-                "source": "wordnet"
-            }
-            wf.write(json.dumps(item, ensure_ascii=False) + "\n")
+    lines: List[str] = []
+    n = min(limit, len(recs))
+    step = max(1, len(recs) // n)
+    for i in range(0, n * step, step):
+        r = recs[i % len(recs)]
+        prompt = f"What does '{r['lemma']}' mean? (POS: {r.get('pos','?')})"
+        answer = f"'{r['lemma']}' relates to offsets {r.get('offsets', [])} in WordNet."
+        item = {
+            "id": f"wn_{seed}_{i//step}",
+            "prompt": prompt,
+            "response": answer,
+            "seed": seed,
+            "source": "wordnet"
+        }
+        lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+    put_bytes("".join(lines).encode("utf-8"), dest=out)
     return out
 
 
 # ---------- Chat-core evaluation ----------
 
-def eval_chat_core(model_id: str, seed: int) -> Dict[str, Any]:
-    set_global_seed(seed)
+def _chat_request(engine: Any, text: str) -> Dict[str, Any]:
+    """One /api/runtime/post round trip minus HTTP: guard the input, answer, guard the answer."""
+    from ..core.runtime.chat import generate_answer
+    engine.apply(text)
+    raw, meta = generate_answer(text)
+    engine.apply(raw)
+    return meta
+
+
+def bench_chat_requests(
+    prompts: List[str],
+    requests: int = 100,
+    warmup: int = 10,
+    concurrency: Any = (1, 4),
+) -> Dict[str, Any]:
+    """Drive the real guardrails + generate_answer path over prompts (cycled to `requests` per level)
+    after `warmup` untimed calls. Returns per-level p50/p95/p99 and throughput, one merged latency
+    histogram and the grounding hit rate. Count bumps made by the benchmark are taken back."""
+    from concurrent.futures import ThreadPoolExecutor
+    from ..core.runtime.chat import discount_counts
+    from ..core.runtime.guardrails import compile_guardrails, default_guardrails
+    from ..core.metrics.histogram import LogHistogram
+    gr_path = GUARDRAILS_DIR / "config.json"
+    engine = compile_guardrails(load_json(gr_path) if gr_path.exists() else default_guardrails())
+    if isinstance(concurrency, (int, str)):
+        concurrency = [concurrency]
+    levels = sorted({max(1, int(c)) for c in concurrency}) or [1]
+    requests = max(1, int(requests))
+    bumps: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def _one(text: str) -> Tuple[float, Dict[str, Any]]:
+        t0 = time.perf_counter()
+        meta = _chat_request(engine, text)
+        dt = time.perf_counter() - t0
+        if not (meta.get("lm") or {}).get("used"):
+            with lock:
+                bumps[meta.get("lemma")] = bumps.get(meta.get("lemma"), 0) + 1
+        return dt, meta
+
+    batch = [prompts[k % len(prompts)] for k in range(requests)]
+    grounded: Dict[str, bool] = {}
+    merged = LogHistogram()
+    per_level: Dict[str, Any] = {}
+    try:
+        for k in range(max(0, int(warmup))):
+            _one(prompts[k % len(prompts)])  # warm caches (index, LM, gloss reads); not timed
+        for level in levels:
+            check_cancelled()
+            hist = LogHistogram()
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                for text, (dt, meta) in zip(batch, pool.map(_one, batch)):
+                    hist.record(dt)
+                    grounded[text] = not (meta.get("lm") or {}).get("used")
+            wall = time.perf_counter() - t0
+            per_level[str(level)] = dict(hist.summary(), throughput_items_s=round(requests / max(wall, 1e-9), 2))
+            merged.merge(hist)
+    finally:
+        discount_counts(bumps)
+    return {
+        "requests": requests,
+        "warmup": int(warmup),
+        "levels": per_level,
+        "histogram": merged.to_dict(),
+        "grounding_hit_rate": sum(grounded.values()) / max(1, len(grounded)),
+    }
+
+
+def eval_chat_core(model_id: str, seed: int, requests: int = 100, warmup: int = 10,
+                   concurrency: Any = (1, 4)) -> Dict[str, Any]:
     # Load sample prompts from synthetic dialogs (generate if missing)
     ds_path = synth_wordnet_dialogs(seed)
     prompts: List[str] = []
@@ -92,51 +148,28 @@ def eval_chat_core(model_id: str, seed: int) -> Dict[str, Any]:
     if not prompts:
         prompts = ["What does 'example' mean?"]
 
-    # Very simple retrieval: extract first quoted token as lemma
-    latencies: List[float] = []
-    hits = 0
-    for p in prompts:
-        t0 = time.perf_counter()
-        lemma = None
-        try:
-            s = p.split("'")
-            if len(s) >= 2:
-                lemma = s[1]
-        except Exception:
-            pass
-        # simulate retrieval cost proportional to length
-        _ = sum(ord(c) for c in p) % 7
-        time.sleep(0.001)
-        dt = (time.perf_counter() - t0) * 1000.0
-        latencies.append(dt)
-        if lemma and lemma.lower() in p.lower():
-            hits += 1
-    latencies.sort()
-    def pct(arr, q):
-        if not arr:
-            return 0.0
-        k = int(round((q/100.0)*(len(arr)-1)))
-        return float(arr[k])
-    p50 = pct(latencies, 50)
-    p95 = pct(latencies, 95)
-    hit_rate = hits / max(1, len(prompts))
+    bench = bench_chat_requests(prompts, requests=requests, warmup=warmup, concurrency=concurrency)
+    # headline latency is the single-client level, as seen by one UI user
+    single = bench["levels"][min(bench["levels"], key=int)]
+    hit_rate = bench["grounding_hit_rate"]
     # LM stats (if available)
     lm_stats = {}
     try:
         lm_path = ARTIFACTS_DIR / "chat" / "lm_ngram.json"
         if lm_path.exists():
-            obj = json.loads(lm_path.read_text(encoding="utf-8"))
-            counts = obj.get("counts", {}) if isinstance(obj, dict) else {}
-            total_transitions = 0
-            if isinstance(counts, dict):
-                for ctx, nxts in counts.items():
-                    try:
-                        total_transitions += sum(int(v) for v in (nxts or {}).values())
-                    except Exception:
-                        continue
+            # stream the counts table (packed files decode chunk by chunk); contexts are `order` chars
+            contexts = total_transitions = 0
+            order = 0
+            for ctx, nxts in iter_table(lm_path, "counts"):
+                contexts += 1
+                order = order or len(ctx)
+                try:
+                    total_transitions += sum(int(v) for v in (nxts or {}).values())
+                except Exception:
+                    continue
             lm_stats = {
-                "order": int(obj.get("order", 3)) if isinstance(obj, dict) else 3,
-                "contexts": len(counts) if isinstance(counts, dict) else 0,
+                "order": order or 3,
+                "contexts": contexts,
                 "total_transitions": int(total_transitions)
             }
     except Exception:
@@ -156,9 +189,17 @@ def eval_chat_core(model_id: str, seed: int) -> Dict[str, Any]:
         "seed": seed,
         "model_train_seed": reg.get("train_seed"),
         "nn_id": reg.get("nn_id"),
-        "latency_ms": {"p50": round(p50, 3), "p95": round(p95, 3)},
+        "latency_ms": {k: single[k] for k in ("p50", "p95", "p99", "mean", "max")},
+        "throughput_items_s": single["throughput_items_s"],
         "grounding_hit_rate": round(hit_rate, 3),
-        "lm": lm_stats
+        "lm": lm_stats,
+        "bench": {
+            "requests": bench["requests"],
+            "warmup": bench["warmup"],
+            "concurrency": bench["levels"],
+            "latency_histogram": bench["histogram"],
+        },
+        "env": env_fingerprint(),
     }
     record_metrics("chat", model_id, payload)
     return payload
@@ -192,7 +233,6 @@ def _read_ohlcv_close() -> List[float]:
 
 
 def eval_predictor_ma(model_id: str, seed: int, window: int = 5) -> Dict[str, Any]:
-    set_global_seed(seed)
     y = _read_ohlcv_close()
     if len(y) < window + 10:
         # synth small series
@@ -237,9 +277,9 @@ def eval_predictor_ma(model_id: str, seed: int, window: int = 5) -> Dict[str, An
 
 
 MODULE_EVAL = {
-    "lexicon-wordnet3": lambda seed, model_id=None: {"dataset": str(synth_wordnet_dialogs(seed))},
-    "chat-core": lambda seed, model_id=None: eval_chat_core(model_id or f"chat_retrieval_{seed}", seed),
-    "predictor-finance": lambda seed, model_id=None: eval_predictor_ma(model_id or f"predictor_ma_{seed}", seed),
+    "lexicon-wordnet3": lambda seed, model_id=None, **_: {"dataset": str(synth_wordnet_dialogs(seed))},
+    "chat-core": lambda seed, model_id=None, **bench: eval_chat_core(model_id or f"chat_retrieval_{seed}", seed, **bench),
+    "predictor-finance": lambda seed, model_id=None, **_: eval_predictor_ma(model_id or f"predictor_ma_{seed}", seed),
 }
 
 
@@ -249,6 +289,9 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     model_id = payload.get("model_id")
     if module_id not in MODULE_EVAL:
         raise ValueError(f"Unknown module_id: {module_id}")
-    out = MODULE_EVAL[module_id](seed, model_id)
+    # optional benchmark knobs: {"bench": {"requests": 500, "warmup": 50, "concurrency": [1, 8]}}
+    bench = payload.get("bench") if isinstance(payload.get("bench"), dict) else {}
+    bench = {k: bench[k] for k in ("requests", "warmup", "concurrency") if k in bench}
+    out = MODULE_EVAL[module_id](seed, model_id, **bench)
     out.update({"module_id": module_id, "seed": seed, "status": "ok"})
     return out
@@ -3,8 +3,8 @@ from pathlib import Path
 from typing import Dict, Any, List
 import json
 import hashlib
-from ..core.utils.io import ARTIFACTS_DATASETS, ARTIFACTS_DIR, now_iso, write_json
-from ..core.utils.seeds import set_global_seed
+from ..core.utils.io import ARTIFACTS_DIR, now_iso, write_json
+from ..core.utils.dataset_reader import DatasetReader, dataset_sources
 
 
 def _hash_text(s: str) -> str:
@@ -19,29 +19,21 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     Deterministic across the same dataset + seed.
     """
     seed = int(payload.get('seed', 1337))
-    set_global_seed(seed)
     ds_id = str(payload.get('dataset_id', 'wordnet_synth'))
     # Source candidates
-    uploads = sorted((ARTIFACTS_DATASETS / 'uploads').glob('*.jsonl'))
-    synths = sorted(ARTIFACTS_DATASETS.glob('wordnet_synth_*.jsonl'))
+    uploads = dataset_sources(('uploads',))
+    synths = dataset_sources(('synth',))
     sources = [p for p in uploads if p.stem == ds_id] or synths or uploads
     if not sources:
         # Nothing to bucket; create empty structure
         sources = []
     # Read up to N items deterministically
+    reader = DatasetReader(paths=sources[:1], fields=('prompt', 'text', 'question', 'response', 'answer'), limit_per_file=1000)
     items: List[Dict[str, Any]] = []
-    for p in sources[:1]:
-        with p.open('r', encoding='utf-8') as f:
-            for k, line in enumerate(f):
-                if k >= 1000:
-                    break
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    obj = {"text": line.strip()}
-                prompt = str(obj.get('prompt') or obj.get('text') or obj.get('question') or '')
-                response = str(obj.get('response') or obj.get('answer') or '')
-                items.append({"prompt": prompt, "response": response})
+    for obj in reader:
+        prompt = str(obj.get('prompt') or obj.get('text') or obj.get('question') or '')
+        response = str(obj.get('response') or obj.get('answer') or '')
+        items.append({"prompt": prompt, "response": response})
     # Bucketing by prompt length
     cuts = payload.get('buckets') or [16, 32, 64, 128, 256]
     bubbles: Dict[str, List[int]] = {f"<= {c}": [] for c in cuts}
@@ -0,0 +1,284 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Any, List, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import uuid
+from ..core.utils.io import GUARDRAILS_DIR, REGISTRY_DATASETS_DIR, atomic_open, file_lock, load_json, now_iso, write_json
+from ..core.utils.dataset_reader import SCRUBBED_DIR, UPLOADS_DIR, dataset_sources
+from ..core.registry.datasets import register_dataset
+from ..core.runtime.guardrails import compile_guardrails, config_hash, default_guardrails, pii_patterns
+from ..core.runtime.scheduler import JobCancelled, check_cancelled, current_job_id
+
+# Files are split into line-aligned byte ranges of about this size; each range is one pool task.
+CHUNK_BYTES = 8 * 1024 * 1024
+MASK = '[PII]'
+
+# Patterns whose match on a raw JSON line implies nothing about the decoded string values
+# (anchors, look-arounds) disable the raw-line precheck for that run.
+_RAW_UNSAFE = ('^', '$', '\\A', '\\Z', '(?=', '(?!', '(?<')
+
+
+def _pii_patterns(payload: Dict[str, Any]) -> List[str]:
+    if payload.get('pii_regex') is not None:
+        return pii_patterns(payload)
+    cfg_path = GUARDRAILS_DIR / 'config.json'
+    cfg = load_json(cfg_path) if cfg_path.exists() else default_guardrails()
+    return pii_patterns(cfg)
+
+
+def _scrub_value(v: Any, pii: List[Tuple[str, re.Pattern]], masked: Dict[str, int]) -> Any:
+    if isinstance(v, str):
+        for pattern, regex in pii:
+            v, n = regex.subn(MASK, v)
+            if n:
+                masked[pattern] = masked.get(pattern, 0) + n
+        return v
+    if isinstance(v, dict):
+        return {k: _scrub_value(x, pii, masked) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_scrub_value(x, pii, masked) for x in v]
+    return v
+
+
+def _scrub_line(raw: bytes, pii: List[Tuple[str, re.Pattern]], precheck: bool, masked: Dict[str, int]) -> bytes:
+    """Mask PII inside the string values of one JSONL line (the whole line if it is not JSON).
+    Lines without a match come back as the identical bytes object."""
+    text = raw.decode('utf-8', errors='surrogateescape')
+    body = text.rstrip('\r\n')
+    # Escaped strings can hide a match from the raw text, so those lines always take the slow path
+    if precheck and '\\' not in body and not any(regex.search(body) for _, regex in pii):
+        return raw
+    try:
+        obj = json.loads(body)
+        is_json = True
+    except ValueError:
+        obj, is_json = body, False
+    found: Dict[str, int] = {}
+    new = _scrub_value(obj, pii, found)
+    if not found:
+        return raw
+    for k, n in found.items():
+        masked[k] = masked.get(k, 0) + n
+    out = json.dumps(new, ensure_ascii=False) if is_json else new
+    return (out + text[len(body):]).encode('utf-8', errors='surrogateescape')
+
+
+def _scrub_range(src: str, start: int, end: int, dst: str, patterns: Sequence[str]) -> Dict[str, Any]:
+    """Pool task: scrub bytes [start, end) of src (line aligned) into dst."""
+    pii = compile_guardrails({'pii_regex': list(patterns)}).pii
+    precheck = not any(tok in p for p, _ in pii for tok in _RAW_UNSAFE)
+    masked: Dict[str, int] = {}
+    lines = changed = 0
+    with open(src, 'rb') as rf, open(dst, 'wb') as wf:
+        rf.seek(start)
+        pos = start
+        while pos < end:
+            raw = rf.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            out = _scrub_line(raw, pii, precheck, masked)
+            lines += 1
+            if out is not raw:
+                changed += 1
+            wf.write(out)
+    return {'lines': lines, 'lines_changed': changed, 'masked': masked}
+
+
+def _chunk_bounds(path: Path, size: int, chunk_bytes: int) -> List[int]:
+    """Offsets splitting the file into ranges of ~chunk_bytes that start at line boundaries."""
+    bounds = [0]
+    with path.open('rb') as f:
+        pos = chunk_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()
+            nxt = f.tell()
+            if nxt >= size:
+                break
+            bounds.append(nxt)
+            pos = nxt + chunk_bytes
+    bounds.append(size)
+    return bounds
+
+
+def _merge(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    masked: Dict[str, int] = {}
+    for st in stats:
+        for k, n in st['masked'].items():
+            masked[k] = masked.get(k, 0) + n
+    return {
+        'lines': sum(st['lines'] for st in stats),
+        'lines_changed': sum(st['lines_changed'] for st in stats),
+        'masked': masked,
+    }
+
+
+def _resolve_sources(payload: Dict[str, Any]) -> List[Path]:
+    ids = payload.get('dataset_ids')
+    if payload.get('dataset_id'):
+        ids = [payload['dataset_id']]
+    if not ids:
+        return dataset_sources(('uploads',), prefer_scrubbed=False)
+    out: List[Path] = []
+    for ds_id in ids:
+        ds_id = str(ds_id)
+        if Path(ds_id).name != ds_id or not ds_id:
+            raise ValueError(f"invalid dataset id: {ds_id!r}")
+        out.append(UPLOADS_DIR / f"{ds_id}.jsonl")
+    return out
+
+
+def _register(src: Path, dst: Path, report: Dict[str, Any]) -> Dict[str, Any]:
+    ds_id = src.stem
+    source_entry: Dict[str, Any] = {}
+    reg = REGISTRY_DATASETS_DIR / f"{ds_id}.json"
+    if reg.exists():
+        try:
+            source_entry = load_json(reg)
+        except Exception:
+            source_entry = {}
+    scrub_id = f"{ds_id}_scrubbed"
+    with file_lock(REGISTRY_DATASETS_DIR / f"{scrub_id}.json"):
+        entry = register_dataset(scrub_id, f"{source_entry.get('name', ds_id)} (scrubbed)", [dst])
+        entry['source_id'] = ds_id
+        if source_entry.get('capability'):
+            entry['capability'] = source_entry['capability']
+        if source_entry.get('tags'):
+            entry['tags'] = source_entry['tags']
+        entry['scrub'] = report
+        write_json(REGISTRY_DATASETS_DIR / f"{scrub_id}.json", entry)
+    return entry
+
+
+def _is_fresh(src: Path, dst: Path, patterns_hash: str) -> bool:
+    """True if dst was scrubbed from the current src with the same patterns."""
+    reg = REGISTRY_DATASETS_DIR / f"{src.stem}_scrubbed.json"
+    try:
+        entry = load_json(reg)
+        st = src.stat()
+    except Exception:
+        return False
+    scrub = entry.get('scrub') or {}
+    return (
+        dst.exists()
+        and scrub.get('patterns_hash') == patterns_hash
+        and scrub.get('source_size') == st.st_size
+        and scrub.get('source_mtime_ns') == st.st_mtime_ns
+    )
+
+
+def run(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mask guardrail PII patterns in uploaded JSONL datasets.
+    Inputs: payload may include {dataset_id?: str, dataset_ids?: List[str], pii_regex?: List[str],
+            workers?: int, chunk_bytes?: int, force?: bool}
+    Outputs: artifacts/datasets/scrubbed/<dataset_id>.jsonl per source, registered as <dataset_id>_scrubbed
+    with per-file line/mask counts. String values of JSON records are masked; non-JSON lines are masked whole.
+    Large files are split into line-aligned ranges scrubbed in a process pool and concatenated in order,
+    so output bytes do not depend on the worker count. Sources unchanged since their last scrub are skipped.
+    """
+    patterns = _pii_patterns(payload)
+    patterns_hash = config_hash({'pii_regex': patterns})
+    chunk_bytes = max(1, int(payload.get('chunk_bytes', CHUNK_BYTES)))
+    workers = max(1, int(payload.get('workers') or os.cpu_count() or 1))
+    force = bool(payload.get('force', False))
+    sources = _resolve_sources(payload)
+
+    SCRUBBED_DIR.mkdir(parents=True, exist_ok=True)
+    # one part directory per run: concurrent scrubs of the same dataset must not share part files
+    parts_root = SCRUBBED_DIR / '.parts'
+    parts_dir = parts_root / (current_job_id() or f"run_{uuid.uuid4().hex[:10]}")
+    files: List[Dict[str, Any]] = []
+    plan: List[Tuple[Path, Path, os.stat_result, List[Tuple[int, int, str]]]] = []
+    for src in sources:
+        dst = SCRUBBED_DIR / src.name
+        if not src.exists():
+            files.append({'dataset_id': src.stem, 'status': 'missing', 'source': str(src)})
+            continue
+        if not force and _is_fresh(src, dst, patterns_hash):
+            files.append({'dataset_id': src.stem, 'status': 'skipped', 'output': str(dst)})
+            continue
+        st = src.stat()
+        bounds = _chunk_bounds(src, st.st_size, chunk_bytes)
+        ranges = [
+            (a, b, str(parts_dir / f"{src.stem}.{i:05d}.part"))
+            for i, (a, b) in enumerate(zip(bounds, bounds[1:]))
+        ]
+        plan.append((src, dst, st, ranges))
+
+    tasks = [(str(src), a, b, part, patterns) for src, _, _, ranges in plan for a, b, part in ranges]
+    results: List[Dict[str, Any]] = []
+    try:
+        if tasks:
+            parts_dir.mkdir(parents=True, exist_ok=True)
+            workers = min(workers, len(tasks))
+            if workers > 1:
+                # spawn keeps the pool safe to start from a threaded server (and matches Windows)
+                ctx = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                    futures = [pool.submit(_scrub_range, *t) for t in tasks]
+                    try:
+                        for fut in futures:
+                            results.append(fut.result())
+                            check_cancelled()
+                    except JobCancelled:
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        raise
+            else:
+                for t in tasks:
+                    check_cancelled()
+                    results.append(_scrub_range(*t))
+
+        k = 0
+        for src, dst, st, ranges in plan:
+            check_cancelled()
+            stats = results[k:k + len(ranges)]
+            k += len(ranges)
+            with atomic_open(dst, 'wb') as wf:
+                for _, _, part in ranges:
+                    with open(part, 'rb') as pf:
+                        while True:
+                            buf = pf.read(1 << 20)
+                            if not buf:
+                                break
+                            wf.write(buf)
+            for _, _, part in ranges:
+                os.remove(part)
+            report = _merge(stats)
+            report.update({
+                'patterns': patterns,
+                'patterns_hash': patterns_hash,
+                'source_size': st.st_size,
+                'source_mtime_ns': st.st_mtime_ns,
+                'chunks': len(ranges),
+                'scrubbed_at': now_iso(),
+            })
+            entry = _register(src, dst, report)
+            files.append({
+                'dataset_id': src.stem,
+                'status': 'scrubbed',
+                'output': str(dst),
+                'registry_id': entry['id'],
+                'lines': report['lines'],
+                'lines_changed': report['lines_changed'],
+                'masked': report['masked'],
+            })
+    finally:
+        # also on failure or cancellation: no part files are left behind
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        try:
+            parts_root.rmdir()
+        except OSError:
+            pass
+    return {
+        'status': 'ok',
+        'workers': workers if tasks else 0,
+        'files': files,
+        'masked_total': sum(sum(f.get('masked', {}).values()) for f in files),
+    }
@@ -4,7 +4,6 @@ from typing import Dict, Any, List
 import json
 import re
 from ..core.utils.io import ARTIFACTS_DIR, now_iso, write_json
-from ..core.utils.seeds import set_global_seed
 
 
 def _score(a: str, b: str) -> float:
@@ -27,7 +26,6 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     Output file: artifacts/chat/self_eval_<seed>.json
     """
     seed = int(payload.get('seed', 1337))
-    set_global_seed(seed)
     items: List[Dict[str, str]] = payload.get('items') or []
     # If no items provided, create a tiny synthetic set to keep offline determinism
     if not items:
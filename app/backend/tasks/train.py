@@ -1,23 +1,25 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Any, Dict, List
-import csv
-import math
+from typing import Any, Dict, Iterator, List
 from ..core.utils.io import (
     WORDNET_ROOT,
     ARTIFACTS_INDICES,
-    ARTIFACTS_DATASETS,
     ARTIFACTS_DIR,
     REGISTRY_MODELS_DIR,
     REGISTRY_NN_DIR,
     write_json,
+    write_ndjson,
     now_iso,
     MODULES_DIR,
 )
-from ..core.utils.seeds import set_global_seed
 import json
 from ..core.runtime.bubble import build_bubble_model
+from ..core.utils.dataset_reader import DatasetReader, dialog_text, DIALOG_FIELDS
 from ..core.utils.io import load_json
+from ..core.utils.blobstore import put_file, put_json
+from ..core.runtime.scheduler import check_cancelled
+import os
+import threading
 
 # Note: This module is imported via relative path from core.runtime.scheduler
 # ensure imports resolve when package is app.backend
@@ -55,43 +57,47 @@ POS_MAP = {
 }
 
 
+def _wordnet_index_records() -> Iterator[Dict[str, Any]]:
+    for p in _wordnet_index_paths():
+        if not p.exists():
+            continue
+        pos = POS_MAP.get(p.name, "?")
+        with p.open("r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith(" ") or line.startswith("#"):
+                    continue
+                parts = line.split()
+                # heuristic: offsets are the trailing integers; lemma is first token
+                if len(parts) < 3:
+                    continue
+                lemma = parts[0]
+                # find last N integer tokens (sense offsets); ensure at least one
+                offsets: List[int] = []
+                for tok in parts[::-1]:
+                    try:
+                        offsets.append(int(tok))
+                    except ValueError:
+                        # stop when tokens no longer parse as int (reached non-offset zone)
+                        break
+                if not offsets:
+                    continue
+                offsets = list(reversed(offsets))
+                yield {
+                    "lemma": lemma,
+                    "pos": pos,
+                    "offsets": offsets[:8],  # cap to keep file small-ish
+                }
+
+
 def build_wordnet_index() -> Path:
     ARTIFACTS_INDICES.mkdir(parents=True, exist_ok=True)
     out = ARTIFACTS_INDICES / "wordnet-lexicon.jsonl"
-    count = 0
-    with out.open("w", encoding="utf-8") as wf:
-        for p in _wordnet_index_paths():
-            if not p.exists():
-                continue
-            pos = POS_MAP.get(p.name, "?")
-            with p.open("r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith(" ") or line.startswith("#"):
-                        continue
-                    parts = line.split()
-                    # heuristic: offsets are the trailing integers; lemma is first token
-                    if len(parts) < 3:
-                        continue
-                    lemma = parts[0]
-                    # find last N integer tokens (sense offsets); ensure at least one
-                    offsets: List[int] = []
-                    for tok in parts[::-1]:
-                        try:
-                            offsets.append(int(tok))
-                        except ValueError:
-                            # stop when tokens no longer parse as int (reached non-offset zone)
-                            break
-                    if not offsets:
-                        continue
-                    offsets = list(reversed(offsets))
-                    rec = {
-                        "lemma": lemma,
-                        "pos": pos,
-                        "offsets": offsets[:8],  # cap to keep file small-ish
-                    }
-                    wf.write(f"{rec}\n")
-                    count += 1
+    # stream to a scratch file, then hand it to the blob store (a rebuild with unchanged WordNet
+    # files dedupes to the existing blob and leaves the index file untouched)
+    tmp = out.with_name(f".{out.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write_ndjson(tmp, _wordnet_index_records())
+    put_file(tmp, dest=out, move=True)
     # write small metrics-ish sidecar if desired later
     return out
 
@@ -133,8 +139,8 @@ def train_predictor_baseline(payload: Dict[str, Any]) -> Dict[str, Any]:
     ckpt_dir = MODULES_DIR / "predictor-finance" / "models"
     ckpt_dir.mkdir(parents=True, exist_ok=True)
     ckpt = {"type": "moving_average", "window": window, "seed": seed, "nn_id": nn_id}
-    write_json(ckpt_dir / f"{model_id}.json", ckpt)
-    reg_path = register_model("predictor-finance", model_id, "predictor", "forecast", {"checkpoint": str(ckpt_dir / f"{model_id}.json"), "window": window, "train_seed": seed}, nn_id=nn_id)
+    ckpt_sha = put_json(ckpt_dir / f"{model_id}.json", ckpt)
+    reg_path = register_model("predictor-finance", model_id, "predictor", "forecast", {"checkpoint": str(ckpt_dir / f"{model_id}.json"), "checkpoint_blob": ckpt_sha, "window": window, "train_seed": seed}, nn_id=nn_id)
     return {"model_id": model_id, "registry": str(reg_path)}
 
 
@@ -143,35 +149,19 @@ def build_chat_ngram_from_datasets(seed: int, order: int = 3) -> Path:
     Deterministic and offline; caps contexts for footprint.
     """
     from collections import defaultdict
-    set_global_seed(seed)
     chat_dir = ARTIFACTS_DIR / "chat"
     chat_dir.mkdir(parents=True, exist_ok=True)
     out_path = chat_dir / "lm_ngram.json"
 
     # Collect sources
-    synths = sorted(ARTIFACTS_DATASETS.glob("wordnet_synth_*.jsonl"), key=lambda p: p.name)
-    uploads_dir = ARTIFACTS_DATASETS / "uploads"
-    uploads = sorted(uploads_dir.glob("*.jsonl"), key=lambda p: p.name) if uploads_dir.exists() else []
-    sources = synths + uploads
+    reader = DatasetReader(("synth", "uploads"), fields=DIALOG_FIELDS, limit_per_file=2000)
+    sources = reader.sources()
 
     corpus = ""
     built_from = None
     if sources:
         built_from = ",".join([p.name for p in sources[:3]]) + ("+" if len(sources) > 3 else "")
-        for ds in sources:
-            try:
-                with ds.open("r", encoding="utf-8") as f:
-                    for k, line in enumerate(f):
-                        if k >= 2000:
-                            break
-                        try:
-                            obj = json.loads(line)
-                        except Exception:
-                            obj = {"text": line.strip()}
-                        txt = str(obj.get("response", "")) + "\n" + str(obj.get("prompt", obj.get("text", ""))) + "\n"
-                        corpus += txt
-            except Exception:
-                continue
+        corpus = "".join(dialog_text(rec) for rec in reader)
 
     if not corpus:
         # As last resort, create a minimal corpus
@@ -180,6 +170,8 @@ def build_chat_ngram_from_datasets(seed: int, order: int = 3) -> Path:
     order = max(1, int(order))
     counts: Dict[str, Dict[str, int]] = defaultdict(dict)
     for i in range(len(corpus) - order):
+        if not i & 0xFFFF:
+            check_cancelled()
         ctx = corpus[i:i+order]
         nxt = corpus[i+order]
         bucket = counts.setdefault(ctx, {})
@@ -187,7 +179,7 @@ def build_chat_ngram_from_datasets(seed: int, order: int = 3) -> Path:
 
     # Persist capped counts for footprint
     capped = {k: v for k, v in list(counts.items())[:20000]}
-    write_json(out_path, {"order": order, "counts": capped, "seed": seed, "built_from": built_from})
+    put_json(out_path, {"order": order, "counts": capped, "seed": seed, "built_from": built_from})
     return out_path
 
 
@@ -205,6 +197,7 @@ def train_chat_core(payload: Dict[str, Any]) -> Dict[str, Any]:
         order = 3
     # Build/update tiny LM from datasets and register a retrieval-first chat model
     lm_path = build_chat_ngram_from_datasets(seed, order=order)
+    check_cancelled()
     # Also (re)build shared bubble model for early-stage babbling across modules
     try:
         bubble_path = build_bubble_model(seed)
@@ -224,6 +217,7 @@ def train_lexicon(payload: Dict[str, Any]) -> Dict[str, Any]:
     seed = int(payload.get("seed", 1337))
     # Build index and bubble (shared)
     idx = str(build_wordnet_index())
+    check_cancelled()
     try:
         bub = str(build_bubble_model(seed))
     except Exception:
@@ -244,10 +238,10 @@ MODULE_ACTIONS = {
 def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     module_id = payload.get("module_id")
     seed = int(payload.get("seed", 1337))
-    set_global_seed(seed)
     if module_id not in MODULE_ACTIONS:
         raise ValueError(f"Unknown module_id: {module_id}")
     action = MODULE_ACTIONS[module_id]
     out = action(payload)
+    check_cancelled()
     out.update({"module_id": module_id, "seed": seed, "status": "ok"})
     return out
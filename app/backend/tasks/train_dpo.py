@@ -2,22 +2,15 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Any, List, Tuple
 import json
-import hashlib
-import random
-from ..core.utils.io import ARTIFACTS_DIR, ARTIFACTS_DATASETS, ARTIFACTS_INDICES, write_json, now_iso
-from ..core.utils.seeds import set_global_seed
-
-
-def _sha256_path(p: Path) -> str:
-    h = hashlib.sha256()
-    with p.open('rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+from ..core.utils.io import ARTIFACTS_DIR, ARTIFACTS_INDICES, write_json, now_iso, compute_sha256
+from ..core.utils.blobstore import put_json
+from ..core.utils.seeds import make_rng
+from ..core.utils.dataset_reader import DatasetReader
+from ..core.runtime.scheduler import check_cancelled
 
 
 def _code_hash() -> str:
-    return _sha256_path(Path(__file__))
+    return compute_sha256(Path(__file__))
 
 
 def _collect_pairs(max_items: int = 500) -> List[Tuple[str, str, str]]:
@@ -25,32 +18,20 @@ def _collect_pairs(max_items: int = 500) -> List[Tuple[str, str, str]]:
     Prefer uploaded/synth datasets; if unavailable, derive from WordNet lemmas.
     """
     pairs: List[Tuple[str, str, str]] = []
-    uploads_dir = ARTIFACTS_DATASETS / 'uploads'
-    sources: List[Path] = []
-    if uploads_dir.exists():
-        sources.extend(sorted(uploads_dir.glob('*.jsonl')))
-    sources.extend(sorted(ARTIFACTS_DATASETS.glob('wordnet_synth_*.jsonl')))
-    for p in sources:
-        with p.open('r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                if len(pairs) >= max_items:
-                    break
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    obj = {"text": line.strip()}
-                prompt = str(obj.get('prompt') or obj.get('text') or '')
-                pos = str(obj.get('pos') or '')
-                # Create synthetic chosen vs rejected: chosen includes a definition-like phrase
-                chosen = (obj.get('response') or '').strip() or (prompt + " is defined.")
-                rejected = prompt.strip()
-                if not prompt:
-                    continue
-                if chosen == rejected:
-                    chosen = f"Answer: {chosen}"
-                pairs.append((prompt, str(chosen), str(rejected)))
-        if len(pairs) >= max_items:
-            break
+    reader = DatasetReader(
+        ('uploads', 'synth'),
+        fields=('prompt', 'response', 'text'),
+        limit=max_items,
+        where=lambda o: bool(o.get('prompt') or o.get('text')),
+    )
+    for obj in reader:
+        prompt = str(obj.get('prompt') or obj.get('text') or '')
+        # Create synthetic chosen vs rejected: chosen includes a definition-like phrase
+        chosen = (obj.get('response') or '').strip() or (prompt + " is defined.")
+        rejected = prompt.strip()
+        if chosen == rejected:
+            chosen = f"Answer: {chosen}"
+        pairs.append((prompt, str(chosen), str(rejected)))
     if not pairs:
         # Fallback from WordNet index
         idx = ARTIFACTS_INDICES / 'wordnet-lexicon.jsonl'
@@ -79,7 +60,6 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     seed = int(payload.get('seed', 1337))
     steps = int(payload.get('steps', 5))
-    set_global_seed(seed)
 
     def score(p: str, a: str) -> float:
         import re
@@ -87,12 +67,13 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
         return float(len(S))
 
     pairs = _collect_pairs()
+    check_cancelled()
     # Base margin
     margins = [score(p, c) - score(p, r) for (p, c, r) in pairs[:200]]
     base_margin = sum(margins) / max(1, len(margins))
 
     # "Training": rewrite rejected slightly or strengthen chosen tokens
-    rng = random.Random(seed)
+    rng = make_rng(seed)
     improved_pairs = []
     for (p, c, r) in pairs[:200]:
         # append a small suffix to chosen to increase lexical set size deterministically
@@ -105,7 +86,7 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     run_dir = ARTIFACTS_DIR / 'chat' / f'dpo_{seed}'
     run_dir.mkdir(parents=True, exist_ok=True)
     ckpt = run_dir / f'ckpt_dpo_{seed}.json'
-    write_json(ckpt, {'seed': seed, 'suffix': ' therefore'})
+    ckpt_sha = put_json(ckpt, {'seed': seed, 'suffix': ' therefore'})
 
     metrics = {
         'job': 'train_dpo',
@@ -121,7 +102,8 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
         'created_at': now_iso(),
         'code_hash': _code_hash(),
         'dataset_hash': '',
-        'artifacts': {'ckpt': str(ckpt), 'metrics': str(run_dir / 'metrics.json')}
+        'artifacts': {'ckpt': str(ckpt), 'metrics': str(run_dir / 'metrics.json')},
+        'blobs': {'ckpt': ckpt_sha},
     }
     write_json(run_dir / 'run.json', run_info)
     return {'status': 'ok', 'run_dir': str(run_dir), 'metrics': metrics, 'run': run_info}
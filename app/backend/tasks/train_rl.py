@@ -1,21 +1,13 @@
 from __future__ import annotations
 from typing import Dict, Any
 from pathlib import Path
-import hashlib
-from ..core.utils.io import ARTIFACTS_DIR, write_json, now_iso
-from ..core.utils.seeds import set_global_seed
-
-
-def _sha256_path(p: Path) -> str:
-    h = hashlib.sha256()
-    with p.open('rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+from ..core.utils.io import ARTIFACTS_DIR, write_json, now_iso, compute_sha256
+from ..core.utils.blobstore import put_json
+from ..core.runtime.scheduler import check_cancelled
 
 
 def _code_hash() -> str:
-    return _sha256_path(Path(__file__))
+    return compute_sha256(Path(__file__))
 
 
 def run(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -24,7 +16,6 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     We compute a simple policy parameter that increases probability of the better arm.
     """
     seed = int(payload.get('seed', 1337))
-    set_global_seed(seed)
 
     # Bandit arms: arm0 ~ N(0.0, 1), arm1 ~ N(0.5, 1) but deterministic pseudo rewards
     # Deterministic pseudo-rewards via hash of (seed, t, arm)
@@ -46,6 +37,7 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     baseline = 0.0
     avg_rewards = []
     for t in range(T):
+        check_cancelled()
         p1 = sigmoid(theta)
         # choose action deterministically by thresholding p1 with a fixed schedule
         a = 1 if (t % 100) < int(p1 * 100) else 0
@@ -63,7 +55,7 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     run_dir = ARTIFACTS_DIR / 'rl' / f'ppo_{seed}'
     run_dir.mkdir(parents=True, exist_ok=True)
     ckpt = run_dir / f'ckpt_ppo_{seed}.json'
-    write_json(ckpt, {'seed': seed, 'theta': theta})
+    ckpt_sha = put_json(ckpt, {'seed': seed, 'theta': theta})
 
     metrics = {
         'job': 'train_rl',
@@ -80,7 +72,8 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
         'created_at': now_iso(),
         'code_hash': _code_hash(),
         'dataset_hash': '',
-        'artifacts': {'ckpt': str(ckpt), 'metrics': str(run_dir / 'metrics.json')}
+        'artifacts': {'ckpt': str(ckpt), 'metrics': str(run_dir / 'metrics.json')},
+        'blobs': {'ckpt': ckpt_sha},
     }
     write_json(run_dir / 'run.json', run_info)
 
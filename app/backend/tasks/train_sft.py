@@ -5,53 +5,26 @@ import json
 import hashlib
 import math
 import random
-from ..core.utils.io import ARTIFACTS_DIR, ARTIFACTS_DATASETS, ARTIFACTS_INDICES, write_json, now_iso
-from ..core.utils.seeds import set_global_seed
-
-
-def _sha256_path(p: Path) -> str:
-    h = hashlib.sha256()
-    with p.open('rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+from ..core.utils.io import ARTIFACTS_DIR, ARTIFACTS_INDICES, write_json, now_iso, compute_sha256
+from ..core.utils.blobstore import put_json
+from ..core.utils.dataset_reader import DatasetReader, DIALOG_FIELDS
+from ..core.runtime.scheduler import check_cancelled
 
 
 def _code_hash() -> str:
     p = Path(__file__)
-    return _sha256_path(p)
+    return compute_sha256(p)
+
+
+def _sft_text(obj: Dict[str, Any]) -> str:
+    return str(obj.get('response') or obj.get('text') or obj.get('prompt') or '')
 
 
 def _collect_corpus(max_items: int = 2000) -> Tuple[str, List[Path]]:
-    corpus = ""
-    sources: List[Path] = []
     # Prefer uploaded/synth chat datasets
-    uploads_dir = ARTIFACTS_DATASETS / 'uploads'
-    if uploads_dir.exists():
-        for f in sorted(uploads_dir.glob('*.jsonl')):
-            sources.append(f)
-    for f in sorted(ARTIFACTS_DATASETS.glob('wordnet_synth_*.jsonl')):
-        sources.append(f)
-    count = 0
-    for p in sources:
-        try:
-            with p.open('r', encoding='utf-8') as fp:
-                for line in fp:
-                    if count >= max_items:
-                        break
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        obj = {"text": line.strip()}
-                    txt = str(obj.get('response') or obj.get('text') or obj.get('prompt') or '')
-                    if not txt:
-                        continue
-                    corpus += txt + "\n"
-                    count += 1
-        except Exception:
-            continue
-        if count >= max_items:
-            break
+    reader = DatasetReader(('uploads', 'synth'), fields=DIALOG_FIELDS, limit=max_items, where=lambda o: bool(_sft_text(o)))
+    sources: List[Path] = reader.sources()
+    corpus = "".join(_sft_text(obj) + "\n" for obj in reader)
     if not corpus:
         # Fallback: lemmas from WordNet index
         idx = ARTIFACTS_INDICES / 'wordnet-lexicon.jsonl'
@@ -114,7 +87,6 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     seed = int(payload.get('seed', 1337))
     order = int(payload.get('order', 3))
     steps = int(payload.get('steps', 5))  # tiny smoke run
-    set_global_seed(seed)
 
     corpus, sources = _collect_corpus()
     # Split deterministically
@@ -128,6 +100,7 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     # "Training": reinforce observed transitions by a small factor over multiple passes
     counts = {k: v.copy() for k, v in base_counts.items()}
     for s in range(steps):
+        check_cancelled()
         # Sample positions deterministically based on seed
         rng = random.Random(seed + s)
         n = len(train_txt)
@@ -145,7 +118,7 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     run_dir = ARTIFACTS_DIR / 'chat' / f'sft_{seed}'
     run_dir.mkdir(parents=True, exist_ok=True)
     ckpt_path = run_dir / f'ckpt_sft_{seed}.json'
-    write_json(ckpt_path, {"order": order, "counts": {k: v for k, v in list(counts.items())[:20000]}, "seed": seed})
+    ckpt_sha = put_json(ckpt_path, {"order": order, "counts": {k: v for k, v in list(counts.items())[:20000]}, "seed": seed})
 
     # Metrics and run info
     metrics = {
@@ -173,7 +146,8 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
         'created_at': now_iso(),
         'code_hash': _code_hash(),
         'dataset_hash': data_hash.hexdigest(),
-        'artifacts': {'ckpt': str(ckpt_path), 'metrics': str(run_dir / 'metrics.json')}
+        'artifacts': {'ckpt': str(ckpt_path), 'metrics': str(run_dir / 'metrics.json')},
+        'blobs': {'ckpt': ckpt_sha},
     }
     write_json(run_dir / 'run.json', run_info)
 
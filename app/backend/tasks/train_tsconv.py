@@ -2,22 +2,14 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Any, List
 import csv
-import hashlib
 import math
-from ..core.utils.io import ARTIFACTS_DIR, write_json, now_iso, ROOT
-from ..core.utils.seeds import set_global_seed
-
-
-def _sha256_path(p: Path) -> str:
-    h = hashlib.sha256()
-    with p.open('rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+from ..core.utils.io import ARTIFACTS_DIR, write_json, now_iso, ROOT, compute_sha256
+from ..core.utils.blobstore import put_json
+from ..core.runtime.scheduler import check_cancelled
 
 
 def _code_hash() -> str:
-    return _sha256_path(Path(__file__))
+    return compute_sha256(Path(__file__))
 
 
 def _read_close_prices() -> List[float]:
@@ -70,11 +62,11 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     Deterministic; writes ckpt and metrics.
     """
     seed = int(payload.get('seed', 1337))
-    set_global_seed(seed)
     w_short = int(payload.get('w_short', 3))
     w_long = int(payload.get('w_long', 12))
 
     y = _read_close_prices()
+    check_cancelled()
     ma_s = _ma(y, w_short)
     ma_l = _ma(y, w_long)
 
@@ -106,7 +98,7 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
     run_dir = ARTIFACTS_DIR / 'predictor' / f'tsconv_{seed}'
     run_dir.mkdir(parents=True, exist_ok=True)
     ckpt = run_dir / f'ckpt_tsconv_{seed}.json'
-    write_json(ckpt, {'seed': seed, 'w_short': w_short, 'w_long': w_long, 'a': a, 'b': b})
+    ckpt_sha = put_json(ckpt, {'seed': seed, 'w_short': w_short, 'w_long': w_long, 'a': a, 'b': b})
 
     metrics = {
         'job': 'train_tsconv',
@@ -127,7 +119,8 @@ def run(payload: Dict[str, Any]) -> Dict[str, Any]:
         'created_at': now_iso(),
         'code_hash': _code_hash(),
         'dataset_hash': '',
-        'artifacts': {'ckpt': str(ckpt), 'metrics': str(run_dir / 'metrics.json')}
+        'artifacts': {'ckpt': str(ckpt), 'metrics': str(run_dir / 'metrics.json')},
+        'blobs': {'ckpt': ckpt_sha},
     }
     write_json(run_dir / 'run.json', run_info)
 
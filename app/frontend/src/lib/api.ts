@@ -91,8 +91,39 @@ export async function latestMetrics(capability: string, model_id?: string){
   if(!res.ok) throw new Error('Failed to load latest metrics')
   return res.json()
 }
+export async function metricsHistory(capability: string, opts: { model_id?: string, since?: string, until?: string, limit?: number } = {}){
+  const qp = new URLSearchParams({ capability })
+  for(const [k, v] of Object.entries(opts)) if(v !== undefined && v !== '') qp.set(k, String(v))
+  const res = await fetch(`/api/metrics/history?${qp.toString()}`)
+  if(!res.ok) throw new Error('Failed to load metrics history')
+  return res.json()
+}
+export async function metricsRollups(capability: string, metric: string, opts: { model_id?: string, period?: 'hour' | 'day', since?: string, until?: string } = {}){
+  const qp = new URLSearchParams({ capability, metric })
+  for(const [k, v] of Object.entries(opts)) if(v !== undefined && v !== '') qp.set(k, String(v))
+  const res = await fetch(`/api/metrics/rollups?${qp.toString()}`)
+  if(!res.ok) throw new Error('Failed to load metrics rollups')
+  return res.json()
+}
 
-// Jobs
+// Jobs (queued server-side: poll until the job ends so callers still get the final record)
+export async function getJob(job_id: string){
+  const res = await fetch(`/api/jobs/${encodeURIComponent(job_id)}`)
+  if(!res.ok) throw new Error('Failed to load job')
+  return res.json()
+}
+export async function cancelJob(job_id: string){
+  const res = await fetch(`/api/jobs/${encodeURIComponent(job_id)}/cancel`, { method: 'POST' })
+  if(!res.ok) throw new Error('Cancel job failed')
+  return res.json()
+}
+export async function waitJob(job_id: string, intervalMs = 1000){
+  for(;;){
+    const job = await getJob(job_id)
+    if(['finished', 'failed', 'cancelled'].includes(job?.status)) return { ok: job.status === 'finished', job_id, job }
+    await new Promise(r => setTimeout(r, intervalMs))
+  }
+}
 export async function trainJob(module_id: string, seed: number, nn_id?: string){
   const payload: any = { module_id, seed }
   if(nn_id) payload.nn_id = nn_id
@@ -101,7 +132,8 @@ export async function trainJob(module_id: string, seed: number, nn_id?: string){
     body: JSON.stringify(payload)
   })
   if(!res.ok) throw new Error('Train job failed')
-  return res.json()
+  const queued = await res.json()
+  return waitJob(queued.job_id)
 }
 export async function evaluateJob(module_id: string, seed: number, model_id?: string){
   const res = await fetch('/api/evaluate', {
@@ -109,7 +141,8 @@ export async function evaluateJob(module_id: string, seed: number, model_id?: st
     body: JSON.stringify({ module_id, seed, model_id })
   })
   if(!res.ok) throw new Error('Evaluate job failed')
-  return res.json()
+  const queued = await res.json()
+  return waitJob(queued.job_id)
 }
 
 // Runtime
@@ -0,0 +1 @@
+"""Hot-path benchmark suite for the backend (python -m bench --help)."""
@@ -0,0 +1,232 @@
+from __future__ import annotations
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from .cases import CASES
+from .fixtures import DEFAULT_SEED, SCALES, ensure_fixtures
+from .report import DEFAULT_MIN_DELTA_S, DEFAULT_THRESHOLD, compare, format_comparison, format_load, format_results
+
+# python -m bench run      generate/reuse fixtures, time every case, write results JSON
+# python -m bench compare  compare a results file against the stored baseline (exit 1 on regression)
+# python -m bench load     throughput, latency and saturation point of /api/runtime/post under load
+# python -m bench fixtures only generate the fixtures for a scale
+ROOT = Path(__file__).resolve().parents[1]
+BENCH_DIR = ROOT / "bench"
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINES_DIR = BENCH_DIR / "baselines"
+DEFAULT_WORKDIR = Path(os.environ.get("RIAI_BENCH_DIR") or BENCH_DIR / ".work")
+
+# generated or machine-local state that a fresh benchmark tree must not inherit
+_ARTIFACTS_SKIP = ("cache", "blobs", "traces", "indices", "jobs", "metrics", "metrics_history", "bench")
+_IGNORE = shutil.ignore_patterns("__pycache__", "*.pyc", ".work", "results", "baselines")
+
+
+def _link(src: Path, dst: Path) -> None:
+    """Hard link (fixtures are read-only inputs); symlink or copy where that is not possible."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        try:
+            os.symlink(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def prepare_tree(workdir: Path, scale: str, manifest: Dict[str, Any]) -> Path:
+    """A scratch copy of the backend with the current code, registry and datasets, the scale fixtures
+    linked in and no generated artifacts (the WordNet index is rebuilt at startup)."""
+    tree = workdir / "tree"
+    if tree.exists():
+        shutil.rmtree(tree)
+    (tree / "app").mkdir(parents=True)
+    shutil.copy2(ROOT / "app" / "__init__.py", tree / "app" / "__init__.py")
+    for rel in ("app/backend", "app/modules", "app/registry", "docs/specs", "bench"):
+        shutil.copytree(ROOT / rel, tree / rel, ignore=_IGNORE)
+    shutil.copy2(ROOT / "neural_networks.yaml", tree / "neural_networks.yaml")
+    try:
+        os.symlink(ROOT / "WordNet-3.0", tree / "WordNet-3.0", target_is_directory=True)
+    except OSError:
+        shutil.copytree(ROOT / "WordNet-3.0", tree / "WordNet-3.0")
+    artifacts = ROOT / "app" / "artifacts"
+    (tree / "app" / "artifacts").mkdir()
+    for child in artifacts.iterdir() if artifacts.exists() else []:
+        if child.name in _ARTIFACTS_SKIP:
+            continue
+        if child.is_dir():
+            shutil.copytree(child, tree / "app" / "artifacts" / child.name, ignore=_IGNORE)
+        else:
+            shutil.copy2(child, tree / "app" / "artifacts" / child.name)
+    fixtures = workdir / "fixtures" / scale
+    for u in manifest["uploads"]:
+        _link(fixtures / "uploads" / u["file"], tree / "app" / "artifacts" / "datasets" / "uploads" / u["file"])
+    _link(fixtures / manifest["ohlcv"]["file"], tree / "app" / "modules" / "predictor-finance" / "data" / "samples" / "ohlcv.csv")
+    return tree
+
+
+def _git_info() -> Dict[str, Any] | None:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=30)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if commit.returncode != 0:
+        return None
+    return {"commit": commit.stdout.strip(), "dirty": bool(dirty.stdout.strip())}
+
+
+def _run_in_tree(workdir: Path, scale: str, seed: int, module: str, args: List[str]) -> Dict[str, Any]:
+    """Fixtures + fresh scratch tree, then `python -m <module> ... --out` inside it; returns its JSON."""
+    print(f"fixtures ({scale}) in {workdir} ...", file=sys.stderr, flush=True)
+    manifest = ensure_fixtures(workdir, scale, seed, ROOT / "WordNet-3.0")
+    tree = prepare_tree(workdir, scale, manifest)
+    raw = workdir / f"{module.rsplit('.', 1)[-1]}.json"
+    cmd = [sys.executable, "-m", module, "--seed", str(seed), "--out", str(raw)] + args
+    if manifest.get("index_topup"):
+        cmd += ["--index-topup", str(workdir / "fixtures" / scale / manifest["index_topup"]["file"])]
+    env = dict(os.environ, PYTHONPATH=str(tree), PYTHONDONTWRITEBYTECODE="1")
+    subprocess.run(cmd, cwd=tree, env=env, check=True)
+    measured = json.loads(raw.read_text(encoding="utf-8"))
+    measured["fixtures"] = manifest
+    return measured
+
+
+def run(scale: str, seed: int, workdir: Path, only: List[str] | None = None, out: Path | None = None) -> Path:
+    measured = _run_in_tree(workdir, scale, seed, "bench.cases", ["--scale", scale] + (["--cases", ",".join(only)] if only else []))
+    result = {
+        "suite": "riai-bench",
+        "version": 1,
+        "created_at": datetime.now().astimezone().isoformat(),
+        "scale": scale,
+        "seed": seed,
+        "git": _git_info(),
+        "env": measured["env"],
+        "fixtures": measured["fixtures"],
+        "meta": measured["meta"],
+        "cases": measured["cases"],
+    }
+    if out is None:
+        out = RESULTS_DIR / f"{scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return out
+
+
+def load(args: argparse.Namespace) -> Path:
+    """Load test: in-process against the scratch tree, or against --url as is."""
+    opts = ["--duration", str(args.duration), "--mix", args.mix, "--slo-ms", str(args.slo_ms), "--warmup", str(args.warmup)]
+    if args.concurrency:
+        opts += ["--concurrency", args.concurrency]
+    if args.rate:
+        opts += ["--rate", args.rate]
+    if args.url:
+        from . import load as loadgen
+        raw = args.workdir / "load.json"
+        raw.parent.mkdir(parents=True, exist_ok=True)
+        loadgen.main(opts + ["--url", args.url, "--seed", str(args.seed), "--out", str(raw)])
+        measured = json.loads(raw.read_text(encoding="utf-8"))
+    else:
+        measured = _run_in_tree(args.workdir, args.scale, args.seed, "bench.load", opts)
+        measured["scale"] = args.scale
+    result = {"suite": "riai-load", "version": 1, "created_at": datetime.now().astimezone().isoformat(), "git": _git_info()}
+    result.update(measured)
+    out = args.out or RESULTS_DIR / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return out
+
+
+def _compare_files(current_path: Path, baseline_path: Path | None, threshold: float, min_delta_s: float) -> int:
+    current = json.loads(current_path.read_text(encoding="utf-8"))
+    baseline_path = baseline_path or BASELINES_DIR / f"{current.get('scale')}.json"
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path} (store one with: python -m bench run --save-baseline)", file=sys.stderr)
+        return 2
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    rows, warnings = compare(baseline, current, threshold, min_delta_s)
+    print(format_comparison(rows, warnings))
+    regressions = [r["case"] for r in rows if r["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench", description="Backend hot-path benchmarks at production scale.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="time the hot paths and write a results JSON")
+    p_run.add_argument("--scale", choices=sorted(SCALES), default="full")
+    p_run.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    p_run.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    p_run.add_argument("--cases", default="", help="comma-separated subset of: " + ",".join(CASES))
+    p_run.add_argument("--out", type=Path, default=None)
+    p_run.add_argument("--compare", action="store_true", help="compare against the stored baseline afterwards")
+    p_run.add_argument("--baseline", type=Path, default=None, help="baseline file (default bench/baselines/<scale>.json)")
+    p_run.add_argument("--save-baseline", action="store_true", help="store this run as the baseline for its scale")
+    p_run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    p_run.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_S)
+
+    p_cmp = sub.add_parser("compare", help="compare a results JSON against a baseline")
+    p_cmp.add_argument("current", type=Path)
+    p_cmp.add_argument("--baseline", type=Path, default=None)
+    p_cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    p_cmp.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_S)
+
+    p_fix = sub.add_parser("fixtures", help="only generate the fixtures for a scale")
+    p_fix.add_argument("--scale", choices=sorted(SCALES), default="full")
+    p_fix.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    p_fix.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+
+    p_load = sub.add_parser("load", help="throughput/latency under concurrent runtime requests (see bench/load.py)")
+    p_load.add_argument("--url", default=None, help="base URL of a running backend (e.g. http://127.0.0.1:8000); default in-process ASGI")
+    p_load.add_argument("--concurrency", default="", help="closed loop levels, e.g. 1,4,16,64 (the default)")
+    p_load.add_argument("--rate", default="", help="open loop arrival rates in req/s, e.g. 25,50,100,200")
+    p_load.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    p_load.add_argument("--mix", default="hit=0.6,miss=0.3,long=0.1", help="query classes: hit, miss (LM fallback), long")
+    p_load.add_argument("--slo-ms", type=float, default=250.0, help="p95 latency budget used for the saturation point")
+    p_load.add_argument("--warmup", type=int, default=20)
+    p_load.add_argument("--scale", choices=sorted(SCALES), default="full", help="fixture set for the in-process tree")
+    p_load.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    p_load.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    p_load.add_argument("--out", type=Path, default=None)
+
+    args = ap.parse_args(argv)
+    if args.cmd == "load":
+        path = load(args)
+        print(format_load(json.loads(path.read_text(encoding="utf-8"))))
+        print(f"results: {path}")
+        return 0
+    if args.cmd == "fixtures":
+        print(json.dumps(ensure_fixtures(args.workdir, args.scale, args.seed, ROOT / "WordNet-3.0"), indent=2))
+        return 0
+    if args.cmd == "compare":
+        return _compare_files(args.current, args.baseline, args.threshold, args.min_delta)
+
+    only = [c for c in args.cases.split(",") if c] or None
+    unknown = [c for c in only or [] if c not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s): {', '.join(unknown)}")
+    path = run(args.scale, args.seed, args.workdir, only, args.out)
+    print(format_results(json.loads(path.read_text(encoding="utf-8"))))
+    print(f"results: {path}")
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, BASELINES_DIR / f"{args.scale}.json")
+        print(f"baseline: {BASELINES_DIR / (args.scale + '.json')}")
+    if args.compare:
+        return _compare_files(path, args.baseline, args.threshold, args.min_delta)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
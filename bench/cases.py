@@ -0,0 +1,173 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from .fixtures import DEFAULT_SEED, SCALES
+from .report import summarize
+
+# Timed hot paths. Runs as `python -m bench.cases` inside the scratch tree prepared by
+# `python -m bench run` (its own copy of the backend, registry and artifacts, with the scale fixtures
+# linked in), so benchmarks never touch the real app/artifacts. Every case returns
+# (call, reset, batch, meta): call() is one timed sample of `batch` operations and reset() runs
+# untimed before each sample. The first sample is reported apart (first_s: cold caches, lazy loads).
+
+Case = Tuple[Callable[[], Any], Callable[[], None] | None, int, Dict[str, Any]]
+
+QUERIES = [
+    "What does 'dog' mean?",           # quoted lemma: index hit
+    "define bank please",              # unquoted lemma found by scanning
+    "What does 'qwzrtx' mean?",        # unknown lemma: LM fallback
+    "Tell me about the river and the mountain, and how a glacier shapes the valley over time.",
+]
+
+
+def _load_index(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.core.runtime import chat
+
+    return chat.load_index, chat._evict_index, 1, {"records": len(chat.load_index())}
+
+
+def _generate_answer(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.core.runtime.chat import generate_answer
+    rng = random.Random(seed)
+    batch = int(p["answer_batch"])
+    texts = [QUERIES[i % len(QUERIES)] for i in range(batch)]
+
+    def call() -> None:
+        for t in texts:
+            generate_answer(t, rng=rng)
+    return call, None, batch, {"queries": len(QUERIES)}
+
+
+def _apply_guardrails(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.core.runtime.guardrails import apply_guardrails
+    from app.backend.main import _active_guardrails
+    cfg, _ = _active_guardrails()
+    long_text = ("Contact me at jane.doe@example.com or 555-12-3456 about the quarterly numbers. " * 60).strip()
+    batch = int(p["guardrails_batch"])
+    texts = [QUERIES[i % len(QUERIES)] if i % 4 else long_text for i in range(batch)]
+
+    def call() -> None:
+        for t in texts:
+            apply_guardrails(t, cfg)
+    return call, None, batch, {"long_text_chars": len(long_text)}
+
+
+def _readiness(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.main import readiness
+    # first sample: every check runs; then refresh=True steady state (stat inputs, rerun what changed)
+    state = {"first": True}
+
+    def call() -> Any:
+        if state.pop("first", False):
+            return readiness()
+        return readiness(refresh=True)
+    return call, None, 1, {}
+
+
+def _build_chat_ngram(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.tasks.train import build_chat_ngram_from_datasets
+    return (lambda: build_chat_ngram_from_datasets(seed)), None, 1, {}
+
+
+def _train_sft(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.tasks import train_sft
+    return (lambda: train_sft.run({"seed": seed})), None, 1, {}
+
+
+def _train_tsconv(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.tasks import train_tsconv
+    return (lambda: train_tsconv.run({"seed": seed})), None, 1, {}
+
+
+def _eval_predictor_ma(p: Dict[str, Any], seed: int) -> Case:
+    from app.backend.tasks.evaluate import eval_predictor_ma
+    return (lambda: eval_predictor_ma(f"predictor_ma_{seed}", seed)), None, 1, {}
+
+
+# run order matters: the n-gram build precedes generate_answer so LM fallback reads a built model
+CASES: Dict[str, Callable[[Dict[str, Any], int], Case]] = {
+    "load_index": _load_index,
+    "apply_guardrails": _apply_guardrails,
+    "build_chat_ngram_from_datasets": _build_chat_ngram,
+    "generate_answer": _generate_answer,
+    "readiness": _readiness,
+    "train_sft": _train_sft,
+    "train_tsconv": _train_tsconv,
+    "eval_predictor_ma": _eval_predictor_ma,
+}
+
+
+def top_up_index(topup: Path) -> Dict[str, Any]:
+    """Append the fixture's synthetic entries to the index the backend just built."""
+    from app.backend.core.runtime import chat
+    from app.backend.core.utils.io import ARTIFACTS_INDICES
+    idx = ARTIFACTS_INDICES / "wordnet-lexicon.jsonl"
+    tmp = idx.with_name(f".{idx.name}.bench.tmp")
+    with tmp.open("wb") as out:
+        for src in (idx, topup):
+            with src.open("rb") as f:
+                shutil.copyfileobj(f, out)
+    # a new file, not an in-place append: the builder's copy may be hard-linked into the blob store
+    os.replace(tmp, idx)
+    chat._evict_index()
+    with idx.open("rb") as f:
+        return {"records": sum(1 for _ in f), "bytes": idx.stat().st_size}
+
+
+def measure(call: Callable[[], Any], reset: Callable[[], None] | None, repeat: int, batch: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    for _ in range(repeat + 1):
+        if reset is not None:
+            reset()
+        t0 = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples[1:], first=samples[0], batch=batch)
+
+
+def run_cases(scale: str, seed: int = DEFAULT_SEED, only: List[str] | None = None,
+              index_topup: Path | None = None) -> Dict[str, Any]:
+    params = SCALES[scale]
+    t0 = time.perf_counter()
+    import app.backend.main  # noqa: F401  (startup bootstrap: builds the WordNet index)
+    from app.backend.core.utils.env import env_fingerprint
+    meta: Dict[str, Any] = {"bootstrap_s": round(time.perf_counter() - t0, 3)}
+    if index_topup is not None:
+        meta["index"] = top_up_index(index_topup)
+    results: Dict[str, Any] = {}
+    for name, factory in CASES.items():
+        if only and name not in only:
+            continue
+        call, reset, batch, case_meta = factory(params, seed)
+        res = measure(call, reset, int(params["repeat"]), batch)
+        if case_meta:
+            res["meta"] = case_meta
+        results[name] = res
+        print(f"  {name}: median {res['median_s']:.4f}s (first {res['first_s']:.4f}s)", file=sys.stderr, flush=True)
+    return {"env": env_fingerprint(), "meta": meta, "cases": results}
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench.cases")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="full")
+    ap.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    ap.add_argument("--cases", default="", help="comma-separated subset of: " + ",".join(CASES))
+    ap.add_argument("--index-topup", type=Path, default=None, help="synthetic index entries to append first")
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args(argv)
+    only = [c for c in args.cases.split(",") if c] or None
+    out = run_cases(args.scale, args.seed, only, args.index_topup)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
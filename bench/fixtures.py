@@ -0,0 +1,193 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+import json
+import math
+import random
+
+# Deterministic scale fixtures. Everything is derived from (scale, seed) with a private PRNG, so two
+# machines (or two commits) benchmark byte-identical inputs; the manifest written next to the files
+# lets later runs reuse them instead of regenerating a gigabyte of JSONL.
+# The WordNet index is built by the backend itself from the bundled dictionary on startup; when the
+# bundle is partial (checkouts often ship without index.noun), a top-up file of synthetic noun
+# entries brings the index to the size of the full WordNet 3.0 index.
+FIXTURES_VERSION = 1
+DEFAULT_SEED = 1337
+# lemma lines in WordNet 3.0 index.noun + index.verb + index.adj + index.adv
+WORDNET_INDEX_RECORDS = 117_798 + 11_529 + 21_479 + 4_481
+_WORDNET_INDEX_FILES = ("index.noun", "index.verb", "index.adj", "index.adv")
+
+SCALES: Dict[str, Dict[str, Any]] = {
+    # quick sanity pass (seconds): same code paths, tiny inputs
+    "smoke": {
+        "upload_files": 2,
+        "upload_bytes": 4 * 1024 * 1024,
+        "ohlcv_rows": 20_000,
+        "wordnet_records": 0,  # dictionary as bundled, no top-up
+        "repeat": 3,
+        "answer_batch": 20,
+        "guardrails_batch": 200,
+    },
+    # production scale: 1 GiB of chat uploads, multi-million-row OHLCV
+    "full": {
+        "upload_files": 16,
+        "upload_bytes": 1024 * 1024 * 1024,
+        "ohlcv_rows": 2_000_000,
+        "wordnet_records": WORDNET_INDEX_RECORDS,
+        "repeat": 5,
+        "answer_batch": 200,
+        "guardrails_batch": 2000,
+    },
+}
+
+_POOL_SIZE = 4096
+_BATCH_LINES = 8192
+
+
+def _dictionary_lemmas(wordnet_root: Path) -> List[str]:
+    """Lemmas of the bundled WordNet index files, in file order."""
+    words: List[str] = []
+    for name in _WORDNET_INDEX_FILES:
+        p = wordnet_root / "dict" / name
+        if not p.exists():
+            continue
+        with p.open("r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.startswith(" ") or not line.strip():
+                    continue
+                words.append(line.split(" ", 1)[0])
+    return words
+
+
+def vocabulary(wordnet_root: Path, limit: int = 8000) -> List[str]:
+    """Real English lemmas from the bundled WordNet (deterministic order); synthetic words otherwise."""
+    words = [w for w in _dictionary_lemmas(wordnet_root) if w.isalpha()]
+    if words:
+        step = max(1, len(words) // limit)
+        return words[::step][:limit]
+    rng = random.Random(DEFAULT_SEED)
+    syll = ["ka", "lo", "mi", "ne", "ru", "ta", "so", "vi", "de", "pa"]
+    return ["".join(rng.choice(syll) for _ in range(rng.randint(2, 4))) for _ in range(limit)]
+
+
+def write_index_topup(path: Path, target: int, seed: int, wordnet_root: Path) -> Dict[str, Any]:
+    """Synthetic noun entries (index record format) for the records the bundled dictionary lacks."""
+    lemmas = _dictionary_lemmas(wordnet_root)
+    have = set(lemmas)
+    missing = max(0, target - len(lemmas))
+    rng = random.Random(seed)
+    syll = ["ba", "ce", "di", "fo", "gu", "ha", "ji", "ko", "lu", "ma", "ne", "po", "qui", "ra", "se", "tu", "vo", "xa", "ye", "zo"]
+    seen: set[str] = set()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        while len(seen) < missing:
+            lemma = "".join(rng.choice(syll) for _ in range(rng.randint(2, 5)))
+            if rng.random() < 0.2:
+                lemma += "_" + rng.choice(syll) + rng.choice(syll)
+            if lemma in have or lemma in seen:
+                continue
+            seen.add(lemma)
+            offsets = sorted(rng.randrange(1_000_000, 16_000_000) for _ in range(rng.randint(1, 4)))
+            rec = {"lemma": lemma, "pos": "noun", "offsets": offsets}
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+    return {"file": path.name, "records": missing, "dictionary_records": len(lemmas)}
+
+
+def _dialog_pool(rng: random.Random, words: List[str]) -> List[bytes]:
+    prompts = [
+        "What does '{0}' mean?",
+        "Define {0}.",
+        "How is {0} related to {1}?",
+        "Tell me about {0} and {1} in a few sentences.",
+        "Can you explain {0}?",
+    ]
+    pool: List[bytes] = []
+    for _ in range(_POOL_SIZE):
+        a, b = rng.choice(words), rng.choice(words)
+        prompt = rng.choice(prompts).format(a, b)
+        response = " ".join(rng.choice(words) for _ in range(rng.randint(8, 60))).capitalize() + "."
+        rec = {"prompt": prompt, "response": response}
+        pool.append((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+    return pool
+
+
+def write_uploads(dest: Path, files: int, total_bytes: int, seed: int, wordnet_root: Path) -> List[Dict[str, Any]]:
+    """Chat-upload JSONL files (prompt/response records) adding up to ~total_bytes."""
+    dest.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    pool = _dialog_pool(rng, vocabulary(wordnet_root))
+    per_file = max(1, total_bytes // max(1, files))
+    out: List[Dict[str, Any]] = []
+    for i in range(files):
+        path = dest / f"bench_upload_{i:03d}.jsonl"
+        size = lines = 0
+        with path.open("wb") as f:
+            while size < per_file:
+                chunk = b"".join(rng.choices(pool, k=_BATCH_LINES))
+                f.write(chunk)
+                size += len(chunk)
+                lines += _BATCH_LINES
+        out.append({"file": path.name, "bytes": size, "lines": lines})
+    return out
+
+
+def write_ohlcv(path: Path, rows: int, seed: int) -> Dict[str, Any]:
+    """Minute-bar OHLCV random walk in the sample CSV's column layout."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    t = datetime(2015, 1, 1)
+    step = timedelta(minutes=1)
+    close = 100.0
+    buf: List[str] = []
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        f.write("timestamp,open,high,low,close,volume\n")
+        for _ in range(rows):
+            open_ = close
+            close = max(0.01, open_ * math.exp(rng.gauss(0.0, 0.001)))
+            high = max(open_, close) * (1.0 + abs(rng.gauss(0.0, 0.0005)))
+            low = min(open_, close) * (1.0 - abs(rng.gauss(0.0, 0.0005)))
+            vol = int(rng.lognormvariate(13.0, 0.5))
+            buf.append(f"{t:%Y-%m-%dT%H:%M},{open_:.4f},{high:.4f},{low:.4f},{close:.4f},{vol}\n")
+            t += step
+            if len(buf) >= _BATCH_LINES:
+                f.write("".join(buf))
+                buf.clear()
+        f.write("".join(buf))
+    return {"file": path.name, "rows": rows, "bytes": path.stat().st_size}
+
+
+def ensure_fixtures(workdir: Path, scale: str, seed: int, wordnet_root: Path) -> Dict[str, Any]:
+    """Generate the fixtures for a scale under workdir/fixtures/<scale>, or reuse matching ones."""
+    params = SCALES[scale]
+    root = workdir / "fixtures" / scale
+    manifest_path = root / "manifest.json"
+    want = {
+        "version": FIXTURES_VERSION,
+        "seed": seed,
+        "upload_files": params["upload_files"],
+        "upload_bytes": params["upload_bytes"],
+        "ohlcv_rows": params["ohlcv_rows"],
+        "wordnet_records": params["wordnet_records"],
+    }
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        files = [root / "uploads" / u["file"] for u in manifest["uploads"]] + [root / manifest["ohlcv"]["file"]]
+        if manifest.get("index_topup"):
+            files.append(root / manifest["index_topup"]["file"])
+        if manifest.get("params") == want and all(p.exists() for p in files):
+            return manifest
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    manifest = {
+        "scale": scale,
+        "params": want,
+        "created_at": datetime.now().astimezone().isoformat(),
+        "uploads": write_uploads(root / "uploads", want["upload_files"], want["upload_bytes"], seed, wordnet_root),
+        "ohlcv": write_ohlcv(root / "ohlcv.csv", want["ohlcv_rows"], seed),
+        "index_topup": None,
+    }
+    if want["wordnet_records"]:
+        manifest["index_topup"] = write_index_topup(root / "wordnet_topup.jsonl", want["wordnet_records"], seed, wordnet_root)
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
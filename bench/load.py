@@ -0,0 +1,373 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import time
+from .fixtures import DEFAULT_SEED, vocabulary
+
+# Load generator for POST /api/runtime/post. Drives app.backend.main:app in-process through a
+# minimal ASGI transport (routing, middleware, validation and the threadpool hand-off all run as
+# under uvicorn, only socket I/O and HTTP parsing are skipped), or a running server over HTTP/1.1
+# keep-alive connections. Two modes:
+#   closed loop  N workers each send the next request as soon as the previous one answers
+#   open loop    requests arrive at a fixed Poisson rate whatever the backlog; latency is measured
+#                from the scheduled arrival, so queueing delay is not hidden (no coordinated omission)
+# Each step reports throughput, latency percentiles (overall and per query class) and errors; a
+# sweep over concurrency levels or rates also reports the saturation point.
+RUNTIME_PATH = "/api/runtime/post"
+DEFAULT_MIX = {"hit": 0.6, "miss": 0.3, "long": 0.1}
+DEFAULT_SLO_MS = 250.0  # evaluation policy: chat latency_ms.p95 <= 250ms
+WARMUP_REQUESTS = 20
+
+
+class QueryMix:
+    """Seeded request bodies by class: hit (a lemma in the index), miss (unknown word: LM fallback),
+    long (a few KB of running text; guardrails and lemma scan do the most work)."""
+
+    def __init__(self, weights: Dict[str, float], seed: int, words: List[str]):
+        unknown = [k for k in weights if k not in ("hit", "miss", "long")]
+        if unknown or not weights:
+            raise ValueError(f"unknown query class(es): {', '.join(unknown) or '(empty mix)'}")
+        self.classes = list(weights)
+        self.weights = [float(weights[k]) for k in self.classes]
+        self.rng = random.Random(seed)
+        self.words = words
+
+    def next(self) -> Tuple[str, bytes]:
+        kind = self.rng.choices(self.classes, self.weights)[0]
+        r = self.rng
+        if kind == "hit":
+            text = f"What does '{r.choice(self.words)}' mean?"
+        elif kind == "miss":
+            text = f"What does 'qz{r.getrandbits(40):x}' mean?"
+        else:
+            text = " ".join(r.choice(self.words) for _ in range(r.randint(300, 600))) + "."
+        return kind, json.dumps({"text": text}).encode("utf-8")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """"hit=0.6,miss=0.3,long=0.1" -> weights."""
+    out: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, w = part.partition("=")
+        out[name.strip()] = float(w) if w else 1.0
+    return out
+
+
+# ---- transports ---------------------------------------------------------------------------------
+
+class AsgiTransport:
+    """Calls an ASGI app directly with one http scope per request."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def post(self, path: str, body: bytes) -> int:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "server": ("loadgen", 80), "client": ("127.0.0.1", 0),
+        }
+        sent = False
+        status = 0
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()  # never disconnects
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = int(message["status"])
+        await self.app(scope, receive, send)
+        return status
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpTransport:
+    """HTTP/1.1 keep-alive client over asyncio streams (stdlib only); one connection per in-flight
+    request, reused from a pool."""
+
+    def __init__(self, url: str, timeout_s: float = 30.0):
+        u = urlsplit(url)
+        if u.scheme != "http":
+            raise ValueError("only http:// targets are supported")
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 80
+        self.prefix = u.path.rstrip("/")
+        self.timeout_s = timeout_s
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def _request(self, conn: Tuple[asyncio.StreamReader, asyncio.StreamWriter], path: str, body: bytes) -> Tuple[int, bool]:
+        reader, writer = conn
+        head = (f"POST {self.prefix}{path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1")
+        writer.write(head + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        length, keep_alive = None, True
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value.strip())
+            elif name == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        if length is None:
+            await reader.read()
+            keep_alive = False
+        else:
+            await reader.readexactly(length)
+        return status, keep_alive
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return reader, writer
+
+    async def post(self, path: str, body: bytes) -> int:
+        conn = self._idle.pop() if self._idle else await self._connect()
+        try:
+            status, keep_alive = await asyncio.wait_for(self._request(conn, path, body), self.timeout_s)
+        except BaseException:
+            conn[1].close()
+            raise
+        if keep_alive:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+        return status
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+# ---- load steps ---------------------------------------------------------------------------------
+
+class _Recorder:
+    def __init__(self):
+        from app.backend.core.metrics.histogram import LogHistogram
+        self._hist = LogHistogram
+        self.all = LogHistogram()
+        self.by_class: Dict[str, Any] = {}
+        self.ok = 0
+        self.errors: Dict[str, int] = {}
+
+    def record(self, kind: str, seconds: float, error: str | None) -> None:
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.ok += 1
+        self.all.record(seconds)
+        h = self.by_class.get(kind)
+        if h is None:
+            h = self.by_class[kind] = self._hist()
+        h.record(seconds)
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        n_err = sum(self.errors.values())
+        total = self.ok + n_err
+        return {
+            "requests": total,
+            "ok": self.ok,
+            "errors": n_err,
+            "error_rate": round(n_err / total, 4) if total else 0.0,
+            "error_kinds": dict(sorted(self.errors.items())),
+            "duration_s": round(elapsed_s, 3),
+            "throughput_rps": round(self.ok / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+            "latency_ms": self.all.summary(),
+            "by_class": {k: dict(h.summary(), count=h.count) for k, h in sorted(self.by_class.items())},
+        }
+
+
+async def _one(post: Callable[[str, bytes], Awaitable[int]], mix: QueryMix, rec: _Recorder, t_start: float | None = None) -> None:
+    kind, body = mix.next()
+    t0 = time.perf_counter() if t_start is None else t_start
+    try:
+        status = await post(RUNTIME_PATH, body)
+        err = None if 200 <= status < 300 else f"http_{status}"
+    except asyncio.TimeoutError:
+        err = "timeout"
+    except Exception as e:
+        err = type(e).__name__
+    rec.record(kind, time.perf_counter() - t0, err)
+
+
+async def closed_loop(transport: Any, mix: QueryMix, concurrency: int, duration_s: float) -> Dict[str, Any]:
+    rec = _Recorder()
+    deadline = time.perf_counter() + duration_s
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            await _one(transport.post, mix, rec)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    out = rec.summary(time.perf_counter() - t0)
+    out["concurrency"] = concurrency
+    return out
+
+
+async def open_loop(transport: Any, mix: QueryMix, rate: float, duration_s: float, max_inflight: int = 1000) -> Dict[str, Any]:
+    rec = _Recorder()
+    arrivals = random.Random(mix.rng.getrandbits(32))
+    inflight: set[asyncio.Task] = set()
+    peak = 0
+    t0 = time.perf_counter()
+    due = t0
+    while True:
+        due += arrivals.expovariate(rate)
+        if due - t0 >= duration_s:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= max_inflight:
+            rec.record("-", 0.0, "client_backlog_full")
+            continue
+        task = asyncio.ensure_future(_one(transport.post, mix, rec, t_start=due))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+        peak = max(peak, len(inflight))
+    sent_s = time.perf_counter() - t0
+    if inflight:
+        await asyncio.gather(*inflight)
+    out = rec.summary(time.perf_counter() - t0)
+    # the Poisson schedule offers `rate` on average; judge the step against what was actually sent
+    out.update({"rate_rps": rate, "offered_rps": round(out["requests"] / sent_s, 2) if sent_s > 0 else 0.0,
+                "peak_inflight": peak})
+    return out
+
+
+def saturation(steps: List[Dict[str, Any]], mode: str, slo_ms: float) -> Dict[str, Any]:
+    """Where adding load stops adding throughput.
+    closed loop: the last concurrency before throughput gains fall under 10%, and the highest one
+    whose p95 meets the SLO. open loop: the highest offered rate still served (>= 95% of offered
+    throughput, p95 within the SLO, < 1% errors), and the first one that is not."""
+    if not steps:
+        return {}
+    if mode == "closed":
+        knee = steps[-1]
+        for prev, cur in zip(steps, steps[1:]):
+            if cur["throughput_rps"] < prev["throughput_rps"] * 1.10:
+                knee = prev
+                break
+        best = max(steps, key=lambda s: s["throughput_rps"])
+        within = [s for s in steps if s["latency_ms"]["p95"] <= slo_ms and s["error_rate"] < 0.01]
+        return {
+            "saturation_concurrency": knee["concurrency"],
+            "saturation_rps": knee["throughput_rps"],
+            "max_rps": best["throughput_rps"],
+            "max_rps_concurrency": best["concurrency"],
+            "max_concurrency_within_slo": within[-1]["concurrency"] if within else None,
+            "slo_p95_ms": slo_ms,
+        }
+    sustained, broken = None, None
+    for s in steps:
+        ok = (s["throughput_rps"] >= 0.95 * s["offered_rps"] and s["latency_ms"]["p95"] <= slo_ms and s["error_rate"] < 0.01)
+        if ok and broken is None:
+            sustained = s
+        elif not ok and broken is None:
+            broken = s
+    return {
+        "sustained_rps": sustained["rate_rps"] if sustained else None,
+        "saturated_at_rps": broken["rate_rps"] if broken else None,
+        "max_rps": max(s["throughput_rps"] for s in steps),
+        "slo_p95_ms": slo_ms,
+    }
+
+
+async def run_load(transport: Any, mix: QueryMix, concurrency: List[int] | None = None, rates: List[float] | None = None,
+                   duration_s: float = 10.0, slo_ms: float = DEFAULT_SLO_MS, warmup: int = WARMUP_REQUESTS) -> Dict[str, Any]:
+    """Warm up, then one step per concurrency level (closed loop) or per arrival rate (open loop)."""
+    if bool(concurrency) == bool(rates):
+        raise ValueError("give either concurrency levels or arrival rates")
+    throwaway = _Recorder()
+    for _ in range(warmup):
+        await _one(transport.post, mix, throwaway)
+    if warmup and not throwaway.ok:
+        raise RuntimeError(f"target is not answering: {throwaway.errors}")
+    steps: List[Dict[str, Any]] = []
+    for level in concurrency or rates or []:
+        if concurrency:
+            step = await closed_loop(transport, mix, int(level), duration_s)
+            label = f"c={int(level)}"
+        else:
+            step = await open_loop(transport, mix, float(level), duration_s)
+            label = f"rate={float(level):g}/s"
+        steps.append(step)
+        lat = step["latency_ms"]
+        print(f"  {label}: {step['throughput_rps']:.1f} req/s, p50 {lat['p50']:.1f} ms, p95 {lat['p95']:.1f} ms, "
+              f"p99 {lat['p99']:.1f} ms, errors {step['errors']}", file=sys.stderr, flush=True)
+    mode = "closed" if concurrency else "open"
+    return {"mode": mode, "duration_s": duration_s, "warmup": warmup, "steps": steps,
+            "saturation": saturation(steps, mode, slo_ms)}
+
+
+def main(argv: List[str] | None = None) -> int:
+    """In-tree entry (python -m bench.load), started by `python -m bench load` or run directly with --url."""
+    ap = argparse.ArgumentParser(prog="python -m bench.load")
+    ap.add_argument("--url", default=None, help="base URL of a running backend; default: in-process ASGI")
+    ap.add_argument("--concurrency", default="", help="closed loop, e.g. 1,4,16,64")
+    ap.add_argument("--rate", default="", help="open loop arrival rates (req/s), e.g. 50,100,200")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    ap.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    ap.add_argument("--slo-ms", type=float, default=DEFAULT_SLO_MS)
+    ap.add_argument("--warmup", type=int, default=WARMUP_REQUESTS)
+    ap.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    ap.add_argument("--index-topup", type=Path, default=None, help="synthetic index entries to append first (in-process)")
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args(argv)
+    concurrency = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    rates = [float(x) for x in args.rate.split(",") if x.strip()]
+    if not concurrency and not rates:
+        concurrency = [1, 4, 16, 64]
+    words = vocabulary(Path(__file__).resolve().parents[1] / "WordNet-3.0")
+    mix = QueryMix(parse_mix(args.mix), args.seed, words)
+    from app.backend.core.utils.env import env_fingerprint
+    if args.url:
+        transport: Any = HttpTransport(args.url)
+        target = args.url
+    else:
+        from app.backend.main import app
+        if args.index_topup is not None:
+            from .cases import top_up_index
+            top_up_index(args.index_topup)
+        transport = AsgiTransport(app)
+        target = "asgi:app.backend.main:app"
+
+    async def _go() -> Dict[str, Any]:
+        try:
+            return await run_load(transport, mix, concurrency or None, rates or None, args.duration, args.slo_ms, args.warmup)
+        finally:
+            await transport.close()
+    out = asyncio.run(_go())
+    out.update({"target": target, "mix": parse_mix(args.mix), "seed": args.seed, "env": env_fingerprint()})
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
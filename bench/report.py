@@ -0,0 +1,101 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Sequence, Tuple
+import statistics
+
+# Result summaries and baseline comparison. Stdlib only: used both inside the benchmark tree and by
+# the CLI that compares stored result files.
+DEFAULT_THRESHOLD = 0.15
+# changes smaller than this (seconds per sample) are timer noise, never a regression
+DEFAULT_MIN_DELTA_S = 0.002
+# best-of-N: the fastest sample is the least disturbed by other load on the machine
+COMPARE_KEY = "min_s"
+
+
+def summarize(samples: Sequence[float], first: float, batch: int = 1) -> Dict[str, Any]:
+    """Stats over timed samples (seconds). first is the cold call, kept apart from the steady state;
+    batch is the number of operations per sample (ops_s = batch / median)."""
+    med = statistics.median(samples) if samples else first
+    out: Dict[str, Any] = {
+        "first_s": round(first, 6),
+        "min_s": round(min(samples), 6) if samples else round(first, 6),
+        "median_s": round(med, 6),
+        "mean_s": round(statistics.fmean(samples), 6) if samples else round(first, 6),
+        "max_s": round(max(samples), 6) if samples else round(first, 6),
+        "samples": len(samples),
+        "batch": batch,
+    }
+    if med > 0:
+        out["ops_s"] = round(batch / med, 2)
+    return out
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD,
+            min_delta_s: float = DEFAULT_MIN_DELTA_S) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Per-case verdicts on COMPARE_KEY: regression (slower by more than threshold and min_delta_s),
+    improved, ok, new or missing. Returns (rows, warnings)."""
+    warnings: List[str] = []
+    if baseline.get("scale") != current.get("scale"):
+        warnings.append(f"scale differs: baseline {baseline.get('scale')}, current {current.get('scale')}")
+    b_env, c_env = baseline.get("env") or {}, current.get("env") or {}
+    if b_env.get("id") and b_env.get("id") != c_env.get("id"):
+        warnings.append(f"environment differs: baseline {b_env.get('cpu')} ({b_env.get('id')}), "
+                        f"current {c_env.get('cpu')} ({c_env.get('id')}); timings are not comparable")
+    b_cases, c_cases = baseline.get("cases") or {}, current.get("cases") or {}
+    rows: List[Dict[str, Any]] = []
+    for name in list(b_cases) + [n for n in c_cases if n not in b_cases]:
+        b, c = b_cases.get(name), c_cases.get(name)
+        row: Dict[str, Any] = {"case": name, "baseline_s": b and b.get(COMPARE_KEY), "current_s": c and c.get(COMPARE_KEY)}
+        if c is None:
+            row["status"] = "missing"
+        elif b is None:
+            row["status"] = "new"
+        else:
+            bs, cs = float(b[COMPARE_KEY]), float(c[COMPARE_KEY])
+            row["change"] = round((cs - bs) / bs, 4) if bs > 0 else None
+            if cs > bs * (1.0 + threshold) and cs - bs > min_delta_s:
+                row["status"] = "regression"
+            elif cs < bs * (1.0 - threshold) and bs - cs > min_delta_s:
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows, warnings
+
+
+def _fmt_s(v: Any) -> str:
+    if v is None:
+        return "-"
+    v = float(v)
+    return f"{v * 1000:.2f} ms" if v < 1 else f"{v:.3f} s"
+
+
+def format_results(result: Dict[str, Any]) -> str:
+    lines = [f"{'case':34} {'first':>11} {'min':>11} {'median':>11} {'max':>11} {'ops/s':>10}"]
+    for name, r in (result.get("cases") or {}).items():
+        ops = f"{r['ops_s']:.1f}" if r.get("ops_s") is not None else "-"
+        lines.append(f"{name:34} {_fmt_s(r.get('first_s')):>11} {_fmt_s(r.get('min_s')):>11} {_fmt_s(r.get('median_s')):>11} "
+                     f"{_fmt_s(r.get('max_s')):>11} {ops:>10}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows: List[Dict[str, Any]], warnings: List[str]) -> str:
+    lines = [f"warning: {w}" for w in warnings]
+    lines.append(f"{'case':34} {'baseline':>11} {'current':>11} {'change':>8}  status")
+    for r in rows:
+        change = f"{r['change'] * 100:+.1f}%" if r.get("change") is not None else "-"
+        lines.append(f"{r['case']:34} {_fmt_s(r['baseline_s']):>11} {_fmt_s(r['current_s']):>11} {change:>8}  {r['status']}")
+    return "\n".join(lines)
+
+
+def format_load(result: Dict[str, Any]) -> str:
+    key = "concurrency" if result.get("mode") == "closed" else "rate_rps"
+    lines = [f"target: {result.get('target')}  mix: {result.get('mix')}",
+             f"{key:>12} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}"]
+    for s in result.get("steps") or []:
+        lat = s["latency_ms"]
+        lines.append(f"{s[key]:>12} {s['throughput_rps']:>10.1f} {lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f} "
+                     f"{lat['max']:>9.1f} {s['errors']:>7}")
+    sat = result.get("saturation") or {}
+    if sat:
+        lines.append("saturation: " + ", ".join(f"{k}={v}" for k, v in sat.items()))
+    return "\n".join(lines)
@@ -0,0 +1,7 @@
+from __future__ import annotations
+import os
+
+# The suite trains and evaluates against the fixtures checked in under app/artifacts (lm_ngram.json,
+# chat/sft_1337, ...), which are committed as indented JSON. Write artifacts with that codec during
+# tests so a run never rewrites them as packed binary; the codec tests patch io.CODEC_OVERRIDE.
+os.environ.setdefault("RIAI_ARTIFACT_CODEC", "json-pretty")
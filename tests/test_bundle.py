@@ -0,0 +1,64 @@
+from __future__ import annotations
+from pathlib import Path
+import io
+import json
+
+from app.backend.core.registry.bundle import export_bundle, import_bundle, stream_export
+
+
+def _tree(root: Path):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob('*')) if p.is_file()}
+
+
+def test_bundle_roundtrip_incremental_and_tamper(tmp_path: Path):
+    src = {'registry': tmp_path / 'src' / 'registry', 'artifacts': tmp_path / 'src' / 'artifacts'}
+    (src['registry'] / 'models').mkdir(parents=True)
+    (src['artifacts'] / 'metrics').mkdir(parents=True)
+    (src['artifacts'] / 'cache').mkdir(parents=True)
+    (src['registry'] / 'models' / 'm1.json').write_text(json.dumps({'id': 'm1'}), encoding='utf-8')
+    (src['artifacts'] / 'metrics' / 'big.bin').write_bytes(bytes(range(256)) * 4096)
+    (src['artifacts'] / 'cache' / 'local.sqlite').write_bytes(b'machine local')
+
+    # streamed export == file export; machine-local cache is not exported
+    data = b''.join(stream_export(roots=src, compression='gz', chunk_size=4096))
+    manifest = json.loads(json.dumps(export_bundle(io.BytesIO(), roots=src, compression='xz')))
+    assert sorted(manifest['files']) == ['artifacts/metrics/big.bin', 'registry/models/m1.json']
+
+    dst = {'registry': tmp_path / 'dst' / 'registry', 'artifacts': tmp_path / 'dst' / 'artifacts'}
+    (dst['artifacts'] / 'cache').mkdir(parents=True)
+    (dst['artifacts'] / 'cache' / 'keep.txt').write_text('local', encoding='utf-8')
+    (dst['registry'] / 'models').mkdir(parents=True)
+    (dst['registry'] / 'models' / 'stale.json').write_text('{}', encoding='utf-8')
+    report = import_bundle(io.BytesIO(data), roots=dst)
+    assert report['status'] == 'imported' and report['received'] == 2
+    assert _tree(dst['registry']) == _tree(src['registry'])
+    assert (dst['artifacts'] / 'metrics' / 'big.bin').read_bytes() == (src['artifacts'] / 'metrics' / 'big.bin').read_bytes()
+    assert (dst['artifacts'] / 'cache' / 'keep.txt').read_text(encoding='utf-8') == 'local'
+    assert sorted(p.name for p in (tmp_path / 'dst').iterdir()) == ['artifacts', 'registry']
+
+    # incremental: only the changed file travels; the rest is verified and reused from the target
+    (src['registry'] / 'models' / 'm1.json').write_text(json.dumps({'id': 'm1', 'v': 2}), encoding='utf-8')
+    buf = io.BytesIO()
+    delta = export_bundle(buf, roots=src, compression='none', base_manifest=manifest)
+    assert delta['omitted'] == ['artifacts/metrics/big.bin']
+    empty = {'registry': tmp_path / 'empty' / 'registry', 'artifacts': tmp_path / 'empty' / 'artifacts'}
+    rejected = import_bundle(io.BytesIO(buf.getvalue()), roots=empty)
+    assert rejected['status'] == 'rejected' and rejected['errors'][0]['error_code'] == 'base_missing'
+    assert import_bundle(io.BytesIO(buf.getvalue()), roots=dst)['reused'] == 1
+    assert _tree(dst['registry']) == _tree(src['registry'])
+
+    # a corrupted byte is caught and nothing on disk changes
+    tampered = buf.getvalue().replace(b'"v": 2', b'"v": 3')
+    before = _tree(dst['registry'])
+    report = import_bundle(io.BytesIO(tampered), roots=dst)
+    assert report['status'] == 'rejected'
+    assert [e['error_code'] for e in report['errors']] == ['checksum_mismatch']
+    assert _tree(dst['registry']) == before
+
+
+def test_export_endpoint_rejects_bad_level_before_streaming():
+    from app.backend.main import api_export_bundle
+    for level in (10, -1, 'fast', 2.5, True):
+        res = api_export_bundle({'level': level})
+        assert res.status_code == 400 and json.loads(res.body)['error_code'] == 'invalid_level'
+    assert api_export_bundle({'compression': 'none', 'level': '0'}).media_type == 'application/x-tar'
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import random
+
+from app.backend.core.runtime.guardrails import apply_guardrails, compile_guardrails
+
+
+def _stream(cfg, text: str, rng: random.Random):
+    s = compile_guardrails(cfg).stream()
+    out = []
+    i = 0
+    while i < len(text):
+        k = rng.randint(1, 7)
+        out.append(s.feed(text[i:i + k]))
+        i += k
+    out.append(s.finish())
+    return "".join(out), s.actions
+
+
+def test_streaming_guardrails_match_batch():
+    rng = random.Random(1337)
+    pieces = ["hate", "Hate speech", "violence", "123-45-6789", "12", "3-45-", "a", " ", "  ", "\n", "\t", "x1", "hateful"]
+    cfgs = [
+        {"max_tokens": 5, "pii_regex": [r"(?<!\d)\d{3}-\d{2}-\d{4}(?!\d)", r"a+"], "content_filters": ["hate", "hate speech", "violence"]},
+        {"max_tokens": 256, "pii_regex": [r"\b\d{3}-\d{2}-\d{4}\b"], "content_filters": ["hate", "violence"]},
+        {"max_tokens": 0, "pii_regex": [], "content_filters": []},
+    ]
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+        for cfg in cfgs:
+            batch = apply_guardrails(text, cfg)
+            result, actions = _stream(cfg, text, rng)
+            assert result == batch["result"]
+            assert actions == batch["actions"]
+
+
+def test_streaming_guardrails_emit_early_and_stop_at_max_tokens():
+    s = compile_guardrails({"max_tokens": 5, "pii_regex": [r"\b\d{3}-\d{2}-\d{4}\b"], "content_filters": []}).stream()
+    # output trails the input only by the PII pattern's look-ahead window
+    first = s.feed("alpha beta gamma ")
+    assert first and "alpha beta gamma".startswith(first)
+    rest = s.feed("delta epsilon zeta eta")
+    assert s.done
+    assert s.feed("theta") == ""
+    assert first + rest + s.finish() == "alpha beta gamma delta epsilon"
+    assert s.actions == [{"type": "truncate", "max_tokens": 5}]
+    # newlines and tabs pass through as they arrive; truncation keeps them, as the batch path does
+    s = compile_guardrails({"max_tokens": 3, "pii_regex": [], "content_filters": []}).stream()
+    assert s.feed("one\ntwo\t") == "one\ntwo\t"
+    assert s.feed("three\n\n") == "three" and not s.done
+    assert s.feed("four") == "" and s.done
+    assert apply_guardrails("one\ntwo\tthree\n\nfour", {"max_tokens": 3})["result"] == "one\ntwo\tthree"
+
+
+def test_guardrails_skip_non_string_config_entries():
+    # a hand-edited config.json may hold numbers, nulls or objects; they are ignored, not a 500
+    cfg = {"max_tokens": 10, "pii_regex": [5, None, r"\d{3}"], "content_filters": [1, None, {"x": 1}, "", "hate"]}
+    res = apply_guardrails("hate 123", cfg)
+    assert res["result"] == "hate [PII]"
+    assert res["actions"] == [{"type": "pii_mask", "pattern": r"\d{3}"}, {"type": "content_flag", "categories": ["hate"]}]
+    assert _stream(cfg, "hate 123", random.Random(7)) == (res["result"], res["actions"])
+    # the dataset scrub reads the same entries, from the config or its payload
+    from app.backend.tasks.scrub_datasets import _pii_patterns
+    assert _pii_patterns({"pii_regex": cfg["pii_regex"]}) == [r"\d{3}"]
+    assert _pii_patterns({"pii_regex": "not a list"}) == []
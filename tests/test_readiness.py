@@ -0,0 +1,64 @@
+from __future__ import annotations
+from pathlib import Path
+import threading
+import time
+
+from app.backend.core.runtime.readiness import ReadinessState
+
+
+def _assemble(results):
+    errors = [e for r in results.values() for e in r.get('errors', [])]
+    return {'status': 'ready' if not errors else 'blocked', 'errors': errors}
+
+
+def _on_error(name, exc):
+    code = 'timeout' if isinstance(exc, TimeoutError) else 'failed'
+    return {'errors': [{'error_code': code, 'check': name}]}
+
+
+def test_checks_run_concurrently_with_timeouts(tmp_path: Path):
+    release = threading.Event()
+    marker = tmp_path / 'marker.txt'
+
+    def slow(deps):
+        time.sleep(0.2)
+        return {'errors': []}
+
+    def stuck(deps):
+        release.wait(5)
+        return {'errors': [{'error_code': 'late_result'}]}
+
+    def watches_file(deps):
+        p = deps.file(marker)
+        return {'errors': [] if p.exists() else [{'error_code': 'marker_missing'}]}
+
+    state = ReadinessState(
+        [('slow_a', slow), ('slow_b', slow), ('slow_c', slow), ('stuck', stuck, 0.1), ('marker', watches_file)],
+        assemble=_assemble, on_error=_on_error, poll_interval=0,
+    )
+    try:
+        t0 = time.perf_counter()
+        v = state.snapshot()
+        # three 0.2s checks in parallel: latency of the slowest, not the sum
+        assert time.perf_counter() - t0 < 0.5
+        assert [e['error_code'] for e in v['errors']] == ['timeout', 'marker_missing']
+        assert v['checks']['stuck']['status'] == 'timeout'
+        assert v['checks']['slow_a']['duration_ms'] >= 150
+        # a timed-out check does not block later queries
+        t0 = time.perf_counter()
+        state.snapshot()
+        assert time.perf_counter() - t0 < 0.05
+        release.set()
+        deadline = time.time() + 5
+        while state.snapshot()['checks']['stuck']['status'] == 'timeout' and time.time() < deadline:
+            time.sleep(0.01)
+        v = state.snapshot()
+        assert [e['error_code'] for e in v['errors']] == ['late_result', 'marker_missing']
+        # an external change is picked up by polling and re-runs only the affected check
+        marker.write_text('x', encoding='utf-8')
+        v = state.snapshot(refresh=True)
+        assert [e['error_code'] for e in v['errors']] == ['late_result']
+        assert v['checks']['marker']['cached'] is False and v['checks']['slow_a']['cached'] is True
+    finally:
+        release.set()
+        state.stop()
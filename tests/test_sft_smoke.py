@@ -8,7 +8,7 @@ from app.backend.core.utils.io import ARTIFACTS_DIR
 def test_sft_smoke_and_no_echo():
     seed = 1337
     # Run SFT tiny training
-    resp = train_sft_job({'seed': seed, 'steps': 5, 'order': 3})
+    resp = train_sft_job({'wait': True, 'seed': seed, 'steps': 5, 'order': 3})
     assert resp.get('ok') is True
     job = resp.get('job') or {}
     result = job.get('result') or {}
@@ -22,7 +22,7 @@ from app.backend.main import (
 from app.backend.core.utils.io import (
     ARTIFACTS_DIR, ARTIFACTS_METRICS, ARTIFACTS_INDICES, ARTIFACTS_DATASETS,
     REGISTRY_DIR, REGISTRY_WS_DIR, REGISTRY_MODELS_DIR, REGISTRY_NN_DIR,
-    WORDNET_ROOT
+    WORDNET_ROOT, load_json
 )
 from app.backend.core.registry.datasets import register_dataset, verify_dataset
 
@@ -76,7 +76,7 @@ def test_bootstrap_flow_end_to_end(tmp_path: Path):
     seed = 1337
     # Train all base modules
     for mid in ['lexicon-wordnet3', 'chat-core', 'predictor-finance']:
-        j = train_job({'module_id': mid, 'seed': seed})
+        j = train_job({'wait': True, 'module_id': mid, 'seed': seed})
         assert j.get('ok') is True
 
     # Save mappings for chat and predictor
@@ -89,10 +89,19 @@ def test_bootstrap_flow_end_to_end(tmp_path: Path):
     maps = save_mappings(mappings)
     assert maps.get('mappings') and maps['mappings']['module_map']['chat-core'].endswith(str(seed))
 
-    # Evaluate
-    j = evaluate_job({'module_id': 'chat-core', 'seed': seed, 'model_id': f'chat_retrieval_{seed}'})
+    # Evaluate (the latency benchmark drives the real runtime path but must not teach the model)
+    from app.backend.core.runtime import chat
+    counts_path = ARTIFACTS_DIR / 'chat' / 'lm_counts.json'
+    chat.flush_counts()  # earlier requests' bumps are batched in memory until flushed
+    counts_before = load_json(counts_path) if counts_path.exists() else {}
+    j = evaluate_job({'wait': True, 'module_id': 'chat-core', 'seed': seed, 'model_id': f'chat_retrieval_{seed}',
+                      'bench': {'requests': 40, 'warmup': 5, 'concurrency': [1, 2]}})
     assert j.get('ok') is True
-    j = evaluate_job({'module_id': 'predictor-finance', 'seed': seed, 'model_id': f'predictor_ma_{seed}'})
+    lat = j['job']['result']['latency_ms']
+    assert lat['p50'] > 0 and lat['p50'] <= lat['p95'] <= lat['p99']
+    assert sorted(j['job']['result']['bench']['concurrency']) == ['1', '2']
+    assert (load_json(counts_path) if counts_path.exists() else {}) == counts_before
+    j = evaluate_job({'wait': True, 'module_id': 'predictor-finance', 'seed': seed, 'model_id': f'predictor_ma_{seed}'})
     assert j.get('ok') is True
 
     # Metrics files exist
@@ -133,7 +142,7 @@ def test_neural_networks_catalog_and_model_mapping_cleanup():
 
     # Evaluate chat-core for this model id with a fixed seed
     seed = 2025
-    res = evaluate_job({'module_id': 'chat-core', 'seed': seed, 'model_id': model_id})
+    res = evaluate_job({'wait': True, 'module_id': 'chat-core', 'seed': seed, 'model_id': model_id})
     assert res.get('ok') is True
 
     # Readiness should not complain about missing NN because we created it
@@ -191,7 +200,7 @@ def test_train_with_nn_binding():
 
     # Train chat-core with this NN
     seed = 777
-    job = train_job({'module_id': 'chat-core', 'seed': seed, 'nn_id': nn_id})
+    job = train_job({'wait': True, 'module_id': 'chat-core', 'seed': seed, 'nn_id': nn_id})
     assert job.get('ok') is True
     model_id = job['job']['result']['model_id']
 
@@ -202,10 +211,747 @@ def test_train_with_nn_binding():
     assert obj.get('nn_id') == nn_id
 
     # Evaluate this model id
-    job2 = evaluate_job({'module_id': 'chat-core', 'seed': seed, 'model_id': model_id})
+    job2 = evaluate_job({'wait': True, 'module_id': 'chat-core', 'seed': seed, 'model_id': model_id})
     assert job2.get('ok') is True
 
     # Cleanup for isolation
     (REGISTRY_NN_DIR / f"{nn_id}.json").unlink(missing_ok=True)
     (REGISTRY_MODELS_DIR / f"{model_id}.json").unlink(missing_ok=True)
     (ARTIFACTS_METRICS / 'chat' / f"{model_id}.json").unlink(missing_ok=True)
+
+
+def test_bubble_babble_is_deterministic_and_cached():
+    from app.backend.core.runtime import bubble
+    assert bubble.normalize_text("Hi, THERE\t42!") == "hi, there   !"
+    a = bubble.generate_babble("ab", 32, seed=7)
+    b = bubble.generate_babble("ab", 32, seed=7)
+    assert a == b and len(a) == 34
+    # The compiled model is reused across calls while model.json is unchanged
+    assert bubble.get_compiled_model() is bubble.get_compiled_model()
+
+
+def test_babble_is_reproducible_under_concurrency():
+    from concurrent.futures import ThreadPoolExecutor
+    from app.backend.core.runtime.bubble import generate_babble
+    seeds = list(range(16))
+    expected = [generate_babble("a", 64, seed=s) for s in seeds]
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        got = list(ex.map(lambda s: generate_babble("a", 64, seed=s), seeds * 4))
+    assert got == expected * 4
+
+
+def test_dataset_reader_caches_small_files_stops_early_and_prunes_evicted_hashes(tmp_path: Path):
+    from app.backend.core.utils import dataset_reader as dr, memory
+    budget = memory.budget('dataset_records')
+    dr.clear_cache()
+    files = []
+    for i in range(3):
+        f = tmp_path / f'ds{i}.jsonl'
+        f.write_text('\n'.join(json.dumps({'prompt': f'p{i}-{k}'}) for k in range(50)) + '\nnot json\n', encoding='utf-8')
+        files.append(f)
+    try:
+        # an overall limit parses an uncached file only as far as it reads, and caches nothing
+        assert [r['prompt'] for r in dr.DatasetReader(paths=files[:1], limit=2)] == ['p0-0', 'p0-1']
+        assert not dr._RECORDS and not dr._SHA_BY_STAT
+        # a limit the file runs out before caches it like a full read
+        assert len(list(dr.DatasetReader(paths=files[:1], limit=100))) == 51 and len(dr._RECORDS) == 1
+        full = list(dr.DatasetReader(paths=files[:1]))
+        assert len(full) == 51 and full[-1] == {'text': 'not json'} and len(dr._RECORDS) == 1
+        # a per-file cap still caches the whole (small) file, so the next build parses nothing
+        dr.clear_cache()
+        assert [r['prompt'] for r in dr.DatasetReader(paths=files[:1], limit_per_file=2)] == ['p0-0', 'p0-1']
+        assert len(dr._RECORDS) == 1 and list(dr.DatasetReader(paths=files[:1])) == full
+        # evicting a file's records drops its stat -> sha entries too
+        memory.set_budget('dataset_records', memory.approx_size(dr._RECORDS[next(iter(dr._RECORDS))][1]) + 1)
+        for f in files[1:]:
+            list(dr.DatasetReader(paths=[f]))
+        assert len(dr._RECORDS) == 1 and set(dr._SHA_BY_STAT.values()) == set(dr._RECORDS)
+    finally:
+        memory.set_budget('dataset_records', budget)
+        dr.clear_cache()
+
+
+def test_scrub_datasets_masks_pii_in_chunks(monkeypatch):
+    from app.backend.main import api_ingest_dataset, api_scrub_datasets
+    from app.backend.core.utils.dataset_reader import SCRUBBED_DIR, dataset_sources
+    ds_id = 'test_scrub_pii'
+    lines = [json.dumps({'prompt': f'ssn {100 + k}-45-6789 row {k}', 'response': 'ok'}) for k in range(40)]
+    lines.append('not json 123-45-6789')
+    res = api_ingest_dataset({'id': ds_id, 'format': 'jsonl', 'content': '\n'.join(lines), 'scrub': True, 'wait': True})
+    assert res.get('ok') is True and res['scrub_job']['status'] == 'finished'
+    out = SCRUBBED_DIR / f'{ds_id}.jsonl'
+    single = out.read_bytes()
+    assert b'-45-6789' not in single and single.count(b'[PII]') == 41
+    assert out in dataset_sources(('uploads',))
+    # Pool + tiny chunks must produce the same bytes as the inline run
+    job = api_scrub_datasets({'dataset_id': ds_id, 'workers': 2, 'chunk_bytes': 256, 'force': True, 'wait': True})
+    assert job.get('ok') is True
+    info = job['job']['result']['files'][0]
+    assert info['lines'] == 41 and info['lines_changed'] == 41
+    assert out.read_bytes() == single and not (SCRUBBED_DIR / '.parts').exists()
+    # a scrub cancelled between chunks removes its part files and leaves the output untouched
+    from app.backend.core.runtime.scheduler import JobCancelled
+    from app.backend.tasks import scrub_datasets
+    calls = []
+
+    def cancel_on_third_check():
+        calls.append(1)
+        if len(calls) == 3:
+            raise JobCancelled('cancelled')
+    monkeypatch.setattr(scrub_datasets, 'check_cancelled', cancel_on_third_check)
+    try:
+        scrub_datasets.run({'dataset_id': ds_id, 'workers': 1, 'chunk_bytes': 256, 'force': True})
+        raise AssertionError('scrub was not cancelled')
+    except JobCancelled:
+        pass
+    assert out.read_bytes() == single and not (SCRUBBED_DIR / '.parts').exists()
+    entry = json.loads((REGISTRY_DIR / 'datasets' / f'{ds_id}_scrubbed.json').read_text(encoding='utf-8'))
+    assert entry['source_id'] == ds_id and entry['scrub']['chunks'] > 1
+    # Unchanged source: skipped
+    again = api_scrub_datasets({'dataset_id': ds_id, 'wait': True})
+    assert again['job']['result']['files'][0]['status'] == 'skipped'
+    for p in [out, ARTIFACTS_DATASETS / 'uploads' / f'{ds_id}.jsonl',
+              REGISTRY_DIR / 'datasets' / f'{ds_id}.json', REGISTRY_DIR / 'datasets' / f'{ds_id}_scrubbed.json']:
+        p.unlink(missing_ok=True)
+
+
+def test_file_hash_cache_skips_unchanged_files(tmp_path: Path, monkeypatch):
+    import hashlib
+    import os
+    from app.backend.core.utils import hash_cache
+    from app.backend.core.utils.io import compute_sha256
+    monkeypatch.setattr(hash_cache, 'HASH_CACHE_PATH', tmp_path / 'file_hashes.json')
+    monkeypatch.setattr(hash_cache, '_ENTRIES', {})
+    monkeypatch.setattr(hash_cache, '_LOADED', False)
+    f = tmp_path / 'data.jsonl'
+    f.write_bytes(b'{"a": 1}\n')
+    assert compute_sha256(f) == hashlib.sha256(b'{"a": 1}\n').hexdigest()
+    assert (tmp_path / 'file_hashes.json').exists()
+
+    def _no_read(*a, **k):
+        raise AssertionError('unchanged file was re-read')
+    monkeypatch.setattr(hash_cache, '_hash_file', _no_read)
+    # A fresh process view (reloaded from disk) still serves the hash without reading the file
+    monkeypatch.setattr(hash_cache, '_ENTRIES', {})
+    monkeypatch.setattr(hash_cache, '_LOADED', False)
+    assert compute_sha256(f) == hashlib.sha256(b'{"a": 1}\n').hexdigest()
+    monkeypatch.undo()
+    monkeypatch.setattr(hash_cache, 'HASH_CACHE_PATH', tmp_path / 'file_hashes.json')
+    # Same size rewrite with a bumped mtime must be re-hashed
+    f.write_bytes(b'{"a": 2}\n')
+    st = f.stat()
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert compute_sha256(f) == hashlib.sha256(b'{"a": 2}\n').hexdigest()
+
+
+def test_readiness_recomputes_only_affected_checks():
+    from app.backend import main
+    from app.backend.main import get_guardrails
+    state = main._READINESS
+    readiness(refresh=True)
+    runs: Dict[str, int] = {}
+    orig = dict(state.checks)
+    for name, fn in orig.items():
+        state.checks[name] = (lambda n, f: lambda deps: (runs.__setitem__(n, runs.get(n, 0) + 1), f(deps))[1])(name, fn)
+    try:
+        before = get_guardrails()
+        assert readiness() == readiness() and runs == {}
+        # invalid values are refused before anything is written...
+        bad = set_guardrails({'max_tokens': 'lots'})
+        assert bad.status_code == 400 and json.loads(bad.body)['error_code'] == 'invalid_config'
+        assert readiness() == readiness() and runs == {}
+        # ...but a hand-edited config.json keeps serving (default max_tokens) and readiness flags it
+        from app.backend.core.utils.io import write_json
+        write_json(main.GUARDRAILS_CONFIG, dict(before, max_tokens='lots'))
+        assert get_guardrails()['max_tokens'] == 'lots'
+        assert runtime_post({'text': "What does 'dog' mean?"})['processed']['result']
+        rd = readiness()
+        assert runs == {'guardrails': 1}
+        assert 'guardrails_invalid' in [e['error_code'] for e in rd['errors']]
+        # A change made outside write_json is picked up by the watcher, or at once with refresh
+        cfg_path = main.GUARDRAILS_CONFIG
+        cfg_path.write_text(json.dumps(dict(before, max_tokens=64)), encoding='utf-8')
+        rd = readiness(refresh=True)
+        assert runs == {'guardrails': 2} and rd['guardrails']['max_tokens'] == 64
+        set_guardrails(before)
+    finally:
+        state.checks.update(orig)
+        state.invalidate()
+
+
+def test_module_catalog_reparses_only_changed_manifests(tmp_path: Path, monkeypatch):
+    from app.backend.core.runtime import loader
+    mods = tmp_path / 'modules'
+    (mods / 'a').mkdir(parents=True)
+    src = json.loads((ROOT / 'app' / 'modules' / 'chat-core' / 'manifest.json').read_text(encoding='utf-8'))
+    (mods / 'a' / 'manifest.json').write_text(json.dumps(dict(src, id='a')), encoding='utf-8')
+    monkeypatch.setattr(loader, 'MODULES_DIR', mods)
+    monkeypatch.setattr(loader, '_CATALOG', None)
+    monkeypatch.setattr(loader, '_PARSED', {})
+    cat = loader.get_catalog(refresh=True)
+    assert cat.get('a')['task'] == src['task'] and cat.with_capability(src['capabilities'][0])
+    assert loader.get_catalog(refresh=True) is cat
+    (mods / 'b').mkdir()
+    (mods / 'b' / 'manifest.json').write_text('{"id": "b"}', encoding='utf-8')
+    cat2 = loader.get_catalog(refresh=True)
+    assert cat2.generation == cat.generation + 1 and cat2.get('b') is None
+    assert [m['id'] for m in cat2.modules if m.get('error')] == ['b']
+    assert cat2.get('a') is cat.get('a')
+
+
+def test_registry_index_filters_and_paginates(tmp_path: Path):
+    from app.backend.core.registry.index import RegistryIndex
+    dirs = {k: tmp_path / k for k in ('models', 'neural_nets', 'datasets')}
+    for d in dirs.values():
+        d.mkdir()
+    for i in range(25):
+        (dirs['models'] / f'm{i:02d}.json').write_text(json.dumps({
+            'id': f'm{i:02d}', 'capability': 'chat' if i % 2 else 'predictor', 'task': 'dialogue',
+            'nn_id': f'nn{i % 3}', 'dataset_ids': ['ds_a'] if i < 5 else [],
+            'created_at': f'2025-01-{i + 1:02d}T00:00:00+00:00'}), encoding='utf-8')
+    (dirs['models'] / 'broken.json').write_text('{', encoding='utf-8')
+    idx = RegistryIndex(tmp_path / 'index.sqlite', kind_dirs=dirs)
+    try:
+        assert idx.query('models')['total'] == 25
+        assert [m['id'] for m in idx.query('models', filters={'dataset_id': 'ds_a'})['items']] == [f'm{i:02d}' for i in range(5)]
+        chat = idx.query('models', filters={'capability': 'chat', 'nn_id': 'nn1'})
+        assert {m['id'] for m in chat['items']} == {'m01', 'm07', 'm13', 'm19'}
+        seen, cursor = [], None
+        while True:
+            page = idx.query('models', sort='created_at', order='desc', limit=10, cursor=cursor)
+            seen += [m['id'] for m in page['items']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert seen == [f'm{i:02d}' for i in reversed(range(25))]
+        # later pages skip the count unless asked; missing sort values sort as '' on the bare column
+        page = idx.query('models', sort='name', limit=10)
+        assert page['total'] == 25 and idx.query('models', limit=10, cursor=page['next_cursor'])['total'] is None
+        assert idx.query('models', limit=10, cursor=page['next_cursor'], with_total=True)['total'] == 25
+        plan = ' '.join(r[-1] for r in idx.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM entries e WHERE e.kind = 'models' ORDER BY e.name, e.id"))
+        assert 'ix_entries_name' in plan and 'TEMP B-TREE' not in plan
+        # Deleting a file outside the app is reflected on the next query
+        (dirs['models'] / 'm00.json').unlink()
+        assert idx.query('models')['total'] == 24
+    finally:
+        idx.close()
+
+
+def test_atomic_writes_and_locked_updates(tmp_path: Path):
+    import threading
+    from app.backend.core.utils.io import atomic_open, update_json, load_json
+    target = tmp_path / 'counts.json'
+
+    def _bump(data):
+        data['n'] = data.get('n', 0) + 1
+
+    threads = [threading.Thread(target=lambda: [update_json(target, _bump, default={}) for _ in range(20)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # no lost increments under concurrent read-modify-write
+    assert load_json(target) == {'n': 160}
+    # a failed write leaves the previous file intact and no temp files behind
+    try:
+        with atomic_open(target) as f:
+            f.write('{"n": ')
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    assert load_json(target) == {'n': 160}
+    assert [p.name for p in tmp_path.iterdir()] == ['counts.json']
+
+
+def test_nn_catalog_aliases_and_one_time_seeding(tmp_path: Path, monkeypatch):
+    from app.backend.core.registry import nn_catalog
+    cat = nn_catalog.get_nn_catalog(refresh=True)
+    assert cat.resolve('ResNet-50') == 'resnet' and cat.resolve('vgg16') == 'vgg'
+    assert 'resnet' in [e['id'] for e in cat.family('vision')]
+    assert set(_parse_yaml_ids(ROOT / 'neural_networks.yaml')) == set(cat.by_id)
+
+    yaml_path = tmp_path / 'nets.yaml'
+    yaml_path.write_text('architectures:\n  - id: a\n    name: "A"\n    family: "f"\n    aliases: ["A-1"]\n', encoding='utf-8')
+    nn_dir = tmp_path / 'nn'
+    monkeypatch.setattr(nn_catalog, 'CATALOG_PATH', yaml_path)
+    monkeypatch.setattr(nn_catalog, 'MIGRATIONS_PATH', tmp_path / 'migrations.json')
+    monkeypatch.setattr(nn_catalog, 'REGISTRY_NN_DIR', nn_dir)
+    monkeypatch.setattr(nn_catalog, '_CATALOG', None)
+    monkeypatch.setattr(nn_catalog, '_SEEDED_SIG', None)
+    assert nn_catalog.seed_registry() == ['a']
+    # a deleted seeded entry is not resurrected, even after the catalog changes
+    (nn_dir / 'a.json').unlink()
+    yaml_path.write_text(yaml_path.read_text(encoding='utf-8') + '  - id: b\n    family: "f"\n    aliases:\n      - B-2\n', encoding='utf-8')
+    assert nn_catalog.seed_registry(refresh=True) == ['b']
+    assert sorted(p.name for p in nn_dir.iterdir()) == ['b.json']
+    assert nn_catalog.get_nn_catalog().resolve('b 2') == 'b'
+    monkeypatch.setattr(nn_catalog, '_SEEDED_SIG', None)
+    assert nn_catalog.seed_registry() == []
+
+
+def test_blob_store_dedupes_links_and_collects(tmp_path: Path, monkeypatch):
+    import hashlib
+    from app.backend.core.utils import blobstore
+    from app.backend.core.utils.io import load_json, write_json
+    monkeypatch.setattr(blobstore, 'BLOBS_DIR', tmp_path / 'blobs')
+    monkeypatch.setattr(blobstore, 'REFS_PATH', tmp_path / 'blobs' / 'refs.json')
+    monkeypatch.setattr(blobstore, 'REFS_LOG', tmp_path / 'blobs' / 'refs.log')
+    monkeypatch.setattr(blobstore, 'ARTIFACTS_DIR', tmp_path / 'artifacts')
+    monkeypatch.setattr(blobstore, 'REGISTRY_MODELS_DIR', tmp_path / 'models')
+    a, b = tmp_path / 'run_1' / 'ckpt.json', tmp_path / 'run_2' / 'ckpt.json'
+    ckpt = {'weights': list(range(2000))}
+    sha = blobstore.put_json(a, ckpt)
+    blob = blobstore.blob_path(sha)
+    ino = blob.stat().st_ino
+    assert blobstore.put_json(b, ckpt) == sha
+    # one stored copy, the duplicate caused no blob write
+    assert blob.stat().st_ino == ino and load_json(b) == ckpt
+    st = blobstore.stats()
+    assert st['blobs'] == 1 and st['refs'] == 2
+    assert st['saved_bytes'] == st['shared_refs'] * blob.stat().st_size
+
+    # rewriting a legacy path replaces it and never reaches the blob or the other path
+    write_json(a, {'weights': []})
+    assert load_json(b) == ckpt and blobstore.put_json(b, ckpt) == sha
+    assert hashlib.sha256(blob.read_bytes()).hexdigest() == sha
+    assert blobstore.gc(grace_s=0)['removed'] == 0
+    b.unlink()
+    # fresh blobs survive the grace period; afterwards the unreferenced one goes
+    assert blobstore.gc(dry_run=True)['removed'] == 0
+    res = blobstore.gc(grace_s=0)
+    assert res['removed'] == 1 and res['stale_refs'] == 1 and not blob.exists()
+
+    # run records and registry entries pin their blobs without a legacy path
+    run_sha = blobstore.put_bytes(b'run checkpoint')
+    reg_sha = blobstore.put_bytes(b'registry checkpoint')
+    write_json(tmp_path / 'artifacts' / 'sft' / 'm_1' / 'run.json', {'blobs': {'ckpt': run_sha}})
+    write_json(tmp_path / 'models' / 'm.json', {'checkpoint_blob': reg_sha})
+    blobstore.put_bytes(b'orphan')
+    assert blobstore.gc(grace_s=0)['removed'] == 1
+    assert blobstore.blob_path(run_sha).exists() and blobstore.blob_path(reg_sha).exists()
+
+    # existing duplicate files are adopted only where reflinks share their extents
+    c, d = tmp_path / 'c.bin', tmp_path / 'd.bin'
+    c.write_bytes(b'x' * 10000)
+    d.write_bytes(b'x' * 10000)
+    if blobstore.reflink_supported():
+        assert blobstore.adopt([c, d]) == {'adopted': 2, 'saved_bytes': 10000, 'reflink': True}
+    else:
+        assert blobstore.adopt([c, d]) == {'adopted': 0, 'saved_bytes': 0, 'reflink': False}
+    assert c.read_bytes() == d.read_bytes() == b'x' * 10000
+
+
+def test_blob_store_hardlinks_without_reflinks(tmp_path: Path, monkeypatch):
+    import os
+    from app.backend.core.utils import blobstore
+    from app.backend.core.utils.io import load_json, write_json
+    monkeypatch.setattr(blobstore, 'BLOBS_DIR', tmp_path / 'blobs')
+    monkeypatch.setattr(blobstore, 'REFS_PATH', tmp_path / 'blobs' / 'refs.json')
+    monkeypatch.setattr(blobstore, 'REFS_LOG', tmp_path / 'blobs' / 'refs.log')
+    # ext4 / NTFS / overlayfs: no shared extents
+    monkeypatch.setattr(blobstore, '_reflink', lambda src, dst: False)
+    ckpt = {'weights': list(range(2000))}
+    paths = [tmp_path / f'run_{i}' / 'ckpt.json' for i in range(3)]
+    sha = [blobstore.put_json(p, ckpt) for p in paths][0]
+    blob = blobstore.blob_path(sha)
+    size = blob.stat().st_size
+
+    def stored_bytes():
+        inodes = {}
+        for f in tmp_path.rglob('*'):
+            if f.is_file() and f.parent != blobstore.BLOBS_DIR:
+                st = f.stat()
+                inodes[(st.st_dev, st.st_ino)] = st.st_size
+        return sum(inodes.values())
+
+    # the blob and three legacy paths occupy the space of one copy
+    assert stored_bytes() == size and blob.stat().st_nlink == 4
+    st = blobstore.stats()
+    assert st['shared_refs'] == 3 and st['saved_bytes'] == 3 * size
+
+    # a rewrite detaches the path; the blob and the other paths keep their bytes
+    write_json(paths[0], {'weights': []})
+    assert not os.path.samefile(paths[0], blob) and blob.stat().st_nlink == 3
+    assert all(load_json(p) == ckpt for p in paths[1:])
+    assert blobstore.put_json(paths[0], ckpt) == sha and os.path.samefile(paths[0], blob)
+    assert stored_bytes() == size
+
+    # no hardlinks either (another device): a plain copy, reported as unshared
+    def no_link(src, dst):
+        raise OSError('cross-device link')
+    monkeypatch.setattr(blobstore.os, 'link', no_link)
+    other = tmp_path / 'run_3' / 'ckpt.json'
+    blobstore.put_json(other, ckpt)
+    assert stored_bytes() == 2 * size and blobstore.stats()['shared_refs'] == 3
+
+
+def test_artifact_codecs_pack_large_tables_and_stream(tmp_path: Path, monkeypatch):
+    from app.backend.core.utils import io as rio
+    monkeypatch.setattr(rio, 'APP_DIR', tmp_path)
+    monkeypatch.setattr(rio, 'CODEC_OVERRIDE', None)
+    counts = {'version': 2, 'unigram': {f'w{i}': i % 7 for i in range(3000)}}
+    art = tmp_path / 'artifacts' / 'lm.json'
+    rio.write_json(art, counts)
+    raw = art.read_bytes()
+    assert raw.startswith(rio.PACKED_MAGIC)
+    assert len(raw) * 4 < len(json.dumps(counts, indent=2).encode('utf-8'))
+    back = rio.load_json(art)
+    assert back == counts and list(back['unigram']) == list(counts['unigram'])
+    # the table streams without materialising the whole document
+    it = rio.iter_table(art)
+    assert next(it) == ('w0', 0)
+    assert sum(1 for _ in it) == 2999
+
+    # small documents stay plain compact JSON; registry files stay human-readable
+    small = tmp_path / 'artifacts' / 'small.json'
+    rio.write_json(small, {'a': [1, 2]})
+    assert small.read_text(encoding='utf-8') == '{"a":[1,2]}'
+    reg = tmp_path / 'registry' / 'models' / 'm.json'
+    rio.write_json(reg, {'id': 'm', 'big': list(range(5000))})
+    assert reg.read_text(encoding='utf-8').startswith('{\n  "id": "m"')
+
+    # NDJSON rows round-trip, and legacy Python-repr lines are still readable
+    rows = tmp_path / 'artifacts' / 'rows.jsonl'
+    rio.write_ndjson(rows, [{'lemma': 'café', 'n': 1}])
+    with rows.open('a', encoding='utf-8') as f:
+        f.write("{'lemma': 'old', 'n': 2}\n")
+    assert [r['lemma'] for r in rio.iter_ndjson(rows)] == ['café', 'old']
+
+    # a mistyped override fails loudly instead of silently picking the default codec
+    monkeypatch.setattr(rio, 'CODEC_OVERRIDE', 'jsno')
+    try:
+        rio.write_json(small, {'a': 1})
+        raise AssertionError('unknown codec accepted')
+    except ValueError as e:
+        assert 'jsno' in str(e)
+    assert small.read_text(encoding='utf-8') == '{"a":[1,2]}'
+
+
+def test_metrics_history_appends_queries_and_rolls_up(tmp_path: Path, monkeypatch):
+    from app.backend.core.metrics.history import MetricsHistory
+    h = MetricsHistory(history_dir=tmp_path / 'hist', index_path=':memory:')
+    base = 1_700_000_000 - 1_700_000_000 % 3600
+    for i in range(10):
+        h.append('chat', {'model_id': 'm1', 'seed': 7, 'timestamp': base + i * 60,
+                          'latency_ms': {'p50': float(i + 1)}})
+    h.append('chat', {'model_id': 'm2', 'timestamp': base + 30, 'latency_ms': {'p50': 99.0}})
+    assert h.latest('chat', 'm1')['latency_ms']['p50'] == 10.0
+    assert h.latest('chat')['model_id'] == 'm1'
+    rng = h.query('chat', model_id='m1', since=base + 120, until=base + 300, order='asc')
+    assert [r['latency_ms']['p50'] for r in rng] == [3.0, 4.0, 5.0]
+    [hour] = h.rollups('chat', 'latency_ms.p50', model_id='m1', period='hour')
+    assert (hour['count'], hour['p50'], hour['p95'], hour['max']) == (10, 5.0, 10.0, 10.0)
+    assert h.rollups('chat', 'seed', period='day') == []
+
+    # another process appending to the segment is picked up by the next sync
+    seg = next((tmp_path / 'hist' / 'chat').glob('*.jsonl'))
+    with seg.open('a', encoding='utf-8') as f:
+        f.write(json.dumps({'model_id': 'm1', 'timestamp': base + 900, 'latency_ms': {'p50': 0.5}}) + '\n')
+    h.sync(force=True)
+    assert h.latest('chat', 'm1')['latency_ms']['p50'] == 0.5
+    assert h.rollups('chat', 'latency_ms.p50', model_id='m1', period='day')[0]['count'] == 11
+    # the index is disposable: a fresh one rebuilds the same answers from the segments
+    h2 = MetricsHistory(history_dir=tmp_path / 'hist', index_path=':memory:')
+    assert len(h2.query('chat', limit=None)) == 12
+
+    # the latest-metrics file is written before the history append, so a failed append keeps it
+    from app.backend.core.metrics import recorder
+    from app.backend.core.utils.io import load_json
+    monkeypatch.setattr(recorder, 'ARTIFACTS_METRICS', tmp_path / 'metrics')
+
+    def broken_append(capability, data):
+        raise OSError('disk full')
+    monkeypatch.setattr(recorder, 'append_metrics', broken_append)
+    try:
+        recorder.record_metrics('chat', 'm3', {'accuracy': 1.0})
+        raise AssertionError('append failure was swallowed')
+    except OSError:
+        pass
+    assert load_json(tmp_path / 'metrics' / 'chat' / 'm3.json')['accuracy'] == 1.0
+
+
+def test_log_histogram_percentiles_and_merge():
+    import random
+    from app.backend.core.metrics.histogram import LogHistogram
+    rng = random.Random(7)
+    vals = sorted(rng.lognormvariate(-7, 1.5) for _ in range(5000))
+    a, b = LogHistogram(), LogHistogram()
+    for i, v in enumerate(vals):
+        (a if i % 2 else b).record(v)
+    h = LogHistogram.from_dict(json.loads(json.dumps(a.to_dict()))).merge(b)
+    assert h.count == 5000 and len(h.counts) < 1000
+    for q in (50, 95, 99):
+        exact = vals[int(round(q / 100 * 5000)) - 1]
+        assert abs(h.percentile(q) - exact) <= 0.02 * exact + 1e-6
+    assert h.cumulative([1e9])[0][1] == 5000
+
+
+def test_runtime_metrics_prometheus_text():
+    import asyncio
+    from app.backend.core.metrics import runtime_stats
+    from app.backend.main import metrics_runtime
+
+    class _Route:
+        path = '/api/items/{item_id}'
+
+    async def _app(scope, receive, send):
+        scope['route'] = _Route
+        if scope['path'].endswith('boom'):
+            raise RuntimeError('boom')
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'{}'})
+
+    async def _send(message):
+        pass
+
+    async def _drive():
+        mw = runtime_stats.RuntimeMetricsMiddleware(_app)
+        for path in ('/api/items/1', '/api/items/2', '/api/items/boom'):
+            try:
+                await mw({'type': 'http', 'method': 'GET', 'path': path}, None, _send)
+            except RuntimeError:
+                pass
+
+    runtime_stats.reset()
+    asyncio.run(_drive())
+    runtime_post({'text': "123-45-6789 means 'dog'?"})
+    text = metrics_runtime().body.decode('utf-8')
+    assert 'riai_http_requests_total{method="GET",route="/api/items/{item_id}",status="200"} 2' in text
+    assert 'riai_http_request_errors_total{method="GET",route="/api/items/{item_id}"} 1' in text
+    assert 'riai_http_request_duration_seconds_count{method="GET",route="/api/items/{item_id}"} 3' in text
+    assert 'riai_http_request_duration_seconds_bucket{le="+Inf",method="GET",route="/api/items/{item_id}"} 3' in text \
+        or 'riai_http_request_duration_seconds_bucket{method="GET",route="/api/items/{item_id}",le="+Inf"} 3' in text
+    assert 'riai_http_requests_in_flight 0' in text
+    assert 'riai_guardrail_actions_total{stage="input",type="pii_mask"} 1' in text
+    assert re.search(r'^riai_chat_answers_total\{source="(lm|wordnet)"\} 1$', text, re.M)
+    assert '# TYPE riai_job_queue_depth gauge' in text
+
+
+    # shards of exited threads are folded together: totals kept, shard list bounded
+    import gc
+    import threading
+    shards = len(runtime_stats._SHARDS)
+    for _ in range(3):
+        threads = [threading.Thread(target=runtime_stats.inc, args=('riai_test_total',)) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    gc.collect()
+    assert len(runtime_stats._SHARDS) <= shards and runtime_stats.counter_value('riai_test_total') == 60
+
+
+def test_runtime_and_job_traces_are_sampled_and_written(tmp_path: Path, monkeypatch):
+    from app.backend.core.metrics import tracing
+    monkeypatch.setattr(tracing, 'TRACES_DIR', tmp_path)
+    monkeypatch.setattr(tracing, 'SAMPLE_RATE', 0.0)
+    runtime_post({'text': "What does 'dog' mean?"})
+    assert tracing.flush() and not list(tmp_path.glob('*.jsonl'))
+
+    monkeypatch.setattr(tracing, 'SAMPLE_RATE', 1.0)
+    runtime_post({'text': "What does 'dog' mean?"})
+    evaluate_job({'wait': True, 'module_id': 'predictor-finance', 'seed': 1337})
+    assert tracing.flush()
+    [rt] = [json.loads(l) for f in tmp_path.glob('runtime_post-*.jsonl') for l in f.read_text(encoding='utf-8').splitlines()]
+    names = [s['name'] for s in rt['spans']]
+    for stage in ('guardrails.input', 'generate_answer', 'extract_lemma', 'index_lookup', 'guardrails.output', 'anti_echo'):
+        assert stage in names
+    by_id = {s['id']: s for s in rt['spans']}
+    assert by_id[next(s['parent'] for s in rt['spans'] if s['name'] == 'extract_lemma')]['name'] == 'generate_answer'
+    assert all(s['duration_ms'] <= rt['duration_ms'] for s in rt['spans'])
+    [job] = [json.loads(l) for f in tmp_path.glob('job-*.jsonl') for l in f.read_text(encoding='utf-8').splitlines()]
+    assert job['attrs']['status'] == 'finished' and 'job.run' in [s['name'] for s in job['spans']]
+
+    # daily files past the retention window are pruned; other files are left alone
+    from datetime import date
+    for name in ('runtime_post-2020-01-01.jsonl', 'runtime_post-2020-01-09.jsonl', 'notes.jsonl'):
+        (tmp_path / name).write_text('{}\n', encoding='utf-8')
+    removed = tracing.prune(retain_days=7, today=date(2020, 1, 10))
+    assert [p.name for p in removed] == ['runtime_post-2020-01-01.jsonl']
+    assert (tmp_path / 'runtime_post-2020-01-09.jsonl').exists() and (tmp_path / 'notes.jsonl').exists()
+
+
+def test_profile_endpoint_captures_armed_requests_and_jobs(tmp_path: Path, monkeypatch):
+    import time
+    import tracemalloc
+    from app.backend.core.metrics import profiling
+    from app.backend.main import admin_profile_arm, admin_profile_summary
+    monkeypatch.setattr(profiling, 'PROFILES_DIR', tmp_path)
+    armed = admin_profile_arm({'requests': 2, 'memory': True, 'top': 10})
+    assert armed['armed'] and armed['remaining'] == 2
+    assert admin_profile_arm({'requests': 1}).status_code == 409
+    runtime_post({'text': "What does 'dog' mean?"})
+    runtime_post({'text': "What does 'cat' mean?"})
+    assert profiling.status() == {'armed': False}
+    summary = admin_profile_summary(armed['profile_id'])
+    assert summary['captured'] == 2 and 0 < len(summary['hottest']) <= 10
+    assert (tmp_path / summary['files']['pstats']).exists()
+    assert (tmp_path / summary['files']['allocations']).exists()
+
+    armed = admin_profile_arm({'job_type': 'evaluate', 'memory': False})
+    runtime_post({'text': "What does 'dog' mean?"})  # not the target: stays armed
+    assert profiling.status()['remaining'] == 1
+    evaluate_job({'wait': True, 'module_id': 'predictor-finance', 'seed': 1337})
+    summary = admin_profile_summary(armed['profile_id'])
+    assert summary['captured'] == 1 and summary['target']['job_type'] == 'evaluate' and summary['hottest']
+    assert admin_profile_summary('prof_missing').status_code == 404
+
+    # one specific queued job: arm a chosen id, then submit under it
+    job_id = f'eval_prof_{armed["profile_id"][-6:]}'
+    armed = admin_profile_arm({'job_id': job_id, 'memory': False})
+    res = evaluate_job({'wait': True, 'job_id': job_id, 'module_id': 'predictor-finance', 'seed': 1337})
+    assert res['job_id'] == job_id and admin_profile_summary(armed['profile_id'])['captured'] == 1
+    assert evaluate_job({'job_id': job_id, 'module_id': 'predictor-finance'}).status_code == 409
+    assert evaluate_job({'job_id': '../x', 'module_id': 'predictor-finance'}).status_code == 400
+
+    # a target that never comes: the session (and tracemalloc) ends by itself
+    armed = admin_profile_arm({'job_id': 'never_submitted', 'timeout_s': 0.05})
+    deadline = time.monotonic() + 5
+    while profiling.status()['armed'] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    summary = admin_profile_summary(armed['profile_id'])
+    assert summary['expired'] and summary['captured'] == 0 and not tracemalloc.is_tracing()
+
+
+def test_bench_fixtures_are_deterministic_and_compare_flags_regressions(tmp_path: Path):
+    from bench.fixtures import write_index_topup, write_ohlcv, write_uploads
+    from bench.report import compare, summarize
+    wn = ROOT / 'WordNet-3.0'
+    for d in ('a', 'b'):
+        write_uploads(tmp_path / d, files=2, total_bytes=64 * 1024, seed=7, wordnet_root=wn)
+        write_ohlcv(tmp_path / d / 'ohlcv.csv', rows=500, seed=7)
+        write_index_topup(tmp_path / d / 'topup.jsonl', target=40_000, seed=7, wordnet_root=wn)
+    for name in ('bench_upload_000.jsonl', 'bench_upload_001.jsonl', 'ohlcv.csv', 'topup.jsonl'):
+        assert (tmp_path / 'a' / name).read_bytes() == (tmp_path / 'b' / name).read_bytes()
+    rec = json.loads((tmp_path / 'a' / 'bench_upload_000.jsonl').open(encoding='utf-8').readline())
+    assert rec['prompt'] and rec['response']
+    assert len((tmp_path / 'a' / 'ohlcv.csv').read_text(encoding='utf-8').splitlines()) == 501
+
+    base = {'scale': 'smoke', 'env': {'id': 'x'}, 'cases': {
+        'load_index': summarize([0.100, 0.110], first=0.2), 'readiness': summarize([0.0010], first=0.01)}}
+    cur = {'scale': 'smoke', 'env': {'id': 'x'}, 'cases': {
+        'load_index': summarize([0.150, 0.160], first=0.2), 'readiness': summarize([0.0016], first=0.01),
+        'train_sft': summarize([0.5], first=0.5)}}
+    rows, warnings = compare(base, cur)
+    status = {r['case']: r['status'] for r in rows}
+    assert status == {'load_index': 'regression', 'readiness': 'ok', 'train_sft': 'new'} and not warnings
+
+
+def test_load_generator_drives_asgi_app_and_finds_saturation():
+    import asyncio
+    from app.backend.main import app
+    from bench.load import AsgiTransport, QueryMix, run_load, saturation
+    words = ['dog', 'cat', 'bank']
+    a, b = QueryMix({'hit': 1, 'miss': 1, 'long': 1}, 7, words), QueryMix({'hit': 1, 'miss': 1, 'long': 1}, 7, words)
+    assert [a.next() for _ in range(20)] == [b.next() for _ in range(20)]
+
+    out = asyncio.run(run_load(AsgiTransport(app), QueryMix({'hit': 3, 'miss': 1}, 1, words), concurrency=[1, 2], duration_s=0.3, warmup=2))
+    assert out['mode'] == 'closed' and [s['concurrency'] for s in out['steps']] == [1, 2]
+    for step in out['steps']:
+        assert step['ok'] > 0 and step['errors'] == 0 and step['latency_ms']['p50'] > 0
+        assert set(step['by_class']) <= {'hit', 'miss'}
+
+    lat = lambda p95: {'p50': 1.0, 'p95': p95, 'p99': p95, 'mean': 1.0, 'max': p95}
+    closed = [{'concurrency': c, 'throughput_rps': t, 'latency_ms': lat(p), 'error_rate': 0.0}
+              for c, t, p in ((1, 100, 20), (4, 300, 60), (16, 310, 300))]
+    assert saturation(closed, 'closed', 250)['saturation_concurrency'] == 4
+    assert saturation(closed, 'closed', 250)['max_concurrency_within_slo'] == 4
+    opened = [{'rate_rps': r, 'offered_rps': r, 'throughput_rps': t, 'latency_ms': lat(p), 'error_rate': 0.0}
+              for r, t, p in ((50, 50, 10), (100, 99, 40), (200, 150, 900))]
+    sat = saturation(opened, 'open', 250)
+    assert sat['sustained_rps'] == 100 and sat['saturated_at_rps'] == 200
+
+
+def test_debug_memory_reports_caches_and_enforces_budgets(capsys):
+    from app.backend.core.runtime import chat
+    from app.backend.core.utils import memory
+    from app.backend.main import debug_memory
+    runtime_post({'text': "What does 'dog' mean?"})
+    snap = debug_memory()
+    caches = {c['name']: c for c in snap['caches']}
+    assert {'wordnet_index', 'wordnet_glosses', 'chat_lm', 'bubble_model', 'dataset_records'} <= set(caches)
+    assert caches['wordnet_index']['bytes'] > 0 and caches['wordnet_index']['entries'] > 0
+    assert snap['cache_bytes'] >= caches['wordnet_index']['bytes']
+
+    saved = {n: memory.budget(n) for n in ('wordnet_index', 'wordnet_glosses')}
+    try:
+        memory.set_budget('wordnet_glosses', 1024)
+        for i in range(20):
+            chat._gloss_put(('noun', i), (f'gloss number {i}', ['a', 'b']))
+        assert ('noun', 19) in chat._GLOSS_CACHE and ('noun', 0) not in chat._GLOSS_CACHE
+        glosses = {c['name']: c for c in debug_memory()['caches']}['wordnet_glosses']
+        assert glosses['bytes'] <= 1024 and glosses['evictions'] > 0
+
+        memory.set_budget('wordnet_index', 1)
+        assert chat._INDEX_CACHE is None
+        res = runtime_post({'text': "What does 'dog' mean?"})
+        assert res['answer']['meta']['lemma'] == 'dog' and chat._INDEX_CACHE is None
+        index = {c['name']: c for c in debug_memory()['caches']}['wordnet_index']
+        assert index['refusals'] >= 1 and index['bytes'] == 0
+        # the fallback is counted per load and reported once, not per request
+        from app.backend.core.metrics import runtime_stats
+        before = runtime_stats.counter_value('riai_index_uncached_loads_total')
+        runtime_post({'text': "What does 'cat' mean?"})
+        assert runtime_stats.counter_value('riai_index_uncached_loads_total') > before
+        assert capsys.readouterr().err.count('exceeds the wordnet_index budget') == 1
+    finally:
+        for name, b in saved.items():
+            memory.set_budget(name, b)
+        chat._evict_glosses()  # the fake synsets must not answer later tests
+
+
+def test_job_queue_runs_polls_and_cancels(tmp_path: Path, monkeypatch):
+    import threading
+    import time
+    from app.backend.core.runtime import scheduler
+    from app.backend.core.utils.io import write_json
+    from app.backend.main import api_self_eval, get_job, cancel_job, train_sft_job
+    from app.backend.tasks import train_sft
+    # records and queue markers go to tmp_path, not app/artifacts/jobs
+    monkeypatch.setattr(scheduler, 'ARTIFACTS_JOBS', tmp_path)
+    monkeypatch.setattr(scheduler, 'QUEUE_DIR', tmp_path / 'queue')
+    monkeypatch.setattr(scheduler, 'RUNNING_DIR', tmp_path / 'running')
+
+    queued = train_sft_job({'seed': 1337, 'steps': 2, 'order': 3})
+    assert queued['ok'] and queued['job']['status'] in ('queued', 'running')
+    done = scheduler.wait(queued['job_id'], timeout=120)
+    assert done['status'] == 'finished' and get_job(queued['job_id'])['result']['metrics']
+    assert get_job('train_missing').status_code == 404
+    # tools are queued too; wait=True hands back the finished record
+    tool = api_self_eval({'seed': 4242, 'wait': True})
+    assert tool['ok'] and tool['job']['type'] == 'self_eval' and tool['job']['result']['count'] == 2
+    Path(tool['job']['result']['self_eval']).unlink()
+
+    # queued jobs are dropped from the queue on cancel
+    scheduler.stop_workers()
+    try:
+        job = train_sft_job({'seed': 1337})
+        assert job['job']['status'] == 'queued' and list(scheduler.QUEUE_DIR.glob(f"*_{job['job_id']}"))
+        assert cancel_job(job['job_id'])['status'] == 'cancelled'
+        assert not list(scheduler.QUEUE_DIR.glob(f"*_{job['job_id']}"))
+        assert cancel_job(job['job_id']).status_code == 409
+    finally:
+        assert scheduler.start_workers() == scheduler.WORKERS
+
+    # running jobs stop at their next cancellation point
+    started = threading.Event()
+
+    def slow(payload):
+        started.set()
+        for _ in range(2000):
+            scheduler.check_cancelled()
+            time.sleep(0.005)
+        return {}
+    monkeypatch.setattr(train_sft, 'run', slow)
+    job = train_sft_job({'seed': 1337})
+    assert started.wait(30)
+    assert cancel_job(job['job_id'])['cancel_requested'] is True
+    assert scheduler.wait(job['job_id'], timeout=30)['status'] == 'cancelled'
+
+    # a running marker nobody holds belongs to a dead worker
+    write_json(tmp_path / 'train_orphan.json', {'job_id': 'train_orphan', 'type': 'train', 'status': 'running'})
+    scheduler.RUNNING_DIR.mkdir(exist_ok=True)
+    (scheduler.RUNNING_DIR / 'train_orphan').touch()
+    scheduler._recover()
+    assert get_job('train_orphan')['status'] == 'failed' and not (scheduler.RUNNING_DIR / 'train_orphan').exists()
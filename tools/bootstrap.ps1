@@ -14,23 +14,34 @@ function PostJson($Path, $Obj){
 function GetJson($Path){
   return Invoke-RestMethod -Method GET -Uri ($Base + $Path)
 }
+# Jobs are queued server-side: "wait" makes the request return only once the job has ended,
+# so each step starts after the one it depends on (chat-core needs the lexicon index).
+function RunJob($Path, $Obj){
+  $Obj.wait = $true
+  $res = PostJson $Path $Obj
+  if($res.job.status -ne 'finished'){
+    Write-Host ("Job {0} ended {1}: {2}" -f $res.job_id, $res.job.status, $res.job.error) -ForegroundColor Red
+    exit 1
+  }
+  return $res
+}
 
 Write-Host "Saving pending workspace selection..."
 $mods = @('chat-core','predictor-finance')
 PostJson '/api/workspace' @{ selected_modules = $mods } | Out-Null
 
 Write-Host "Training modules (seed=$Seed)..."
-PostJson '/api/train' @{ module_id = 'lexicon-wordnet3'; seed = $Seed } | Out-Null
-PostJson '/api/train' @{ module_id = 'chat-core'; seed = $Seed } | Out-Null
-PostJson '/api/train' @{ module_id = 'predictor-finance'; seed = $Seed } | Out-Null
+RunJob '/api/train' @{ module_id = 'lexicon-wordnet3'; seed = $Seed } | Out-Null
+RunJob '/api/train' @{ module_id = 'chat-core'; seed = $Seed } | Out-Null
+RunJob '/api/train' @{ module_id = 'predictor-finance'; seed = $Seed } | Out-Null
 
 Write-Host "Saving model mappings..."
 $module_map = @{ 'chat-core' = "chat_retrieval_$Seed"; 'predictor-finance' = "predictor_ma_$Seed" }
 PostJson '/api/workspace/mappings' @{ module_map = $module_map } | Out-Null
 
 Write-Host "Evaluating models..."
-PostJson '/api/evaluate' @{ module_id = 'chat-core'; seed = $Seed; model_id = "chat_retrieval_$Seed" } | Out-Null
-PostJson '/api/evaluate' @{ module_id = 'predictor-finance'; seed = $Seed; model_id = "predictor_ma_$Seed" } | Out-Null
+RunJob '/api/evaluate' @{ module_id = 'chat-core'; seed = $Seed; model_id = "chat_retrieval_$Seed" } | Out-Null
+RunJob '/api/evaluate' @{ module_id = 'predictor-finance'; seed = $Seed; model_id = "predictor_ma_$Seed" } | Out-Null
 
 Write-Host "Checking readiness..."
 $ready = GetJson '/api/readiness'